@@ -179,6 +179,50 @@ class Cache(object):
         fun = '{0}.fetch'.format(self.driver)
         return self.modules[fun](bank, key, **self._kwargs)
 
+    def fetch_many(self, items):
+        '''
+        Fetch the data of many keys at once
+
+        :param items:
+            An iterable of ``(bank, key)`` tuples, see :py:meth:`fetch`.
+
+        :return:
+            Return a dict mapping each ``(bank, key)`` tuple to the data
+            fetched from the cache, or to an empty dict if it was not found.
+
+        :raises SaltCacheError:
+            Raises an exception if cache driver detected an error accessing data
+            in the cache backend (auth, permissions, etc).
+
+        Drivers which do not provide a ``fetch_many`` function fall back to
+        fetching the keys one by one.
+        '''
+        fun = '{0}.fetch_many'.format(self.driver)
+        if fun in self.modules:
+            return self.modules[fun](list(items), **self._kwargs)
+        return dict(((bank, key), self.fetch(bank, key)) for bank, key in items)
+
+    def store_many(self, items):
+        '''
+        Store the data of many keys at once
+
+        :param items:
+            A dict mapping ``(bank, key)`` tuples to the data to store, see
+            :py:meth:`store`.
+
+        :raises SaltCacheError:
+            Raises an exception if cache driver detected an error accessing data
+            in the cache backend (auth, permissions, etc).
+
+        Drivers which do not provide a ``store_many`` function fall back to
+        storing the keys one by one.
+        '''
+        fun = '{0}.store_many'.format(self.driver)
+        if fun in self.modules:
+            return self.modules[fun](items, **self._kwargs)
+        for (bank, key), data in six.iteritems(items):
+            self.store(bank, key, data)
+
     def updated(self, bank, key):
         '''
         Get the last updated epoch for the specified key
@@ -243,6 +287,35 @@ class Cache(object):
         fun = '{0}.list'.format(self.driver)
         return self.modules[fun](bank, **self._kwargs)
 
+    def list_with_mtime(self, bank):
+        '''
+        Lists entries stored in the specified bank along with the epoch of
+        their last update.
+
+        :param bank:
+            The name of the location inside the cache which will hold the key
+            and its associated data.
+
+        :return:
+            A dict mapping the bank entries to their last updated epoch, or to
+            None if the driver could not tell. Returns an empty dict if the
+            bank doesn't exists.
+
+        :raises SaltCacheError:
+            Raises an exception if cache driver detected an error accessing data
+            in the cache backend (auth, permissions, etc).
+
+        Drivers which do not provide a ``list_with_mtime`` function fall back
+        to calling ``updated`` for every entry, when they support it.
+        '''
+        fun = '{0}.list_with_mtime'.format(self.driver)
+        if fun in self.modules:
+            return self.modules[fun](bank, **self._kwargs)
+        entries = self.list(bank) or []
+        if '{0}.updated'.format(self.driver) not in self.modules:
+            return dict((entry, None) for entry in entries)
+        return dict((entry, self.updated(bank, entry)) for entry in entries)
+
     def contains(self, bank, key=None):
         '''
         Checks if the specified bank contains the specified key.
@@ -352,6 +425,13 @@ class MemCache(Cache):
                 self.storage.popitem(last=False)
         self.storage[(bank, key)] = [time.time(), data]
 
+    def fetch_many(self, items):
+        return dict(((bank, key), self.fetch(bank, key)) for bank, key in items)
+
+    def store_many(self, items):
+        for (bank, key), data in six.iteritems(items):
+            self.store(bank, key, data)
+
     def flush(self, bank, key=None):
         self.storage.pop((bank, key), None)
         super(MemCache, self).flush(bank, key)
@@ -19,6 +19,7 @@ import shutil
 import tempfile
 
 from salt.exceptions import SaltCacheError
+from salt.ext import six
 import salt.utils.atomicfile
 import salt.utils.files
 
@@ -41,11 +42,10 @@ def get_storage_id(kwargs):
     return ('localfs', __cachedir(kwargs))
 
 
-def store(bank, key, data, cachedir):
+def _mkbank(base):
     '''
-    Store information in a file.
+    Create the directory of a bank if it does not exist yet.
     '''
-    base = os.path.join(cachedir, os.path.normpath(bank))
     try:
         os.makedirs(base)
     except OSError as exc:
@@ -56,6 +56,11 @@ def store(bank, key, data, cachedir):
                 )
             )
 
+
+def _write(base, key, data):
+    '''
+    Atomically write the data of a key inside an existing bank directory.
+    '''
     outfile = os.path.join(base, '{0}.p'.format(key))
     tmpfh, tmpfname = tempfile.mkstemp(dir=base)
     os.close(tmpfh)
@@ -72,6 +77,28 @@ def store(bank, key, data, cachedir):
         )
 
 
+def store(bank, key, data, cachedir):
+    '''
+    Store information in a file.
+    '''
+    base = os.path.join(cachedir, os.path.normpath(bank))
+    _mkbank(base)
+    _write(base, key, data)
+
+
+def store_many(items, cachedir):
+    '''
+    Store information in many files, creating each bank directory only once.
+    '''
+    banks = set()
+    for (bank, key), data in six.iteritems(items):
+        base = os.path.join(cachedir, os.path.normpath(bank))
+        if base not in banks:
+            _mkbank(base)
+            banks.add(base)
+        _write(base, key, data)
+
+
 def fetch(bank, key, cachedir):
     '''
     Fetch information from a file.
@@ -100,6 +127,29 @@ def fetch(bank, key, cachedir):
         )
 
 
+def fetch_many(items, cachedir):
+    '''
+    Fetch information from many files, opening the key files directly
+    instead of checking for their existence first.
+    '''
+    ret = {}
+    for bank, key in items:
+        key_file = os.path.join(cachedir, os.path.normpath(bank), '{0}.p'.format(key))
+        try:
+            with salt.utils.files.fopen(key_file, 'rb') as fh_:
+                ret[(bank, key)] = __context__['serial'].load(fh_)
+        except (IOError, OSError) as exc:
+            if exc.errno != errno.ENOENT:
+                raise SaltCacheError(
+                    'There was an error reading the cache file "{0}": {1}'.format(
+                        key_file, exc
+                    )
+                )
+            # The bank may be a file holding the key
+            ret[(bank, key)] = fetch(bank, key, cachedir)
+    return ret
+
+
 def updated(bank, key, cachedir):
     '''
     Return the epoch of the mtime for this cache file
@@ -169,6 +219,36 @@ def list_(bank, cachedir):
     return ret
 
 
+def list_with_mtime(bank, cachedir):
+    '''
+    Return a dict mapping all entries stored in the specified bank to the
+    epoch of their last modification. The mtime of a sub-bank changes
+    whenever a key is stored directly inside of it.
+    '''
+    base = os.path.join(cachedir, os.path.normpath(bank))
+    if not os.path.isdir(base):
+        return {}
+    try:
+        items = os.listdir(base)
+    except OSError as exc:
+        raise SaltCacheError(
+            'There was an error accessing directory "{0}": {1}'.format(
+                base, exc
+            )
+        )
+    ret = {}
+    for item in items:
+        try:
+            mtime = os.path.getmtime(os.path.join(base, item))
+        except OSError:
+            # The entry was removed in the meantime
+            continue
+        if item.endswith('.p'):
+            item = item[:-2]
+        ret[item] = mtime
+    return ret
+
+
 def contains(bank, key, cachedir):
     '''
     Checks if the specified bank contains the specified key.
@@ -24,6 +24,7 @@ import os
 import time
 import random
 import logging
+import threading
 from datetime import datetime
 
 # Import salt libs
@@ -106,6 +107,100 @@ def get_local_client(
         auto_reconnect=auto_reconnect)
 
 
+class JobLiveness(object):
+    '''
+    The jobs running on the minions, as reported by the ``saltutil.running``
+    pings sent by the LocalClients of a process
+
+    The LocalClients share it to check whether their jobs are still running
+    with the returns of the pings recorded by the other clients, instead of a
+    ``saltutil.find_job`` ping per job.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        # minion id -> (ping jid, publish time) of the last ping
+        self.pings = {}
+        # ping jid -> publish time, of the pings sent less than an interval ago
+        self.sent = {}
+        # minion id -> (publish time of the ping, running jids)
+        self.running = {}
+
+    def check(self, minions, since, interval, ping, subscribed=()):
+        '''
+        Return what is known of the jobs running on the minions, for a job
+        published before ``since``
+
+        Only the returns of the pings published after ``since`` and less than
+        ``interval`` seconds ago are used. A ping which was not answered yet
+        is only waited for when its jid is in ``subscribed``, the pings the
+        caller listened to since they were published: the returns of a ping
+        published before the caller subscribed to it may have been dropped
+        by its event listener already. The other minions are pinged by
+        calling ``ping`` with the list of their ids, it returns the jid of
+        the ping or None.
+
+        Returns a tuple of the dict of the running jids of the minions which
+        answered, and the dict of the ping jids still awaited to the set of
+        minions they were sent to.
+        '''
+        known = {}
+        waiting = {}
+        stale = []
+        with self.lock:
+            now = time.time()
+            fresh = max(since, now - interval)
+            for ping_jid, sent_at in list(six.iteritems(self.sent)):
+                if sent_at < now - interval:
+                    del self.sent[ping_jid]
+            for minion in minions:
+                ret = self.running.get(minion)
+                if ret is not None and ret[0] >= fresh:
+                    known[minion] = ret[1]
+                    continue
+                sent = self.pings.get(minion)
+                if sent is not None and sent[1] >= fresh and sent[0] in subscribed:
+                    waiting.setdefault(sent[0], set()).add(minion)
+                else:
+                    stale.append(minion)
+            if stale:
+                # Ping under the lock so that the other clients find the ping
+                # in self.sent when they record its returns
+                ping_jid = ping(sorted(stale))
+                if ping_jid:
+                    now = time.time()
+                    self.sent[ping_jid] = now
+                    for minion in stale:
+                        self.pings[minion] = (ping_jid, now)
+                    waiting[ping_jid] = set(stale)
+        return known, waiting
+
+    def record(self, ping_jid, minion, jids):
+        '''
+        Record the jids a minion returned to a ping as running
+        '''
+        with self.lock:
+            sent_at = self.sent.get(ping_jid)
+            ret = self.running.get(minion)
+            # Ignore the returns of older pings
+            if sent_at is not None and (ret is None or ret[0] < sent_at):
+                self.running[minion] = (sent_at, frozenset(jids))
+
+
+_JOB_LIVENESS = {}
+
+
+def job_liveness(opts):
+    '''
+    Return the JobLiveness shared by the LocalClients of this process which
+    talk to the same master
+    '''
+    key = opts.get('sock_dir')
+    try:
+        return _JOB_LIVENESS[key]
+    except KeyError:
+        return _JOB_LIVENESS.setdefault(key, JobLiveness())
+
+
 class LocalClient(object):
     '''
     The interface used by the :command:`salt` CLI tool on the Salt Master
@@ -247,6 +342,50 @@ class LocalClient(object):
 
         return pub_data
 
+    def _check_running(self, minions, since, subscribed, **kwargs):
+        '''
+        Check whether a job published before ``since`` is still running on the
+        minions, with the ``saltutil.running`` pings shared by the clients of
+        this process
+
+        Returns the dict of the running jids of the minions already known,
+        and the dict of the ping jids to read the returns of to the minions
+        they were sent to. These are either in ``subscribed``, the pings this
+        job listened to, or sent by this call.
+        '''
+        gather_job_timeout = int(kwargs.get('gather_job_timeout', self.opts['gather_job_timeout']))
+
+        def ping(tgt):
+            log.debug('Checking the jobs running on %s', tgt)
+            pub_data = self.run_job(tgt,
+                                    'saltutil.running',
+                                    tgt_type='list',
+                                    timeout=gather_job_timeout,
+                                    listen=True,
+                                    **kwargs)
+            # run_job subscribed to the events of the ping before sending it
+            return pub_data.get('jid')
+
+        return job_liveness(self.opts).check(
+            minions, since, gather_job_timeout, ping, subscribed)
+
+    def _job_running(self, jid, ping_jid, raw):
+        '''
+        Record the return of a ``saltutil.running`` ping, and return the id of
+        the minion if the job is running on it
+        '''
+        data = raw.get('data', {})
+        if 'id' not in data or 'return' not in data:
+            return None
+        if data.get('retcode', 0) > 0 or not isinstance(data['return'], list):
+            log.error('saltutil returning errors on minion %s', data['id'])
+            return None
+        jids = set(job.get('jid') for job in data['return'] if isinstance(job, dict))
+        job_liveness(self.opts).record(ping_jid, data['id'], jids)
+        if jid in jids:
+            return data['id']
+        return None
+
     def _check_pub_data(self, pub_data, listen=True):
         '''
         Common checks on the pub_data data structure returned from running pub
@@ -1086,7 +1225,10 @@ class LocalClient(object):
         if timeout is None:
             timeout = self.opts['timeout']
         gather_job_timeout = int(kwargs.get('gather_job_timeout', self.opts['gather_job_timeout']))
-        start = int(time.time())
+        # The job was published before, and this client listening since
+        start = time.time()
+        # Share the saltutil.running pings with the other jobs of the process
+        coalesce = self.opts.get('gather_job_coalesce', False) and not self.opts['order_masters']
 
         # timeouts per minion, id_ -> timeout time
         minion_timeouts = {}
@@ -1112,8 +1254,12 @@ class LocalClient(object):
             ret_iter = self.get_returns_no_block('salt/job/{0}'.format(jid))
         # iterator for the info of this job
         jinfo_iter = []
+        # iterators for the returns of the saltutil.running pings
+        running_iters = []
         # open event jids that need to be un-subscribed from later
         open_jids = set()
+        # saltutil.running pings subscribed to
+        running_jids = set()
         timeout_at = time.time() + timeout
         gather_syndic_wait = time.time() + self.opts['syndic_wait']
         # are there still minions running the job out there
@@ -1178,7 +1324,29 @@ class LocalClient(object):
 
             # if the jinfo has timed out and some minions are still running the job
             # re-do the ping
-            if time.time() > timeout_at and minions_running:
+            if time.time() > timeout_at and minions_running and coalesce:
+                try:
+                    known, waiting = self._check_running(
+                        minions - found, start, running_jids, **kwargs)
+                except AuthorizationError:
+                    # The publisher ACL always accepts saltutil.find_job, not
+                    # saltutil.running
+                    log.debug('Not authorized to ping with saltutil.running, '
+                              'checking jid %s with saltutil.find_job', jid)
+                    coalesce = False
+                else:
+                    minions_running = False
+                    for id_, jids in six.iteritems(known):
+                        if jid in jids:
+                            minion_timeouts[id_] = time.time() + timeout
+                            minions_running = True
+                    running_jids.update(waiting)
+                    running_iters = [
+                        (ping_jid, self.get_returns_no_block('salt/job/{0}'.format(ping_jid)))
+                        for ping_jid in waiting
+                    ]
+                    timeout_at = time.time() + gather_job_timeout
+            if time.time() > timeout_at and minions_running and not coalesce:
                 # since this is a new ping, no one has responded yet
                 jinfo = self.gather_job_info(jid, list(minions - found), 'list', **kwargs)
                 minions_running = False
@@ -1194,6 +1362,17 @@ class LocalClient(object):
                     timeout_at += self.opts.get('syndic_wait', 1)
 
             # check for minions that are running the job still
+            for ping_jid, ping_iter in running_iters:
+                for raw in ping_iter:
+                    if raw is None:
+                        break
+                    id_ = self._job_running(jid, ping_jid, raw)
+                    if id_ is None:
+                        continue
+                    minions.add(id_)
+                    minion_timeouts[id_] = time.time() + timeout
+                    minions_running = True
+
             for raw in jinfo_iter:
                 # if there are no more events, lets stop waiting for the jinfo
                 if raw is None:
@@ -1276,6 +1455,8 @@ class LocalClient(object):
         if open_jids:
             for jid in open_jids:
                 self.event.unsubscribe(jid)
+        for ping_jid in running_jids:
+            self._clean_up_subscriptions(ping_jid)
 
         if expect_minions:
             for minion in list((minions - found)):
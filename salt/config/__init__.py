@@ -175,6 +175,20 @@ VALID_OPTS = immutabletypes.freeze({
     # what commands the master is processing and what the rates are of the executions
     'master_stats': bool,
     'master_stats_event_iter': int,
+
+    # The number of minion returns a master worker queues before writing them
+    # to the job cache in a single batch, 1 writes every return right away
+    'return_batch_size': int,
+
+    # The maximum time in seconds a queued return waits for its batch
+    'return_batch_interval': float,
+
+    # Keep the request statistics of the master workers in a memory mapped file
+    'worker_stats': bool,
+
+    # Separate pools of master workers for the given request commands
+    'worker_pools': dict,
+
     # The key fingerprint of the higher-level master for the syndic to verify it is talking to the
     # intended master
     'syndic_finger': six.string_types,
@@ -381,6 +395,14 @@ VALID_OPTS = immutabletypes.freeze({
     # The chunk size to use when streaming files with the file server
     'file_buffer_size': int,
 
+    # The number of batches of files a minion fetches from the master at once when it caches many
+    # files, like the files of a directory
+    'file_fetch_workers': int,
+
+    # Store the files a minion caches from the master once per contents, as hard links to an
+    # object store keyed by their hash
+    'file_cache_objects': bool,
+
     # The TCP port on which minion events should be published if ipc_mode is TCP
     'tcp_pub_port': int,
 
@@ -439,6 +461,10 @@ VALID_OPTS = immutabletypes.freeze({
     # If an event is above this size, it will be trimmed before putting it on the event bus
     'max_event_size': int,
 
+    # The number of processes publishing the master events, the tags are
+    # spread across them
+    'event_publisher_shards': int,
+
     # Enable old style events to be sent on minion_startup. Change default to False in Sodium release
     'enable_legacy_startup_events': bool,
 
@@ -454,6 +480,12 @@ VALID_OPTS = immutabletypes.freeze({
     # Tell the loader to attempt to import *.zip archives
     'enable_zip_modules': bool,
 
+    # Keep an on disk index of the module directories scanned by the loaders
+    'loader_index': bool,
+
+    # Keep an on disk cache of the modules refused by their __virtual__ function
+    'virtual_cache': bool,
+
     # Tell the client to show minions that have timed out
     'show_timeout': bool,
 
@@ -484,6 +516,14 @@ VALID_OPTS = immutabletypes.freeze({
     # Fire events as state chunks are processed by the state compiler
     'state_events': bool,
 
+    # The number of processes to run the state chunks which do not depend on each other in,
+    # following the graph of their requisites. 0 or 1 runs the state chunks in order.
+    'state_workers': int,
+
+    # Cache the compiled highstate in the cachedir and reuse it while the files it was rendered
+    # from, the grains, the pillar and the options of the minion are unchanged
+    'state_compile_cache': bool,
+
     # The number of seconds a minion should wait before retry when attempting authentication
     'acceptance_wait_time': float,
 
@@ -568,6 +608,10 @@ VALID_OPTS = immutabletypes.freeze({
     # default match type for filtering events tags: startswith, endswith, find, regex, fnmatch
     'event_match_type': six.string_types,
 
+    # The number of events cached for each event subscription until they are
+    # requested, the older events are dropped. 0 for no limit.
+    'event_subscription_queue_size': int,
+
     # This pidfile to write out to when a daemon starts
     'pidfile': six.string_types,
 
@@ -687,6 +731,10 @@ VALID_OPTS = immutabletypes.freeze({
     # could be, we'll just skip type-checking.
     'git_pillar_ssl_verify': bool,
     'git_pillar_global_lock': bool,
+    # The number of git_pillar remotes fetched at the same time
+    'git_pillar_fetch_workers': int,
+    # Seconds after which a git_pillar remote fetch stops holding up the others
+    'git_pillar_fetch_timeout': int,
     'git_pillar_user': six.string_types,
     'git_pillar_password': six.string_types,
     'git_pillar_insecure_auth': bool,
@@ -711,6 +759,10 @@ VALID_OPTS = immutabletypes.freeze({
     'gitfs_saltenv_blacklist': list,
     'gitfs_ssl_verify': bool,
     'gitfs_global_lock': bool,
+    # The number of gitfs remotes fetched at the same time
+    'gitfs_fetch_workers': int,
+    # Seconds after which a gitfs remote fetch stops holding up the others
+    'gitfs_fetch_timeout': int,
     'gitfs_saltenv': list,
     'gitfs_ref_types': list,
     'gitfs_refspecs': list,
@@ -757,6 +809,13 @@ VALID_OPTS = immutabletypes.freeze({
     # Pillar cache backend. Defaults to `disk` which stores caches in the master cache
     'pillar_cache_backend': six.string_types,
 
+    # Render the identical pillar top files and ext_pillar calls in flight in the master workers
+    # once, and share the result
+    'pillar_coalesce': bool,
+
+    # The maximum time in seconds a master worker waits for a pillar render of another worker
+    'pillar_coalesce_timeout': int,
+
     'pillar_safe_render_error': bool,
 
     # When creating a pillar, there are several strategies to choose from when
@@ -809,6 +868,12 @@ VALID_OPTS = immutabletypes.freeze({
     'fileserver_limit_traversal': bool,
     'fileserver_verify_config': bool,
 
+    # Watch the file_roots with inotify to keep an index of their files instead of walking them
+    'fileserver_roots_inotify': bool,
+
+    # Serve the hashes of the files of the file_roots from an index shared by the master processes
+    'fileserver_roots_hash_index': bool,
+
     # Optionally apply '*' permissioins to any user. By default '*' is a fallback case that is
     # applied only if the user didn't matched by other matchers.
     'permissive_acl': bool,
@@ -864,6 +929,10 @@ VALID_OPTS = immutabletypes.freeze({
     # reply from executions.
     'minion_data_cache': bool,
 
+    # Keep an in-memory index of the minion data cache in each master process to
+    # speed up grain, pillar, ipcidr and compound targeting
+    'minion_data_index': bool,
+
     # The number of seconds between AES key rotations on the master
     'publish_session': int,
 
@@ -985,6 +1054,10 @@ VALID_OPTS = immutabletypes.freeze({
     # The number of seconds to wait when the client is requesting information about running jobs
     'gather_job_timeout': int,
 
+    # Share the checks of whether jobs are still running between the clients
+    # of a process, with a single saltutil.running ping per minion
+    'gather_job_coalesce': bool,
+
     # The number of seconds to wait before timing out an authentication request
     'auth_timeout': int,
 
@@ -1058,6 +1131,10 @@ VALID_OPTS = immutabletypes.freeze({
     # Cache ZeroMQ connections. Can greatly improve salt performance.
     'cache_sreqs': bool,
 
+    # Share one request channel to the master between all the threads of a
+    # minion process
+    'shared_req_channel': bool,
+
     # Can be set to override the python_shell=False default in the cmd module
     'cmd_safe': bool,
 
@@ -1333,6 +1410,8 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze({
     'git_pillar_root': '',
     'git_pillar_ssl_verify': True,
     'git_pillar_global_lock': True,
+    'git_pillar_fetch_workers': 1,
+    'git_pillar_fetch_timeout': 0,
     'git_pillar_user': '',
     'git_pillar_password': '',
     'git_pillar_insecure_auth': False,
@@ -1356,6 +1435,8 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze({
     'gitfs_saltenv_whitelist': [],
     'gitfs_saltenv_blacklist': [],
     'gitfs_global_lock': True,
+    'gitfs_fetch_workers': 1,
+    'gitfs_fetch_timeout': 0,
     'gitfs_ssl_verify': True,
     'gitfs_saltenv': [],
     'gitfs_ref_types': ['branch', 'tag', 'sha'],
@@ -1394,6 +1475,8 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze({
     'ipc_so_backlog': 128,
     'ipv6': None,
     'file_buffer_size': 262144,
+    'file_fetch_workers': 4,
+    'file_cache_objects': False,
     'tcp_pub_port': 4510,
     'tcp_pull_port': 4511,
     'tcp_authentication_retries': 5,
@@ -1415,12 +1498,16 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze({
     'cython_enable': False,
     'enable_gpu_grains': True,
     'enable_zip_modules': False,
+    'loader_index': False,
+    'virtual_cache': False,
     'state_verbose': True,
     'state_output': 'full',
     'state_output_diff': False,
     'state_auto_order': True,
     'state_events': False,
     'state_aggregate': False,
+    'state_workers': 0,
+    'state_compile_cache': False,
     'snapper_states': False,
     'snapper_states_config': 'root',
     'acceptance_wait_time': 10,
@@ -1490,12 +1577,14 @@ DEFAULT_MINION_OPTS = immutabletypes.freeze({
     'zmq_filtering': False,
     'zmq_monitor': False,
     'cache_sreqs': True,
+    'shared_req_channel': False,
     'cmd_safe': True,
     'sudo_user': '',
     'http_connect_timeout': 20.0,  # tornado default - 20 seconds
     'http_request_timeout': 1 * 60 * 60.0,  # 1 hour
     'http_max_body': 100 * 1024 * 1024 * 1024,  # 100GB
     'event_match_type': 'startswith',
+    'event_subscription_queue_size': 0,
     'minion_restart_command': [],
     'pub_ret': True,
     'user_agent': '',
@@ -1589,6 +1678,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'git_pillar_root': '',
     'git_pillar_ssl_verify': True,
     'git_pillar_global_lock': True,
+    'git_pillar_fetch_workers': 1,
+    'git_pillar_fetch_timeout': 0,
     'git_pillar_user': '',
     'git_pillar_password': '',
     'git_pillar_insecure_auth': False,
@@ -1613,6 +1704,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'gitfs_saltenv_whitelist': [],
     'gitfs_saltenv_blacklist': [],
     'gitfs_global_lock': True,
+    'gitfs_fetch_workers': 1,
+    'gitfs_fetch_timeout': 0,
     'gitfs_ssl_verify': True,
     'gitfs_saltenv': [],
     'gitfs_ref_types': ['branch', 'tag', 'sha'],
@@ -1641,8 +1734,13 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'svnfs_saltenv_whitelist': [],
     'svnfs_saltenv_blacklist': [],
     'max_event_size': 1048576,
+    'event_publisher_shards': 1,
     'master_stats': False,
     'master_stats_event_iter': 60,
+    'return_batch_size': 1,
+    'return_batch_interval': 0.25,
+    'worker_stats': False,
+    'worker_pools': {},
     'minionfs_env': 'base',
     'minionfs_mountpoint': '',
     'minionfs_whitelist': [],
@@ -1657,6 +1755,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'pillar_cache': False,
     'pillar_cache_ttl': 3600,
     'pillar_cache_backend': 'disk',
+    'pillar_coalesce': False,
+    'pillar_coalesce_timeout': 60,
     'ping_on_rotate': False,
     'peer': {},
     'preserve_minion_cache': False,
@@ -1691,6 +1791,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'fileserver_ignoresymlinks': False,
     'fileserver_limit_traversal': False,
     'fileserver_verify_config': True,
+    'fileserver_roots_inotify': False,
+    'fileserver_roots_hash_index': False,
     'max_open_files': 100000,
     'hash_type': 'sha256',
     'optimization_order': [0, 1, 2],
@@ -1711,6 +1813,7 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'master_job_cache': 'local_cache',
     'job_cache_store_endtime': False,
     'minion_data_cache': True,
+    'minion_data_index': False,
     'enforce_mine_cache': False,
     'ipc_mode': _DFLT_IPC_MODE,
     'ipc_write_buffer': _DFLT_IPC_WBUFFER,
@@ -1746,6 +1849,7 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'event_return_whitelist': [],
     'event_return_blacklist': [],
     'event_match_type': 'startswith',
+    'event_subscription_queue_size': 0,
     'runner_returns': True,
     'serial': 'msgpack',
     'test': False,
@@ -1761,6 +1865,8 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'ssh_list_nodegroups': {},
     'ssh_use_home_key': False,
     'cython_enable': False,
+    'loader_index': False,
+    'virtual_cache': False,
     'enable_gpu_grains': False,
     # XXX: Remove 'key_logfile' support in 2014.1.0
     'key_logfile': os.path.join(salt.syspaths.LOGS_DIR, 'key'),
@@ -1796,6 +1902,7 @@ DEFAULT_MASTER_OPTS = immutabletypes.freeze({
     'keysize': 2048,
     'transport': 'zeromq',
     'gather_job_timeout': 10,
+    'gather_job_coalesce': False,
     'syndic_event_forward_timeout': 0.5,
     'syndic_jid_forward_cache_hwm': 100,
     'regen_thin': False,
@@ -223,6 +223,16 @@ def sign_message(privkey_path, message, passphrase=None):
     '''
     key = get_rsa_key(privkey_path, passphrase)
     log.debug('salt.crypt.sign_message: Signing message.')
+    return sign_message_with_key(key, message)
+
+
+def sign_message_with_key(key, message):
+    '''
+    Sign a message with an already loaded private key. Returns the signature.
+
+    This is used by callers which sign many messages with the same key, such
+    as the master publisher, to avoid looking up the key for every message.
+    '''
     if HAS_M2:
         md = EVP.MessageDigest('sha1')
         md.update(salt.utils.stringutils.to_bytes(message))
@@ -776,6 +786,7 @@ class AsyncAuth(object):
                 if salt.utils.crypt.pem_finger(m_pub_fn, sum_type=self.opts['hash_type']) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        auth['pool_commands'] = payload.get('pool_commands', [])
         raise tornado.gen.Return(auth)
 
     def get_keys(self):
@@ -1361,6 +1372,7 @@ class SAuth(AsyncAuth):
                 if salt.utils.crypt.pem_finger(m_pub_fn, sum_type=self.opts['hash_type']) != self.opts['master_finger']:
                     self._finger_fail(self.opts['master_finger'], m_pub_fn)
         auth['publish_port'] = payload['publish_port']
+        auth['pool_commands'] = payload.get('pool_commands', [])
         return auth
 
 
@@ -1474,5 +1486,5 @@ class Crypticle(object):
         # simple integrity check to verify that we got meaningful data
         if not data.startswith(self.PICKLE_PAD):
             return {}
-        load = self.serial.loads(data[len(self.PICKLE_PAD):], raw=raw)
+        load = self.serial.loads(data[len(self.PICKLE_PAD):], raw=raw, use_bin_type=False)
         return load
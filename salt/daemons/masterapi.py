@@ -129,6 +129,34 @@ def clean_fsbackend(opts):
                         cache_file, exc
                     )
 
+    # Clear the index of the file_roots, the watcher of the roots backend
+    # writes it again once it indexed the roots
+    index_dir = os.path.join(opts['cachedir'], 'roots', 'index')
+    try:
+        index_files = os.listdir(index_dir)
+    except OSError:
+        index_files = []
+    for index_file in fnmatch.filter(index_files, '*.p'):
+        try:
+            os.remove(os.path.join(index_dir, index_file))
+        except OSError as exc:
+            log.critical('Unable to clear roots index file %s: %s', index_file, exc)
+
+
+def clean_pillar_flight(opts):
+    '''
+    Clean out the pillar renders left behind by a previous run of the master
+    '''
+    flight_dir = os.path.join(opts['cachedir'], 'pillar_flight')
+    if not os.path.isdir(flight_dir):
+        return
+    log.debug('Clearing the pillar renders in %s', flight_dir)
+    for name in os.listdir(flight_dir):
+        try:
+            os.remove(os.path.join(flight_dir, name))
+        except OSError as exc:
+            log.error('Unable to remove %s: %s', name, exc)
+
 
 def clean_expired_tokens(opts):
     '''
@@ -474,6 +502,8 @@ class RemoteFuncs(object):
         self._serve_file = fs_.serve_file
         self._file_find = fs_._find_file
         self._file_hash = fs_.file_hash
+        self._file_manifest = fs_.file_manifest
+        self._serve_files = fs_.serve_files
         self._file_list = fs_.file_list
         self._file_list_emptydirs = fs_.file_list_emptydirs
         self._dir_list = fs_.dir_list
@@ -5,6 +5,7 @@ Classes that manage file clients
 from __future__ import absolute_import, print_function, unicode_literals
 
 # Import python libs
+import collections
 import contextlib
 import errno
 import logging
@@ -12,6 +13,7 @@ import os
 import string
 import shutil
 import ftplib
+import threading
 from tornado.httputil import parse_response_start_line, HTTPHeaders, HTTPInputError
 import salt.utils.atomicfile
 
@@ -47,6 +49,81 @@ from salt.ext.six.moves.urllib.parse import urlparse, urlunparse
 log = logging.getLogger(__name__)
 MAX_FILENAME_LENGTH = 255
 
+# The sets the files fetched by the file clients of each thread are recorded
+# in, see record_files
+_RECORDERS = threading.local()
+
+
+@contextlib.contextmanager
+def record_files():
+    '''
+    Record the files fetched by the ``get_file`` method of the file clients in
+    this thread, whichever client fetches them, until the context exits.
+
+    Yields a set of ``(path, saltenv, hash)`` tuples, ``hash`` being the hash
+    of the file on the file server or an empty string if the file was not
+    found.
+    '''
+    recorded = set()
+    stack = _RECORDERS.__dict__.setdefault('stack', [])
+    stack.append(recorded)
+    try:
+        yield recorded
+    finally:
+        stack.remove(recorded)
+
+
+def _record_file(path, saltenv, hash_server):
+    '''
+    Add a fetched file to the sets of the active recorders of this thread
+    '''
+    stack = getattr(_RECORDERS, 'stack', None)
+    if not stack:
+        return
+    try:
+        hsum = hash_server.get('hsum', '')
+    except AttributeError:
+        hsum = ''
+    for recorded in stack:
+        recorded.add((path, saltenv, hsum))
+
+
+def object_path(opts, hash_type, hsum, cachedir=None):
+    '''
+    Return the path of the object holding the contents of the given hash in
+    the object store of the minion file cache, see the
+    :conf_minion:`file_cache_objects` option. Return None if the object store
+    is disabled or the hash is not valid.
+    '''
+    if not opts.get('file_cache_objects', False) \
+            or salt.utils.platform.is_windows():
+        return None
+    hash_type = salt.utils.stringutils.to_unicode(hash_type)
+    hsum = salt.utils.stringutils.to_unicode(hsum)
+    if salt.utils.files.HASHES.get(hash_type) != len(hsum) \
+            or not all(char in string.hexdigits for char in hsum):
+        return None
+    if cachedir is None:
+        cachedir = opts['cachedir']
+    return os.path.join(cachedir, 'objects', hash_type, hsum[:2], hsum)
+
+
+def is_cached_object(opts, path, hash_type, hsum, cachedir=None):
+    '''
+    Return whether the cached file at path is a hard link to the object of the
+    given hash, which tells that the file has this hash without reading it
+    '''
+    try:
+        obj = object_path(opts, hash_type, hsum, cachedir)
+    except (AttributeError, TypeError):
+        return False
+    if obj is None:
+        return False
+    try:
+        return os.path.samefile(path, obj)
+    except OSError:
+        return False
+
 
 def get_file_client(opts, pillar=False):
     '''
@@ -165,6 +242,118 @@ class Client(object):
             cachedir = os.path.join(self.opts['cachedir'], cachedir)
         return cachedir
 
+    def _object_path(self, hash_server, cachedir=None):
+        '''
+        Return the path of the object of hash_server in the object store of
+        the cachedir, None if there is none
+        '''
+        try:
+            return object_path(self.opts,
+                               hash_server['hash_type'],
+                               hash_server['hsum'],
+                               self.get_cachedir(cachedir))
+        except (AttributeError, KeyError, TypeError):
+            return None
+
+    def _is_object(self, hash_server, dest, cachedir=None):
+        '''
+        Return whether the cached file dest is the object of hash_server
+        '''
+        try:
+            return is_cached_object(self.opts,
+                                    dest,
+                                    hash_server['hash_type'],
+                                    hash_server['hsum'],
+                                    self.get_cachedir(cachedir))
+        except (KeyError, TypeError):
+            return False
+
+    def _link_object(self, hash_server, dest, cachedir=None):
+        '''
+        Replace the cached file dest with a hard link to the object of
+        hash_server, return False if the object store does not hold it
+        '''
+        obj = self._object_path(hash_server, cachedir)
+        if obj is None or not os.path.isfile(obj):
+            return False
+        if os.path.isdir(dest):
+            salt.utils.files.rm_rf(dest)
+        tmp = '{0}.{1}.{2}.link'.format(
+            dest, os.getpid(), threading.current_thread().ident)
+        try:
+            os.link(obj, tmp)
+            os.rename(tmp, dest)
+        except OSError as exc:
+            log.debug('Could not link %s to the object %s: %s', dest, obj, exc)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        log.debug('Linked %s to the object %s', dest, obj)
+        return True
+
+    def _store_object(self, hash_server, dest, cachedir=None):
+        '''
+        Add the cached file dest, which matches hash_server, to the object
+        store, or link it to the object if the store already holds it
+        '''
+        obj = self._object_path(hash_server, cachedir)
+        if obj is None:
+            return
+        if os.path.isfile(obj):
+            # Another path or saltenv has the same contents
+            self._link_object(hash_server, dest, cachedir)
+            return
+        try:
+            try:
+                os.makedirs(os.path.dirname(obj))
+            except OSError as exc:
+                if exc.errno != errno.EEXIST:
+                    raise
+            os.link(dest, obj)
+        except OSError as exc:
+            if exc.errno == errno.EEXIST:
+                self._link_object(hash_server, dest, cachedir)
+            else:
+                log.debug('Could not store %s in the object store: %s', dest, exc)
+
+    def _release_object(self, hash_local, dest, cachedir=None):
+        '''
+        Detach the cached file dest, about to be replaced, from the object
+        store so that it is not written through, and remove the object of
+        hash_local if dest was the last link to it
+        '''
+        obj = self._object_path(hash_local, cachedir)
+        if obj is None:
+            return
+        try:
+            nlink = os.stat(dest).st_nlink
+            if nlink == 2 and os.path.samefile(dest, obj):
+                os.remove(obj)
+            if nlink > 1:
+                os.remove(dest)
+        except OSError:
+            pass
+
+    def _check_cached(self, hash_server, dest, cachedir=None):
+        '''
+        Return whether the cached file dest matches hash_server, the file is
+        linked from the object store when the store holds it
+        '''
+        if self._is_object(hash_server, dest, cachedir):
+            return True
+        if os.path.isfile(dest):
+            hash_local = {
+                'hsum': salt.utils.hashutils.get_hash(dest, hash_server['hash_type']),
+                'hash_type': hash_server['hash_type'],
+            }
+            if hash_local['hsum'] == hash_server['hsum']:
+                self._store_object(hash_server, dest, cachedir)
+                return True
+            self._release_object(hash_local, dest, cachedir)
+        return self._link_object(hash_server, dest, cachedir)
+
     def get_file(self,
                  path,
                  dest='',
@@ -200,21 +389,30 @@ class Client(object):
         ret = []
         if isinstance(paths, six.string_types):
             paths = paths.split(',')
+        fetched = self._fetch_files(paths, saltenv, cachedir=cachedir)
         for path in paths:
-            ret.append(self.cache_file(path, saltenv, cachedir=cachedir))
+            if path in fetched:
+                ret.append(fetched[path])
+            else:
+                ret.append(self.cache_file(path, saltenv, cachedir=cachedir))
         return ret
 
+    def _fetch_files(self, paths, saltenv='base', cachedir=None):
+        '''
+        Cache many salt:// files at once, return a dict mapping the paths it
+        handled to their cached location or False. The paths left out are
+        cached one by one by cache_files.
+        '''
+        return {}
+
     def cache_master(self, saltenv='base', cachedir=None):
         '''
         Download and cache all files on a master in a specified environment
         '''
-        ret = []
-        for path in self.file_list(saltenv):
-            ret.append(
-                self.cache_file(
-                    salt.utils.url.create(path), saltenv, cachedir=cachedir)
-            )
-        return ret
+        return self.cache_files(
+            [salt.utils.url.create(path) for path in self.file_list(saltenv)],
+            saltenv,
+            cachedir=cachedir)
 
     def cache_dir(self, path, saltenv='base', include_empty=False,
                   include_pat=None, exclude_pat=None, cachedir=None):
@@ -235,15 +433,17 @@ class Client(object):
         )
         # go through the list of all files finding ones that are in
         # the target directory and caching them
+        urls = []
         for fn_ in self.file_list(saltenv):
             fn_ = salt.utils.data.decode(fn_)
             if fn_.strip() and fn_.startswith(path):
                 if salt.utils.stringutils.check_include_exclude(
                         fn_, include_pat, exclude_pat):
-                    fn_ = self.cache_file(
-                        salt.utils.url.create(fn_), saltenv, cachedir=cachedir)
-                    if fn_:
-                        ret.append(fn_)
+                    urls.append(salt.utils.url.create(fn_))
+        ret.extend(
+            fn_ for fn_ in self.cache_files(urls, saltenv, cachedir=cachedir)
+            if fn_
+        )
 
         if include_empty:
             # Break up the path into a list containing the bottom-level
@@ -1086,6 +1286,7 @@ class RemoteClient(Client):
         else:
             hash_server = self.hash_file(path, saltenv)
             mode_server = None
+        _record_file(path, saltenv, hash_server)
 
         # Check if file exists on server, before creating files and
         # directories
@@ -1108,6 +1309,9 @@ class RemoteClient(Client):
         # Hash compare local copy with master and skip download
         # if no difference found.
         dest2check = dest
+        # Only the files cached at their own location are linked to the
+        # object store, a dest given by the caller is left alone
+        cache_view = not dest
         if not dest2check:
             rel_path = self._check_proto(path)
 
@@ -1124,6 +1328,10 @@ class RemoteClient(Client):
             '\'%s\'', saltenv, dest2check, path
         )
 
+        if cache_view and self._is_object(hash_server, dest2check, cachedir):
+            # The cached file is a link to the object of the hash
+            return dest2check
+
         if dest2check and os.path.isfile(dest2check):
             if not salt.utils.platform.is_windows():
                 hash_local, stat_local = \
@@ -1137,7 +1345,15 @@ class RemoteClient(Client):
                 mode_local = None
 
             if hash_local == hash_server:
+                if cache_view:
+                    self._store_object(hash_server, dest2check, cachedir)
                 return dest2check
+            if cache_view:
+                self._release_object(hash_local, dest2check, cachedir)
+
+        if cache_view and self._link_object(hash_server, dest2check, cachedir):
+            # The same contents were cached for another path or saltenv
+            return dest2check
 
         log.debug(
             'Fetching file from saltenv \'%s\', ** attempting ** \'%s\'',
@@ -1252,6 +1468,10 @@ class RemoteClient(Client):
                 'Fetching file from saltenv \'%s\', ** done ** \'%s\'',
                 saltenv, path
             )
+            if cache_view and self._object_path(hash_server, cachedir) \
+                    and salt.utils.hashutils.get_hash(
+                        dest, hash_server['hash_type']) == hash_server['hsum']:
+                self._store_object(hash_server, dest, cachedir)
         else:
             log.debug(
                 'In saltenv \'%s\', we are ** missing ** the file \'%s\'',
@@ -1260,6 +1480,191 @@ class RemoteClient(Client):
 
         return dest
 
+    def _fetch_files(self, paths, saltenv='base', cachedir=None):
+        '''
+        Cache many salt:// files at once. One ``_file_manifest`` request
+        returns the hash of all of them, then only the files missing from the
+        cache or changed on the master are downloaded with ``_serve_files``
+        requests, see _download_files.
+        '''
+        ret = {}
+        # mapping of saltenv -> {relative path -> [(path, salt:// url)]}
+        by_env = {}
+        for path in paths:
+            if not isinstance(path, six.string_types) \
+                    or not path.startswith('salt://'):
+                continue
+            url, senv = salt.utils.url.split_env(path)
+            rel_path = self._check_proto(url)
+            by_env.setdefault(senv or saltenv, {}).setdefault(
+                rel_path, []).append((path, url))
+        if sum(len(rel_paths) for rel_paths in six.itervalues(by_env)) < 2:
+            # Not worth a manifest
+            return ret
+
+        for env, rel_paths in six.iteritems(by_env):
+            load = {'paths': sorted(rel_paths),
+                    'saltenv': env,
+                    'cmd': '_file_manifest'}
+            manifest = self.channel.send(load)
+            if not isinstance(manifest, dict):
+                # The master can not send manifests, fetch the files one by
+                # one
+                log.debug('No file manifest from the master, got: %s', manifest)
+                return ret
+            if six.PY2:
+                manifest = salt.utils.data.decode(manifest)
+
+            fetch = []
+            for rel_path, urls in six.iteritems(rel_paths):
+                hash_server = manifest.get(rel_path, '')
+                for path, url in urls:
+                    _record_file(url, env, hash_server)
+                if not hash_server:
+                    log.debug(
+                        'Could not find file \'%s\' in saltenv \'%s\'',
+                        rel_path, env
+                    )
+                    dest = False
+                else:
+                    with self._cache_loc(rel_path, env, cachedir=cachedir) as dest:
+                        pass
+                    if not self._check_cached(hash_server, dest, cachedir=cachedir):
+                        fetch.append(rel_path)
+                        continue
+                for path, url in urls:
+                    ret[path] = dest
+
+            downloaded = self._download_files(fetch, env, manifest, cachedir=cachedir)
+            for rel_path, dest in six.iteritems(downloaded):
+                for path, url in rel_paths[rel_path]:
+                    ret[path] = dest
+        return ret
+
+    def _download_files(self, rel_paths, saltenv, manifest, cachedir=None):
+        '''
+        Download files from the master, return a dict mapping the relative path
+        of those which were downloaded and match the hash of the manifest to
+        their cached location.
+
+        The files are requested in batches adding up to ``file_buffer_size``
+        bytes, so that the small files share requests, and up to
+        :conf_minion:`file_fetch_workers` batches are in flight at once.
+        '''
+        ret = {}
+        if not rel_paths:
+            return ret
+        buffer_size = self.opts['file_buffer_size']
+        # the [relative path, loc] pairs left to request
+        pending = collections.deque([rel_path, 0] for rel_path in rel_paths)
+        cond = threading.Condition()
+        # mapping of relative path -> (dest, file object) of the files being
+        # written
+        files = {}
+        in_flight = [0]
+
+        def _next_batch():
+            batch = []
+            size = 0
+            while pending and size < buffer_size:
+                rel_path, loc = pending.popleft()
+                batch.append([rel_path, loc])
+                size += max(manifest[rel_path].get('size', buffer_size) - loc, 1)
+            return batch
+
+        def _write(chunk):
+            # The chunks of a file are requested one at a time, in order
+            chunk = decode_dict_keys_to_str(chunk)
+            rel_path = salt.utils.stringutils.to_unicode(chunk['path'])
+            data = chunk['data']
+            if data is None or rel_path not in manifest:
+                log.debug('The master did not serve \'%s\'', rel_path)
+                return rel_path
+            if rel_path not in files:
+                with self._cache_loc(rel_path, saltenv, cachedir=cachedir) as dest:
+                    # If a directory was formerly cached at this path, then
+                    # remove it to avoid a traceback trying to write the file
+                    if os.path.isdir(dest):
+                        salt.utils.files.rm_rf(dest)
+                    files[rel_path] = (dest, salt.utils.atomicfile.atomic_open(dest, 'wb+'))
+            dest, fn_ = files[rel_path]
+            if six.PY3 and isinstance(data, str):
+                data = data.encode()
+            fn_.write(data)
+            if not chunk['eof']:
+                with cond:
+                    pending.append([rel_path, chunk['loc'] + len(data)])
+                return rel_path
+            fn_.close()
+            hash_server = manifest[rel_path]
+            if salt.utils.hashutils.get_hash(dest, hash_server['hash_type']) != hash_server['hsum']:
+                log.warning('Bad download of file %s', rel_path)
+                return rel_path
+            log.info(
+                'Fetching file from saltenv \'%s\', ** done ** \'%s\'',
+                saltenv, rel_path
+            )
+            self._store_object(hash_server, dest, cachedir=cachedir)
+            ret[rel_path] = dest
+            return rel_path
+
+        def _fetch(channel):
+            while True:
+                with cond:
+                    while not pending and in_flight[0]:
+                        # The files being fetched may need more chunks
+                        cond.wait()
+                    batch = _next_batch()
+                    if not batch:
+                        return
+                    in_flight[0] += 1
+                load = {'files': batch,
+                        'saltenv': saltenv,
+                        'cmd': '_serve_files'}
+                try:
+                    data = channel.send(load, raw=True)
+                    if six.PY3:
+                        data = decode_dict_keys_to_str(data)
+                    served = set(_write(chunk) for chunk in data['files'])
+                    with cond:
+                        # Ask again for the files left out of the reply
+                        pending.extend(item for item in batch if item[0] not in served)
+                except Exception as exc:  # pylint: disable=broad-except
+                    # The files of the batch are fetched one by one instead
+                    log.warning('Could not fetch a batch of files: %s', exc)
+                finally:
+                    with cond:
+                        in_flight[0] -= 1
+                        cond.notify_all()
+
+        workers = 1
+        if not isinstance(self.channel, salt.fileserver.FSChan):
+            workers = max(1, min(self.opts.get('file_fetch_workers', 1), len(rel_paths)))
+        threads = []
+        channels = []
+        for idx in range(1, workers):
+            channel = self.channel
+            if not isinstance(channel, salt.transport.client.SharedReqChannel):
+                # A sync channel can only have one request in flight
+                channel = salt.transport.client.ReqChannel.factory(self.opts)
+                channels.append(channel)
+            thread = threading.Thread(target=_fetch, args=(channel,))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        try:
+            _fetch(self.channel)
+            for thread in threads:
+                thread.join()
+        finally:
+            for channel in channels:
+                channel.close()
+            for dest, fn_ in six.itervalues(files):
+                if not fn_.closed:
+                    # Drop the partial download instead of moving it in place
+                    fn_.__exit__(IOError, None, None)
+        return ret
+
     def file_list(self, saltenv='base', prefix=''):
         '''
         List the files on the master
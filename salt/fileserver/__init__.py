@@ -691,6 +691,85 @@ class Fileserver(object):
         except (IndexError, TypeError):
             return '', None
 
+    def file_manifest(self, load):
+        '''
+        Return the hash of many files at once, those given in the ``paths``
+        list of the load or all the files under its ``prefix``.
+
+        Returns a dict mapping each path to its hash dict, along with the
+        ``size`` of the file when the backend stats it, or to an empty string
+        for the files which are not found.
+        '''
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        if 'saltenv' not in load:
+            return {}
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+
+        if 'paths' in load:
+            paths = load['paths']
+            if not isinstance(paths, list):
+                return {}
+        else:
+            paths = self.file_list({'saltenv': load['saltenv'],
+                                    'prefix': load.get('prefix', '')})
+        ret = {}
+        for path in paths:
+            path = salt.utils.stringutils.to_unicode(path)
+            hsum, stat_result = self.file_hash_and_stat(
+                {'path': path, 'saltenv': load['saltenv']})
+            if hsum and stat_result:
+                hsum = dict(hsum, size=stat_result[6])
+            ret[path] = hsum
+        return ret
+
+    def serve_files(self, load):
+        '''
+        Serve up chunks of many files at once, from the ``[path, loc]`` pairs
+        of the ``files`` list of the load.
+
+        The chunks are served in order until they add up to
+        ``file_buffer_size``, so that many small files fit in one reply. Each
+        chunk is returned with the ``path`` and ``loc`` it was read from and
+        ``eof`` set if it is the last chunk of its file. The files left out of
+        the reply have to be asked for again.
+        '''
+        ret = {'files': []}
+
+        if 'env' in load:
+            # "env" is not supported; Use "saltenv".
+            load.pop('env')
+
+        if 'files' not in load or 'saltenv' not in load:
+            return ret
+        if not isinstance(load['saltenv'], six.string_types):
+            load['saltenv'] = six.text_type(load['saltenv'])
+
+        buffer_size = self.opts['file_buffer_size']
+        total = 0
+        for path, loc in load['files']:
+            if total >= buffer_size:
+                break
+            path = salt.utils.stringutils.to_unicode(path)
+            chunk = {'path': path, 'loc': loc, 'data': '', 'eof': True}
+            fnd = self.find_file(path, load['saltenv'])
+            fstr = '{0}.serve_file'.format(fnd.get('back'))
+            if fstr in self.servers:
+                served = self.servers[fstr](
+                    {'path': path, 'loc': loc, 'saltenv': load['saltenv']},
+                    fnd)
+                chunk['data'] = served.get('data', '')
+                chunk['eof'] = len(chunk['data']) < buffer_size
+            else:
+                # The file is gone, tell it apart from an empty file
+                chunk['data'] = None
+            total += len(chunk['data'] or '')
+            ret['files'].append(chunk)
+        return ret
+
     def clear_file_list_cache(self, load):
         '''
         Deletes the file_lists cache files
@@ -21,9 +21,17 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import errno
 import logging
+import posixpath
+import shutil
+import threading
+import time
 
 # Import salt libs
 import salt.fileserver
+import salt.payload
+import salt.utils.atomicfile
+import salt.utils.cache
+import salt.utils.data
 import salt.utils.event
 import salt.utils.files
 import salt.utils.gzip_util
@@ -34,8 +42,152 @@ import salt.utils.stringutils
 import salt.utils.versions
 from salt.ext import six
 
+# Import third party libs
+try:
+    import pyinotify
+    HAS_PYINOTIFY = True
+    _WATCH_MASK = pyinotify.IN_CREATE | pyinotify.IN_DELETE | \
+        pyinotify.IN_CLOSE_WRITE | pyinotify.IN_ATTRIB | \
+        pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO | \
+        pyinotify.IN_DELETE_SELF | pyinotify.IN_MOVE_SELF
+except ImportError:
+    HAS_PYINOTIFY = False
+
 log = logging.getLogger(__name__)
 
+# Set while the watcher of this process keeps the index of the roots
+_WATCHING = threading.Event()
+# The indexes loaded by this process: saltenv -> (stat key, index)
+_INDEXES = {}
+
+
+class _HashIndex(salt.utils.cache.CachedirFile):
+    '''
+    The hashes of the files of the file_roots, shared by the processes of the
+    master when :conf_master:`fileserver_roots_hash_index` is set, as
+    ``{hash_type: {path: [mtime, size, hsum]}}``.
+
+    The fileserver update process hashes the roots and writes the index, the
+    workers read it again once it was replaced and keep the hashes they had
+    to compute in memory until then.
+    '''
+    filename = os.path.join('roots', 'hashes.p')
+    # Seconds between two checks for a new index
+    check_interval = 1
+
+    def __init__(self, path):
+        super(_HashIndex, self).__init__(path)
+        self.loaded = None
+        self.checked = 0
+
+    def _refresh(self):
+        now = time.time()
+        if self.entries is not None and now - self.checked < self.check_interval:
+            return
+        self.checked = now
+        mtime = self.mtime(self.path)
+        if self.entries is None or mtime != self.loaded:
+            self.entries = self._read()
+            self.loaded = mtime
+
+    def get(self, path, hash_type, stat):
+        '''
+        Return the hash of the file at path if it did not change since it was
+        hashed, None otherwise
+        '''
+        self._refresh()
+        entry = self.entries.get(hash_type, {}).get(path)
+        if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            return entry[2]
+        return None
+
+    def set(self, path, hash_type, stat, hsum):
+        '''
+        Keep the hash of the file at path in the memory of this process
+        '''
+        self._refresh()
+        self.entries.setdefault(hash_type, {})[path] = [stat.st_mtime, stat.st_size, hsum]
+
+    def update(self, hash_type, paths, changed=None):
+        '''
+        Hash the files at paths and write the index. The hashes of the files
+        which did not change are reused, if the paths which changed are given
+        the other files are not even checked.
+        '''
+        old = self._read().get(hash_type, {})
+        new = {}
+        if not os.path.isdir(os.path.dirname(self.path)):
+            try:
+                os.makedirs(os.path.dirname(self.path))
+            except OSError:
+                pass
+        for path in paths:
+            entry = old.get(path)
+            if entry is None or changed is None or path in changed:
+                try:
+                    stat = os.stat(path)
+                    if not entry or entry[0] != stat.st_mtime or entry[1] != stat.st_size:
+                        entry = [stat.st_mtime,
+                                 stat.st_size,
+                                 salt.utils.hashutils.get_hash(path, hash_type)]
+                except (IOError, OSError):
+                    continue
+            new[path] = entry
+        self.entries = {hash_type: new}
+        self._write()
+        self.loaded = self.mtime(self.path)
+        self.checked = time.time()
+        log.debug('roots: Wrote the hashes of %d files to %s', len(new), self.path)
+
+
+def _index_path(saltenv):
+    '''
+    Return the path of the index of the file_roots of a saltenv
+    '''
+    return os.path.join(
+        __opts__['cachedir'],
+        'roots',
+        'index',
+        '{0}.p'.format(salt.utils.files.safe_filename_leaf(saltenv)))
+
+
+def _saltenv_roots(saltenv):
+    '''
+    Return the normalized file_roots of a saltenv
+    '''
+    return [os.path.normpath(root) for root in __opts__['file_roots'][saltenv]]
+
+
+def _read_index(saltenv):
+    '''
+    Return the index of the file_roots of a saltenv written by the watcher of
+    the FileserverUpdate process, None if there is none. The index is only
+    read again once the watcher replaced it.
+    '''
+    if not __opts__.get('fileserver_roots_inotify', False):
+        return None
+    path = _index_path(saltenv)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        _INDEXES.pop(saltenv, None)
+        return None
+    key = (stat.st_ino, stat.st_mtime, stat.st_size)
+    cached = _INDEXES.get(saltenv)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        with salt.utils.files.fopen(path, 'rb') as fp_:
+            index = salt.utils.data.decode(salt.payload.Serial(__opts__).load(fp_))
+    except Exception as exc:
+        log.debug('roots: Could not read the index %s: %s', path, exc)
+        return None
+    if index.get('roots') != _saltenv_roots(saltenv):
+        # Written for other file_roots
+        return None
+    _INDEXES[saltenv] = (key, index)
+    return index
+
 
 def find_file(path, saltenv='base', **kwargs):
     '''
@@ -97,6 +249,24 @@ def find_file(path, saltenv='base', **kwargs):
             fnd['rel'] = path
             return _add_file_stat(fnd)
         return fnd
+    index = _read_index(saltenv)
+    if index is not None and __opts__['fileserver_followsymlinks'] \
+            and not __opts__['fileserver_ignoresymlinks']:
+        # The index lists the files found in the roots the same way, look up
+        # the first root holding the path instead of checking each of them
+        root = index['found'].get(path)
+        if root is None:
+            return fnd
+        full = os.path.join(index['roots'][root], path)
+        if salt.fileserver.is_file_ignored(__opts__, full):
+            return fnd
+        fnd['path'] = full
+        fnd['rel'] = path
+        _add_file_stat(fnd)
+        if 'stat' not in fnd:
+            # Removed since the index was written
+            fnd['path'] = fnd['rel'] = ''
+        return fnd
     for root in __opts__['file_roots'][saltenv]:
         full = os.path.join(root, path)
         if os.path.isfile(full) and not salt.fileserver.is_file_ignored(__opts__, full):
@@ -153,6 +323,10 @@ def update():
         # Hash file won't exist if no files have yet been served up
         pass
 
+    if _WATCHING.is_set():
+        # The watcher fires the events of the changes as they happen
+        return
+
     mtime_map_path = os.path.join(__opts__['cachedir'], 'roots', 'mtime_map')
     # data to send on event
     data = {'changed': False,
@@ -189,6 +363,9 @@ def update():
     data['files']['removed'] = list(old_files - new_files)
     data['files']['added'] = list(new_files - old_files)
 
+    if __opts__.get('fileserver_roots_hash_index', False):
+        _HashIndex.instance(__opts__).update(__opts__['hash_type'], new_mtime_map)
+
     # write out the new map
     mtime_map_path_dir = os.path.dirname(mtime_map_path)
     if not os.path.exists(mtime_map_path_dir):
@@ -214,6 +391,289 @@ def update():
                 salt.utils.event.tagify(['roots', 'update'], prefix='fileserver'))
 
 
+class _RootIndex(object):
+    '''
+    The files, dirs, empty dirs and symlinks of a file root, kept up to date
+    by rescanning only the paths changed
+    '''
+    def __init__(self, root):
+        self.root = root
+        # rel_path -> 'files' or 'dirs'
+        self.entries = {}
+        # rel_path of a dir, '' for the root -> rel_paths of its items
+        self.children = {}
+        self.empty_dirs = set()
+        self.links = {}
+
+    def _add(self, kind, rel_path, empty, link_dest, changes):
+        self.entries[rel_path] = kind
+        self.children.setdefault(posixpath.dirname(rel_path), set()).add(rel_path)
+        if empty:
+            self.empty_dirs.add(rel_path)
+        if link_dest is not None:
+            self.links[rel_path] = link_dest
+        if kind == 'files':
+            changes['added'].add(os.path.join(self.root, rel_path))
+
+    def _forget(self, rel_path, changes):
+        self.children.get(posixpath.dirname(rel_path), set()).discard(rel_path)
+        stack = [rel_path]
+        while stack:
+            item = stack.pop()
+            if self.entries.pop(item, None) == 'files':
+                changes['removed'].add(os.path.join(self.root, item))
+            self.empty_dirs.discard(item)
+            self.links.pop(item, None)
+            stack.extend(self.children.pop(item, ()))
+
+    def scan(self, path, changes):
+        '''
+        Index the items under the dir path
+        '''
+        for root, dirs, files in salt.utils.path.os_walk(
+                path,
+                followlinks=__opts__['fileserver_followsymlinks']):
+            for kind, items in (('dirs', dirs), ('files', files)):
+                for rel_path, empty, link_dest in _walk_items(self.root, root, items):
+                    self._add(kind, rel_path, empty, link_dest, changes)
+
+    def refresh(self, path, changes):
+        '''
+        Index again the path, which was changed, and its items
+        '''
+        rel_path = os.path.relpath(path, self.root)
+        if rel_path == '.':
+            for item in list(self.children.get('', ())):
+                self._forget(item, changes)
+            if os.path.isdir(self.root):
+                self.scan(self.root, changes)
+            return
+        self._forget(rel_path, changes)
+        if os.path.lexists(path):
+            kind = 'dirs' if os.path.isdir(path) else 'files'
+            for rel_path, empty, link_dest in _walk_items(
+                    self.root, os.path.dirname(path), [os.path.basename(path)]):
+                self._add(kind, rel_path, empty, link_dest, changes)
+            if kind == 'dirs' and (__opts__['fileserver_followsymlinks']
+                                   or not salt.utils.path.islink(path)):
+                self.scan(path, changes)
+        parent = posixpath.dirname(rel_path)
+        if self.entries.get(parent) == 'dirs':
+            # The parent may have become empty, or not
+            try:
+                empty = not os.listdir(os.path.dirname(path))
+            except OSError:
+                empty = False
+            if empty:
+                self.empty_dirs.add(parent)
+            else:
+                self.empty_dirs.discard(parent)
+
+
+def _write_index(saltenv, indexes):
+    '''
+    Write the index of the file_roots of a saltenv from the indexes of its
+    roots, in the format of the file list cache plus the root of each file
+    '''
+    roots = _saltenv_roots(saltenv)
+    files = set()
+    dirs = set()
+    empty_dirs = set()
+    links = {}
+    found = {}
+    for idx, root in enumerate(roots):
+        index = indexes[root]
+        for rel_path, kind in six.iteritems(index.entries):
+            if kind == 'files':
+                files.add(rel_path)
+                found.setdefault(rel_path, idx)
+            else:
+                dirs.add(rel_path)
+        empty_dirs.update(index.empty_dirs)
+        links.update(index.links)
+    data = {'roots': roots,
+            'files': sorted(files),
+            'dirs': sorted(dirs),
+            'empty_dirs': sorted(empty_dirs),
+            'links': links,
+            'found': found}
+    path = _index_path(saltenv)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with salt.utils.atomicfile.atomic_open(path, 'wb') as fp_:
+            salt.payload.Serial(__opts__).dump(data, fp_)
+    except (IOError, OSError) as exc:
+        log.error('roots: Unable to write the index %s: %s', path, exc)
+
+
+def _remove_indexes():
+    '''
+    Remove the indexes so that the file lists are walked again
+    '''
+    shutil.rmtree(os.path.join(__opts__['cachedir'], 'roots', 'index'),
+                  ignore_errors=True)
+
+
+def watch():
+    '''
+    Keep an index of the file_roots up to date from inotify events, which
+    file_list, dir_list and find_file look up instead of walking the roots,
+    and fire the fileserver events of the changes. This is run by the
+    FileserverUpdate process of the master when
+    :conf_master:`fileserver_roots_inotify` is set, the roots are then no
+    longer walked by :py:func:`update`.
+    '''
+    if not __opts__.get('fileserver_roots_inotify', False):
+        return
+    if not HAS_PYINOTIFY:
+        log.error(
+            'fileserver_roots_inotify is set but pyinotify is not installed, '
+            'the file_roots are walked instead'
+        )
+        return
+
+    envs_roots = dict((saltenv, _saltenv_roots(saltenv))
+                      for saltenv in __opts__['file_roots'])
+    indexes = {}
+    for roots in six.itervalues(envs_roots):
+        for root in roots:
+            indexes.setdefault(root, _RootIndex(root))
+    dirty = set()
+    unwatched = set()
+
+    class _Handler(pyinotify.ProcessEvent):
+        def process_default(self, event):
+            if event.mask & pyinotify.IN_Q_OVERFLOW:
+                log.warning('roots: inotify queue overflow, indexing the roots again')
+                dirty.update(indexes)
+            elif getattr(event, 'pathname', None):
+                path = os.path.normpath(event.pathname)
+                dirty.add(path)
+                if event.mask & pyinotify.IN_CREATE and event.dir \
+                        and os.path.isdir(path) \
+                        and watch_manager.get_wd(path) is None:
+                    # auto_add failed to watch the new directory
+                    unwatched.add(path)
+
+    def _roots_of(path):
+        # The roots may be nested
+        return [root for root in indexes
+                if path == root or path.startswith(root.rstrip(os.sep) + os.sep)]
+
+    watch_manager = pyinotify.WatchManager()
+    notifier = pyinotify.Notifier(watch_manager, default_proc_fun=_Handler())
+    try:
+        for root in indexes:
+            if not os.path.isdir(root):
+                log.warning('roots: %s is not a directory, it is not watched', root)
+                continue
+            wdds = watch_manager.add_watch(
+                root,
+                _WATCH_MASK,
+                rec=True,
+                auto_add=True,
+                follow_symlinks=__opts__['fileserver_followsymlinks'])
+            unwatched.update(path for path, wdd in six.iteritems(wdds) if wdd < 0)
+            if unwatched:
+                break
+
+        if unwatched:
+            _log_unwatched(unwatched)
+            return
+
+        # Index after adding the watches so that no change is missed
+        changes = {'added': set(), 'removed': set()}
+        for root, index in six.iteritems(indexes):
+            if os.path.isdir(root):
+                index.scan(root, changes)
+        for saltenv in envs_roots:
+            _write_index(saltenv, indexes)
+        _update_hashes(indexes)
+        _WATCHING.set()
+        log.info('roots: Watching %d file roots', len(indexes))
+
+        since = None
+        while True:
+            if notifier.check_events(timeout=200):
+                notifier.read_events()
+                notifier.process_events()
+                if unwatched:
+                    _log_unwatched(unwatched)
+                    return
+                if dirty and since is None:
+                    since = time.time()
+                if since is None or time.time() - since < 1:
+                    # Wait for the changes to settle, for up to a second
+                    continue
+            if not dirty:
+                continue
+            changes = {'added': set(), 'removed': set()}
+            touched = set()
+            # Parents first, their refresh covers the changes beneath
+            for path in sorted(dirty):
+                for root in _roots_of(path):
+                    indexes[root].refresh(path, changes)
+                    touched.add(root)
+            dirty.clear()
+            since = None
+            for saltenv, roots in six.iteritems(envs_roots):
+                if touched.intersection(roots):
+                    _write_index(saltenv, indexes)
+            _update_hashes(indexes, changes['added'])
+            _fire_changes(changes)
+    finally:
+        _WATCHING.clear()
+        _remove_indexes()
+        notifier.stop()
+
+
+def _log_unwatched(paths):
+    '''
+    Log the directories the watcher failed to watch
+    '''
+    log.error(
+        'roots: Unable to watch %s, the file_roots are walked instead. The '
+        'limit of inotify watches (fs.inotify.max_user_watches) may be too low.',
+        ', '.join(sorted(paths))
+    )
+
+
+def _update_hashes(indexes, changed=None):
+    '''
+    Update the shared hash index from the indexes of the roots
+    '''
+    if not __opts__.get('fileserver_roots_hash_index', False):
+        return
+    paths = [os.path.join(root, rel_path)
+             for root, index in six.iteritems(indexes)
+             for rel_path, kind in six.iteritems(index.entries)
+             if kind == 'files']
+    _HashIndex.instance(__opts__).update(__opts__['hash_type'], paths, changed)
+
+
+def _fire_changes(changes):
+    '''
+    Fire the fileserver event of the changes found by the watcher
+    '''
+    if not __opts__.get('fileserver_events', False):
+        return
+    data = {'changed': True,
+            'files': {'changed': sorted(changes['added'] & changes['removed']),
+                      'added': sorted(changes['added'] - changes['removed']),
+                      'removed': sorted(changes['removed'] - changes['added'])},
+            'backend': 'roots'}
+    with salt.utils.event.get_event(
+            'master',
+            __opts__['sock_dir'],
+            __opts__['transport'],
+            opts=__opts__,
+            listen=False) as event:
+        event.fire_event(
+            data,
+            salt.utils.event.tagify(['roots', 'update'], prefix='fileserver'))
+
+
 def file_hash(load, fnd):
     '''
     Return a file hash, the hash type is set in the master config file
@@ -237,6 +697,19 @@ def file_hash(load, fnd):
     # set the hash_type as it is determined by config-- so mechanism won't change that
     ret['hash_type'] = __opts__['hash_type']
 
+    if __opts__.get('fileserver_roots_hash_index', False):
+        # Look up the hash in the shared index instead of the cache files
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return {}
+        index = _HashIndex.instance(__opts__)
+        ret['hsum'] = index.get(path, ret['hash_type'], stat)
+        if ret['hsum'] is None:
+            ret['hsum'] = salt.utils.hashutils.get_hash(path, ret['hash_type'])
+            index.set(path, ret['hash_type'], stat, ret['hsum'])
+        return ret
+
     # check if the hash is cached
     # cache file's contents should be "hash:mtime"
     cache_path = os.path.join(__opts__['cachedir'],
@@ -293,6 +766,82 @@ def file_hash(load, fnd):
     return ret
 
 
+def _walk_items(fs_root, parent_dir, items):
+    '''
+    Yield the relative path, whether it is an empty dir and the destination
+    of the link, or None, of the items of a directory of a file root which are
+    listed by the fileserver
+    '''
+    def _translate_sep(path):
+        '''
+        Translate path separators for Windows masterless minions
+        '''
+        return path.replace('\\', '/') if os.path.sep == '\\' else path
+
+    for item in items:
+        abs_path = os.path.join(parent_dir, item)
+        log.trace('roots: Processing %s', abs_path)
+        is_link = salt.utils.path.islink(abs_path)
+        log.trace(
+            'roots: %s is %sa link',
+            abs_path, 'not ' if not is_link else ''
+        )
+        if is_link and __opts__['fileserver_ignoresymlinks']:
+            continue
+        rel_path = _translate_sep(os.path.relpath(abs_path, fs_root))
+        log.trace('roots: %s relative path is %s', abs_path, rel_path)
+        if salt.fileserver.is_file_ignored(__opts__, rel_path):
+            continue
+        empty = False
+        try:
+            if not os.listdir(abs_path):
+                empty = True
+        except Exception:
+            # Generic exception because running os.listdir() on a
+            # non-directory path raises an OSError on *NIX and a
+            # WindowsError on Windows.
+            pass
+        link_dest = None
+        if is_link:
+            link_dest = salt.utils.path.readlink(abs_path)
+            log.trace(
+                'roots: %s symlink destination is %s',
+                abs_path, link_dest
+            )
+            if salt.utils.platform.is_windows() \
+                    and link_dest.startswith('\\\\'):
+                # Symlink points to a network path. Since you can't
+                # join UNC and non-UNC paths, just assume the original
+                # path.
+                log.trace(
+                    'roots: %s is a UNC path, using %s instead',
+                    link_dest, abs_path
+                )
+                link_dest = abs_path
+            if link_dest.startswith('..'):
+                joined = os.path.join(abs_path, link_dest)
+            else:
+                joined = os.path.join(
+                    os.path.dirname(abs_path), link_dest
+                )
+            rel_dest = _translate_sep(
+                os.path.relpath(
+                    os.path.realpath(os.path.normpath(joined)),
+                    os.path.realpath(fs_root)
+                )
+            )
+            log.trace(
+                'roots: %s relative path is %s',
+                abs_path, rel_dest
+            )
+            if rel_dest.startswith('..'):
+                # Only count the link if it does not point
+                # outside of the root dir of the fileserver
+                # (i.e. the "path" variable)
+                link_dest = None
+        yield rel_path, empty, link_dest
+
+
 def _file_lists(load, form):
     '''
     Return a dict containing the file lists for files, dirs, emtydirs and symlinks
@@ -309,6 +858,10 @@ def _file_lists(load, form):
         else:
             return []
 
+    index = _read_index(saltenv)
+    if index is not None:
+        return index.get(form, [])
+
     list_cachedir = os.path.join(__opts__['cachedir'], 'file_lists', 'roots')
     if not os.path.isdir(list_cachedir):
         try:
@@ -336,72 +889,12 @@ def _file_lists(load, form):
             '''
             Add the files to the target set
             '''
-            def _translate_sep(path):
-                '''
-                Translate path separators for Windows masterless minions
-                '''
-                return path.replace('\\', '/') if os.path.sep == '\\' else path
-
-            for item in items:
-                abs_path = os.path.join(parent_dir, item)
-                log.trace('roots: Processing %s', abs_path)
-                is_link = salt.utils.path.islink(abs_path)
-                log.trace(
-                    'roots: %s is %sa link',
-                    abs_path, 'not ' if not is_link else ''
-                )
-                if is_link and __opts__['fileserver_ignoresymlinks']:
-                    continue
-                rel_path = _translate_sep(os.path.relpath(abs_path, fs_root))
-                log.trace('roots: %s relative path is %s', abs_path, rel_path)
-                if salt.fileserver.is_file_ignored(__opts__, rel_path):
-                    continue
+            for rel_path, empty, link_dest in _walk_items(fs_root, parent_dir, items):
                 tgt.add(rel_path)
-                try:
-                    if not os.listdir(abs_path):
-                        ret['empty_dirs'].add(rel_path)
-                except Exception:
-                    # Generic exception because running os.listdir() on a
-                    # non-directory path raises an OSError on *NIX and a
-                    # WindowsError on Windows.
-                    pass
-                if is_link:
-                    link_dest = salt.utils.path.readlink(abs_path)
-                    log.trace(
-                        'roots: %s symlink destination is %s',
-                        abs_path, link_dest
-                    )
-                    if salt.utils.platform.is_windows() \
-                            and link_dest.startswith('\\\\'):
-                        # Symlink points to a network path. Since you can't
-                        # join UNC and non-UNC paths, just assume the original
-                        # path.
-                        log.trace(
-                            'roots: %s is a UNC path, using %s instead',
-                            link_dest, abs_path
-                        )
-                        link_dest = abs_path
-                    if link_dest.startswith('..'):
-                        joined = os.path.join(abs_path, link_dest)
-                    else:
-                        joined = os.path.join(
-                            os.path.dirname(abs_path), link_dest
-                        )
-                    rel_dest = _translate_sep(
-                        os.path.relpath(
-                            os.path.realpath(os.path.normpath(joined)),
-                            os.path.realpath(fs_root)
-                        )
-                    )
-                    log.trace(
-                        'roots: %s relative path is %s',
-                        abs_path, rel_dest
-                    )
-                    if not rel_dest.startswith('..'):
-                        # Only count the link if it does not point
-                        # outside of the root dir of the fileserver
-                        # (i.e. the "path" variable)
-                        ret['links'][rel_path] = link_dest
+                if empty:
+                    ret['empty_dirs'].add(rel_path)
+                if link_dest is not None:
+                    ret['links'][rel_path] = link_dest
 
         for path in __opts__['file_roots'][saltenv]:
             for root, dirs, files in salt.utils.path.os_walk(
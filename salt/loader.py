@@ -15,8 +15,8 @@ import logging
 import inspect
 import tempfile
 import threading
+import hashlib
 import functools
-import threading
 import traceback
 import types
 from zipimport import zipimporter
@@ -26,12 +26,15 @@ import salt.config
 import salt.defaults.events
 import salt.defaults.exitcodes
 import salt.syspaths
+import salt.payload
 import salt.utils.args
+import salt.utils.cache
 import salt.utils.context
 import salt.utils.data
 import salt.utils.dictupdate
 import salt.utils.event
 import salt.utils.files
+import salt.utils.json
 import salt.utils.lazy
 import salt.utils.odict
 import salt.utils.platform
@@ -106,9 +109,13 @@ LIBCLOUD_FUNCS_NOT_SUPPORTED = (
     'proxmox.avail_sizes',
 )
 
-# Will be set to pyximport module at runtime if cython is enabled in config.
+# Will be set to pyximport module at runtime if cython is enabled in config,
+# or to False if it could not be imported.
 pyximport = None
 
+# Matches the static __virtualname__ of a module in its source
+VIRTUALNAME_RE = re.compile(r'''^__virtualname__\s*=\s*['"]([^'"]+)['"]''', re.M)
+
 
 def static_loader(
         opts,
@@ -1191,6 +1198,112 @@ class FilterDictWrapper(MutableMapping):
                 yield key.replace(self.suffix, '')
 
 
+class LoaderIndex(salt.utils.cache.CachedirFile):
+    '''
+    An on disk index of the file mappings built by the loaders, enabled by
+    the ``loader_index`` option.
+
+    A loader scanning its module directories records the resulting file
+    mapping, the static ``__virtualname__`` of its modules and the mtime of
+    every directory it listed. The next loader built from the same
+    directories, in this process or any other one sharing the cachedir, only
+    has to stat those directories to reuse the mapping. Adding, removing or
+    renaming a module changes the mtime of its directory and invalidates the
+    entry, ``saltutil.sync_*`` removes the whole index.
+    '''
+    filename = 'loader_index.p'
+    _instances = {}
+
+    def get(self, key):
+        '''
+        Return the entry stored for key if none of its directories changed
+        '''
+        if self.entries is None:
+            self.entries = self._read()
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        for path, mtime in entry['dirs']:
+            if self.mtime(path) != mtime:
+                return None
+        return entry
+
+    def set(self, key, dirs, mapping, virtualnames):
+        '''
+        Store the file mapping of key, along with the (path, mtime) pairs of
+        the directories it was built from
+        '''
+        entry = {'dirs': dirs, 'mapping': mapping, 'virtualnames': virtualnames}
+        # Merge with what the other processes stored in the meantime
+        self.entries = self._read()
+        self.entries[key] = entry
+        self._write()
+
+
+class VirtualCache(salt.utils.cache.CachedirFile):
+    '''
+    An on disk cache of the modules refused by their ``__virtual__``
+    function, enabled by the ``virtual_cache`` option.
+
+    The refusals are stored per fingerprint of the options the loader was
+    given, grains and pillar included, and per module along with the mtime
+    and size of its file. A loader given the same options skips the modules
+    refused before without importing them. The ``__virtual__`` function of
+    the modules which do load still runs, since many of them set the module
+    up there. ``saltutil.refresh_modules``, ``saltutil.sync_*`` and the
+    ``reload_modules`` state argument remove the cache.
+    '''
+    filename = 'virtual_cache.p'
+    # The least recently stored fingerprints are dropped past this number
+    max_fingerprints = 8
+    _instances = {}
+
+    def __init__(self, path):
+        super(VirtualCache, self).__init__(path)
+        # mapping of fingerprint -> {module key -> [mtime, size, reason]}
+        self.pending = {}
+
+    def get(self, fingerprint, key, stat):
+        '''
+        Return a tuple of whether the module was refused and the reason
+        '''
+        if self.entries is None:
+            self.entries = self._read()
+        entry = self.entries.get(fingerprint, {}).get('modules', {}).get(key)
+        if entry is None or list(entry[:2]) != list(stat):
+            return False, None
+        return True, entry[2]
+
+    def set(self, fingerprint, key, stat, reason):
+        '''
+        Record a refused module, it is written out by flush
+        '''
+        if self.entries is None:
+            self.entries = self._read()
+        entry = list(stat) + [None if reason is None else six.text_type(reason)]
+        self.entries.setdefault(fingerprint, {'modules': {}})['modules'][key] = entry
+        self.pending.setdefault(fingerprint, {})[key] = entry
+
+    def flush(self):
+        '''
+        Write out the recorded refusals
+        '''
+        if not self.pending:
+            return
+        # Merge with what the other processes stored in the meantime
+        self.entries = self._read()
+        for fingerprint, modules in six.iteritems(self.pending):
+            data = self.entries.setdefault(fingerprint, {'modules': {}})
+            data['modules'].update(modules)
+            data['stored'] = time.time()
+        self.pending = {}
+        stored = sorted(self.entries, key=lambda x: self.entries[x].get('stored', 0))
+        # A negative slice end would keep everything with max_fingerprints = 0
+        for fingerprint in stored[:max(len(stored) - self.max_fingerprints, 0)]:
+            del self.entries[fingerprint]
+        self._write()
+
+
 class LazyLoader(salt.utils.lazy.LazyDict):
     '''
     A pseduo-dictionary which has a set of keys which are the
@@ -1297,6 +1410,11 @@ class LazyLoader(salt.utils.lazy.LazyDict):
             self.suffix_map[suffix] = (suffix, mode, kind)
             self.suffix_order.append(suffix)
 
+        self.virtual_cache = None
+        if self.virtual_enable and self.opts.get('virtual_cache', False) and 'cachedir' in self.opts:
+            self.virtual_cache = VirtualCache.instance(self.opts)
+        self._virtual_fingerprint = None
+
         self._lock = threading.RLock()
         self._refresh_file_mapping()
 
@@ -1371,15 +1489,18 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         '''
         # map of suffix to description for imp
         if self.opts.get('cython_enable', True) is True:
-            try:
-                global pyximport
-                pyximport = __import__('pyximport')  # pylint: disable=import-error
-                pyximport.install()
+            global pyximport
+            if pyximport is None:
+                try:
+                    pyximport = __import__('pyximport')  # pylint: disable=import-error
+                    pyximport.install()
+                except ImportError:
+                    pyximport = False
+                    log.info('Cython is enabled in the options but not present '
+                        'in the system path. Skipping Cython modules.')
+            if pyximport:
                 # add to suffix_map so file_mapping will pick it up
                 self.suffix_map['.pyx'] = tuple()
-            except ImportError:
-                log.info('Cython is enabled in the options but not present '
-                    'in the system path. Skipping Cython modules.')
         # Allow for zipimport of modules
         if self.opts.get('enable_zip_modules', True) is True:
             self.suffix_map['.zip'] = tuple()
@@ -1392,6 +1513,31 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         # create mapping of filename (without suffix) to (path, suffix)
         # The files are added in order of priority, so order *must* be retained.
         self.file_mapping = salt.utils.odict.OrderedDict()
+        # mapping of __virtualname__ -> names of the modules using it
+        self.virtualname_mapping = {}
+
+        index = None
+        if self.opts.get('loader_index', False) and 'cachedir' in self.opts:
+            index = LoaderIndex.instance(self.opts)
+            index_key = hashlib.sha1(salt.utils.stringutils.to_bytes(repr((
+                sys.version_info[:2],
+                self.module_dirs,
+                sorted(self.suffix_map),
+                self.suffix_order,
+                sorted(self.disabled),
+                self.opts.get('optimization_order'),
+            )))).hexdigest()
+            entry = index.get(index_key)
+            if entry is not None:
+                for f_noext, fpath, ext, opt_index in entry['mapping']:
+                    self.file_mapping[f_noext] = (fpath, ext, opt_index)
+                for f_noext, virtualname in entry['virtualnames']:
+                    self.virtualname_mapping.setdefault(virtualname, []).append(f_noext)
+                self._add_static_modules()
+                return
+            # (path, mtime) of the directories listed, taken before listing
+            # them so that a change made during the scan invalidates the entry
+            index_dirs = []
 
         opt_match = []
 
@@ -1406,6 +1552,11 @@ class LazyLoader(salt.utils.lazy.LazyDict):
             return ''
 
         for mod_dir in self.module_dirs:
+            if index is not None:
+                index_dirs.append((mod_dir, LoaderIndex.mtime(mod_dir)))
+                if six.PY3:
+                    pycache_dir = os.path.join(mod_dir, '__pycache__')
+                    index_dirs.append((pycache_dir, LoaderIndex.mtime(pycache_dir)))
             try:
                 # Make sure we have a sorted listdir in order to have
                 # expectable override results
@@ -1469,6 +1620,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     fpath = os.path.join(mod_dir, filename)
                     # if its a directory, lets allow us to load that
                     if ext == '':
+                        if index is not None:
+                            index_dirs.append((fpath, LoaderIndex.mtime(fpath)))
                         # is there something __init__?
                         subfiles = os.listdir(fpath)
                         for suffix in self.suffix_order:
@@ -1515,10 +1668,43 @@ class LazyLoader(salt.utils.lazy.LazyDict):
 
                 except OSError:
                     continue
+
+        if index is not None:
+            virtualnames = []
+            for f_noext, (fpath, ext, _) in six.iteritems(self.file_mapping):
+                virtualname = self._static_virtualname(fpath, ext)
+                if virtualname and virtualname != f_noext:
+                    virtualnames.append((f_noext, virtualname))
+                    self.virtualname_mapping.setdefault(virtualname, []).append(f_noext)
+            index.set(
+                index_key,
+                index_dirs,
+                [(f_noext,) + tuple(value) for f_noext, value in six.iteritems(self.file_mapping)],
+                virtualnames,
+            )
+        self._add_static_modules()
+
+    def _add_static_modules(self):
         for smod in self.static_modules:
             f_noext = smod.split('.')[-1]
             self.file_mapping[f_noext] = (smod, '.o', 0)
 
+    @staticmethod
+    def _static_virtualname(fpath, ext):
+        '''
+        Return the __virtualname__ assigned in the source of a module, if any
+        '''
+        if ext == '':
+            fpath = os.path.join(fpath, '__init__.py')
+        elif ext != '.py':
+            return None
+        try:
+            with salt.utils.files.fopen(fpath, 'r') as fp_:
+                match = VIRTUALNAME_RE.search(fp_.read())
+        except (IOError, OSError, UnicodeDecodeError):
+            return None
+        return match.group(1) if match else None
+
     def clear(self):
         '''
         Clear the dict
@@ -1571,14 +1757,20 @@ class LazyLoader(salt.utils.lazy.LazyDict):
         if mod_name in self.file_mapping:
             yield mod_name
 
+        # do we know modules which use it as their __virtualname__?
+        virtual = self.virtualname_mapping.get(mod_name, ())
+        for k in virtual:
+            if k in self.file_mapping:
+                yield k
+
         # do we have a partial match?
         for k in self.file_mapping:
-            if mod_name in k:
+            if mod_name in k and k not in virtual:
                 yield k
 
         # anyone else? Bueller?
         for k in self.file_mapping:
-            if mod_name not in k:
+            if mod_name not in k and k not in virtual:
                 yield k
 
     def _reload_submodules(self, mod):
@@ -1594,10 +1786,59 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                 reload_module(submodule)
                 self._reload_submodules(submodule)
 
+    def _virtual_cache_key(self, name):
+        '''
+        Return the key and the stat fingerprint of a module in the virtual
+        cache, or None if the module can not be cached
+        '''
+        if self._virtual_fingerprint is None:
+            opts = dict(
+                (key, value) for key, value in six.iteritems(self.opts)
+                # The function and arguments of salt-call
+                if key not in ('fun', 'arg', 'jid')
+            )
+            if isinstance(opts.get('grains'), dict):
+                # The pid grain changes with every process
+                opts['grains'] = dict(
+                    (key, value) for key, value in six.iteritems(opts['grains'])
+                    if key != 'pid'
+                )
+            try:
+                self._virtual_fingerprint = hashlib.sha1(salt.utils.stringutils.to_bytes(
+                    salt.utils.json.dumps(
+                        [self.tag, self.virtual_funcs, opts],
+                        sort_keys=True,
+                        default=lambda obj: type(obj).__name__,
+                    )
+                )).hexdigest()
+            except (TypeError, ValueError):
+                # Mixed key types can not be sorted
+                log.debug('Not caching the __virtual__ results of the %s loader', self.tag)
+                self._virtual_fingerprint = False
+        if not self._virtual_fingerprint:
+            return None
+        fpath, suffix = self.file_mapping[name][:2]
+        if suffix == '.o':
+            return None
+        try:
+            stat = os.stat(fpath)
+        except OSError:
+            return None
+        return '{0}:{1}'.format(name, fpath), (stat.st_mtime, stat.st_size)
+
     def _load_module(self, name):
         mod = None
         fpath, suffix = self.file_mapping[name][:2]
         self.loaded_files.add(name)
+        virtual_cache_key = None
+        if self.virtual_cache is not None:
+            virtual_cache_key = self._virtual_cache_key(name)
+            if virtual_cache_key is not None:
+                refused, reason = self.virtual_cache.get(self._virtual_fingerprint, *virtual_cache_key)
+                if refused:
+                    log.trace('Skipping %s.%s, refused by __virtual__ before', self.tag, name)
+                    self.missing_modules[name] = reason
+                    return False
         fpath_dirname = os.path.dirname(fpath)
         try:
             sys.path.append(fpath_dirname)
@@ -1770,6 +2011,9 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                     # If a module has information about why it could not be loaded, record it
                     self.missing_modules[module_name] = virtual_err
                     self.missing_modules[name] = virtual_err
+                    if virtual_cache_key is not None:
+                        self.virtual_cache.set(self._virtual_fingerprint, virtual_cache_key[0],
+                                               virtual_cache_key[1], virtual_err)
                     return False
         else:
             virtual_aliases = ()
@@ -1898,6 +2142,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                         self._refresh_file_mapping()
                         reloaded = True
                     continue
+            if self.virtual_cache is not None:
+                self.virtual_cache.flush()
 
         return ret
 
@@ -1912,6 +2158,8 @@ class LazyLoader(salt.utils.lazy.LazyDict):
                 self._load_module(name)
 
             self.loaded = True
+            if self.virtual_cache is not None:
+                self.virtual_cache.flush()
 
     def reload_modules(self):
         with self._lock:
@@ -28,6 +28,7 @@ from salt.utils.zeromq import zmq, ZMQDefaultLoop, install_zmq, ZMQ_VERSION_INFO
 # pylint: enable=import-error,no-name-in-module,redefined-builtin
 
 import tornado.gen  # pylint: disable=F0401
+import tornado.ioloop  # pylint: disable=F0401
 
 # Import salt libs
 import salt.crypt
@@ -97,6 +98,10 @@ from salt.utils.ctx import RequestContext
 
 log = logging.getLogger(__name__)
 
+# The number of one second checks a worker pool must be idle for before
+# it loses a worker
+POOL_IDLE_CHECKS = 30
+
 
 class SMaster(object):
     '''
@@ -362,6 +367,7 @@ class FileserverUpdate(salt.utils.process.SignalHandlingMultiprocessingProcess):
         super(FileserverUpdate, self).__init__(**kwargs)
         self.opts = opts
         self.update_threads = {}
+        self.watch_threads = {}
         # Avoid circular import
         import salt.fileserver
         self.fileserver = salt.fileserver.Fileserver(self.opts)
@@ -476,6 +482,19 @@ class FileserverUpdate(salt.utils.process.SignalHandlingMultiprocessingProcess):
                 condition.wait(interval)
             _do_update()
 
+    def watch_fileserver(self, backend, watch_func):
+        '''
+        Threading target which runs the watch function of a backend, which
+        keeps the caches of the backend up to date from change notifications
+        for as long as it runs
+        '''
+        try:
+            watch_func()
+        except Exception:
+            log.exception(
+                'Uncaught exception while watching the %s fileserver', backend
+            )
+
     def run(self):
         '''
         Start the update threads
@@ -484,6 +503,17 @@ class FileserverUpdate(salt.utils.process.SignalHandlingMultiprocessingProcess):
         # Clean out the fileserver backend cache
         salt.daemons.masterapi.clean_fsbackend(self.opts)
 
+        for backend in self.fileserver.backends():
+            try:
+                watch_func = self.fileserver.servers['{0}.watch'.format(backend)]
+            except KeyError:
+                continue
+            self.watch_threads[backend] = threading.Thread(
+                target=self.watch_fileserver,
+                args=(backend, watch_func),
+            )
+            self.watch_threads[backend].start()
+
         for interval in self.buckets:
             self.update_threads[interval] = threading.Thread(
                 target=self.update_fileserver,
@@ -649,6 +679,8 @@ class Master(SMaster):
         '''
         self._pre_flight()
         log.info('salt-master is starting as user \'%s\'', salt.utils.user.get_user())
+        # The pillar renders of a previous run may hold secrets
+        salt.daemons.masterapi.clean_pillar_flight(self.opts)
 
         enable_sigusr1_handler()
         enable_sigusr2_handler()
@@ -683,7 +715,17 @@ class Master(SMaster):
                 pub_channels.append(chan)
 
             log.info('Creating master event publisher process')
-            self.process_manager.add_process(salt.utils.event.EventPublisher, args=(self.opts,))
+            event_shards = salt.utils.event.event_shards(self.opts)
+            if event_shards < self.opts.get('event_publisher_shards', 1):
+                log.warning(
+                    'event_publisher_shards is not supported with ipc_mode '
+                    'tcp, using a single event publisher'
+                )
+            for shard in range(event_shards):
+                self.process_manager.add_process(
+                    salt.utils.event.EventPublisher,
+                    args=(self.opts,),
+                    kwargs={'shard': shard})
 
             if self.opts.get('reactor'):
                 if isinstance(self.opts['engines'], list):
@@ -920,6 +962,16 @@ class ReqServer(salt.utils.process.SignalHandlingMultiprocessingProcess):
                             'when using Python 2.')
                 self.opts['worker_threads'] = 1
 
+        # The worker pools of the channels routing the requests by command
+        pools = {}
+        for chan in req_channels:
+            pools = getattr(chan, 'pools', None) or pools
+        if self.opts['worker_stats']:
+            salt.utils.master.WorkerStats.create(
+                self.opts,
+                int(self.opts['worker_threads']) + sum(pool['max'] for pool in pools.values())
+            )
+
         # Reset signals to default ones before adding processes to the process
         # manager. We don't want the processes being started to inherit those
         # signal handlers
@@ -932,9 +984,92 @@ class ReqServer(salt.utils.process.SignalHandlingMultiprocessingProcess):
                                                        self.key,
                                                        req_channels,
                                                        name),
-                                                 kwargs=kwargs,
+                                                 kwargs=dict(kwargs, index=ind),
                                                  name=name)
-        self.process_manager.run()
+        if pools:
+            self._run_pools(req_channels, pools, kwargs)
+        else:
+            self.process_manager.run()
+
+    def _run_pools(self, req_channels, pools, kwargs):
+        '''
+        Start the workers of the worker pools, then watch the requests waiting
+        for each pool while managing the processes. A pool gets one more
+        worker while requests wait for it and loses one when it had no
+        requests for a while, staying within its bounds. A worker is only
+        stopped once the pool is paused with none of its requests in flight,
+        so that it is idle.
+
+        :param list req_channels: The request server channels
+        :param dict pools: The worker pools, see salt.transport.zeromq.worker_pools
+        :param dict kwargs: The keyword arguments of the worker processes
+        '''
+        channels = [chan for chan in req_channels if getattr(chan, 'pools', None)]
+        workers = dict((name, 0) for name in pools)
+        idle = dict((name, 0) for name in pools)
+        # Each possible worker of a pool has its own region in the stats file
+        base = {}
+        ind = int(self.opts['worker_threads'])
+        for name, pool in six.iteritems(pools):
+            base[name] = ind
+            ind += pool['max']
+
+        def add_worker(name):
+            worker_name = 'MWorker-{0}-{1}'.format(name, workers[name])
+            with salt.utils.process.default_signals(signal.SIGINT, signal.SIGTERM):
+                self.process_manager.add_process(MWorker,
+                                                 args=(self.opts,
+                                                       self.master_key,
+                                                       self.key,
+                                                       req_channels,
+                                                       worker_name),
+                                                 kwargs=dict(kwargs,
+                                                             index=base[name] + workers[name],
+                                                             pool=name),
+                                                 name=worker_name)
+            workers[name] += 1
+
+        for name, pool in six.iteritems(pools):
+            while workers[name] < pool['min']:
+                add_worker(name)
+
+        def check_pools():
+            for name, pool in six.iteritems(pools):
+                waiting = busy = 0
+                for chan in channels:
+                    chan_waiting, chan_busy = chan.pool_state(name)
+                    waiting += chan_waiting
+                    busy += chan_busy
+                if waiting:
+                    if idle[name] >= POOL_IDLE_CHECKS:
+                        for chan in channels:
+                            chan.resume_pool(name)
+                    idle[name] = 0
+                    if workers[name] < pool['max']:
+                        log.debug('Adding a worker to the %s worker pool, %d '
+                                  'requests are waiting', name, waiting)
+                        add_worker(name)
+                elif busy < workers[name] and workers[name] > pool['min']:
+                    idle[name] += 1
+                    if idle[name] >= POOL_IDLE_CHECKS and \
+                            all([chan.retire_pool_worker(name) for chan in channels]):
+                        workers[name] -= 1
+                        log.debug('Removing a worker from the %s worker pool', name)
+                        self.process_manager.stop_process(
+                            'MWorker-{0}-{1}'.format(name, workers[name]))
+                        for chan in channels:
+                            chan.set_pool_workers(name, workers[name])
+                            chan.resume_pool(name)
+                        idle[name] = 0
+                else:
+                    if idle[name] >= POOL_IDLE_CHECKS:
+                        for chan in channels:
+                            chan.resume_pool(name)
+                    idle[name] = 0
+                for chan in channels:
+                    chan.set_pool_workers(name, workers[name])
+
+        self.process_manager.run(periodic=check_pools, interval=1)
 
     def run(self):
         '''
@@ -963,6 +1098,8 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
                  key,
                  req_channels,
                  name,
+                 index=0,
+                 pool=None,
                  **kwargs):
         '''
         Create a salt master worker process
@@ -970,6 +1107,9 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         :param dict opts: The salt options
         :param dict mkey: The user running the salt master and the AES key
         :param dict key: The user running the salt master and the RSA key
+        :param int index: The number of the worker in the worker stats file
+        :param str pool: The worker pool the worker serves, see the
+                         worker_pools master option
 
         :rtype: MWorker
         :return: Master worker
@@ -983,8 +1123,11 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.mkey = mkey
         self.key = key
         self.k_mtime = 0
+        self.index = index
+        self.pool = pool
         self.stats = collections.defaultdict(lambda: {'mean': 0, 'latency': 0, 'runs': 0})
         self.stat_clock = time.time()
+        self.worker_stats = None
 
     # We need __setstate__ and __getstate__ to also pickle 'SMaster.secrets'.
     # Otherwise, 'SMaster.secrets' won't be copied over to the spawned process
@@ -1002,6 +1145,9 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.mkey = state['mkey']
         self.key = state['key']
         self.k_mtime = state['k_mtime']
+        self.index = state['index']
+        self.pool = state['pool']
+        self.worker_stats = None
         SMaster.secrets = state['secrets']
 
     def __getstate__(self):
@@ -1011,6 +1157,8 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
             'mkey': self.mkey,
             'key': self.key,
             'k_mtime': self.k_mtime,
+            'index': self.index,
+            'pool': self.pool,
             'secrets': SMaster.secrets,
             'log_queue': self.log_queue,
             'log_queue_level': self.log_queue_level
@@ -1019,6 +1167,8 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
     def _handle_signals(self, signum, sigframe):
         for channel in getattr(self, 'req_channels', ()):
             channel.close()
+        # The queued returns are written once the loop stopped, not from the
+        # signal handler which may interrupt a flush
         super(MWorker, self)._handle_signals(signum, sigframe)
 
     def __bind(self):
@@ -1030,12 +1180,22 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self.io_loop = ZMQDefaultLoop()
         self.io_loop.make_current()
         for req_channel in self.req_channels:
+            if hasattr(req_channel, 'worker_pool'):
+                req_channel.worker_pool = self.pool
             req_channel.post_fork(self._handle_payload, io_loop=self.io_loop)  # TODO: cleaner? Maybe lazily?
+        if self.opts['return_batch_size'] > 1:
+            # Write out the queued returns even when no more returns come in
+            tornado.ioloop.PeriodicCallback(
+                self.aes_funcs.flush_returns,
+                self.opts['return_batch_interval'] * 1000,
+            ).start()
         try:
             self.io_loop.start()
         except (KeyboardInterrupt, SystemExit):
             # Tornado knows what to do
             pass
+        finally:
+            self.aes_funcs.flush_returns()
 
     @tornado.gen.coroutine
     def _handle_payload(self, payload):
@@ -1072,10 +1232,26 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         end_time = time.time()
         if end_time - self.stat_clock > self.opts['master_stats_event_iter']:
             # Fire the event with the stats and wipe the tracker
-            self.aes_funcs.event.fire_event({'time': end_time - self.stat_clock, 'worker': self.name, 'stats': stats}, tagify(self.name, 'stats'))
+            data = {'time': end_time - self.stat_clock, 'worker': self.name, 'stats': stats}
+            if self.opts['return_batch_size'] > 1:
+                data['return_batch'] = self.aes_funcs.return_batch_stats()
+            publish = {}
+            for _, opts in iter_transport_opts(self.opts):
+                chan = salt.transport.server.PubServerChannel.factory(opts)
+                publish.update(chan.publish_stats())
+            if publish:
+                data['publish'] = publish
+            self.aes_funcs.event.fire_event(data, tagify(self.name, 'stats'))
             self.stats = collections.defaultdict(lambda: {'mean': 0, 'latency': 0, 'runs': 0})
             self.stat_clock = end_time
 
+    def _record_stats(self, cmd, start):
+        '''
+        Account for a request in the worker stats file
+        '''
+        self.worker_stats.record(
+            cmd, time.time() - start, self.aes_funcs.queued_returns())
+
     def _handle_clear(self, load):
         '''
         Process a cleartext command
@@ -1088,9 +1264,10 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         cmd = load['cmd']
         if cmd.startswith('__'):
             return False
-        if self.opts['master_stats']:
-            start = time.time()
+        start = time.time()
         ret = getattr(self.clear_funcs, cmd)(load), {'fun': 'send_clear'}
+        if self.worker_stats:
+            self._record_stats(cmd, start)
         if self.opts['master_stats']:
             stats = salt.utils.event.update_stats(self.stats, start, load)
             self._post_stats(stats)
@@ -1111,8 +1288,7 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
         log.trace('AES payload received with command %s', data['cmd'])
         if cmd.startswith('__'):
             return False
-        if self.opts['master_stats']:
-            start = time.time()
+        start = time.time()
 
         def run_func(data):
             return self.aes_funcs.run_func(data['cmd'], data)
@@ -1122,6 +1298,8 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
                                              'opts': self.opts})):
             ret = run_func(data)
 
+        if self.worker_stats:
+            self._record_stats(cmd, start)
         if self.opts['master_stats']:
             stats = salt.utils.event.update_stats(self.stats, start, data)
             self._post_stats(stats)
@@ -1137,6 +1315,14 @@ class MWorker(salt.utils.process.SignalHandlingMultiprocessingProcess):
            self.key,
            )
         self.aes_funcs = AESFuncs(self.opts)
+        if self.opts['worker_stats']:
+            try:
+                self.worker_stats = salt.utils.master.WorkerStats(self.opts, self.index)
+            except (IOError, OSError, salt.exceptions.SaltException) as exc:
+                log.error('Unable to open the worker stats file: %s', exc)
+            else:
+                # Count the pillar renders computed and coalesced
+                salt.pillar.PillarFlight.recorders.append(self.worker_stats.record_slot)
         salt.utils.crypt.reinit_crypto()
         self.__bind()
 
@@ -1172,6 +1358,12 @@ class AESFuncs(object):
         )
         self.__setup_fileserver()
         self.masterapi = salt.daemons.masterapi.RemoteFuncs(opts)
+        # Returns queued to be written to the job cache in a single batch
+        self._return_queue = []
+        self._return_flush = time.time()
+        self._return_flushing = False
+        self._return_stats = {'flushes': 0, 'returns': 0, 'max_queue': 0,
+                              'forced': 0, 'flush_time': 0.0}
 
     def __setup_fileserver(self):
         '''
@@ -1184,6 +1376,8 @@ class AESFuncs(object):
         self._file_find = self.fs_._find_file
         self._file_hash = self.fs_.file_hash
         self._file_hash_and_stat = self.fs_.file_hash_and_stat
+        self._file_manifest = self.fs_.file_manifest
+        self._serve_files = self.fs_.serve_files
         self._file_list = self.fs_.file_list
         self._file_list_emptydirs = self.fs_.file_list_emptydirs
         self._dir_list = self.fs_.dir_list
@@ -1629,12 +1823,82 @@ class AESFuncs(object):
                     log.info('But \'drop_message_signature_fail\' is disabled, so message is still accepted.')
             load['sig'] = sig
 
+        if self.opts['return_batch_size'] > 1:
+            self._queue_return(load)
+            return
+
         try:
             salt.utils.job.store_job(
                 self.opts, load, event=self.event, mminion=self.mminion)
         except salt.exceptions.SaltCacheError:
             log.error('Could not store job information for load: %s', load)
 
+    def _queue_return(self, load):
+        '''
+        Queue a verified return, the queue is written out once it holds
+        return_batch_size returns or return_batch_interval has passed since
+        the last write.
+
+        :param dict load: The minion payload
+        '''
+        self._return_queue.append(load)
+        queued = len(self._return_queue)
+        if queued > self._return_stats['max_queue']:
+            self._return_stats['max_queue'] = queued
+        if queued >= self.opts['return_batch_size']:
+            # The worker stops taking requests until the batch is written
+            self._return_stats['forced'] += 1
+            self.flush_returns()
+        elif time.time() - self._return_flush >= self.opts['return_batch_interval']:
+            self.flush_returns()
+
+    def flush_returns(self):
+        '''
+        Fire the events of the queued returns and write them to the master
+        job cache
+        '''
+        if self._return_flushing:
+            # Already writing the returns, the next flush gets the new ones
+            return
+        self._return_flush = time.time()
+        if not self._return_queue:
+            return
+        loads, self._return_queue = self._return_queue, []
+        self._return_flushing = True
+        try:
+            salt.utils.job.store_jobs(
+                self.opts, loads, event=self.event, mminion=self.mminion)
+        except salt.exceptions.SaltCacheError:
+            log.error('Could not store job information for %d returns', len(loads))
+        finally:
+            self._return_flushing = False
+        self._return_stats['flushes'] += 1
+        self._return_stats['returns'] += len(loads)
+        self._return_stats['flush_time'] += time.time() - self._return_flush
+
+    def queued_returns(self):
+        '''
+        Return the number of returns waiting to be written to the job cache
+
+        :rtype: int
+        '''
+        return len(self._return_queue)
+
+    def return_batch_stats(self):
+        '''
+        Return the statistics of the return batches written since the last
+        call, used to watch how far the job cache lags behind the returns
+
+        :rtype: dict
+        '''
+        stats = dict(self._return_stats, queued=self.queued_returns())
+        if stats['flushes']:
+            stats['mean_batch'] = float(stats['returns']) / stats['flushes']
+            stats['mean_flush_time'] = stats['flush_time'] / stats['flushes']
+        self._return_stats = {'flushes': 0, 'returns': 0, 'max_queue': 0,
+                              'forced': 0, 'flush_time': 0.0}
+        return stats
+
     def _syndic_return(self, load):
         '''
         Receive a syndic minion return and format it to look like returns from
@@ -2162,7 +2426,7 @@ class ClearFuncs(object):
 
         # Send it!
         self._send_ssh_pub(payload, ssh_minions=ssh_minions)
-        self._send_pub(payload)
+        self._send_pub(payload, minions=minions)
 
         return {
             'enc': 'clear',
@@ -2216,13 +2480,13 @@ class ClearFuncs(object):
             return {'error': msg}
         return jid
 
-    def _send_pub(self, load):
+    def _send_pub(self, load, minions=None):
         '''
         Take a load and send it across the network to connected minions
         '''
         for transport, opts in iter_transport_opts(self.opts):
             chan = salt.transport.server.PubServerChannel.factory(opts)
-            chan.publish(load)
+            chan.publish(load, minions=minions)
 
     @property
     def ssh_client(self):
@@ -45,6 +45,7 @@ except ImportError:
     pass
 
 # Import salt libs
+import salt.fileclient
 import salt.utils.args
 import salt.utils.atomicfile
 import salt.utils.data
@@ -4310,7 +4311,12 @@ def get_managed(
         cached_dest = __salt__['cp.is_cached'](source, saltenv)
         if cached_dest and (source_hash or skip_verify):
             htype = source_sum.get('hash_type', 'sha256')
-            cached_sum = get_hash(cached_dest, form=htype)
+            if not skip_verify and salt.fileclient.is_cached_object(
+                    __opts__, cached_dest, htype, source_sum.get('hsum', '')):
+                # The cached file is a link to the object of the source hash
+                cached_sum = source_sum['hsum']
+            else:
+                cached_sum = get_hash(cached_dest, form=htype)
             if skip_verify:
                 # prev: if skip_verify or cached_sum == source_sum['hsum']:
                 # but `cached_sum == source_sum['hsum']` is elliptical as prev if
@@ -43,6 +43,7 @@ import salt.config
 import salt.client
 import salt.client.ssh.client
 import salt.defaults.events
+import salt.loader
 import salt.payload
 import salt.runner
 import salt.state
@@ -113,6 +114,9 @@ def _sync(form, saltenv=None, extmod_whitelist=None, extmod_blacklist=None):
         mod_file = os.path.join(__opts__['cachedir'], 'module_refresh')
         with salt.utils.files.fopen(mod_file, 'a'):
             pass
+        salt.loader.LoaderIndex.invalidate(__opts__)
+        salt.loader.VirtualCache.invalidate(__opts__)
+        salt.state.CompileCache.invalidate(__opts__)
     if form == 'grains' and \
        __opts__.get('grains_cache') and \
        os.path.isfile(os.path.join(__opts__['cachedir'], 'grains.cache.p')):
@@ -1121,6 +1125,7 @@ def refresh_modules(**kwargs):
 
         salt '*' saltutil.refresh_modules
     '''
+    salt.loader.VirtualCache.invalidate(__opts__)
     asynchronous = bool(kwargs.get('async', True))
     try:
         if asynchronous:
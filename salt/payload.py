@@ -11,6 +11,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 import logging
 import gc
 import datetime
+import threading
 
 # Import salt libs
 import salt.log
@@ -19,6 +20,7 @@ import salt.utils.immutabletypes as immutabletypes
 import salt.utils.stringutils
 from salt.exceptions import SaltReqTimeoutError
 from salt.utils.data import CaseInsensitiveDict
+from salt.utils.thread_local_proxy import ThreadLocalProxy
 
 # Import third party libs
 from salt.ext import six
@@ -107,6 +109,103 @@ def format_payload(enc, **kwargs):
     return package(payload)
 
 
+def _ext_type_decoder(code, data):
+    if code == 78:
+        data = salt.utils.stringutils.to_unicode(data)
+        try:
+            # Much faster than strptime for the format used by the encoder
+            return datetime.datetime(int(data[0:4]), int(data[4:6]), int(data[6:8]),
+                                     int(data[9:11]), int(data[12:14]), int(data[15:17]),
+                                     int(data[18:]))
+        except ValueError:
+            return datetime.datetime.strptime(data, '%Y%m%dT%H:%M:%S.%f')
+    return data
+
+
+def _ext_type_str_decoder(code, data):
+    '''
+    Same as _ext_type_decoder, also decoding the data of unknown types as
+    salt.transport.frame.decode_embedded_strs would
+    '''
+    if code == 78:
+        return _ext_type_decoder(code, data)
+    try:
+        return data.decode()
+    except UnicodeError:
+        return data
+
+
+def _ext_type_encoder(obj):
+    obj = ThreadLocalProxy.unproxy(obj)
+    if isinstance(obj, six.integer_types):
+        # msgpack can't handle the very long Python longs for jids
+        # Convert any very long longs to strings
+        return six.text_type(obj)
+    elif isinstance(obj, datetime.datetime):
+        # msgpack doesn't support datetime.datetime and datetime.date datatypes.
+        # So here we have converted these types to custom datatype
+        # This is msgpack Extended types numbered 78
+        return msgpack.ExtType(78, salt.utils.stringutils.to_bytes(
+            '{0:04d}{1:02d}{2:02d}T{3:02d}:{4:02d}:{5:02d}.{6:06d}'.format(
+                obj.year, obj.month, obj.day, obj.hour, obj.minute, obj.second,
+                obj.microsecond)))
+    elif isinstance(obj, datetime.date):
+        return msgpack.ExtType(78, salt.utils.stringutils.to_bytes(
+            obj.strftime('%Y%m%dT%H:%M:%S.%f')))
+    # The same for immutable types
+    elif isinstance(obj, immutabletypes.ImmutableDict):
+        return dict(obj)
+    elif isinstance(obj, immutabletypes.ImmutableList):
+        return list(obj)
+    elif isinstance(obj, (set, immutabletypes.ImmutableSet)):
+        # msgpack can't handle set so translate it to tuple
+        return tuple(obj)
+    elif isinstance(obj, CaseInsensitiveDict):
+        return dict(obj)
+    # Nothing known exceptions found. Let msgpack raise it's own.
+    return obj
+
+
+def _loads_kwargs(encoding):
+    '''
+    Return the keyword arguments of msgpack.loads for the given encoding
+    '''
+    kwargs = {'use_list': True, 'ext_hook': _ext_type_decoder}
+    if msgpack.version >= (0, 4, 0):
+        # msgpack only supports 'encoding' starting in 0.4.0.
+        # Due to this, if we don't need it, don't pass it at all so
+        # that under Python 2 we can still work with older versions
+        # of msgpack.
+        if msgpack.version >= (0, 5, 2):
+            kwargs['raw'] = encoding is None
+        else:
+            kwargs['encoding'] = encoding
+    return kwargs
+
+
+if HAS_MSGPACK:
+    _LOADS_KWARGS = {None: _loads_kwargs(None)}
+    # Decodes the strings of messages packed without the bin type in C, like
+    # salt.transport.frame.decode_embedded_strs does afterwards in python
+    if six.PY3 and msgpack.version >= (0, 5, 2):
+        _LOADS_STR_KWARGS = dict(_loads_kwargs('utf-8'), ext_hook=_ext_type_str_decoder)
+    else:
+        _LOADS_STR_KWARGS = None
+    # Packers are reused by the thread which created them
+    _PACKERS = threading.local()
+
+
+def _packer(use_bin_type):
+    '''
+    Return a msgpack Packer of the current thread, or None when the msgpack
+    module has no Packer
+    '''
+    packer = _PACKERS.__dict__.pop(use_bin_type, None)
+    if packer is None and hasattr(msgpack, 'Packer') and msgpack.version >= (0, 4, 0):
+        packer = msgpack.Packer(default=_ext_type_encoder, use_bin_type=use_bin_type)
+    return packer
+
+
 class Serial(object):
     '''
     Create a serialization object, this object manages all message
@@ -120,7 +219,7 @@ class Serial(object):
         else:
             self.serial = 'msgpack'
 
-    def loads(self, msg, encoding=None, raw=False):
+    def loads(self, msg, encoding=None, raw=False, use_bin_type=True):
         '''
         Run the correct loads serialization format
 
@@ -136,39 +235,41 @@ class Serial(object):
                          been lost in this case) to what the encoding is
                          set as. In this case, it will fail if any of
                          the contents cannot be converted.
+        :param use_bin_type: Set to False when the msgpack data was encoded
+                             without "use_bin_type=True" and holds no binary
+                             data, like the decrypted payloads sent between
+                             minions and masters. On Python 3 the strings
+                             are then decoded while unpacking instead of
+                             walking the whole unpacked data. The envelopes
+                             holding the ciphertext must not use it.
         '''
         try:
-            def ext_type_decoder(code, data):
-                if code == 78:
-                    data = salt.utils.stringutils.to_unicode(data)
-                    return datetime.datetime.strptime(data, '%Y%m%dT%H:%M:%S.%f')
-                return data
-
             gc.disable()  # performance optimization for msgpack
-            loads_kwargs = {'use_list': True,
-                            'ext_hook': ext_type_decoder,
-                            '_msgpack_module': msgpack}
-            if msgpack.version >= (0, 4, 0):
-                # msgpack only supports 'encoding' starting in 0.4.0.
-                # Due to this, if we don't need it, don't pass it at all so
-                # that under Python 2 we can still work with older versions
-                # of msgpack.
-                if msgpack.version >= (0, 5, 2):
-                    if encoding is None:
-                        loads_kwargs['raw'] = True
-                    else:
-                        loads_kwargs['raw'] = False
-                else:
-                    loads_kwargs['encoding'] = encoding
+            if (encoding is None and not raw and _LOADS_STR_KWARGS is not None
+                    and (not use_bin_type or isinstance(msg, bytes)
+                         and b'\xc4' not in msg and b'\xc5' not in msg and b'\xc6' not in msg)):
+                # Without any bin type in the message, decoding all the
+                # strings while unpacking gives the same result as
+                # decode_embedded_strs, unless some are not valid utf-8
                 try:
-                    ret = salt.utils.msgpack.loads(msg, **loads_kwargs)
+                    return salt.utils.msgpack.loads(msg, _msgpack_module=msgpack,
+                                                    **_LOADS_STR_KWARGS)
                 except UnicodeDecodeError:
-                    # msg contains binary data
-                    loads_kwargs.pop('raw', None)
-                    loads_kwargs.pop('encoding', None)
-                    ret = salt.utils.msgpack.loads(msg, **loads_kwargs)
+                    pass
+            if encoding in _LOADS_KWARGS:
+                loads_kwargs = _LOADS_KWARGS[encoding]
             else:
-                ret = salt.utils.msgpack.loads(msg, **loads_kwargs)
+                loads_kwargs = _LOADS_KWARGS.setdefault(encoding, _loads_kwargs(encoding))
+            try:
+                ret = salt.utils.msgpack.loads(msg, _msgpack_module=msgpack, **loads_kwargs)
+            except UnicodeDecodeError:
+                if 'raw' not in loads_kwargs and 'encoding' not in loads_kwargs:
+                    raise
+                # msg contains binary data
+                loads_kwargs = dict(loads_kwargs)
+                loads_kwargs.pop('raw', None)
+                loads_kwargs.pop('encoding', None)
+                ret = salt.utils.msgpack.loads(msg, _msgpack_module=msgpack, **loads_kwargs)
             if six.PY3 and encoding is None and not raw:
                 ret = salt.transport.frame.decode_embedded_strs(ret)
         except Exception as exc:
@@ -207,41 +308,15 @@ class Serial(object):
                              Since this changes the wire protocol, this
                              option should not be used outside of IPC.
         '''
-        def ext_type_encoder(obj):
-            if isinstance(obj, six.integer_types):
-                # msgpack can't handle the very long Python longs for jids
-                # Convert any very long longs to strings
-                return six.text_type(obj)
-            elif isinstance(obj, (datetime.datetime, datetime.date)):
-                # msgpack doesn't support datetime.datetime and datetime.date datatypes.
-                # So here we have converted these types to custom datatype
-                # This is msgpack Extended types numbered 78
-                return msgpack.ExtType(78, salt.utils.stringutils.to_bytes(
-                    obj.strftime('%Y%m%dT%H:%M:%S.%f')))
-            # The same for immutable types
-            elif isinstance(obj, immutabletypes.ImmutableDict):
-                return dict(obj)
-            elif isinstance(obj, immutabletypes.ImmutableList):
-                return list(obj)
-            elif isinstance(obj, (set, immutabletypes.ImmutableSet)):
-                # msgpack can't handle set so translate it to tuple
-                return tuple(obj)
-            elif isinstance(obj, CaseInsensitiveDict):
-                return dict(obj)
-            # Nothing known exceptions found. Let msgpack raise it's own.
-            return obj
-
         try:
-            if msgpack.version >= (0, 4, 0):
-                # msgpack only supports 'use_bin_type' starting in 0.4.0.
-                # Due to this, if we don't need it, don't pass it at all so
-                # that under Python 2 we can still work with older versions
-                # of msgpack.
-                return salt.utils.msgpack.dumps(msg, default=ext_type_encoder,
-                                                use_bin_type=use_bin_type,
-                                                _msgpack_module=msgpack)
+            packer = _packer(use_bin_type)
+            if packer is not None:
+                try:
+                    return packer.pack(msg)
+                finally:
+                    _PACKERS.__dict__[use_bin_type] = packer
             else:
-                return salt.utils.msgpack.dumps(msg, default=ext_type_encoder,
+                return salt.utils.msgpack.dumps(msg, default=_ext_type_encoder,
                                                 _msgpack_module=msgpack)
         except (OverflowError, msgpack.exceptions.PackValueError):
             # msgpack<=0.4.6 don't call ext encoder on very long integers raising the error instead.
@@ -271,11 +346,11 @@ class Serial(object):
 
             msg = verylong_encoder(msg, set())
             if msgpack.version >= (0, 4, 0):
-                return salt.utils.msgpack.dumps(msg, default=ext_type_encoder,
+                return salt.utils.msgpack.dumps(msg, default=_ext_type_encoder,
                                                 use_bin_type=use_bin_type,
                                                 _msgpack_module=msgpack)
             else:
-                return salt.utils.msgpack.dumps(msg, default=ext_type_encoder,
+                return salt.utils.msgpack.dumps(msg, default=_ext_type_encoder,
                                                 _msgpack_module=msgpack)
 
     def dump(self, msg, fn_):
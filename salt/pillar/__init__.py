@@ -6,25 +6,36 @@ Render the pillar data
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
 import copy
+import errno
 import fnmatch
+import hashlib
 import os
 import collections
 import logging
+import time
 import tornado.gen
 import sys
 import traceback
 import inspect
+import uuid
 
 # Import salt libs
 import salt.loader
 import salt.fileclient
 import salt.minion
+import salt.payload
+import salt.template
 import salt.transport.client
 import salt.utils.args
+import salt.utils.atomicfile
 import salt.utils.cache
 import salt.utils.crypt
 import salt.utils.data
 import salt.utils.dictupdate
+import salt.utils.files
+import salt.utils.hashutils
+import salt.utils.json
+import salt.utils.stringutils
 import salt.utils.url
 from salt.exceptions import SaltClientError
 from salt.template import compile_template
@@ -372,6 +383,206 @@ class PillarCache(object):
         return pillar_data
 
 
+class PillarFlight(object):
+    '''
+    Coalesce the identical pillar renders in flight in the processes sharing
+    a cachedir, see the :conf_master:`pillar_coalesce` option.
+
+    The first process to start a render of a given key computes it, holding a
+    lock file in ``<cachedir>/pillar_flight``, and writes the result for the
+    processes which asked for the same key meanwhile. These register a wait
+    file, wait for the lock to go away and read the result instead of
+    rendering it again. The last one to read the result removes it.
+    '''
+    # Renders computed and coalesced by this process, per kind of render
+    stats = collections.defaultdict(lambda: {'computed': 0, 'coalesced': 0})
+    # Called with the name and the duration of every render, the master
+    # workers account for them in their worker stats
+    recorders = []
+    # Seconds between two waits for a lock
+    poll_interval = 0.05
+    # When this process last removed the old results
+    reaped = 0
+
+    def __init__(self, opts):
+        self.opts = opts
+        self.flight_dir = os.path.join(opts['cachedir'], 'pillar_flight')
+        self.timeout = opts.get('pillar_coalesce_timeout', 60)
+        self.serial = salt.payload.Serial(opts)
+
+    @staticmethod
+    def key(*inputs):
+        '''
+        Return the key of a render from its inputs, None if they cannot be
+        serialized to compare them
+        '''
+        try:
+            data = salt.utils.json.dumps(inputs, sort_keys=True, default=repr)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha1(salt.utils.stringutils.to_bytes(data)).hexdigest()
+
+    def _account(self, kind, how, start):
+        self.stats[kind][how] += 1
+        for recorder in self.recorders:
+            recorder('pillar.{0}:{1}'.format(kind, how), time.time() - start)
+
+    def _wait(self, lock, result):
+        '''
+        Wait for the render holding the lock and return its result, raise
+        KeyError if there is none
+        '''
+        token = None
+        while True:
+            try:
+                with salt.utils.files.fopen(lock, 'rb') as fp_:
+                    token = salt.utils.stringutils.to_unicode(fp_.read()) or token
+                if time.time() - os.path.getmtime(lock) > self.timeout:
+                    # Left behind by a process which died, or too slow
+                    log.warning('Removing the stale pillar render lock %s', lock)
+                    os.remove(lock)
+                    raise KeyError(lock)
+            except (IOError, OSError):
+                break
+            time.sleep(self.poll_interval)
+        if not token:
+            raise KeyError(lock)
+        try:
+            with salt.utils.files.fopen(result, 'rb') as fp_:
+                data = self.serial.load(fp_)
+        except Exception:
+            raise KeyError(lock)
+        if not isinstance(data, dict) \
+                or salt.utils.stringutils.to_unicode(data.get('token')) != token:
+            # Not written by the render we waited for
+            raise KeyError(lock)
+        return data['ret']
+
+    def run(self, kind, key, func, *args, **kwargs):
+        '''
+        Return func(*args, **kwargs), computed once by the renders of the
+        same kind and key in flight
+        '''
+        start = time.time()
+        if key is None:
+            ret = func(*args, **kwargs)
+            self._account(kind, 'computed', start)
+            return ret
+        lock = os.path.join(self.flight_dir, '{0}-{1}.lock'.format(kind, key))
+        result = os.path.join(self.flight_dir, '{0}-{1}.p'.format(kind, key))
+        for _ in range(2):
+            try:
+                fd_ = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError as exc:
+                if exc.errno == errno.ENOENT:
+                    try:
+                        os.makedirs(self.flight_dir)
+                    except OSError:
+                        pass
+                    continue
+                if exc.errno != errno.EEXIST:
+                    break
+                waiting = self._register(kind, key)
+                try:
+                    ret = self._wait(lock, result)
+                except KeyError:
+                    # The render failed, or its result cannot be shared
+                    continue
+                finally:
+                    self._unregister(kind, key, waiting, result)
+                log.debug('Coalesced the pillar %s render %s', kind, key)
+                self._account(kind, 'coalesced', start)
+                return ret
+            else:
+                return self._lead(kind, key, func, args, kwargs, fd_, lock, result, start)
+        ret = func(*args, **kwargs)
+        self._account(kind, 'computed', start)
+        return ret
+
+    def _register(self, kind, key):
+        '''
+        Tell the render in flight that this process waits for its result,
+        return the path of the wait file
+        '''
+        waiting = os.path.join(self.flight_dir,
+                               '{0}-{1}.{2}.wait'.format(kind, key, uuid.uuid4().hex))
+        try:
+            with salt.utils.files.fopen(waiting, 'wb'):
+                pass
+        except (IOError, OSError):
+            return None
+        return waiting
+
+    def _waiters(self, kind, key):
+        '''
+        Return the wait files of the processes waiting for a render
+        '''
+        try:
+            names = os.listdir(self.flight_dir)
+        except OSError:
+            return []
+        return fnmatch.filter(names, '{0}-{1}.*.wait'.format(kind, key))
+
+    def _unregister(self, kind, key, waiting, result):
+        '''
+        Remove the wait file, and the result once no one waits for it anymore
+        '''
+        if waiting is not None:
+            try:
+                os.remove(waiting)
+            except OSError:
+                pass
+        if not self._waiters(kind, key):
+            try:
+                os.remove(result)
+            except OSError:
+                pass
+
+    def _lead(self, kind, key, func, args, kwargs, fd_, lock, result, start):
+        token = uuid.uuid4().hex
+        try:
+            os.write(fd_, salt.utils.stringutils.to_bytes(token))
+        finally:
+            os.close(fd_)
+        try:
+            ret = func(*args, **kwargs)
+            try:
+                with salt.utils.atomicfile.atomic_open(result, 'wb') as fp_:
+                    self.serial.dump({'token': token, 'ret': ret}, fp_)
+            except Exception as exc:
+                log.debug('Unable to share the pillar %s render: %s', kind, exc)
+        finally:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+        # The processes which started to wait before the lock went away are
+        # registered, the others render again
+        self._unregister(kind, key, None, result)
+        self._account(kind, 'computed', start)
+        if time.time() - PillarFlight.reaped > self.timeout:
+            self._reap()
+        return ret
+
+    def _reap(self):
+        '''
+        Remove the results and wait files left behind by the processes which
+        died while waiting for a render
+        '''
+        PillarFlight.reaped = time.time()
+        try:
+            names = os.listdir(self.flight_dir)
+        except OSError:
+            return
+        for name in fnmatch.filter(names, '*.p') + fnmatch.filter(names, '*.wait'):
+            path = os.path.join(self.flight_dir, name)
+            try:
+                if PillarFlight.reaped - os.path.getmtime(path) > self.timeout:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
 class Pillar(object):
     '''
     Read over the pillar top files and render the pillar data
@@ -423,6 +634,9 @@ class Pillar(object):
         if not isinstance(self.extra_minion_data, dict):
             self.extra_minion_data = {}
             log.error('Extra minion data must be a dictionary')
+        self.flight = None
+        if self.opts.get('pillar_coalesce', False):
+            self.flight = PillarFlight(self.opts)
         self._closing = False
 
     def __valid_on_demand_ext_pillar(self, opts):
@@ -547,15 +761,7 @@ class Pillar(object):
             for saltenv in saltenvs:
                 top = self.client.cache_file(self.opts['state_top'], saltenv)
                 if top:
-                    tops[saltenv].append(compile_template(
-                        top,
-                        self.rend,
-                        self.opts['renderer'],
-                        self.opts['renderer_blacklist'],
-                        self.opts['renderer_whitelist'],
-                        saltenv=saltenv,
-                        _pillar_rend=True,
-                    ))
+                    tops[saltenv].append(self._compile_top(top, saltenv))
         except Exception as exc:
             errors.append(
                     ('Rendering Primary Top file failed, render error:\n{0}'
@@ -606,6 +812,77 @@ class Pillar(object):
 
         return tops, errors
 
+    def _compile_top(self, top, saltenv):
+        '''
+        Render a primary top file, once for the identical renders in flight
+        when pillar_coalesce is set
+        '''
+        args = (top,
+                self.rend,
+                self.opts['renderer'],
+                self.opts['renderer_blacklist'],
+                self.opts['renderer_whitelist'])
+        kwargs = {'saltenv': saltenv, '_pillar_rend': True}
+        if self.flight is None:
+            return compile_template(*args, **kwargs)
+        return self.flight.run('top',
+                               self._top_key(top, saltenv, args[2:]),
+                               compile_template,
+                               *args,
+                               **kwargs)
+
+    def _top_key(self, top, saltenv, render_opts):
+        '''
+        Return the key of the render of a primary top file. A plain data top
+        file renders the same for every minion, only a template may use what
+        the minion sent.
+        '''
+        try:
+            with salt.utils.files.fopen(top, 'rb') as fp_:
+                data = salt.utils.stringutils.to_unicode(fp_.read())
+        except (IOError, OSError, UnicodeDecodeError):
+            return None
+        inputs = [salt.utils.hashutils.sha256_digest(data), render_opts]
+        first = data.split('\n', 1)[0].strip()
+        if first.startswith('#!') and not first.startswith('#!/'):
+            pipe = first[2:]
+        else:
+            pipe = self.opts.get('renderer') or ''
+        pipe = salt.template.OLD_STYLE_RENDERERS.get(pipe, pipe)
+        names = [part.split()[0] for part in pipe.split('|') if part.strip()]
+        markers = ['{{', '{%', '{#']
+        for env in (self.opts.get('jinja_env'), self.opts.get('jinja_sls_env')):
+            if isinstance(env, dict):
+                markers.extend(
+                    val for name, val in six.iteritems(env)
+                    if name.endswith(('_string', '_prefix'))
+                    and isinstance(val, six.string_types) and val
+                )
+        if any(name not in ('jinja', 'json', 'yaml', 'yamlex') for name in names) \
+                or 'jinja' in names and any(marker in data for marker in markers):
+            # The top file may use anything the minion sent
+            inputs.extend([saltenv,
+                           self.minion_id,
+                           self.opts.get('grains'),
+                           self.opts.get('pillar'),
+                           self.opts.get('pillarenv')])
+        return PillarFlight.key(*inputs)
+
+    def _ext_pillar_key(self, key, val, pillar):
+        '''
+        Return the key of an ext_pillar call. Besides its arguments, the
+        ext_pillars may use the environments and the grains in their opts,
+        git_pillar picks its branch from the pillarenv for example.
+        '''
+        return PillarFlight.key(key,
+                                val,
+                                self.minion_id,
+                                pillar,
+                                self.extra_minion_data,
+                                self.saltenv,
+                                self.opts.get('pillarenv'),
+                                self.opts.get('grains'))
+
     def merge_tops(self, tops):
         '''
         Cleanly merge the top files
@@ -1000,9 +1277,18 @@ class Pillar(object):
                     )
                     continue
                 try:
-                    ext = self._external_pillar_data(pillar,
-                                                     val,
-                                                     key)
+                    if self.flight is None:
+                        ext = self._external_pillar_data(pillar,
+                                                         val,
+                                                         key)
+                    else:
+                        ext = self.flight.run(
+                            'ext_pillar',
+                            self._ext_pillar_key(key, val, pillar),
+                            self._external_pillar_data,
+                            pillar,
+                            val,
+                            key)
                 except Exception as exc:
                     errors.append(
                         'Failed to load ext_pillar {0}: {1}'.format(
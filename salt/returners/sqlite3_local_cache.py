@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+'''
+Use an embedded SQLite database as the master job cache.
+
+.. versionadded:: Neon
+
+The default :mod:`local_cache <salt.returners.local_cache>` stores every job
+as a directory tree holding one file per minion return. Listing or cleaning
+up the jobs has to walk the whole tree, which becomes slow when the master
+receives a lot of returns. This returner keeps the same data in a single
+SQLite database running in WAL mode, indexed by jid, minion id, function and
+time, so that listing jobs and expiring old ones are simple indexed queries.
+
+:maturity:      New
+:depends:       sqlite3 (part of the python standard library)
+:platform:      all
+
+To use it as the master job cache, set the following in the master config:
+
+.. code-block:: yaml
+
+    master_job_cache: sqlite3_local_cache
+
+The database is created on first use. Its location and the time to wait for
+a lock held by another master process can be changed with:
+
+.. code-block:: yaml
+
+    master_job_cache.sqlite3.database: /var/cache/salt/master/jobs.sqlite3
+    master_job_cache.sqlite3.timeout: 10
+
+Jobs are expired according to the :conf_master:`keep_jobs` setting, like
+with the default job cache.
+'''
+
+# Import python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import logging
+import os
+import time
+
+# Import salt libs
+import salt.payload
+import salt.utils.jid
+import salt.utils.minions
+import salt.exceptions
+
+# Import 3rd-party libs
+from salt.ext import six
+
+# Better safe than sorry here. Even though sqlite3 is included in python
+try:
+    import sqlite3
+    HAS_SQLITE3 = True
+except ImportError:
+    HAS_SQLITE3 = False
+
+log = logging.getLogger(__name__)
+
+__virtualname__ = 'sqlite3_local_cache'
+
+# Connections are opened once per process and database
+_CONNECTIONS = {}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jids (
+  jid TEXT PRIMARY KEY,
+  started REAL NOT NULL,
+  nocache INTEGER NOT NULL DEFAULT 0,
+  fun TEXT,
+  load BLOB,
+  endtime TEXT
+);
+CREATE INDEX IF NOT EXISTS jids_started ON jids (started);
+CREATE INDEX IF NOT EXISTS jids_fun ON jids (fun);
+
+CREATE TABLE IF NOT EXISTS job_minions (
+  jid TEXT NOT NULL,
+  syndic_id TEXT NOT NULL,
+  id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_minions_jid ON job_minions (jid, syndic_id);
+
+CREATE TABLE IF NOT EXISTS returns (
+  jid TEXT NOT NULL,
+  id TEXT NOT NULL,
+  fun TEXT,
+  added REAL NOT NULL,
+  ret BLOB NOT NULL,
+  out BLOB,
+  PRIMARY KEY (jid, id)
+);
+CREATE INDEX IF NOT EXISTS returns_id ON returns (id);
+CREATE INDEX IF NOT EXISTS returns_fun ON returns (fun);
+CREATE INDEX IF NOT EXISTS returns_added ON returns (added);
+'''
+
+
+def __virtual__():
+    if not HAS_SQLITE3:
+        return (False, 'Could not import sqlite3; sqlite3_local_cache disabled')
+    return __virtualname__
+
+
+def _get_conn():
+    '''
+    Return the sqlite3 connection of this process, creating the database
+    and its schema on first use
+    '''
+    database = __opts__.get(
+        'master_job_cache.sqlite3.database',
+        os.path.join(__opts__['cachedir'], 'jobs.sqlite3')
+    )
+    key = (os.getpid(), database)
+    if key not in _CONNECTIONS:
+        log.debug('Connecting the sqlite3 job cache database: %s', database)
+        conn = sqlite3.connect(
+            database,
+            timeout=float(__opts__.get('master_job_cache.sqlite3.timeout', 10)),
+        )
+        # WAL lets the workers read while another process writes
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        _CONNECTIONS[key] = conn
+    return _CONNECTIONS[key]
+
+
+def _dumps(data):
+    return sqlite3.Binary(salt.payload.Serial(__opts__).dumps(data))
+
+
+def _loads(data):
+    return salt.payload.Serial(__opts__).loads(bytes(data))
+
+
+def prep_jid(nocache=False, passed_jid=None, recurse_count=0):
+    '''
+    Return a job id and prepare the job id entry.
+
+    This is the function responsible for making sure jids don't collide (unless
+    it is passed a jid).
+    '''
+    if recurse_count >= 5:
+        err = 'prep_jid could not store a jid after {0} tries.'.format(recurse_count)
+        log.error(err)
+        raise salt.exceptions.SaltCacheError(err)
+    conn = _get_conn()
+    if passed_jid is None:  # this can be a None or an empty string.
+        jid = salt.utils.jid.gen_jid(__opts__)
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT INTO jids (jid, started, nocache) VALUES (?, ?, ?)',
+                    (jid, time.time(), int(nocache))
+                )
+        except sqlite3.IntegrityError:
+            return prep_jid(nocache=nocache, recurse_count=recurse_count + 1)
+    else:
+        jid = passed_jid
+        with conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO jids (jid, started, nocache) VALUES (?, ?, ?)',
+                (jid, time.time(), int(nocache))
+            )
+    return jid
+
+
+def _insert_return(conn, load):
+    '''
+    Insert a single return using an open connection
+    '''
+    row = conn.execute(
+        'SELECT nocache FROM jids WHERE jid = ?', (load['jid'],)
+    ).fetchone()
+    if row is None:
+        log.error(
+            'An inconsistency occurred, a job was received with a job id '
+            '(%s) that is not present in the local cache', load['jid']
+        )
+        return False
+    if row[0]:
+        return
+
+    ret = dict((key, load[key]) for key in ['return', 'retcode', 'success'] if key in load)
+    cur = conn.execute(
+        'INSERT OR IGNORE INTO returns (jid, id, fun, added, ret, out) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        (load['jid'],
+         load['id'],
+         load.get('fun'),
+         time.time(),
+         _dumps(ret),
+         _dumps(load['out']) if 'out' in load else None)
+    )
+    if not cur.rowcount:
+        # Minion has already returned this jid and it should be dropped
+        log.error(
+            'An extra return was detected from minion %s, please verify '
+            'the minion, this could be a replay attack', load['id']
+        )
+        return False
+
+
+def returner(load):
+    '''
+    Return data to the sqlite3 job cache
+    '''
+    # if a minion is returning a standalone job, get a jobid
+    if load['jid'] == 'req':
+        load['jid'] = prep_jid(nocache=load.get('nocache', False))
+
+    with _get_conn() as conn:
+        return _insert_return(conn, load)
+
+
+def returner_many(loads):
+    '''
+    Return a batch of returns to the sqlite3 job cache in a single
+    transaction
+    '''
+    for load in loads:
+        if load['jid'] == 'req':
+            load['jid'] = prep_jid(nocache=load.get('nocache', False))
+
+    with _get_conn() as conn:
+        for load in loads:
+            _insert_return(conn, load)
+
+
+def save_load(jid, clear_load, minions=None):
+    '''
+    Save the load to the specified jid
+
+    minions argument is to provide a pre-computed list of matched minions for
+    the job, for cases when this function can't compute that list itself (such
+    as for salt-ssh)
+    '''
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            'INSERT OR IGNORE INTO jids (jid, started) VALUES (?, ?)',
+            (jid, time.time())
+        )
+        # The master job cache receives the load of every return, keep the
+        # load of the published job
+        conn.execute(
+            'UPDATE jids SET load = ?, fun = ? WHERE jid = ? AND load IS NULL',
+            (_dumps(clear_load), clear_load.get('fun'), jid)
+        )
+
+    # if you have a tgt, save that for the UI etc
+    if 'tgt' in clear_load and clear_load['tgt'] != '':
+        if minions is None:
+            ckminions = salt.utils.minions.CkMinions(__opts__)
+            # Retrieve the minions list
+            _res = ckminions.check_minions(
+                    clear_load['tgt'],
+                    clear_load.get('tgt_type', 'glob')
+                    )
+            minions = _res['minions']
+        # save the minions to a cache so we can see in the UI
+        save_minions(jid, minions)
+
+
+def save_minions(jid, minions, syndic_id=None):
+    '''
+    Save/update the list of minions for a given job
+    '''
+    minions = list(minions)
+    log.debug(
+        'Adding minions for job %s%s: %s',
+        jid,
+        ' from syndic master \'{0}\''.format(syndic_id) if syndic_id else '',
+        minions
+    )
+    syndic_id = syndic_id or ''
+    conn = _get_conn()
+    with conn:
+        conn.execute(
+            'DELETE FROM job_minions WHERE jid = ? AND syndic_id = ?',
+            (jid, syndic_id)
+        )
+        conn.executemany(
+            'INSERT INTO job_minions (jid, syndic_id, id) VALUES (?, ?, ?)',
+            ((jid, syndic_id, minion) for minion in minions)
+        )
+
+
+def get_load(jid):
+    '''
+    Return the load data that marks a specified jid
+    '''
+    conn = _get_conn()
+    row = conn.execute('SELECT load FROM jids WHERE jid = ?', (jid,)).fetchone()
+    if row is None or row[0] is None:
+        return {}
+    ret = _loads(row[0]) or {}
+    minions = set(
+        minion for minion, in conn.execute(
+            'SELECT id FROM job_minions WHERE jid = ?', (jid,)
+        )
+    )
+    if minions:
+        ret['Minions'] = sorted(minions)
+    return ret
+
+
+def get_jid(jid):
+    '''
+    Return the information returned when the specified job id was executed
+    '''
+    ret = {}
+    for minion, ret_data, out in _get_conn().execute(
+            'SELECT id, ret, out FROM returns WHERE jid = ?', (jid,)):
+        ret[minion] = _loads(ret_data)
+        if out is not None:
+            ret[minion]['out'] = _loads(out)
+    return ret
+
+
+def get_jids():
+    '''
+    Return a dict mapping all job ids to job information
+    '''
+    ret = {}
+    for jid, load, endtime in _get_conn().execute(
+            'SELECT jid, load, endtime FROM jids WHERE load IS NOT NULL'):
+        ret[jid] = salt.utils.jid.format_jid_instance(jid, _loads(load))
+        if __opts__.get('job_cache_store_endtime') and endtime:
+            ret[jid]['EndTime'] = endtime
+    return ret
+
+
+def get_jids_filter(count, filter_find_job=True):
+    '''
+    Return a list of all jobs information filtered by the given criteria.
+    :param int count: show not more than the count of most recent jobs
+    :param bool filter_find_jobs: filter out 'saltutil.find_job' jobs
+    '''
+    sql = 'SELECT jid, load FROM jids WHERE load IS NOT NULL'
+    if filter_find_job:
+        sql += ' AND fun IS NOT \'saltutil.find_job\''
+    sql += ' ORDER BY jid DESC LIMIT ?'
+    ret = [
+        salt.utils.jid.format_jid_instance_ext(jid, _loads(load))
+        for jid, load in _get_conn().execute(sql, (count,))
+    ]
+    ret.reverse()
+    return ret
+
+
+def clean_old_jobs():
+    '''
+    Clean out the old jobs from the job cache
+    '''
+    if __opts__['keep_jobs'] != 0:
+        cutoff = time.time() - __opts__['keep_jobs'] * 3600
+        conn = _get_conn()
+        with conn:
+            old = 'SELECT jid FROM jids WHERE started < ?'
+            conn.execute(
+                'DELETE FROM returns WHERE jid IN ({0})'.format(old), (cutoff,)
+            )
+            conn.execute(
+                'DELETE FROM job_minions WHERE jid IN ({0})'.format(old), (cutoff,)
+            )
+            conn.execute('DELETE FROM jids WHERE started < ?', (cutoff,))
+
+
+def update_endtime(jid, time):
+    '''
+    Update (or store) the end time for a given job
+    '''
+    with _get_conn() as conn:
+        conn.execute(
+            'UPDATE jids SET endtime = ? WHERE jid = ?',
+            (six.text_type(time), jid)
+        )
+
+
+def get_endtime(jid):
+    '''
+    Retrieve the stored endtime for a given job
+
+    Returns False if no endtime is present
+    '''
+    row = _get_conn().execute(
+        'SELECT endtime FROM jids WHERE jid = ?', (jid,)
+    ).fetchone()
+    if row is None or not row[0]:
+        return False
+    return row[0]
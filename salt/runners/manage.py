@@ -25,6 +25,7 @@ import salt.client.ssh
 import salt.key
 import salt.utils.compat
 import salt.utils.files
+import salt.utils.master
 import salt.utils.minions
 import salt.utils.path
 import salt.utils.versions
@@ -659,6 +660,29 @@ def versions():
     return ret
 
 
+def worker_stats():
+    '''
+    .. versionadded:: Neon
+
+    Return the request statistics of the master worker processes. The
+    statistics are read from the file kept by the workers when
+    :conf_master:`worker_stats` is enabled, the master is not contacted.
+
+    ``utilization`` is the share of its uptime a worker has spent serving
+    requests, it is close to 1 for every worker when more
+    :conf_master:`worker_threads` are needed.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt-run manage.worker_stats
+    '''
+    if not __opts__.get('worker_stats'):
+        return 'The worker_stats option is not enabled on the master'
+    return salt.utils.master.WorkerStats.read(__opts__)
+
+
 def bootstrap(version='develop',
               script=None,
               hosts='',
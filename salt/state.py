@@ -33,6 +33,7 @@ import salt.minion
 import salt.pillar
 import salt.fileclient
 import salt.utils.args
+import salt.utils.cache
 import salt.utils.crypt
 import salt.utils.data
 import salt.utils.decorators.state
@@ -41,6 +42,7 @@ import salt.utils.event
 import salt.utils.files
 import salt.utils.hashutils
 import salt.utils.immutabletypes as immutabletypes
+import salt.utils.json
 import salt.utils.msgpack as msgpack
 import salt.utils.platform
 import salt.utils.process
@@ -65,6 +67,9 @@ from salt.ext.six.moves import map, range, reload_module
 
 log = logging.getLogger(__name__)
 
+# The characters which make a requisite a glob
+GLOB_CHARS = re.compile(r'[*?[]')
+
 
 # These are keywords passed to state module functions which are to be used
 # by salt in this state module and not on the actual state module function
@@ -232,7 +237,55 @@ def state_args(id_, state, high):
     return args
 
 
-def find_name(name, state, high):
+class HighIndex(object):
+    '''
+    Index the high data by the values of the state arguments and by sls, for
+    find_name and find_sls_ids. The ids the index returns are checked against
+    the high data, a state changed after the index was built only has to be
+    added again.
+    '''
+    def __init__(self, high):
+        self.high = high
+        self.order = {}
+        self.values = {}
+        self.sls = {}
+        for nid, body in six.iteritems(high):
+            self.order[nid] = len(self.order)
+            if not isinstance(body, dict):
+                continue
+            if isinstance(body.get('__sls__'), six.string_types):
+                self.sls.setdefault(body['__sls__'], []).append(nid)
+            for state in body:
+                self.add(nid, state)
+
+    def add(self, nid, state):
+        '''
+        Index the arguments of a state
+        '''
+        run = self.high[nid][state]
+        if not isinstance(run, list):
+            return
+        for arg in run:
+            if isinstance(arg, dict) and len(arg) == 1:
+                try:
+                    self.values.setdefault((state, arg[next(iter(arg))]), set()).add(nid)
+                except TypeError:
+                    # Not hashable
+                    pass
+
+    def ids(self, state, value):
+        '''
+        Return the ids, in the order of the high data, which may have an
+        argument of the given state set to the value
+        '''
+        try:
+            ids = self.values.get((state, value), ())
+        except TypeError:
+            return list(self.high)
+        return sorted(ids, key=self.order.get)
+
+
+def find_name(name, state, high, index=None):
     '''
     Scan high data for the id referencing the given name and return a list of (IDs, state) tuples that match
 
@@ -249,7 +302,7 @@ def find_name(name, state, high):
     # otherwise we are requiring a single state, lets find it
     else:
         # We need to scan for the name
-        for nid in high:
+        for nid in high if index is None else index.ids(state, name):
             if state in high[nid]:
                 if isinstance(high[nid][state], list):
                     for arg in high[nid][state]:
@@ -262,12 +315,16 @@ def find_name(name, state, high):
     return ext_id
 
 
-def find_sls_ids(sls, high):
+def find_sls_ids(sls, high, index=None):
     '''
     Scan for all ids in the given sls and return them in a dict; {name: state}
     '''
     ret = []
-    for nid, item in six.iteritems(high):
+    if index is not None:
+        items = [(nid, high[nid]) for nid in index.sls.get(sls, [])]
+    else:
+        items = six.iteritems(high)
+    for nid, item in items:
         try:
             sls_tgt = item['__sls__']
         except TypeError:
@@ -286,6 +343,70 @@ def find_sls_ids(sls, high):
     return ret
 
 
+class ChunkIndex(object):
+    '''
+    Index the low chunks by sls and by id and name, to find the chunks a
+    requisite refers to without matching every chunk. The matches are
+    remembered, the index is built once per list of chunks.
+    '''
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.size = len(chunks)
+        self.sls = {}
+        self.names = {}
+        self.matches = {}
+        for pos, chunk in enumerate(chunks):
+            if isinstance(chunk.get('__sls__'), six.string_types):
+                self.sls.setdefault(os.path.normcase(chunk['__sls__']), []).append(pos)
+            keys = set()
+            for key in (chunk.get('name'), chunk.get('__id__')):
+                if isinstance(key, six.string_types):
+                    keys.add(os.path.normcase(key))
+            for key in keys:
+                self.names.setdefault(key, []).append(pos)
+
+    def current(self, chunks):
+        '''
+        Check if the index was built for the given list of chunks
+        '''
+        return chunks is self.chunks and len(chunks) == self.size
+
+    def _lookup(self, index, pattern):
+        if not GLOB_CHARS.search(pattern):
+            return index.get(os.path.normcase(pattern), [])
+        positions = set()
+        for key, key_positions in six.iteritems(index):
+            if fnmatch.fnmatch(key, pattern):
+                positions.update(key_positions)
+        return sorted(positions)
+
+    def positions(self, req_key, req_val):
+        '''
+        Return the positions of the chunks matching a requisite, the value of
+        the requisite is a glob matched against the sls of the chunks for the
+        sls requisites, against the id and name of the chunks otherwise
+        '''
+        key = (req_key, req_val)
+        if key not in self.matches:
+            if req_key == 'sls':
+                positions = self._lookup(self.sls, req_val)
+            else:
+                positions = self._lookup(self.names, req_val)
+                if req_key != 'id':
+                    positions = [
+                        pos for pos in positions
+                        if self.chunks[pos]['state'] == req_key
+                    ]
+            self.matches[key] = positions
+        return self.matches[key]
+
+    def match(self, req_key, req_val):
+        '''
+        Return the chunks matching a requisite
+        '''
+        return [self.chunks[pos] for pos in self.positions(req_key, req_val)]
+
+
 def format_log(ret):
     '''
     Format the state into a log message
@@ -759,6 +880,9 @@ class State(object):
         self.mod_init = set()
         self.pre = {}
         self.__run_num = 0
+        # The order given to the chunks without an order option
+        self.order_cap = None
+        self.chunk_index = None
         self.jid = jid
         self.instance_id = six.text_type(id(self))
         self.inject_globals = {}
@@ -1057,6 +1181,7 @@ class State(object):
                 log.error('Error encountered during module reload. Modules were not reloaded.')
             except TypeError:
                 log.error('Error encountered during module reload. Modules were not reloaded.')
+        salt.loader.VirtualCache.invalidate(self.opts)
         self.load_modules()
         if not self.opts.get('local', False) and self.opts.get('multiprocessing', True):
             self.functions['saltutil.refresh_modules']()
@@ -1090,18 +1215,23 @@ class State(object):
             self.module_refresh()
             return
 
+        if self._refreshes_modules(data):
+            self.module_refresh()
+
+    def _refreshes_modules(self, data):
+        '''
+        Check if the changes made by this state can add or replace modules
+        '''
         if data['state'] == 'file':
             if data['fun'] == 'managed':
-                if data['name'].endswith(
-                    ('.py', '.pyx', '.pyo', '.pyc', '.so')):
-                    self.module_refresh()
+                return data['name'].endswith(
+                    ('.py', '.pyx', '.pyo', '.pyc', '.so'))
             elif data['fun'] == 'recurse':
-                self.module_refresh()
+                return True
             elif data['fun'] == 'symlink':
-                if 'bin' in data['name']:
-                    self.module_refresh()
-        elif data['state'] in ('pkg', 'ports'):
-            self.module_refresh()
+                return 'bin' in data['name']
+            return False
+        return data['state'] in ('pkg', 'ports')
 
     def verify_data(self, data):
         '''
@@ -1374,6 +1504,7 @@ class State(object):
                 chunk_order = chunk['order']
                 if chunk_order > cap - 1 and chunk_order > 0:
                     cap = chunk_order + 100
+        self.order_cap = cap
         for chunk in chunks:
             if 'order' not in chunk:
                 chunk['order'] = cap
@@ -1459,7 +1590,7 @@ class State(object):
         chunks = self.order_chunks(chunks)
         return chunks
 
-    def reconcile_extend(self, high):
+    def reconcile_extend(self, high, index=None):
         '''
         Pull the extend data and add it to the respective high data
         '''
@@ -1473,8 +1604,10 @@ class State(object):
                     state_type = next(
                         x for x in body if not x.startswith('__')
                     )
+                    if index is None:
+                        index = HighIndex(high)
                     # Check for a matching 'name' override in high data
-                    ids = find_name(name, state_type, high)
+                    ids = find_name(name, state_type, high, index)
                     if len(ids) != 1:
                         errors.append(
                             'Cannot extend ID \'{0}\' in \'{1}:{2}\'. It is not '
@@ -1496,6 +1629,8 @@ class State(object):
                         continue
                     if state not in high[name]:
                         high[name][state] = run
+                        if index is not None:
+                            index.add(name, state)
                         continue
                     # high[name][state] is extended by run, both are lists
                     for arg in run:
@@ -1525,6 +1660,8 @@ class State(object):
                                     high[name][state][hind] = arg
                         if not update:
                             high[name][state].append(arg)
+                    if index is not None:
+                        index.add(name, state)
         return high, errors
 
     def apply_exclude(self, high):
@@ -1578,6 +1715,7 @@ class State(object):
         disabled_reqs = self.opts.get('disabled_requisites', [])
         if not isinstance(disabled_reqs, list):
             disabled_reqs = [disabled_reqs]
+        index = HighIndex(high)
         for id_, body in six.iteritems(high):
             if not isinstance(body, dict):
                 continue
@@ -1672,7 +1810,7 @@ class State(object):
                                 pname = ind[pstate]
                                 if pstate == 'sls':
                                     # Expand hinges here
-                                    hinges = find_sls_ids(pname, high)
+                                    hinges = find_sls_ids(pname, high, index)
                                 else:
                                     hinges.append((pname, pstate))
                                 if '.' in pstate:
@@ -1702,7 +1840,7 @@ class State(object):
                                                 )
                                     if key == 'prereq':
                                         # Add prerequired to prereqs
-                                        ext_ids = find_name(name, _state, high)
+                                        ext_ids = find_name(name, _state, high, index)
                                         for ext_id, _req_state in ext_ids:
                                             if ext_id not in extend:
                                                 extend[ext_id] = OrderedDict()
@@ -1715,7 +1853,7 @@ class State(object):
                                     if key == 'use_in':
                                         # Add the running states args to the
                                         # use_in states
-                                        ext_ids = find_name(name, _state, high)
+                                        ext_ids = find_name(name, _state, high, index)
                                         for ext_id, _req_state in ext_ids:
                                             if not ext_id:
                                                 continue
@@ -1742,7 +1880,7 @@ class State(object):
                                     if key == 'use':
                                         # Add the use state's args to the
                                         # running state
-                                        ext_ids = find_name(name, _state, high)
+                                        ext_ids = find_name(name, _state, high, index)
                                         for ext_id, _req_state in ext_ids:
                                             if not ext_id:
                                                 continue
@@ -1790,7 +1928,7 @@ class State(object):
         high['__extend__'] = []
         for key, val in six.iteritems(extend):
             high['__extend__'].append({key: val})
-        req_in_high, req_in_errors = self.reconcile_extend(high)
+        req_in_high, req_in_errors = self.reconcile_extend(high, index)
         errors.extend(req_in_errors)
         return req_in_high, errors
 
@@ -2280,6 +2418,9 @@ class State(object):
                         self.__run_num += 1
                         chunks.remove(low)
                         break
+        if self.opts.get('state_workers', 0) > 1 and self.jid:
+            running = self.call_chunks_graph(chunks)
+            return dict(list(disabled.items()) + list(running.items()))
         running = {}
         for low in chunks:
             if '__FAILHARD__' in running:
@@ -2302,6 +2443,193 @@ class State(object):
         ret = dict(list(disabled.items()) + list(running.items()))
         return ret
 
+    def _graph_inline(self, low):
+        '''
+        Check if the chunk has to run in this process when the chunks are
+        called following their requisites, the chunks which rely on the
+        return of the state call or change the modules, grains or pillar
+        of this process can not run in a separate process
+        '''
+        if 'parallel' in low and not low['parallel']:
+            return True
+        for key in ('prereq', 'prerequired', 'watch', 'watch_any', 'retry',
+                    'check_cmd', 'reload_modules', 'reload_grains',
+                    'reload_pillar', 'force_reload_modules'):
+            if key in low:
+                return True
+        return self._refreshes_modules(low)
+
+    def _explicit_order(self, low):
+        '''
+        Check if the order of the chunk was set with the order option
+        '''
+        order = low.get('order')
+        if self.order_cap is None or not isinstance(order, (int, float)):
+            return False
+        if order == self.order_cap:
+            # No order option
+            return False
+        if order > self.order_cap:
+            # Ordered last
+            return True
+        # The orders given by state_auto_order start at 10000
+        return not self.opts.get('state_auto_order', True) or order < 10000
+
+    def _auto_order(self, low):
+        '''
+        Check if the order of the chunk was given by state_auto_order
+        '''
+        order = low.get('order')
+        if self.order_cap is None or not isinstance(order, (int, float)):
+            return False
+        return self.opts.get('state_auto_order', True) and 10000 <= order < self.order_cap
+
+    def _chunk_graph(self, chunks):
+        '''
+        Return the indexes of the chunks each of the given chunks has to wait
+        for, from their requisites, order options and state_auto_order
+        '''
+        disabled_reqs = self.opts.get('disabled_requisites', [])
+        if not isinstance(disabled_reqs, list):
+            disabled_reqs = [disabled_reqs]
+        index = self._index_chunks(chunks)
+        graph = []
+        prereqs = []
+        for low in chunks:
+            deps = set()
+            targets = set()
+            for r_state in ('require', 'require_any', 'watch', 'watch_any',
+                            'prereq', 'prerequired', 'onfail', 'onfail_any',
+                            'onfail_all', 'onchanges', 'onchanges_any'):
+                if not low.get(r_state) or r_state in disabled_reqs:
+                    continue
+                for req in low[r_state]:
+                    if isinstance(req, six.string_types):
+                        req = {'id': req}
+                    req = trim_req(req)
+                    req_key = next(iter(req))
+                    req_val = req[req_key]
+                    if not isinstance(req_val, six.string_types):
+                        continue
+                    for idx in index.positions(req_key, req_val):
+                        if r_state == 'prereq':
+                            # The prereq runs the chunk in test mode first
+                            targets.add(idx)
+                        else:
+                            deps.add(idx)
+            graph.append(deps)
+            prereqs.append(targets)
+        for idx, targets in enumerate(prereqs):
+            for target in targets:
+                graph[idx].update(graph[target])
+            graph[idx].discard(idx)
+
+        # The chunks ordered by state_auto_order keep the order they are
+        # defined in within their SLS file, like when they run one after the
+        # other: they wait for the chunks before them which are not parallel
+        blocking = {}
+        for idx, low in enumerate(chunks):
+            if not self._auto_order(low):
+                continue
+            key = (low.get('__env__'), low.get('__sls__'))
+            # Unless that chunk requires this one
+            if key in blocking and idx not in graph[blocking[key]]:
+                graph[idx].add(blocking[key])
+            if not low.get('parallel'):
+                blocking[key] = idx
+
+        # The chunks ordered with the order option wait for all the chunks
+        # before them, the chunks after them wait for them
+        group = None
+        group_deps = set()
+        barrier = set()
+        since = set()
+        for idx, low in enumerate(chunks):
+            if self._explicit_order(low):
+                if int(low['order']) != group:
+                    group = int(low['order'])
+                    group_deps = barrier | since
+                    barrier = set()
+                    since = set()
+                graph[idx].update(group_deps)
+                barrier.add(idx)
+            else:
+                graph[idx].update(barrier)
+                since.add(idx)
+        return graph
+
+    def call_chunks_graph(self, chunks):
+        '''
+        Call the chunks following the graph of their requisites, enabled by
+        the state_workers option. The chunks which do not depend on each other
+        run at the same time in separate processes, up to state_workers of
+        them. The failhard option stops starting new chunks, the chunks which
+        are still running are waited for.
+        '''
+        workers = self.opts['state_workers']
+        graph = self._chunk_graph(chunks)
+        tags = [_gen_tag(low) for low in chunks]
+        running = {}
+        pending = list(range(len(chunks)))
+        started = set()
+        done = set()
+        stop = False
+        while pending or started:
+            if started:
+                self.reconcile_procs(running, set(tags[idx] for idx in started))
+            for idx in list(started):
+                if 'proc' not in running[tags[idx]]:
+                    started.remove(idx)
+                    done.add(idx)
+                    stop = stop or self.check_failhard(chunks[idx], running)
+            # The chunks run as the requisites of other chunks
+            for idx in [idx for idx in pending if tags[idx] in running]:
+                pending.remove(idx)
+                if 'proc' in running[tags[idx]]:
+                    started.add(idx)
+                else:
+                    done.add(idx)
+            if '__FAILHARD__' in running:
+                running.pop('__FAILHARD__')
+                stop = True
+            if stop:
+                pending = []
+            ready = None
+            for idx in pending:
+                if not graph[idx].issubset(done):
+                    continue
+                if self._graph_inline(chunks[idx]) or len(started) < workers:
+                    ready = idx
+                    break
+            if ready is None:
+                if started:
+                    time.sleep(0.01)
+                    continue
+                if not pending:
+                    break
+                # Recursive requisites, let call_chunk sort them out
+                ready = pending[0]
+            pending.remove(ready)
+            low = chunks[ready]
+            if self.check_pause(low) == 'kill':
+                stop = True
+                continue
+            if not self._graph_inline(low):
+                low = low.copy()
+                low['parallel'] = True
+            running = self.call_chunk(low, running, chunks)
+            self.active = set()
+            if 'proc' in running.get(tags[ready], {}):
+                started.add(ready)
+            else:
+                done.add(ready)
+                stop = stop or self.check_failhard(low, running)
+        while True:
+            if self.reconcile_procs(running):
+                break
+            time.sleep(0.01)
+        return running
+
     def check_failhard(self, low, running):
         '''
         Check if the low data chunk should send a failhard signal
@@ -2360,12 +2688,15 @@ class State(object):
                 return 'run'
         return 'run'
 
-    def reconcile_procs(self, running):
+    def reconcile_procs(self, running, tags=None):
         '''
-        Check the running dict for processes and resolve them
+        Check the running dict for processes and resolve them, return whether
+        the processes of the given tags, or all of them, are done
         '''
         retset = set()
-        for tag in running:
+        if tags is not None:
+            tags = [tag for tag in tags if tag in running]
+        for tag in running if tags is None else tags:
             proc = running[tag].get('proc')
             if proc:
                 if not proc.is_alive():
@@ -2392,6 +2723,14 @@ class State(object):
                     retset.add(False)
         return False not in retset
 
+    def _index_chunks(self, chunks):
+        '''
+        Return the index of the given chunks, it is built once per list
+        '''
+        if self.chunk_index is None or not self.chunk_index.current(chunks):
+            self.chunk_index = ChunkIndex(chunks)
+        return self.chunk_index
+
     def check_requisite(self, low, running, chunks, pre=False):
         '''
         Look into the running data to check the status of all requisite
@@ -2438,7 +2777,7 @@ class State(object):
             present = True
         if not present:
             return 'met', ()
-        self.reconcile_procs(running)
+        index = self._index_chunks(chunks)
         reqs = {
                 'require': [],
                 'require_any': [],
@@ -2461,40 +2800,21 @@ class State(object):
                     if isinstance(req, six.string_types):
                         req = {'id': req}
                     req = trim_req(req)
-                    found = False
-                    for chunk in chunks:
-                        req_key = next(iter(req))
-                        req_val = req[req_key]
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                found = True
-                                reqs[r_state].append(chunk)
-                            continue
-                        try:
-                            if isinstance(req_val, six.string_types):
-                                if (fnmatch.fnmatch(chunk['name'], req_val) or
-                                    fnmatch.fnmatch(chunk['__id__'], req_val)):
-                                    if req_key == 'id' or chunk['state'] == req_key:
-                                        found = True
-                                        reqs[r_state].append(chunk)
-                            else:
-                                raise KeyError
-                        except KeyError as exc:
-                            raise SaltRenderError(
-                                'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
-                                    req_key, chunk['name']))
-                        except TypeError:
-                            # On Python 2, the above req_val, being an OrderedDict, will raise a KeyError,
-                            # however on Python 3 it will raise a TypeError
-                            # This was found when running tests.unit.test_state.StateCompilerTestCase.test_render_error_on_invalid_requisite
-                            raise SaltRenderError(
-                                'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
-                                    req_key, chunk['name']))
+                    req_key = next(iter(req))
+                    req_val = req[req_key]
+                    if req_val is None:
+                        return 'unmet', ()
+                    if not isinstance(req_val, six.string_types):
+                        if not chunks:
+                            return 'unmet', ()
+                        raise SaltRenderError(
+                            'Could not locate requisite of [{0}] present in state with name [{1}]'.format(
+                                req_key, chunks[0]['name']))
+                    # Allow requisite tracking of entire sls files
+                    found = index.match(req_key, req_val)
                     if not found:
                         return 'unmet', ()
+                    reqs[r_state].extend(found)
         fun_stats = set()
         for r_state, chunks in six.iteritems(reqs):
             req_stats = set()
@@ -2503,8 +2823,10 @@ class State(object):
             else:
                 run_dict = running
 
-            while True:
-                if self.reconcile_procs(run_dict):
+            # Only wait for the processes of the requisites
+            req_tags = set(_gen_tag(chunk) for chunk in chunks)
+            while req_tags:
+                if self.reconcile_procs(run_dict, req_tags):
                     break
                 time.sleep(0.01)
 
@@ -2645,6 +2967,7 @@ class State(object):
         if status == 'unmet':
             lost = {}
             reqs = []
+            index = self._index_chunks(chunks)
             for requisite in requisites:
                 lost[requisite] = []
                 if requisite not in low:
@@ -2656,26 +2979,14 @@ class State(object):
                     found = False
                     req_key = next(iter(req))
                     req_val = req[req_key]
-                    for chunk in chunks:
-                        if req_val is None:
-                            continue
-                        if req_key == 'sls':
-                            # Allow requisite tracking of entire sls files
-                            if fnmatch.fnmatch(chunk['__sls__'], req_val):
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                reqs.append(chunk)
-                                found = True
-                            continue
-                        if (fnmatch.fnmatch(chunk['name'], req_val) or
-                            fnmatch.fnmatch(chunk['__id__'], req_val)):
-                            if req_key == 'id' or chunk['state'] == req_key:
-                                if requisite == 'prereq':
-                                    chunk['__prereq__'] = True
-                                elif requisite == 'prerequired':
-                                    chunk['__prerequired__'] = True
-                                reqs.append(chunk)
-                                found = True
+                    if isinstance(req_val, six.string_types):
+                        for chunk in index.match(req_key, req_val):
+                            if requisite == 'prereq':
+                                chunk['__prereq__'] = True
+                            elif requisite == 'prerequired' and req_key != 'sls':
+                                chunk['__prerequired__'] = True
+                            reqs.append(chunk)
+                            found = True
                     if not found:
                         lost[requisite].append(req)
             if lost['require'] or lost['watch'] or lost['prereq'] \
@@ -3105,6 +3416,71 @@ class State(object):
         return self.call_high(high)
 
 
+class CompileCache(salt.utils.cache.CachedirFile):
+    '''
+    An on disk cache of the compiled highstates, enabled by the
+    ``state_compile_cache`` option.
+
+    The high data rendered from the top files and the SLS files, or the low
+    chunks compiled from it, are stored per fingerprint of the options of the
+    minion, grains, pillar and saltenv included, along with the hash of every
+    file fetched from the file server while rendering them. An entry is used
+    again only if the file server still returns the same hash for all these
+    files. ``saltutil.sync_*`` removes the cache when it syncs modules.
+    '''
+    filename = 'state_compile.p'
+    # The least recently stored fingerprints are dropped past this number
+    max_fingerprints = 8
+    _instances = {}
+
+    def get(self, fingerprint, client):
+        '''
+        Return the entry stored for fingerprint if none of its files changed
+        on the file server of client
+        '''
+        # The entries are read every time, another process may have stored
+        # a newer compilation
+        entry = self._read().get(fingerprint)
+        if entry is None:
+            return None
+        for path, saltenv, hsum in entry['files']:
+            hash_server = client.hash_file(path, saltenv)
+            try:
+                hash_server = hash_server.get('hsum', '')
+            except AttributeError:
+                hash_server = ''
+            if hash_server != hsum:
+                log.debug(
+                    'Compiled highstate out of date, \'%s\' changed in saltenv \'%s\'',
+                    path, saltenv
+                )
+                return None
+        return entry
+
+    def set(self, fingerprint, files, data, matches=None):
+        '''
+        Store the data compiled for fingerprint, along with the (path, saltenv,
+        hash) tuples of the files it was rendered from
+        '''
+        entry = {
+            'files': sorted(files),
+            'data': data,
+            'matches': matches,
+            'stored': time.time(),
+        }
+        # Merge with what the other processes stored in the meantime
+        self.entries = self._read()
+        self.entries[fingerprint] = entry
+        for key in sorted(self.entries, key=lambda x: self.entries[x].get('stored', 0))[:-self.max_fingerprints]:
+            del self.entries[key]
+        try:
+            self._write()
+        except TypeError:
+            # Can't serialize pydsl
+            log.debug('Not caching the compiled highstate, it can not be serialized')
+        self.entries = None
+
+
 class BaseHighState(object):
     '''
     The BaseHighState is an abstract base class that is the foundation of
@@ -3119,6 +3495,7 @@ class BaseHighState(object):
         self.avail = self.__gather_avail()
         self.serial = salt.payload.Serial(self.opts)
         self.building_highstate = OrderedDict()
+        self.compile_cache_stats = {'hits': 0, 'misses': 0}
 
     def __gather_avail(self):
         '''
@@ -3618,16 +3995,17 @@ class BaseHighState(object):
     def load_dynamic(self, matches):
         '''
         If autoload_dynamic_modules is True then automatically load the
-        dynamic modules
+        dynamic modules, return whether any module was synced
         '''
         if not self.opts['autoload_dynamic_modules']:
-            return
+            return False
         syncd = self.state.functions['saltutil.sync_all'](list(matches),
                                                           refresh=False)
         if syncd['grains']:
             self.opts['grains'] = salt.loader.grains(self.opts)
             self.state.opts['pillar'] = self.state._gather_pillar()
         self.state.module_refresh()
+        return any(syncd.values())
 
     def render_state(self, sls, saltenv, mods, matches, local=False):
         '''
@@ -4068,6 +4446,63 @@ class BaseHighState(object):
                     ret_matches[env].append(sls)
         return ret_matches
 
+    def _compile_fingerprint(self, kind, whitelist=None):
+        '''
+        Return the key of a compilation of kind in the compile cache, or None
+        if the compile cache is disabled or the options can not be hashed
+        '''
+        if not self.opts.get('state_compile_cache', False):
+            return None
+        opts = dict(
+            (key, value) for key, value in six.iteritems(self.state.opts)
+            # The function and arguments of salt-call
+            if key not in ('fun', 'arg', 'jid')
+        )
+        if isinstance(opts.get('grains'), dict):
+            # The pid grain changes with every process
+            opts['grains'] = dict(
+                (key, value) for key, value in six.iteritems(opts['grains'])
+                if key != 'pid'
+            )
+        try:
+            return salt.utils.hashutils.sha1_digest(
+                salt.utils.json.dumps(
+                    [kind, whitelist, self.avail, self._master_tops(), opts],
+                    sort_keys=True,
+                    default=lambda obj: type(obj).__name__,
+                )
+            )
+        except (TypeError, ValueError):
+            # Mixed key types can not be sorted
+            log.debug('Not caching the compiled highstate')
+            return None
+
+    def _compile_cache_get(self, fingerprint):
+        '''
+        Return the entry of the compile cache for fingerprint, None on a miss
+        '''
+        if fingerprint is None:
+            return None
+        entry = CompileCache.instance(self.opts).get(fingerprint, self.client)
+        if entry is None:
+            self.compile_cache_stats['misses'] += 1
+        else:
+            self.compile_cache_stats['hits'] += 1
+        log.info(
+            'Compiled highstate cache: %s hit(s), %s miss(es)',
+            self.compile_cache_stats['hits'],
+            self.compile_cache_stats['misses']
+        )
+        return entry
+
+    def _compile_cache_set(self, fingerprint, files, data, matches=None):
+        '''
+        Store data in the compile cache, rendered from the recorded files
+        '''
+        if fingerprint is None:
+            return
+        CompileCache.instance(self.opts).set(fingerprint, files, data, matches)
+
     def call_highstate(self, exclude=None, cache=None, cache_name='highstate',
                        force=False, whitelist=None, orchestration_jid=None):
         '''
@@ -4094,42 +4529,54 @@ class BaseHighState(object):
                     return self.state.call_high(high, orchestration_jid)
         # File exists so continue
         err = []
-        try:
-            top = self.get_top()
-        except SaltRenderError as err:
-            ret[tag_name]['comment'] = 'Unable to render top file: '
-            ret[tag_name]['comment'] += six.text_type(err.error)
-            return ret
-        except Exception:
-            trb = traceback.format_exc()
-            err.append(trb)
-            return err
-        err += self.verify_tops(top)
-        matches = self.top_matches(top)
-        if not matches:
-            msg = ('No Top file or master_tops data matches found. Please see '
-                   'master log for details.')
-            ret[tag_name]['comment'] = msg
-            return ret
-        matches = self.matches_whitelist(matches, whitelist)
-        self.load_dynamic(matches)
-        if not self._check_pillar(force):
-            err += ['Pillar failed to render with the following messages:']
-            err += self.state.opts['pillar']['_errors']
+        fingerprint = self._compile_fingerprint('highstate', whitelist)
+        compiled = self._compile_cache_get(fingerprint)
+        if compiled is not None and self.load_dynamic(compiled['matches']):
+            # The synced modules may render the states differently
+            compiled = None
+        if compiled is not None:
+            # Only compilations without errors, pillar errors included, are
+            # stored
+            high = compiled['data']
         else:
-            high, errors = self.render_highstate(matches)
-            if exclude:
-                if isinstance(exclude, six.string_types):
-                    exclude = exclude.split(',')
-                if '__exclude__' in high:
-                    high['__exclude__'].extend(exclude)
+            with salt.fileclient.record_files() as files:
+                try:
+                    top = self.get_top()
+                except SaltRenderError as err:
+                    ret[tag_name]['comment'] = 'Unable to render top file: '
+                    ret[tag_name]['comment'] += six.text_type(err.error)
+                    return ret
+                except Exception:
+                    trb = traceback.format_exc()
+                    err.append(trb)
+                    return err
+                err += self.verify_tops(top)
+                matches = self.top_matches(top)
+                if not matches:
+                    msg = ('No Top file or master_tops data matches found. Please see '
+                           'master log for details.')
+                    ret[tag_name]['comment'] = msg
+                    return ret
+                matches = self.matches_whitelist(matches, whitelist)
+                self.load_dynamic(matches)
+                if not self._check_pillar(force):
+                    err += ['Pillar failed to render with the following messages:']
+                    err += self.state.opts['pillar']['_errors']
                 else:
-                    high['__exclude__'] = exclude
-            err += errors
-        if err:
-            return err
-        if not high:
-            return ret
+                    high, errors = self.render_highstate(matches)
+                    err += errors
+            if err:
+                return err
+            if not high:
+                return ret
+            self._compile_cache_set(fingerprint, files, high, matches)
+        if exclude:
+            if isinstance(exclude, six.string_types):
+                exclude = exclude.split(',')
+            if '__exclude__' in high:
+                high['__exclude__'].extend(exclude)
+            else:
+                high['__exclude__'] = exclude
         with salt.utils.files.set_umask(0o077):
             try:
                 if salt.utils.platform.is_windows():
@@ -4153,16 +4600,22 @@ class BaseHighState(object):
         '''
         Return just the highstate or the errors
         '''
+        fingerprint = self._compile_fingerprint('highstate')
+        compiled = self._compile_cache_get(fingerprint)
+        if compiled is not None:
+            return compiled['data']
         err = []
-        top = self.get_top()
-        err += self.verify_tops(top)
-        matches = self.top_matches(top)
-        high, errors = self.render_highstate(matches)
+        with salt.fileclient.record_files() as files:
+            top = self.get_top()
+            err += self.verify_tops(top)
+            matches = self.top_matches(top)
+            high, errors = self.render_highstate(matches)
         err += errors
 
         if err:
             return err
 
+        self._compile_cache_set(fingerprint, files, high, matches)
         return high
 
     def compile_low_chunks(self):
@@ -4170,9 +4623,14 @@ class BaseHighState(object):
         Compile the highstate but don't run it, return the low chunks to
         see exactly what the highstate will execute
         '''
-        top = self.get_top()
-        matches = self.top_matches(top)
-        high, errors = self.render_highstate(matches)
+        fingerprint = self._compile_fingerprint('lowstate')
+        compiled = self._compile_cache_get(fingerprint)
+        if compiled is not None:
+            return compiled['data']
+        with salt.fileclient.record_files() as files:
+            top = self.get_top()
+            matches = self.top_matches(top)
+            high, errors = self.render_highstate(matches)
 
         # If there is extension data reconcile it
         high, ext_errors = self.state.reconcile_extend(high)
@@ -4190,6 +4648,7 @@ class BaseHighState(object):
         # Compile and verify the raw chunks
         chunks = self.state.compile_high_data(high)
 
+        self._compile_cache_set(fingerprint, files, chunks)
         return chunks
 
     def compile_state_usage(self):
@@ -7,11 +7,19 @@ This includes client side transport, for the ReqServer and the Publisher
 
 # Import Python Libs
 from __future__ import absolute_import, print_function, unicode_literals
+import os
+import sys
 import logging
+import threading
 
 # Import Salt Libs
+import salt.utils.zeromq
 from salt.utils.asynchronous import SyncWrapper
 
+# Import 3rd-party libs
+import tornado.concurrent
+from salt.ext import six
+
 log = logging.getLogger(__name__)
 
 
@@ -21,6 +29,8 @@ class ReqChannel(object):
     '''
     @staticmethod
     def factory(opts, **kwargs):
+        if opts.get('shared_req_channel') and set(kwargs).issubset(('crypt', 'master_uri')):
+            return SharedReqChannel.instance(opts, **kwargs)
         # All Sync interfaces are just wrappers around the Async ones
         sync = SyncWrapper(AsyncReqChannel.factory, (opts,), kwargs)
         return sync
@@ -39,6 +49,116 @@ class ReqChannel(object):
         raise NotImplementedError()
 
 
+class SharedReqChannel(object):
+    '''
+    A Sync communication channel to the ReqServer shared by all the threads
+    of a process, see the shared_req_channel minion option.
+
+    The Async channel lives on an io_loop running in a background thread and
+    the calling threads hand their requests over to it, so the requests of all
+    the threads are in flight on the same connection at once instead of each
+    call setting up its own channel. Forked processes get their own instance.
+    '''
+    # mapping of (pid, minion/master pair) -> channel
+    instance_map = {}
+    instance_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls, opts, **kwargs):
+        '''
+        Return the shared channel of this process for the minion/master pair
+        '''
+        key = (os.getpid(),
+               opts['pki_dir'],
+               opts['id'],
+               kwargs.get('master_uri', opts.get('master_uri')),
+               kwargs.get('crypt', 'aes'))
+        with cls.instance_lock:
+            if key not in cls.instance_map:
+                log.debug('Starting the shared request channel for %s', key[1:])
+                cls.instance_map[key] = cls(opts, **kwargs)
+            return cls.instance_map[key]
+
+    def __init__(self, opts, **kwargs):
+        self.io_loop = salt.utils.zeromq.ZMQDefaultLoop()
+        started = threading.Event()
+        errors = []
+
+        def _run():
+            self.io_loop.make_current()
+            kwargs['io_loop'] = self.io_loop
+            try:
+                self.asynchronous = AsyncReqChannel.factory(opts, **kwargs)
+            except Exception:  # pylint: disable=broad-except
+                errors.append(sys.exc_info())
+                return
+            finally:
+                started.set()
+            self.io_loop.start()
+
+        self._thread = threading.Thread(target=_run, name='SharedReqChannel')
+        self._thread.daemon = True
+        self._thread.start()
+        started.wait()
+        if errors:
+            six.reraise(*errors[0])
+
+    def _call(self, method, *args, **kwargs):
+        '''
+        Run a method of the Async channel on its io_loop and wait for the result
+        '''
+        future = tornado.concurrent.Future()
+        done = threading.Event()
+        future.add_done_callback(lambda future: done.set())
+
+        def _start():
+            try:
+                ret = method(*args, **kwargs)
+            except Exception as exc:  # pylint: disable=broad-except
+                future.set_exception(exc)
+                return
+            if isinstance(ret, tornado.concurrent.Future):
+                tornado.concurrent.chain_future(ret, future)
+            else:
+                future.set_result(ret)
+
+        self.io_loop.add_callback(_start)
+        done.wait()
+        return future.result()
+
+    def __getattr__(self, key):
+        if key == 'asynchronous':
+            raise AttributeError(key)
+        attr = getattr(self.asynchronous, key)
+        if hasattr(attr, '__call__'):
+            def wrap(*args, **kwargs):
+                return self._call(attr, *args, **kwargs)
+            return wrap
+        return attr
+
+    def send(self, load, tries=3, timeout=60, raw=False):
+        '''
+        Send "load" to the master.
+        '''
+        return self._call(self.asynchronous.send, load, tries=tries, timeout=timeout, raw=raw)
+
+    def crypted_transfer_decode_dictentry(self, load, dictkey=None, tries=3, timeout=60):
+        '''
+        Send "load" to the master in a way that the load is only readable by
+        the minion and the master (not other minions etc.)
+        '''
+        return self._call(self.asynchronous.crypted_transfer_decode_dictentry,
+                          load, dictkey=dictkey, tries=tries, timeout=timeout)
+
+    def close(self):
+        '''
+        The channel is shared by the whole process and stays open
+        '''
+
+    def destroy(self):
+        self.close()
+
+
 class PushChannel(object):
     '''
     Factory class to create Sync channel for push side of push/pull IPC
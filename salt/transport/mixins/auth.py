@@ -444,6 +444,12 @@ class AESReqServerMixin(object):
         ret = {'enc': 'pub',
                'pub_key': self.master_key.get_pub_str(),
                'publish_port': self.opts['publish_port']}
+        pools = getattr(self, 'pools', None)
+        if pools:
+            # The minions send the command of the requests routed to a
+            # worker pool in clear, see the worker_pools master option
+            ret['pool_commands'] = sorted(
+                set().union(*[pool['commands'] for pool in six.itervalues(pools)]))
 
         # sign the master's pubkey (if enabled) before it is
         # sent to the minion that was just authenticated
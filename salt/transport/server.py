@@ -94,10 +94,24 @@ class PubServerChannel(object):
         '''
         pass
 
-    def publish(self, load):
+    def publish(self, load, minions=None):
         '''
         Publish "load" to minions
+
+        :param dict load: A load to be sent across the wire to minions
+        :param list minions: The minions the master resolved the target to,
+                             transports delivering the load only to the
+                             targeted minions use it instead of resolving
+                             the target again
         '''
         raise NotImplementedError()
 
+    def publish_stats(self):
+        '''
+        Return the timings of the publishes sent by this process since the
+        last call, which the master workers add to their master stats events.
+        Transports which do not record any return an empty dict.
+        '''
+        return {}
+
 # EOF
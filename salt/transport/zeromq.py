@@ -8,6 +8,8 @@ from __future__ import absolute_import, print_function, unicode_literals
 import os
 import sys
 import copy
+import ctypes
+import time
 import errno
 import signal
 import socket
@@ -15,6 +17,8 @@ import hashlib
 import logging
 import weakref
 import threading
+import collections
+import multiprocessing
 from random import randint
 
 # Import Salt Libs
@@ -24,6 +28,7 @@ import salt.log.setup
 import salt.utils.event
 import salt.utils.files
 import salt.utils.minions
+import salt.utils.msgpack
 import salt.utils.process
 import salt.utils.stringutils
 import salt.utils.verify
@@ -34,6 +39,7 @@ import salt.transport.client
 import salt.transport.server
 import salt.transport.mixins.auth
 from salt.ext import six
+from salt.defaults import DEFAULT_TARGET_DELIM
 from salt.exceptions import SaltReqTimeoutError, SaltException
 from salt._compat import ipaddress
 
@@ -273,11 +279,16 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
         # if we've reached here something is very abnormal
         raise SaltException('ReqChannel: missing master_uri/master_ip in self.opts')
 
-    def _package_load(self, load):
-        return {
-            'enc': self.crypt,
-            'load': load,
-        }
+    def _package_load(self, load, clear_load=None):
+        ret = {}
+        if isinstance(clear_load, dict) and \
+                clear_load.get('cmd') in self.auth.creds.get('pool_commands', ()):
+            # Let the master route the request to a worker pool without
+            # decrypting it, see the worker_pools master option
+            ret['cmd'] = clear_load['cmd']
+        ret['enc'] = self.crypt
+        ret['load'] = load
+        return ret
 
     @tornado.gen.coroutine
     def crypted_transfer_decode_dictentry(self, load, dictkey=None, tries=3, timeout=60):
@@ -286,7 +297,7 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
             yield self.auth.authenticate()
         # Return control to the caller. When send() completes, resume by populating ret with the Future.result
         ret = yield self.message_client.send(
-            self._package_load(self.auth.crypticle.dumps(load)),
+            self._package_load(self.auth.crypticle.dumps(load), load),
             timeout=timeout,
             tries=tries,
         )
@@ -295,7 +306,7 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
             # Reauth in the case our key is deleted on the master side.
             yield self.auth.authenticate()
             ret = yield self.message_client.send(
-                self._package_load(self.auth.crypticle.dumps(load)),
+                self._package_load(self.auth.crypticle.dumps(load), load),
                 timeout=timeout,
                 tries=tries,
             )
@@ -330,7 +341,7 @@ class AsyncZeroMQReqChannel(salt.transport.client.ReqChannel):
         def _do_transfer():
             # Yield control to the caller. When send() completes, resume by populating data with the Future.result
             data = yield self.message_client.send(
-                self._package_load(self.auth.crypticle.dumps(load)),
+                self._package_load(self.auth.crypticle.dumps(load), load),
                 timeout=timeout,
                 tries=tries,
             )
@@ -579,12 +590,68 @@ class AsyncZeroMQPubChannel(salt.transport.mixins.auth.AESPubClientMixin, salt.t
         return self.stream.on_recv(wrap_callback)
 
 
+def worker_pools(opts):
+    '''
+    Return the worker pools configured with the worker_pools master option,
+    sorted by name. Each pool is a dict holding the commands routed to it and
+    the minimum and maximum number of workers.
+    '''
+    ret = collections.OrderedDict()
+    for name in sorted(opts.get('worker_pools') or {}):
+        pool = opts['worker_pools'][name] or {}
+        min_workers = max(int(pool.get('worker_threads', 1)), 1)
+        ret[name] = {
+            'commands': set(pool.get('commands', [])),
+            'min': min_workers,
+            'max': max(int(pool.get('max_worker_threads', min_workers)), min_workers),
+        }
+    return ret
+
+
+def _payload_cmd(frame):
+    '''
+    Return the command of a serialized request payload, reading only the
+    payload keys until the command is found
+    '''
+    try:
+        unpacker = salt.utils.msgpack.msgpack.Unpacker()
+        unpacker.feed(frame)
+        enc = None
+        for _ in range(unpacker.read_map_header()):
+            key = salt.utils.stringutils.to_unicode(unpacker.unpack())
+            if key == 'cmd':
+                return salt.utils.stringutils.to_unicode(unpacker.unpack())
+            elif key == 'enc':
+                enc = salt.utils.stringutils.to_unicode(unpacker.unpack())
+            elif key == 'load' and enc == 'clear':
+                load = unpacker.unpack()
+                cmd = load.get('cmd', load.get(b'cmd'))
+                return salt.utils.stringutils.to_unicode(cmd) if cmd else None
+            else:
+                unpacker.skip()
+    except Exception:
+        pass
+    return None
+
+
 class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
                              salt.transport.server.ReqServerChannel):
 
+    # Seconds after which a request handed to a pool worker which did not
+    # answer no longer counts against the pool
+    POOL_REQUEST_TIMEOUT = 600
+    # States of the retirement of a pool worker, see retire_pool_worker
+    POOL_RETIRE_ASKED = 1
+    POOL_RETIRE_PAUSED = 2
+
+    # Set by the worker process to the pool it serves before post_fork
+    worker_pool = None
+
     def __init__(self, opts):
         salt.transport.server.ReqServerChannel.__init__(self, opts)
         self._closing = False
+        self.pools = worker_pools(opts)
+        self._pool_state = None
 
     def zmq_device(self):
         '''
@@ -602,20 +669,16 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
         self.clients.setsockopt(zmq.BACKLOG, self.opts.get('zmq_backlog', 1000))
         self._start_zmq_monitor()
         self.workers = self.context.socket(zmq.DEALER)
-
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            self.w_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_workers', 4515)
-                )
-        else:
-            self.w_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'workers.ipc')
-                )
+        self.w_uri = self._worker_uri()
 
         log.info('Setting up the master communication server')
         self.clients.bind(self.uri)
         self.workers.bind(self.w_uri)
 
+        if self.pools:
+            self._pool_device()
+            return
+
         while True:
             if self.clients.closed or self.workers.closed:
                 break
@@ -628,6 +691,133 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
             except (KeyboardInterrupt, SystemExit):
                 break
 
+    def _worker_uri(self, pool=None):
+        '''
+        Return the uri the workers of a pool connect to, the workers which
+        are not in a pool use the default uri
+        '''
+        if self.opts.get('ipc_mode', '') == 'tcp':
+            port = int(self.opts.get('tcp_master_workers', 4515))
+            if pool is not None:
+                port += list(self.pools).index(pool) + 1
+            return 'tcp://127.0.0.1:{0}'.format(port)
+        return 'ipc://{0}'.format(
+            os.path.join(
+                self.opts['sock_dir'],
+                'workers.ipc' if pool is None else 'workers-{0}.ipc'.format(pool)
+            )
+        )
+
+    def pool_state(self, pool):
+        '''
+        Return the number of requests waiting for a worker of the pool and
+        the number of requests its workers are handling
+        '''
+        idx = list(self.pools).index(pool) * 4
+        return self._pool_state[idx], self._pool_state[idx + 1]
+
+    def set_pool_workers(self, pool, workers):
+        '''
+        Set the number of running workers of the pool, the device does not
+        hand more requests to the pool than it has workers
+        '''
+        self._pool_state[list(self.pools).index(pool) * 4 + 2] = workers
+
+    def retire_pool_worker(self, pool):
+        '''
+        Ask the device to stop handing requests to the pool once none of its
+        requests is being handled. Return True when it did: a worker of the
+        pool is then idle and can be stopped, after which resume_pool has to
+        be called.
+        '''
+        idx = list(self.pools).index(pool) * 4 + 3
+        with self._pool_state.get_lock():
+            if self._pool_state[idx] == self.POOL_RETIRE_PAUSED:
+                return True
+            self._pool_state[idx] = self.POOL_RETIRE_ASKED
+        return False
+
+    def resume_pool(self, pool):
+        '''
+        Let the device hand requests to the pool again, and forget about
+        retiring one of its workers
+        '''
+        idx = list(self.pools).index(pool) * 4 + 3
+        with self._pool_state.get_lock():
+            self._pool_state[idx] = 0
+
+    def _pool_device(self):
+        '''
+        Route the requests by command to the worker pools. The requests of a
+        pool wait in the device while all the workers of the pool are busy,
+        so that slow commands can not hold up the others.
+        '''
+        names = list(self.pools)
+        commands = {}
+        dealers = []
+        for idx, name in enumerate(names):
+            for cmd in self.pools[name]['commands']:
+                commands[cmd] = idx
+            dealer = self.context.socket(zmq.DEALER)
+            dealer.bind(self._worker_uri(name))
+            dealers.append(dealer)
+        backlog = [collections.deque() for _ in names]
+        # Requests handed to the workers of each pool, by envelope
+        inflight = [{} for _ in names]
+
+        poller = zmq.Poller()
+        poller.register(self.clients, zmq.POLLIN)
+        poller.register(self.workers, zmq.POLLIN)
+        for dealer in dealers:
+            poller.register(dealer, zmq.POLLIN)
+
+        while not self._closing:
+            if self.clients.closed or self.workers.closed:
+                break
+            try:
+                events = dict(poller.poll(1000))
+                if self.clients in events:
+                    frames = self.clients.recv_multipart()
+                    idx = commands.get(_payload_cmd(frames[-1]))
+                    if idx is None:
+                        self.workers.send_multipart(frames)
+                    else:
+                        backlog[idx].append(frames)
+                if self.workers in events:
+                    self.clients.send_multipart(self.workers.recv_multipart())
+                for idx, dealer in enumerate(dealers):
+                    if dealer in events:
+                        frames = dealer.recv_multipart()
+                        inflight[idx].pop(tuple(frames[:-1]), None)
+                        self.clients.send_multipart(frames)
+                now = time.time()
+                for idx, dealer in enumerate(dealers):
+                    # Forget the requests whose worker went away
+                    for envelope, sent in list(inflight[idx].items()):
+                        if now - sent > self.POOL_REQUEST_TIMEOUT:
+                            del inflight[idx][envelope]
+                    with self._pool_state.get_lock():
+                        # Pause the pool while one of its workers is retired
+                        if self._pool_state[idx * 4 + 3] == self.POOL_RETIRE_ASKED \
+                                and not inflight[idx]:
+                            self._pool_state[idx * 4 + 3] = self.POOL_RETIRE_PAUSED
+                        paused = self._pool_state[idx * 4 + 3] == self.POOL_RETIRE_PAUSED
+                    limit = self._pool_state[idx * 4 + 2] or self.pools[names[idx]]['min']
+                    while backlog[idx] and len(inflight[idx]) < limit and not paused:
+                        frames = backlog[idx].popleft()
+                        inflight[idx][tuple(frames[:-1])] = now
+                        dealer.send_multipart(frames)
+                    self._pool_state[idx * 4] = len(backlog[idx])
+                    self._pool_state[idx * 4 + 1] = len(inflight[idx])
+            except zmq.ZMQError as exc:
+                if exc.errno == errno.EINTR:
+                    continue
+                six.reraise(*sys.exc_info())
+            except (KeyboardInterrupt, SystemExit):
+                break
+        for dealer in dealers:
+            dealer.close()
+
     def close(self):
         '''
         Cleanly shutdown the router socket
@@ -662,6 +852,10 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
         :param func process_manager: An instance of salt.utils.process.ProcessManager
         '''
         salt.transport.mixins.auth.AESReqServerMixin.pre_fork(self, process_manager)
+        if self.pools:
+            # Waiting requests, requests being handled, running workers and
+            # retirement state of each pool, shared with the device process
+            self._pool_state = multiprocessing.Array(ctypes.c_int, len(self.pools) * 4)
         process_manager.add_process(self.zmq_device)
 
     def _start_zmq_monitor(self):
@@ -695,14 +889,7 @@ class ZeroMQReqServerChannel(salt.transport.mixins.auth.AESReqServerMixin,
         self._socket = self.context.socket(zmq.REP)
         self._start_zmq_monitor()
 
-        if self.opts.get('ipc_mode', '') == 'tcp':
-            self.w_uri = 'tcp://127.0.0.1:{0}'.format(
-                self.opts.get('tcp_master_workers', 4515)
-                )
-        else:
-            self.w_uri = 'ipc://{0}'.format(
-                os.path.join(self.opts['sock_dir'], 'workers.ipc')
-                )
+        self.w_uri = self._worker_uri(self.worker_pool)
         log.info('Worker binding to socket %s', self.w_uri)
         self._socket.connect(self.w_uri)
 
@@ -842,12 +1029,59 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
     '''
 
     _sock_data = threading.local()
+    # A new channel is created for every publish, so the crypticle and the
+    # signing key are cached on the class, per pki_dir, and only rebuilt when
+    # the AES key is rotated.
+    _crypt_data = {}
+    _pub_stats = collections.defaultdict(lambda: {'mean': 0, 'runs': 0})
 
     def __init__(self, opts):
         self.opts = opts
         self.serial = salt.payload.Serial(self.opts)  # TODO: in init?
         self.ckminions = salt.utils.minions.CkMinions(self.opts)
 
+    def _get_crypt(self):
+        '''
+        Return a tuple of the Crypticle for the current AES key and the loaded
+        master signing key (``None`` unless ``sign_pub_messages`` is set)
+        '''
+        secret = salt.master.SMaster.secrets['aes']['secret'].value
+        cached = self._crypt_data.get(self.opts['pki_dir'])
+        if cached is not None and cached[0] == secret:
+            return cached[1], cached[2]
+        log.debug('Building publish crypticle for new AES key')
+        crypticle = salt.crypt.Crypticle(self.opts, secret)
+        sign_key = None
+        if self.opts['sign_pub_messages']:
+            master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
+            sign_key = salt.crypt.get_rsa_key(master_pem_path, None)
+        self._crypt_data[self.opts['pki_dir']] = (secret, crypticle, sign_key)
+        return crypticle, sign_key
+
+    @classmethod
+    def _update_pub_stats(cls, stage, start):
+        '''
+        Record the duration of a publish stage which started at ``start`` and
+        return the current time, to be used as the start of the next stage
+        '''
+        end = time.time()
+        stats = cls._pub_stats[stage]
+        stats['runs'] += 1
+        stats['mean'] = (stats['mean'] * (stats['runs'] - 1) + (end - start)) / stats['runs']
+        return end
+
+    @classmethod
+    def publish_stats(cls):
+        '''
+        Return the mean duration and the number of runs of each publish stage
+        (``encrypt``, ``sign``, ``target``, ``serialize`` and ``send``) in
+        this process since the last call. Stats are only gathered when
+        ``master_stats`` is set.
+        '''
+        stats = copy.deepcopy(dict(cls._pub_stats))
+        cls._pub_stats.clear()
+        return stats
+
     def connect(self):
         return tornado.gen.sleep(5)
 
@@ -909,13 +1143,17 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
                 # SIGUSR1 gracefully so we don't choke and die horribly
                 try:
                     log.debug('Publish daemon getting data from puller %s', pull_uri)
-                    package = pull_sock.recv()
-                    log.debug('Publish daemon received payload. size=%d', len(package))
-
-                    unpacked_package = salt.payload.unpackage(package)
+                    package = pull_sock.recv_multipart(copy=False)
+                    unpacked_package = salt.payload.unpackage(package[0].bytes)
                     if six.PY3:
                         unpacked_package = salt.transport.frame.decode_embedded_strs(unpacked_package)
-                    payload = unpacked_package['payload']
+                    if len(package) > 1:
+                        # The payload was sent as its own frame, forward it
+                        # to the minions without unpacking or copying it
+                        payload = package[1]
+                    else:
+                        payload = unpacked_package['payload']
+                    log.debug('Publish daemon received payload. size=%d', len(payload))
                     log.trace('Accepted unpacked package from puller')
                     if self.opts['zmq_filtering']:
                         # if you have a specific topic list, use that
@@ -926,25 +1164,25 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
                                 # to avoid collisions
                                 htopic = salt.utils.stringutils.to_bytes(hashlib.sha1(salt.utils.stringutils.to_bytes(topic)).hexdigest())
                                 pub_sock.send(htopic, flags=zmq.SNDMORE)
-                                pub_sock.send(payload)
+                                pub_sock.send(payload, copy=False)
                                 log.trace('Filtered data has been sent')
 
                             # Syndic broadcast
                             if self.opts.get('order_masters'):
                                 log.trace('Sending filtered data to syndic')
                                 pub_sock.send(b'syndic', flags=zmq.SNDMORE)
-                                pub_sock.send(payload)
+                                pub_sock.send(payload, copy=False)
                                 log.trace('Filtered data has been sent to syndic')
                         # otherwise its a broadcast
                         else:
                             # TODO: constants file for "broadcast"
                             log.trace('Sending broadcasted data over publisher %s', pub_uri)
                             pub_sock.send(b'broadcast', flags=zmq.SNDMORE)
-                            pub_sock.send(payload)
+                            pub_sock.send(payload, copy=False)
                             log.trace('Broadcasted data has been sent')
                     else:
                         log.trace('Sending ZMQ-unfiltered data over publisher %s', pub_uri)
-                        pub_sock.send(payload)
+                        pub_sock.send(payload, copy=False)
                         log.trace('Unfiltered data has been sent')
                 except zmq.ZMQError as exc:
                     if exc.errno == errno.EINTR:
@@ -1015,45 +1253,64 @@ class ZeroMQPubServerChannel(salt.transport.server.PubServerChannel):
             self._sock_data.sock.close()
             delattr(self._sock_data, 'sock')
 
-    def publish(self, load):
+    def publish(self, load, minions=None):
         '''
         Publish "load" to minions. This send the load to the publisher daemon
         process with does the actual sending to minions.
 
         :param dict load: A load to be sent across the wire to minions
+        :param list minions: The minions the master resolved the target to,
+                             it is resolved again when not passed
         '''
-        payload = {'enc': 'aes'}
-        crypticle = salt.crypt.Crypticle(self.opts, salt.master.SMaster.secrets['aes']['secret'].value)
-        payload['load'] = crypticle.dumps(load)
-        if self.opts['sign_pub_messages']:
-            master_pem_path = os.path.join(self.opts['pki_dir'], 'master.pem')
+        track = self.opts.get('master_stats', False)
+        start = time.time()
+        crypticle, sign_key = self._get_crypt()
+        payload = {'enc': 'aes', 'load': crypticle.dumps(load)}
+        if track:
+            start = self._update_pub_stats('encrypt', start)
+        if sign_key is not None:
             log.debug("Signing data packet")
-            payload['sig'] = salt.crypt.sign_message(master_pem_path, payload['load'])
-        int_payload = {'payload': self.serial.dumps(payload)}
+            payload['sig'] = salt.crypt.sign_message_with_key(sign_key, payload['load'])
+            if track:
+                start = self._update_pub_stats('sign', start)
+        int_payload = {}
 
         # add some targeting stuff for lists only (for now)
         if load['tgt_type'] == 'list':
             int_payload['topic_lst'] = load['tgt']
 
-        # If zmq_filtering is enabled, target matching has to happen master side
-        match_targets = ["pcre", "glob", "list"]
-        if self.opts['zmq_filtering'] and load['tgt_type'] in match_targets:
-            # Fetch a list of minions that match
-            _res = self.ckminions.check_minions(load['tgt'],
-                                                tgt_type=load['tgt_type'])
-            match_ids = _res['minions']
+        # If zmq_filtering is enabled, target matching has to happen master
+        # side so that only the targeted minions receive the publication
+        if self.opts['zmq_filtering']:
+            if minions is None:
+                # Fetch a list of minions that match
+                _res = self.ckminions.check_minions(
+                    load['tgt'],
+                    tgt_type=load.get('tgt_type', 'glob'),
+                    delimiter=load.get('delimiter', DEFAULT_TARGET_DELIM),
+                )
+                minions = _res['minions']
 
-            log.debug("Publish Side Match: %s", match_ids)
+            log.debug("Publish Side Match: %s", minions)
             # Send list of miions thru so zmq can target them
-            int_payload['topic_lst'] = match_ids
-        payload = self.serial.dumps(int_payload)
+            int_payload['topic_lst'] = minions
+        if track:
+            start = self._update_pub_stats('target', start)
+        # The payload is serialized once, the publish daemon receives it as
+        # its own frame and sends it to the minions without unpacking it
+        payload = self.serial.dumps(payload)
+        header = self.serial.dumps(int_payload)
+        if track:
+            start = self._update_pub_stats('serialize', start)
         log.debug(
             'Sending payload to publish daemon. jid=%s size=%d',
             load.get('jid', None), len(payload),
         )
         if not self.pub_sock:
             self.pub_connect()
-        self.pub_sock.send(payload)
+        self.pub_sock.send_multipart([header, payload], copy=False)
+        if track:
+            self._update_pub_stats('send', start)
         log.debug('Sent payload to publish daemon.')
 
 
@@ -1093,14 +1350,17 @@ class AsyncReqMessageClientPool(salt.transport.MessageClientPool):
         self.close()
 
 
-# TODO: unit tests!
 class AsyncReqMessageClient(object):
     '''
-    This class wraps the underlying zeromq REQ socket and gives a future-based
-    interface to sending and recieving messages. This works around the primary
-    limitation of serialized send/recv on the underlying socket by queueing the
-    message sends in this class. In the future if we decide to attempt to multiplex
-    we can manage a pool of REQ/REP sockets-- but for now we'll just do them in serial
+    This class wraps the underlying zeromq DEALER socket and gives a future-based
+    interface to sending and recieving messages. Every request is sent with a
+    message id in its envelope, which the master hands back with the reply.
+
+    With shared_req_channel, any number of requests are in flight on the same
+    socket and each of them times out on its own. Otherwise the requests are
+    sent one at a time like on a REQ socket, and the socket is re-created when
+    a request times out, so that at most one copy of a request reaches the
+    master.
     '''
     def __init__(self, opts, addr, linger=0, io_loop=None):
         '''
@@ -1117,29 +1377,40 @@ class AsyncReqMessageClient(object):
         self.linger = linger
         if io_loop is None:
             install_zmq()
-            ZMQDefaultLoop.current()
+            self.io_loop = ZMQDefaultLoop.current()
         else:
             self.io_loop = io_loop
 
         self.serial = salt.payload.Serial(self.opts)
         self.context = zmq.Context()
+        # send all the requests at once instead of one at a time
+        self.multiplex = bool(self.opts.get('shared_req_channel'))
 
-        # wire up sockets
-        self._init_socket()
-
+        # ids of the requests waiting for a reply
         self.send_queue = []
-        # mapping of message -> future
+        # mapping of message id -> message, of the requests not sent yet
+        self.send_message_map = {}
+        # mapping of message id -> future
         self.send_future_map = {}
 
-        self.send_timeout_map = {}  # message -> timeout
+        self.send_timeout_map = {}  # message id -> timeout
+        self._mid = 0
         self._closing = False
 
-    # TODO: timeout all in-flight sessions, or error
+        # wire up sockets
+        self._init_socket()
+
     def close(self):
         if self._closing:
             return
 
         self._closing = True
+        for timeout in six.itervalues(self.send_timeout_map):
+            self.io_loop.remove_timeout(timeout)
+        self.send_timeout_map = {}
+        self.send_future_map = {}
+        self.send_message_map = {}
+        self.send_queue = []
         if hasattr(self, 'stream') and self.stream is not None:
             if ZMQ_VERSION_INFO < (14, 3, 0):
                 # stream.close() doesn't work properly on pyzmq < 14.3.0
@@ -1177,7 +1448,7 @@ class AsyncReqMessageClient(object):
             del self.stream
             del self.socket
 
-        self.socket = self.context.socket(zmq.REQ)
+        self.socket = self.context.socket(zmq.DEALER)
 
         # socket options
         if hasattr(zmq, 'RECONNECT_IVL_MAX'):
@@ -1196,56 +1467,72 @@ class AsyncReqMessageClient(object):
         log.debug('Trying to connect to: %s', self.addr)
         self.socket.connect(self.addr)
         self.stream = zmq.eventloop.zmqstream.ZMQStream(self.socket, io_loop=self.io_loop)
+        self.stream.on_recv(self._handle_reply)
 
-    @tornado.gen.coroutine
-    def _internal_send_recv(self):
-        while self.send_queue:
-            message = self.send_queue[0]
-            future = self.send_future_map.get(message, None)
-            if future is None:
-                # Timedout
-                del self.send_queue[0]
-                continue
+    def _message_id(self):
+        '''
+        Return the id of the next request. The master REP sockets send back
+        every envelope frame in front of the empty delimiter, the id is one
+        of them.
+        '''
+        self._mid = self._mid % 0xffffffff + 1
+        return salt.utils.stringutils.to_bytes(six.text_type(self._mid))
 
-            # send
-            def mark_future(msg):
-                if not future.done():
-                    data = self.serial.loads(msg[0])
-                    future.set_result(data)
-            self.stream.on_recv(mark_future)
-            self.stream.send(message)
+    def _handle_reply(self, frames):
+        message_id = frames[0]
+        future = self.send_future_map.pop(message_id, None)
+        if future is None:
+            # The request timed out before the reply came in
+            log.trace('Dropping the reply to request %s', message_id)
+            return
+        self.send_queue.remove(message_id)
+        self.remove_message_timeout(message_id)
+        self._send_next()
+        if future.done():
+            return
+        try:
+            future.set_result(self.serial.loads(frames[-1]))
+        except Exception as exc:  # pylint: disable=broad-except
+            future.set_exception(exc)
 
-            try:
-                ret = yield future
-            except Exception as err:  # pylint: disable=W0702
-                log.debug('Re-init ZMQ socket: %s', err)
-                self._init_socket()  # re-init the zmq socket (no other way in zmq)
-                del self.send_queue[0]
-                continue
-            del self.send_queue[0]
-            self.send_future_map.pop(message, None)
-            self.remove_message_timeout(message)
+    def _send_next(self):
+        '''
+        Send the oldest request waiting for its turn, when they are sent one
+        at a time
+        '''
+        if self.send_queue:
+            message = self.send_message_map.pop(self.send_queue[0], None)
+            if message is not None:
+                self.stream.send_multipart([self.send_queue[0], b'', message])
 
-    def remove_message_timeout(self, message):
-        if message not in self.send_timeout_map:
+    def remove_message_timeout(self, message_id):
+        if message_id not in self.send_timeout_map:
             return
-        timeout = self.send_timeout_map.pop(message, None)
+        timeout = self.send_timeout_map.pop(message_id, None)
         if timeout is not None:
             # Hasn't been already timedout
             self.io_loop.remove_timeout(timeout)
 
-    def timeout_message(self, message):
+    def timeout_message(self, message_id, message):
         '''
-        Handle a message timeout by removing it from the sending queue
-        and informing the caller
+        Handle a message timeout by forgetting the request and either sending
+        it again or informing the caller
 
         :raises: SaltReqTimeoutError
         '''
-        future = self.send_future_map.pop(message, None)
-        # In a race condition the message might have been sent by the time
+        self.send_timeout_map.pop(message_id, None)
+        future = self.send_future_map.pop(message_id, None)
+        # In a race condition the reply might have been received by the time
         # we're timing it out. Make sure the future is not None
         if future is not None:
-            del self.send_timeout_map[message]
+            self.send_queue.remove(message_id)
+            sent = self.send_message_map.pop(message_id, None) is None
+            if sent and not self.multiplex:
+                # Drop the request if it is still queued on the socket, as
+                # the REQ socket did, so that the retry is the only copy
+                # which reaches the master
+                log.debug('Re-init ZMQ socket after a timeout')
+                self._init_socket()
             if future.attempts < future.tries:
                 future.attempts += 1
                 log.debug('SaltReqTimeoutError, retrying. (%s/%s)', future.attempts, future.tries)
@@ -1258,6 +1545,7 @@ class AsyncReqMessageClient(object):
 
             else:
                 future.set_exception(SaltReqTimeoutError('Message timed out'))
+            self._send_next()
 
     def send(self, message, timeout=None, tries=3, future=None, callback=None, raw=False):
         '''
@@ -1275,20 +1563,24 @@ class AsyncReqMessageClient(object):
                 response = future.result()
                 self.io_loop.add_callback(callback, response)
             future.add_done_callback(handle_future)
-        # Add this future to the mapping
-        self.send_future_map[message] = future
+        # Add this future to the mapping, a retry is sent with a new id and
+        # a late reply to the previous attempt is dropped
+        message_id = self._message_id()
+        self.send_future_map[message_id] = future
+        self.send_queue.append(message_id)
 
         if self.opts.get('detect_mode') is True:
             timeout = 1
 
         if timeout is not None:
-            send_timeout = self.io_loop.call_later(timeout, self.timeout_message, message)
-            self.send_timeout_map[message] = send_timeout
-
-        if not self.send_queue:
-            self.io_loop.spawn_callback(self._internal_send_recv)
+            send_timeout = self.io_loop.call_later(timeout, self.timeout_message, message_id, message)
+            self.send_timeout_map[message_id] = send_timeout
 
-        self.send_queue.append(message)
+        if self.multiplex or len(self.send_queue) == 1:
+            self.stream.send_multipart([message_id, b'', message])
+        else:
+            # Wait for the replies to the requests in front of it
+            self.send_message_map[message_id] = message
 
         return future
 
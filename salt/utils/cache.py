@@ -16,6 +16,7 @@ except ImportError:
 # Import salt libs
 import salt.config
 import salt.payload
+import salt.utils.atomicfile
 import salt.utils.data
 import salt.utils.dictupdate
 import salt.utils.files
@@ -213,6 +214,76 @@ class CacheDisk(CacheDict):
                 log.error('Error storing cache data to the disk: %s', err)
 
 
+class CachedirFile(object):
+    '''
+    Base class of the files kept in the cachedir to share data between all
+    the processes using the cachedir, such as the loader index or the
+    compiled highstates. A subclass sets the filename and reads and writes
+    its ``entries`` with ``_read`` and ``_write``.
+    '''
+    filename = None
+    # mapping of path -> instance, per process and subclass
+    _instances = {}
+
+    def __init__(self, path):
+        self.path = path
+        self.serial = salt.payload.Serial('msgpack')
+        self.entries = None
+
+    @classmethod
+    def cache_path(cls, opts):
+        return os.path.join(opts['cachedir'], cls.filename)
+
+    @classmethod
+    def instance(cls, opts):
+        '''
+        Return the instance for the cachedir of opts
+        '''
+        path = cls.cache_path(opts)
+        if path not in cls._instances:
+            cls._instances[path] = cls(path)
+        return cls._instances[path]
+
+    @classmethod
+    def invalidate(cls, opts):
+        '''
+        Remove the file from the cachedir of opts
+        '''
+        if 'cachedir' not in opts:
+            return
+        path = cls.cache_path(opts)
+        cls._instances.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _read(self):
+        try:
+            with salt.utils.files.fopen(self.path, 'rb') as fp_:
+                entries = self.serial.load(fp_)
+        except (IOError, OSError):
+            return {}
+        except Exception as exc:  # pylint: disable=broad-except
+            log.debug('Ignoring the unreadable cache file %s: %s', self.path, exc)
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _write(self):
+        try:
+            with salt.utils.atomicfile.atomic_open(self.path, 'wb') as fp_:
+                self.serial.dump(self.entries, fp_)
+        except (IOError, OSError) as exc:
+            log.debug('Could not write the cache file %s: %s', self.path, exc)
+
+
 class CacheCli(object):
     '''
     Connection client for the ConCache. Should be used by all
@@ -56,10 +56,13 @@ from __future__ import absolute_import, unicode_literals, print_function
 import os
 import time
 import fnmatch
+import collections
+import itertools
 import hashlib
 import logging
 import datetime
 import sys
+import zlib
 
 try:
     from collections.abc import MutableMapping
@@ -71,8 +74,10 @@ from salt.ext.six.moves import range
 
 # Import third party libs
 from salt.ext import six
+import tornado.gen
 import tornado.ioloop
 import tornado.iostream
+import tornado.locks
 
 # Import salt libs
 import salt.config
@@ -99,6 +104,9 @@ SUB_EVENT = ('state.highstate', 'state.sls')
 TAGEND = str('\n\n')  # long tag delimiter
 TAGPARTER = str('/')  # name spaced tag delimiter
 SALT = 'salt'  # base prefix for all salt/ events
+# The number of leading parts of a tag used to pick its shard of the master
+# event bus, so that all of the events of a job go through the same shard
+SHARD_TAG_PARTS = 3
 # dict map of namespaced base tag prefixes for salt events
 TAGS = {
     'auth': 'auth',  # prefix for all salt/auth events
@@ -201,6 +209,45 @@ def tagify(suffix='', prefix='', base=SALT):
     return TAGPARTER.join([part for part in parts if part])
 
 
+def event_shards(opts):
+    '''
+    Return the number of shards of the master event bus
+    '''
+    if opts.get('ipc_mode') == 'tcp':
+        # The shards only have socket files, not ports
+        return 1
+    return max(int(opts.get('event_publisher_shards') or 1), 1)
+
+
+def master_event_uris(sock_dir, shard=0):
+    '''
+    Return the paths of the pub and pull sockets of a shard of the master
+    event bus. The first shard uses the sockets of an unsharded event bus.
+    '''
+    if shard:
+        suffix = '_{0}'.format(shard)
+    else:
+        suffix = ''
+    return (
+        os.path.join(sock_dir, 'master_event_pub{0}.ipc'.format(suffix)),
+        os.path.join(sock_dir, 'master_event_pull{0}.ipc'.format(suffix)),
+    )
+
+
+def tag_shard(tag, shards):
+    '''
+    Return the shard of the master event bus which publishes the events with
+    this tag
+    '''
+    if shards <= 1:
+        return 0
+    parts = salt.utils.stringutils.to_bytes(tag).split(
+        salt.utils.stringutils.to_bytes(TAGPARTER))
+    prefix = salt.utils.stringutils.to_bytes(TAGPARTER).join(
+        parts[:SHARD_TAG_PARTS])
+    return (zlib.crc32(prefix) & 0xffffffff) % shards
+
+
 def update_stats(stats, start_time, data):
     '''
     Calculate the master stats and return the updated stat info
@@ -227,6 +274,189 @@ def update_stats(stats, start_time, data):
     return stats
 
 
+class PendingEvents(object):
+    '''
+    The events cached by a SaltEvent for its subscriptions until they are
+    requested, in the order they were received.
+
+    The ``startswith`` and ``endswith`` subscriptions are indexed by the
+    length of their tag, an event is matched against them by looking up the
+    prefixes and suffixes of its tag of those lengths, so matching an event
+    costs about the same with one subscription as with many thousands. The
+    subscriptions with other match types are checked one after the other.
+
+    Each subscription keeps a queue of the events which matched it. When
+    ``queue_size`` is set, the oldest events of a queue are dropped once it
+    is full, and counted in ``dropped``.
+    '''
+    INDEXED_MATCH_TYPES = ('startswith', 'endswith')
+
+    def __init__(self, get_match_func, queue_size=0):
+        self.get_match_func = get_match_func
+        self.queue_size = queue_size
+        self.dropped = 0
+        # (tag, match_type) -> [subscription count, queue of event sequences]
+        self._subs = {}
+        # match_type -> {tag length: set of tags}
+        self._index = dict((x, {}) for x in self.INDEXED_MATCH_TYPES)
+        # (tag, match_type, match_func) of the subscriptions not indexed
+        self._unindexed = {}
+        # event sequence -> [event, number of queues holding it]
+        self._events = collections.OrderedDict()
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._events)
+
+    def __iter__(self):
+        for event, _ in six.itervalues(self._events):
+            yield event
+
+    def _matching(self, event_tag):
+        '''
+        Return the keys of the subscriptions matching an event tag
+        '''
+        ret = []
+        for length, tags in six.iteritems(self._index['startswith']):
+            if event_tag[:length] in tags:
+                ret.append((event_tag[:length], 'startswith'))
+        for length, tags in six.iteritems(self._index['endswith']):
+            if length > len(event_tag):
+                continue
+            suffix = event_tag[len(event_tag) - length:]
+            if suffix in tags:
+                ret.append((suffix, 'endswith'))
+        for key, match_func in six.iteritems(self._unindexed):
+            if match_func(event_tag, key[0]):
+                ret.append(key)
+        return ret
+
+    def _queue(self, key, seq):
+        '''
+        Queue an event for a subscription
+        '''
+        queue = self._subs[key][1]
+        queue.append(seq)
+        self._events[seq][1] += 1
+        if self.queue_size:
+            # Events already returned are still in the queues of the other
+            # subscriptions they matched
+            while queue and queue[0] not in self._events:
+                queue.popleft()
+            while len(queue) > self.queue_size:
+                self._release(queue.popleft(), dropped=key)
+
+    def _release(self, seq, dropped=None):
+        '''
+        A queue no longer holds an event, forget the event when no other queue
+        holds it
+        '''
+        entry = self._events.get(seq)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._events[seq]
+            if dropped is not None:
+                self.dropped += 1
+                log.debug(
+                    'Dropped event %s, the queue of subscription %s is full '
+                    '(%d events dropped so far)',
+                    entry[0]['tag'], dropped, self.dropped
+                )
+
+    def subscribe(self, tag, match_type):
+        '''
+        Add a subscription, and queue for it the cached events it matches
+        '''
+        key = (tag, match_type)
+        if key in self._subs:
+            self._subs[key][0] += 1
+            return
+        self._subs[key] = [1, collections.deque()]
+        if match_type in self.INDEXED_MATCH_TYPES:
+            self._index[match_type].setdefault(len(tag), set()).add(tag)
+            match_func = self.get_match_func(match_type)
+        else:
+            match_func = self._unindexed[key] = \
+                self.get_match_func(match_type)
+        for seq, (event, _) in list(six.iteritems(self._events)):
+            if match_func(event['tag'], tag):
+                self._queue(key, seq)
+
+    def unsubscribe(self, tag, match_type):
+        '''
+        Remove a subscription, and the cached events no other subscription
+        matches
+        '''
+        key = (tag, match_type)
+        if key not in self._subs:
+            raise ValueError(
+                'No subscription to {0} ({1})'.format(tag, match_type))
+        self._subs[key][0] -= 1
+        if self._subs[key][0] > 0:
+            return
+        _, queue = self._subs.pop(key)
+        if match_type in self.INDEXED_MATCH_TYPES:
+            tags = self._index[match_type][len(tag)]
+            tags.discard(tag)
+            if not tags:
+                del self._index[match_type][len(tag)]
+        else:
+            self._unindexed.pop(key)
+        for seq in queue:
+            self._release(seq)
+
+    def subscribed(self, event_tag):
+        '''
+        Return whether any subscription matches an event tag
+        '''
+        return bool(self._matching(event_tag))
+
+    def add(self, event):
+        '''
+        Cache an event for the subscriptions it matches, return False if there
+        is none
+        '''
+        keys = self._matching(event['tag'])
+        if not keys:
+            return False
+        seq = next(self._seq)
+        self._events[seq] = [event, 0]
+        for key in keys:
+            self._queue(key, seq)
+        return True
+
+    def pop(self, tag, match_type, match_func):
+        '''
+        Remove and return the first cached event matching the tag, or None
+        '''
+        sub = self._subs.get((tag, match_type))
+        if sub is not None:
+            # The queue of the subscription holds all of the cached events
+            # matching it, in order
+            queue = sub[1]
+            while queue:
+                seq = queue.popleft()
+                entry = self._events.pop(seq, None)
+                if entry is not None:
+                    return entry[0]
+            return None
+        for seq, (event, _) in six.iteritems(self._events):
+            if match_func(event['tag'], tag):
+                del self._events[seq]
+                return event
+        return None
+
+    def clear(self):
+        '''
+        Forget all of the cached events
+        '''
+        self._events.clear()
+        for sub in six.itervalues(self._subs):
+            sub[1].clear()
+
+
 class SaltEvent(object):
     '''
     Warning! Use the get_event function or the code will not be
@@ -277,8 +507,10 @@ class SaltEvent(object):
         if salt.utils.platform.is_windows() and 'ipc_mode' not in opts:
             self.opts['ipc_mode'] = 'tcp'
         self.puburi, self.pulluri = self.__load_uri(sock_dir, node)
-        self.pending_tags = []
-        self.pending_events = []
+        self.shards = event_shards(self.opts) if node == 'master' else 1
+        self.pending_events = PendingEvents(
+            self._get_match_func,
+            queue_size=self.opts.get('event_subscription_queue_size', 0))
         self.__load_cache_regex()
         if listen and not self.cpub:
             # Only connect to the publisher at initialization time if
@@ -350,8 +582,7 @@ class SaltEvent(object):
         '''
         if tag is None:
             return
-        match_func = self._get_match_func(match_type)
-        self.pending_tags.append([tag, match_func])
+        self.pending_events.subscribe(tag, self._get_match_type(match_type))
 
     def unsubscribe(self, tag, match_type=None):
         '''
@@ -359,15 +590,7 @@ class SaltEvent(object):
         '''
         if tag is None:
             return
-        match_func = self._get_match_func(match_type)
-
-        self.pending_tags.remove([tag, match_func])
-
-        old_events = self.pending_events
-        self.pending_events = []
-        for evt in old_events:
-            if any(pmatch_func(evt['tag'], ptag) for ptag, pmatch_func in self.pending_tags):
-                self.pending_events.append(evt)
+        self.pending_events.unsubscribe(tag, self._get_match_type(match_type))
 
     def connect_pub(self, timeout=None):
         '''
@@ -379,10 +602,7 @@ class SaltEvent(object):
         if self._run_io_loop_sync:
             with salt.utils.asynchronous.current_ioloop(self.io_loop):
                 if self.subscriber is None:
-                    self.subscriber = salt.transport.ipc.IPCMessageSubscriber(
-                    self.puburi,
-                    io_loop=self.io_loop
-                )
+                    self.subscriber = self._get_subscriber()
                 try:
                     self.io_loop.run_sync(
                         lambda: self.subscriber.connect(timeout=timeout))
@@ -391,16 +611,43 @@ class SaltEvent(object):
                     pass
         else:
             if self.subscriber is None:
-                self.subscriber = salt.transport.ipc.IPCMessageSubscriber(
-                self.puburi,
-                io_loop=self.io_loop
-            )
+                self.subscriber = self._get_subscriber()
 
             # For the asynchronous case, the connect will be defered to when
             # set_event_handler() is invoked.
             self.cpub = True
         return self.cpub
 
+    def _get_subscriber(self):
+        '''
+        Return the subscriber to the event bus, to all of its shards if it is
+        sharded
+        '''
+        if self.shards > 1:
+            return ShardedSubscriber(
+                [master_event_uris(self.opts['sock_dir'], shard)[0]
+                 for shard in range(self.shards)],
+                io_loop=self.io_loop)
+        return salt.transport.ipc.IPCMessageSubscriber(
+            self.puburi,
+            io_loop=self.io_loop
+        )
+
+    def _get_pusher(self):
+        '''
+        Return the client firing events to the event bus, to the shard of
+        their tag if it is sharded
+        '''
+        if self.shards > 1:
+            return ShardedPusher(
+                [master_event_uris(self.opts['sock_dir'], shard)[1]
+                 for shard in range(self.shards)],
+                io_loop=self.io_loop)
+        return salt.transport.ipc.IPCMessageClient(
+            self.pulluri,
+            io_loop=self.io_loop
+        )
+
     def close_pub(self):
         '''
         Close the publish connection (if established)
@@ -410,7 +657,7 @@ class SaltEvent(object):
 
         self.subscriber.close()
         self.subscriber = None
-        self.pending_events = []
+        self.pending_events.clear()
         self.cpub = False
 
     def connect_pull(self, timeout=1):
@@ -424,10 +671,7 @@ class SaltEvent(object):
         if self._run_io_loop_sync:
             with salt.utils.asynchronous.current_ioloop(self.io_loop):
                 if self.pusher is None:
-                    self.pusher = salt.transport.ipc.IPCMessageClient(
-                        self.pulluri,
-                        io_loop=self.io_loop
-                    )
+                    self.pusher = self._get_pusher()
                 try:
                     self.io_loop.run_sync(
                         lambda: self.pusher.connect(timeout=timeout))
@@ -436,10 +680,7 @@ class SaltEvent(object):
                     pass
         else:
             if self.pusher is None:
-                self.pusher = salt.transport.ipc.IPCMessageClient(
-                    self.pulluri,
-                    io_loop=self.io_loop
-                )
+                self.pusher = self._get_pusher()
             # For the asynchronous case, the connect will be deferred to when
             # fire_event() is invoked.
             self.cpush = True
@@ -459,36 +700,31 @@ class SaltEvent(object):
             data = serial.loads(mdata, encoding='utf-8')
         return mtag, data
 
-    def _get_match_func(self, match_type=None):
+    def _get_match_type(self, match_type=None):
         if match_type is None:
             match_type = self.opts['event_match_type']
-        return getattr(self, '_match_tag_{0}'.format(match_type), None)
+        return match_type
+
+    def _get_match_func(self, match_type=None):
+        return getattr(
+            self,
+            '_match_tag_{0}'.format(self._get_match_type(match_type)),
+            None)
 
-    def _check_pending(self, tag, match_func=None):
-        """Check the pending_events list for events that match the tag
+    def _check_pending(self, tag, match_type=None):
+        """Check the pending_events for an event that matches the tag
 
         :param tag: The tag to search for
         :type tag: str
-        :param tags_regex: List of re expressions to search for also
-        :type tags_regex: list[re.compile()]
+        :param match_type: The match type to use, see get_event()
+        :type match_type: str
         :return:
         """
-        if match_func is None:
-            match_func = self._get_match_func()
-        old_events = self.pending_events
-        self.pending_events = []
-        ret = None
-        for evt in old_events:
-            if match_func(evt['tag'], tag):
-                if ret is None:
-                    ret = evt
-                    log.trace('get_event() returning cached event = %s', ret)
-                else:
-                    self.pending_events.append(evt)
-            elif any(pmatch_func(evt['tag'], ptag) for ptag, pmatch_func in self.pending_tags):
-                self.pending_events.append(evt)
-            else:
-                log.trace('get_event() discarding cached event that no longer has any subscriptions = %s', evt)
+        match_type = self._get_match_type(match_type)
+        ret = self.pending_events.pop(
+            tag, match_type, self._get_match_func(match_type))
+        if ret is not None:
+            log.trace('get_event() returning cached event = %s', ret)
         return ret
 
     @staticmethod
@@ -575,9 +811,8 @@ class SaltEvent(object):
 
             if not match_func(ret['tag'], tag):
                 # tag not match
-                if any(pmatch_func(ret['tag'], ptag) for ptag, pmatch_func in self.pending_tags):
+                if self.pending_events.add(ret):
                     log.trace('get_event() caching unwanted event = %s', ret)
-                    self.pending_events.append(ret)
                 if wait:  # only update the wait timeout if we had one
                     wait = timeout_at - time.time()
                 continue
@@ -643,7 +878,7 @@ class SaltEvent(object):
 
         match_func = self._get_match_func(match_type)
 
-        ret = self._check_pending(tag, match_func)
+        ret = self._check_pending(tag, match_type)
         if ret is None:
             with salt.utils.asynchronous.current_ioloop(self.io_loop):
                 if auto_reconnect:
@@ -1082,16 +1317,135 @@ class AsyncEventPublisher(object):
         self.close()
 
 
+class ShardedSubscriber(object):
+    '''
+    Subscribe to all of the shards of the master event bus, and read their
+    events as if they came from a single IPCMessageSubscriber. The order of
+    the events is only kept within a shard, that is for the events sharing
+    the first parts of their tag.
+    '''
+    def __init__(self, socket_paths, io_loop=None):
+        self.io_loop = io_loop or tornado.ioloop.IOLoop.current()
+        self.callbacks = set()
+        self.subscribers = []
+        for socket_path in socket_paths:
+            subscriber = salt.transport.ipc.IPCMessageSubscriber(
+                socket_path, io_loop=self.io_loop)
+            # The events of all of the shards go to the same callbacks
+            subscriber.callbacks = self.callbacks
+            self.subscribers.append(subscriber)
+        self._saved_data = collections.deque()
+        self._ready = tornado.locks.Event()
+        self._reading = False
+        self._error = None
+
+    def connected(self):
+        return all(x.connected() for x in self.subscribers)
+
+    @tornado.gen.coroutine
+    def connect(self, timeout=None):
+        yield [x.connect(timeout=timeout) for x in self.subscribers]
+
+    def _save(self, raw):
+        self._saved_data.append(raw)
+        self._ready.set()
+
+    @tornado.gen.coroutine
+    def _read_shard(self, subscriber):
+        try:
+            yield subscriber.read_async()
+        except Exception as exc:
+            self._error = exc
+            self._ready.set()
+
+    @tornado.gen.coroutine
+    def _wait(self, timeout):
+        if not self._reading:
+            self._reading = True
+            self.callbacks.add(self._save)
+            for subscriber in self.subscribers:
+                self.io_loop.spawn_callback(self._read_shard, subscriber)
+        while not self._saved_data and self._error is None:
+            self._ready.clear()
+            try:
+                if timeout is None:
+                    yield self._ready.wait()
+                else:
+                    yield self._ready.wait(
+                        timeout=datetime.timedelta(seconds=timeout))
+            except tornado.gen.TimeoutError:
+                break
+
+    def read_sync(self, timeout=None):
+        '''
+        Read a message from any of the shards, the IO Loop must NOT be running
+        '''
+        if not self._saved_data:
+            self.io_loop.run_sync(lambda: self._wait(timeout))
+        if self._saved_data:
+            return self._saved_data.popleft()
+        if self._error is not None:
+            exc, self._error = self._error, None
+            raise exc  # pylint: disable=raising-bad-type
+        return None
+
+    @tornado.gen.coroutine
+    def read_async(self):
+        '''
+        Asynchronously read the messages of all of the shards and invoke the
+        callbacks with them
+        '''
+        yield [x.read_async() for x in self.subscribers]
+
+    def close(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
+
+
+class ShardedPusher(object):
+    '''
+    Send events to the shard of the master event bus of their tag
+    '''
+    def __init__(self, socket_paths, io_loop=None):
+        self.pushers = [
+            salt.transport.ipc.IPCMessageClient(x, io_loop=io_loop)
+            for x in socket_paths
+        ]
+        self._tagend = salt.utils.stringutils.to_bytes(TAGEND)
+
+    def connected(self):
+        return all(x.connected() for x in self.pushers)
+
+    @tornado.gen.coroutine
+    def connect(self, timeout=None):
+        yield [x.connect(timeout=timeout) for x in self.pushers]
+
+    def send(self, msg, timeout=None, tries=None):
+        tag = msg.partition(self._tagend)[0]
+        pusher = self.pushers[tag_shard(tag, len(self.pushers))]
+        return pusher.send(msg, timeout=timeout, tries=tries)
+
+    def close(self):
+        for pusher in self.pushers:
+            pusher.close()
+
+
 class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
     '''
     The interface that takes master events and republishes them out to anyone
     who wants to listen
+
+    With event_publisher_shards, each of the shards of the master event bus
+    has its own EventPublisher.
     '''
-    def __init__(self, opts, **kwargs):
+    def __init__(self, opts, shard=0, **kwargs):
         super(EventPublisher, self).__init__(**kwargs)
         self.opts = salt.config.DEFAULT_MASTER_OPTS.copy()
         self.opts.update(opts)
+        self.shard = shard
         self._closing = False
+        self.stat_clock = time.time()
+        self.stat_events = 0
 
     # __setstate__ and __getstate__ are only used on Windows.
     # We do this so that __init__ will be invoked on Windows in the child
@@ -1100,6 +1454,7 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         self._is_child = True
         self.__init__(
             state['opts'],
+            shard=state['shard'],
             log_queue=state['log_queue'],
             log_queue_level=state['log_queue_level']
         )
@@ -1107,6 +1462,7 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
     def __getstate__(self):
         return {
             'opts': self.opts,
+            'shard': self.shard,
             'log_queue': self.log_queue,
             'log_queue_level': self.log_queue_level
         }
@@ -1115,21 +1471,17 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         '''
         Bind the pub and pull sockets for events
         '''
-        salt.utils.process.appendproctitle(self.__class__.__name__)
+        salt.utils.process.appendproctitle(
+            '{0}-{1}'.format(self.__class__.__name__, self.shard)
+            if self.shard else self.__class__.__name__)
         self.io_loop = tornado.ioloop.IOLoop()
         with salt.utils.asynchronous.current_ioloop(self.io_loop):
             if self.opts['ipc_mode'] == 'tcp':
                 epub_uri = int(self.opts['tcp_master_pub_port'])
                 epull_uri = int(self.opts['tcp_master_pull_port'])
             else:
-                epub_uri = os.path.join(
-                    self.opts['sock_dir'],
-                    'master_event_pub.ipc'
-                )
-                epull_uri = os.path.join(
-                    self.opts['sock_dir'],
-                    'master_event_pull.ipc'
-                )
+                epub_uri, epull_uri = master_event_uris(
+                    self.opts['sock_dir'], self.shard)
 
             self.publisher = salt.transport.ipc.IPCMessagePublisher(
                 self.opts,
@@ -1151,8 +1503,7 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
                 if (self.opts['ipc_mode'] != 'tcp' and (
                         self.opts['publisher_acl'] or
                         self.opts['external_auth'])):
-                    os.chmod(os.path.join(
-                        self.opts['sock_dir'], 'master_event_pub.ipc'), 0o666)
+                    os.chmod(epub_uri, 0o666)
 
             # Make sure the IO loop and respective sockets are closed and
             # destroyed
@@ -1166,6 +1517,9 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
         '''
         try:
             self.publisher.publish(package)
+            self.stat_events += 1
+            if self.opts['master_stats']:
+                self._post_stats(package)
             return package
         # Add an extra fallback in case a forked process leeks through
         except Exception:
@@ -1173,6 +1527,45 @@ class EventPublisher(salt.utils.process.SignalHandlingMultiprocessingProcess):
                          exc_info=True)
             return None
 
+    def _post_stats(self, package):
+        '''
+        Publish the throughput of this shard and the time the last event took
+        to get through it, if it's time
+        '''
+        now = time.time()
+        if now - self.stat_clock <= self.opts['master_stats_event_iter']:
+            return
+        lag = None
+        try:
+            _, data = SaltEvent.unpack(package)
+            stamp = data['_stamp']
+            fmt = '%Y-%m-%dT%H:%M:%S.%f' if '.' in stamp \
+                else '%Y-%m-%dT%H:%M:%S'
+            lag = (datetime.datetime.utcnow() -
+                   datetime.datetime.strptime(stamp, fmt)).total_seconds()
+        except Exception:
+            # Not an event fired by SaltEvent
+            pass
+        data = {
+            'shard': self.shard,
+            'shards': event_shards(self.opts),
+            'time': now - self.stat_clock,
+            'events': self.stat_events,
+            'rate': self.stat_events / (now - self.stat_clock),
+            'lag': lag,
+            '_stamp': datetime.datetime.utcnow().isoformat(),
+        }
+        self.publisher.publish(b''.join([
+            salt.utils.stringutils.to_bytes(
+                tagify(['event_publisher', six.text_type(self.shard)],
+                       'stats')),
+            salt.utils.stringutils.to_bytes(TAGEND),
+            salt.payload.Serial({'serial': 'msgpack'}).dumps(
+                data, use_bin_type=six.PY3),
+        ]))
+        self.stat_clock = now
+        self.stat_events = 0
+
     def close(self):
         if self._closing:
             return
@@ -5,11 +5,11 @@ Classes which provide the shared base for GitFS, git_pillar, and winrepo
 
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
+import collections
 import contextlib
 import copy
 import errno
 import fnmatch
-import glob
 import hashlib
 import logging
 import os
@@ -18,6 +18,8 @@ import shutil
 import stat
 import subprocess
 import sys
+import tempfile
+import threading
 import time
 import tornado.ioloop
 import weakref
@@ -61,6 +63,9 @@ GLOBAL_ONLY = ()
 
 SYMLINK_RECURSE_DEPTH = 100
 
+# Cached gitfs blobs younger than this (in seconds) are never reaped
+BLOB_REAP_AGE = 300
+
 # Auth support (auth params can be global or per-remote, too)
 AUTH_PROVIDERS = ('pygit2',)
 AUTH_PARAMS = ('user', 'password', 'pubkey', 'privkey', 'passphrase',
@@ -224,6 +229,9 @@ class GitProvider(object):
                  override_params, cache_root, role='gitfs'):
         self.opts = opts
         self.role = role
+        # Listings of the environments, keyed by tree SHA (see list_env())
+        self._listings = {}
+        self._env_listings = {}
         self.global_saltenv = salt.utils.data.repack_dictlist(
             self.opts.get('{0}_saltenv'.format(self.role), []),
             strict=True,
@@ -957,7 +965,7 @@ class GitProvider(object):
         '''
         raise NotImplementedError()
 
-    def dir_list(self, tgt_env):
+    def dir_list(self, tgt_env, tree=None):
         '''
         This function must be overridden in a sub-class
         '''
@@ -987,12 +995,38 @@ class GitProvider(object):
         '''
         raise NotImplementedError()
 
-    def file_list(self, tgt_env):
+    def file_list(self, tgt_env, tree=None):
         '''
         This function must be overridden in a sub-class
         '''
         raise NotImplementedError()
 
+    def list_env(self, tgt_env):
+        '''
+        Return the files, symlinks and dirs of the target environment. The
+        listing is computed once per tree, so it is reused until the
+        environment moves to another commit, and by the environments which
+        point to the same tree.
+        '''
+        tree = self.get_tree(tgt_env)
+        if not tree:
+            self._env_listings.pop(tgt_env, None)
+            return set(), {}, set()
+        key = (self.tree_sha(tree),
+               self.root(tgt_env),
+               self.mountpoint(tgt_env))
+        listing = self._listings.get(key)
+        if listing is None:
+            files, symlinks = self.file_list(tgt_env, tree=tree)
+            listing = (files, symlinks, self.dir_list(tgt_env, tree=tree))
+            self._listings[key] = listing
+        self._env_listings[tgt_env] = key
+        # Forget the trees no environment points to anymore
+        current = set(six.itervalues(self._env_listings))
+        for old_key in [x for x in self._listings if x not in current]:
+            del self._listings[old_key]
+        return listing
+
     def find_file(self, path, tgt_env):
         '''
         This function must be overridden in a sub-class
@@ -1103,6 +1137,12 @@ class GitProvider(object):
         '''
         pass
 
+    def tree_sha(self, tree):
+        '''
+        This function must be overridden in a sub-class
+        '''
+        raise NotImplementedError()
+
     def verify_auth(self):
         '''
         Override this function in a sub-class to implement auth checking.
@@ -1220,12 +1260,13 @@ class GitPython(GitProvider):
 
         return new
 
-    def dir_list(self, tgt_env):
+    def dir_list(self, tgt_env, tree=None):
         '''
         Get list of directories for the target environment using GitPython
         '''
         ret = set()
-        tree = self.get_tree(tgt_env)
+        if tree is None:
+            tree = self.get_tree(tgt_env)
         if not tree:
             return ret
         if self.root(tgt_env):
@@ -1291,13 +1332,14 @@ class GitPython(GitProvider):
         cleaned = self.clean_stale_refs()
         return True if (new_objs or cleaned) else None
 
-    def file_list(self, tgt_env):
+    def file_list(self, tgt_env, tree=None):
         '''
         Get file list for the target environment using GitPython
         '''
         files = set()
         symlinks = {}
-        tree = self.get_tree(tgt_env)
+        if tree is None:
+            tree = self.get_tree(tgt_env)
         if not tree:
             # Not found, return empty objects
             return files, symlinks
@@ -1400,6 +1442,12 @@ class GitPython(GitProvider):
         except (gitdb.exc.ODBError, AttributeError):
             return None
 
+    def tree_sha(self, tree):
+        '''
+        Return the SHA of a git.Tree object
+        '''
+        return tree.hexsha
+
     def write_file(self, blob, dest):
         '''
         Using the blob object, write the file to the destination path
@@ -1669,7 +1717,7 @@ class Pygit2(GitProvider):
 
         return new
 
-    def dir_list(self, tgt_env):
+    def dir_list(self, tgt_env, tree=None):
         '''
         Get a list of directories for the target environment using pygit2
         '''
@@ -1695,7 +1743,8 @@ class Pygit2(GitProvider):
                     )
 
         ret = set()
-        tree = self.get_tree(tgt_env)
+        if tree is None:
+            tree = self.get_tree(tgt_env)
         if not tree:
             return ret
         if self.root(tgt_env):
@@ -1793,7 +1842,7 @@ class Pygit2(GitProvider):
             if (received_objects or refs_pre != refs_post or cleaned) \
             else None
 
-    def file_list(self, tgt_env):
+    def file_list(self, tgt_env, tree=None):
         '''
         Get file list for the target environment using pygit2
         '''
@@ -1822,7 +1871,8 @@ class Pygit2(GitProvider):
 
         files = set()
         symlinks = {}
-        tree = self.get_tree(tgt_env)
+        if tree is None:
+            tree = self.get_tree(tgt_env)
         if not tree:
             # Not found, return empty objects
             return files, symlinks
@@ -2066,6 +2116,12 @@ class Pygit2(GitProvider):
             )
             failhard(self.role)
 
+    def tree_sha(self, tree):
+        '''
+        Return the SHA of a pygit2.Tree object
+        '''
+        return tree.hex
+
     def write_file(self, blob, dest):
         '''
         Using the blob object, write the file to the destination path
@@ -2084,6 +2140,11 @@ class GitBase(object):
     '''
     Base class for gitfs/git_pillar
     '''
+    # (role, cache_root) of the remotes which changed when fetched after
+    # their fetch timeout, to be reported by the next fetch_remotes()
+    _late_changes = set()
+    _late_lock = threading.Lock()
+
     def __init__(self, opts, remotes=None, per_remote_overrides=(),
                  per_remote_only=PER_REMOTE_ONLY, global_only=GLOBAL_ONLY,
                  git_providers=None, cache_root=None, init_remotes=True):
@@ -2138,8 +2199,10 @@ class GitBase(object):
             self.remote_root = salt.utils.path.join(self.cache_root, 'remotes')
         self.env_cache = salt.utils.path.join(self.cache_root, 'envs.p')
         self.hash_cachedir = salt.utils.path.join(self.cache_root, 'hash')
+        self.blob_cachedir = salt.utils.path.join(self.cache_root, 'blobs')
         self.file_list_cachedir = salt.utils.path.join(
             self.opts['cachedir'], 'file_lists', self.role)
+        self.fetch_stats = OrderedDict()
         if init_remotes:
             self.init_remotes(
                 remotes if remotes is not None else [],
@@ -2288,7 +2351,7 @@ class GitBase(object):
                 pass
         to_remove = []
         for item in cachedir_ls:
-            if item in ('hash', 'refs'):
+            if item in ('hash', 'blobs'):
                 continue
             path = salt.utils.path.join(self.cache_root, item)
             if os.path.isdir(path):
@@ -2354,6 +2417,11 @@ class GitBase(object):
         '''
         Fetch all remotes and return a boolean to let the calling function know
         whether or not any remotes were updated in the process of fetching
+
+        Up to ``<role>_fetch_workers`` remotes are fetched at the same time,
+        and a remote still fetching after ``<role>_fetch_timeout`` seconds is
+        left to finish in the background. The duration of each fetch is kept
+        in ``self.fetch_stats``.
         '''
         if remotes is None:
             remotes = []
@@ -2364,26 +2432,134 @@ class GitBase(object):
             )
             remotes = []
 
+        repos = [
+            repo for repo in self.remotes
+            if not remotes or (repo.id, getattr(repo, 'name', None)) in remotes
+        ]
+        workers = self.opts.get('{0}_fetch_workers'.format(self.role), 1)
+        timeout = self.opts.get('{0}_fetch_timeout'.format(self.role), 0)
+        self.fetch_stats = OrderedDict()
+
+        # A fetch which outlived its timeout in a previous update may have
+        # brought changes after that update was done with
+        with GitBase._late_lock:
+            changed = (self.role, self.cache_root) in GitBase._late_changes
+            GitBase._late_changes.discard((self.role, self.cache_root))
+
+        if workers > 1 or timeout > 0:
+            results = self._fetch_concurrent(repos, workers, timeout)
+        else:
+            results = []
+            for repo in repos:
+                repo_changed, duration = self._fetch_repo(repo)
+                self._record_fetch(repo, duration, repo_changed)
+                results.append(repo_changed)
+        # We can't just use the return value from repo.fetch() because the
+        # data could still have changed if old remotes were cleared above.
+        return any(results) or changed
+
+    def _fetch_repo(self, repo):
+        '''
+        Fetch a single remote, return whether it changed and how long it took
+        '''
+        start = time.time()
         changed = False
-        for repo in self.remotes:
-            name = getattr(repo, 'name', None)
-            if not remotes or (repo.id, name) in remotes:
-                try:
-                    if repo.fetch():
-                        # We can't just use the return value from repo.fetch()
-                        # because the data could still have changed if old
-                        # remotes were cleared above. Additionally, we're
-                        # running this in a loop and later remotes without
-                        # changes would override this value and make it
-                        # incorrect.
-                        changed = True
-                except Exception as exc:
-                    log.error(
-                        'Exception caught while fetching %s remote \'%s\': %s',
-                        self.role, repo.id, exc,
-                        exc_info=True
-                    )
-        return changed
+        try:
+            changed = bool(repo.fetch())
+        except Exception as exc:
+            log.error(
+                'Exception caught while fetching %s remote \'%s\': %s',
+                self.role, repo.id, exc,
+                exc_info=True
+            )
+        return changed, time.time() - start
+
+    def _record_fetch(self, repo, duration, changed, timed_out=False):
+        '''
+        Keep the duration of the fetch of a remote in self.fetch_stats
+        '''
+        self.fetch_stats[repo.id] = {'duration': duration,
+                                     'changed': changed,
+                                     'timed_out': timed_out}
+        if not timed_out:
+            log.debug(
+                'Fetched %s remote \'%s\' in %.3fs',
+                self.role, repo.id, duration
+            )
+
+    def _fetch_concurrent(self, repos, workers, timeout):
+        '''
+        Fetch the remotes with up to ``workers`` threads, giving up on the
+        fetches which take more than ``timeout`` seconds (0 waits for all of
+        them). Return the list of the fetch results which came in.
+        '''
+        pending = collections.deque(repos)
+        running = {}
+        results = []
+        abandoned = set()
+        cond = threading.Condition()
+
+        def _worker():
+            while True:
+                with cond:
+                    if not pending:
+                        return
+                    repo = pending.popleft()
+                    running[id(repo)] = (repo, time.time())
+                changed, duration = self._fetch_repo(repo)
+                with cond:
+                    if id(repo) in abandoned:
+                        # A replacement worker was started when this fetch
+                        # timed out, keep the changes for the next update.
+                        if changed:
+                            with GitBase._late_lock:
+                                GitBase._late_changes.add(
+                                    (self.role, self.cache_root))
+                        log.debug(
+                            '%s remote \'%s\' finished fetching after its '
+                            'timeout', self.role, repo.id
+                        )
+                        return
+                    running.pop(id(repo))
+                    self._record_fetch(repo, duration, changed)
+                    results.append(changed)
+                    cond.notify()
+
+        def _start_worker():
+            thread = threading.Thread(target=_worker,
+                                      name='{0}_fetch'.format(self.role))
+            thread.daemon = True
+            thread.start()
+
+        with cond:
+            for _ in range(min(max(workers, 1), len(repos))):
+                _start_worker()
+            while len(results) + len(abandoned) < len(repos):
+                wait = None
+                if timeout > 0:
+                    now = time.time()
+                    for key, (repo, start) in list(six.iteritems(running)):
+                        remaining = start + timeout - now
+                        if remaining > 0:
+                            wait = remaining if wait is None \
+                                else min(wait, remaining)
+                            continue
+                        log.warning(
+                            'Fetch of %s remote \'%s\' is taking more than '
+                            '%ss, continuing without it. It keeps its update '
+                            'lock until the fetch is done.',
+                            self.role, repo.id, timeout
+                        )
+                        running.pop(key)
+                        abandoned.add(key)
+                        self._record_fetch(repo, now - start, False,
+                                           timed_out=True)
+                        if pending:
+                            _start_worker()
+                    if len(results) + len(abandoned) >= len(repos):
+                        break
+                cond.wait(wait)
+        return results
 
     def lock(self, remote=None):
         '''
@@ -2462,6 +2638,8 @@ class GitBase(object):
         except (OSError, IOError):
             # Hash file won't exist if no files have yet been served up
             pass
+        if data['changed']:
+            self._reap_blobs()
 
     def update_intervals(self):
         '''
@@ -2758,7 +2936,9 @@ class GitFS(GitBase):
     def find_file(self, path, tgt_env='base', **kwargs):  # pylint: disable=W0613
         '''
         Find the first file to match the path and ref, read the file out of git
-        and send the path to the newly cached file
+        and send the path to the cached file. The files are cached once per
+        blob SHA, so a blob is shared by all of the environments and paths it
+        is found in and only written out again when it changes.
         '''
         fnd = {'path': '',
                'rel': ''}
@@ -2766,25 +2946,10 @@ class GitFS(GitBase):
                 (not salt.utils.stringutils.is_hex(tgt_env) and tgt_env not in self.envs()):
             return fnd
 
-        dest = salt.utils.path.join(self.cache_root, 'refs', tgt_env, path)
-        hashes_glob = salt.utils.path.join(self.hash_cachedir,
-                                           tgt_env,
-                                           '{0}.hash.*'.format(path))
         blobshadest = salt.utils.path.join(self.hash_cachedir,
                                            tgt_env,
                                            '{0}.hash.blob_sha1'.format(path))
-        lk_fn = salt.utils.path.join(self.hash_cachedir,
-                                     tgt_env,
-                                     '{0}.lk'.format(path))
-        destdir = os.path.dirname(dest)
         hashdir = os.path.dirname(blobshadest)
-        if not os.path.isdir(destdir):
-            try:
-                os.makedirs(destdir)
-            except OSError:
-                # Path exists and is a file, remove it and retry
-                os.remove(destdir)
-                os.makedirs(destdir)
         if not os.path.isdir(hashdir):
             try:
                 os.makedirs(hashdir)
@@ -2805,56 +2970,102 @@ class GitFS(GitBase):
             if blob is None:
                 continue
 
-            def _add_file_stat(fnd, mode):
-                '''
-                Add a the mode to the return dict. In other fileserver backends
-                we stat the file to get its mode, and add the stat result
-                (passed through list() for better serialization) to the 'stat'
-                key in the return dict. However, since we aren't using the
-                stat result for anything but the mode at this time, we can
-                avoid unnecessary work by just manually creating the list and
-                not running an os.stat() on all files in the repo.
-                '''
-                if mode is not None:
-                    fnd['stat'] = [mode]
-                return fnd
-
-            salt.fileserver.wait_lock(lk_fn, dest)
+            dest = self._blob_path(blob_hexsha)
+            if not os.path.isfile(dest):
+                self._write_blob(repo, blob, dest)
+
+            # Keep track of the blob in use for this path so that the blobs
+            # no longer in use can be reaped
             try:
                 with salt.utils.files.fopen(blobshadest, 'r') as fp_:
                     sha = salt.utils.stringutils.to_unicode(fp_.read())
-                    if sha == blob_hexsha:
-                        fnd['rel'] = path
-                        fnd['path'] = dest
-                        return _add_file_stat(fnd, blob_mode)
             except IOError as exc:
                 if exc.errno != errno.ENOENT:
                     six.reraise(*sys.exc_info())
+                sha = None
+            if sha != blob_hexsha:
+                with salt.utils.files.fopen(blobshadest, 'w+') as fp_:
+                    fp_.write(blob_hexsha)
 
-            with salt.utils.files.fopen(lk_fn, 'w'):
-                pass
-
-            for filename in glob.glob(hashes_glob):
-                try:
-                    os.remove(filename)
-                except Exception:
-                    pass
-            # Write contents of file to their destination in the FS cache
-            repo.write_file(blob, dest)
-            with salt.utils.files.fopen(blobshadest, 'w+') as fp_:
-                fp_.write(blob_hexsha)
-            try:
-                os.remove(lk_fn)
-            except OSError:
-                pass
             fnd['rel'] = path
             fnd['path'] = dest
-            return _add_file_stat(fnd, blob_mode)
+            # In other fileserver backends we stat the file to get its mode,
+            # and add the stat result (passed through list() for better
+            # serialization) to the 'stat' key in the return dict. However,
+            # since we aren't using the stat result for anything but the mode
+            # at this time, we can avoid unnecessary work by just manually
+            # creating the list and not running an os.stat() on all files in
+            # the repo.
+            if blob_mode is not None:
+                fnd['stat'] = [blob_mode]
+            return fnd
 
         # No matching file was found in tgt_env. Return a dict with empty paths
         # so the calling function knows the file could not be found.
         return fnd
 
+    def _blob_path(self, blob_hexsha):
+        '''
+        Return the path to the cached copy of a blob
+        '''
+        return salt.utils.path.join(self.blob_cachedir,
+                                    blob_hexsha[:2],
+                                    blob_hexsha)
+
+    def _write_blob(self, repo, blob, dest):
+        '''
+        Write the contents of a blob to its destination in the FS cache. The
+        blob is written to a temporary file first, so that concurrent writers
+        of the same blob never serve a partial file.
+        '''
+        destdir = os.path.dirname(dest)
+        try:
+            os.makedirs(destdir)
+        except OSError as exc:
+            if exc.errno != errno.EEXIST:
+                six.reraise(*sys.exc_info())
+        fd_, tmp = tempfile.mkstemp(prefix='.', dir=destdir)
+        os.close(fd_)
+        try:
+            repo.write_file(blob, tmp)
+            salt.utils.files.rename(tmp, dest)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _reap_blobs(self):
+        '''
+        Remove the cached blobs which are not in use by any path anymore
+        '''
+        in_use = set()
+        for root, _, files in salt.utils.path.os_walk(self.hash_cachedir):
+            for name in files:
+                if not name.endswith('.hash.blob_sha1'):
+                    continue
+                try:
+                    with salt.utils.files.fopen(
+                            os.path.join(root, name), 'r') as fp_:
+                        in_use.add(
+                            salt.utils.stringutils.to_unicode(fp_.read()))
+                except (OSError, IOError):
+                    continue
+        # Leave alone the blobs which were just written out, their path may
+        # not have been recorded yet.
+        cutoff = time.time() - BLOB_REAP_AGE
+        for root, _, files in salt.utils.path.os_walk(self.blob_cachedir):
+            for name in files:
+                if name.lstrip('.').split('.')[0] in in_use:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                except OSError:
+                    pass
+
     def serve_file(self, load, fnd):
         '''
         Return a chunk from a file based on the data received
@@ -2899,26 +3110,17 @@ class GitFS(GitBase):
         if not all(x in load for x in ('path', 'saltenv')):
             return '', None
         ret = {'hash_type': self.opts['hash_type']}
-        relpath = fnd['rel']
         path = fnd['path']
-        hashdest = salt.utils.path.join(self.hash_cachedir,
-                                        load['saltenv'],
-                                        '{0}.hash.{1}'.format(relpath,
-                                                              self.opts['hash_type']))
+        # Blobs are cached by SHA, so the hash of the blob never changes
+        hashdest = '{0}.{1}'.format(path, self.opts['hash_type'])
         try:
             with salt.utils.files.fopen(hashdest, 'rb') as fp_:
-                ret['hsum'] = fp_.read()
+                ret['hsum'] = salt.utils.stringutils.to_unicode(fp_.read())
             return ret
         except IOError as exc:
             if exc.errno != errno.ENOENT:
                 six.reraise(*sys.exc_info())
 
-        try:
-            os.makedirs(os.path.dirname(hashdest))
-        except OSError as exc:
-            if exc.errno != errno.EEXIST:
-                six.reraise(*sys.exc_info())
-
         ret['hsum'] = salt.utils.hashutils.get_hash(path, self.opts['hash_type'])
         with salt.utils.files.fopen(hashdest, 'w+') as fp_:
             fp_.write(ret['hsum'])
@@ -2957,10 +3159,11 @@ class GitFS(GitBase):
             if salt.utils.stringutils.is_hex(load['saltenv']) \
                     or load['saltenv'] in self.envs():
                 for repo in self.remotes:
-                    repo_files, repo_symlinks = repo.file_list(load['saltenv'])
+                    repo_files, repo_symlinks, repo_dirs = \
+                        repo.list_env(load['saltenv'])
                     ret['files'].update(repo_files)
                     ret['symlinks'].update(repo_symlinks)
-                    ret['dirs'].update(repo.dir_list(load['saltenv']))
+                    ret['dirs'].update(repo_dirs)
             ret['files'] = sorted(ret['files'])
             ret['dirs'] = sorted(ret['dirs'])
 
@@ -23,13 +23,49 @@ def store_job(opts, load, event=None, mminion=None):
     # Generate EndTime
     endtime = salt.utils.jid.jid_to_time(salt.utils.jid.gen_jid(opts))
     # If the return data is invalid, just ignore it
-    if any(key not in load for key in ('return', 'jid', 'id')):
-        return False
-    if not salt.utils.verify.valid_id(opts, load['id']):
+    if not _valid_load(opts, load):
         return False
     if mminion is None:
         mminion = salt.minion.MasterMinion(opts, states=False, rend=False)
 
+    if _prep_load(opts, load, event, mminion):
+        _cache_loads(opts, [load], mminion, endtime)
+
+
+def store_jobs(opts, loads, event=None, mminion=None):
+    '''
+    Store job information of several returns using the configured
+    master_job_cache. The returns are written with a single call to the
+    ``returner_many`` function of the job cache when it provides one.
+    '''
+    # Generate EndTime
+    endtime = salt.utils.jid.jid_to_time(salt.utils.jid.gen_jid(opts))
+    # If the return data is invalid, just ignore it
+    loads = [load for load in loads if _valid_load(opts, load)]
+    if not loads:
+        return
+    if mminion is None:
+        mminion = salt.minion.MasterMinion(opts, states=False, rend=False)
+
+    loads = [load for load in loads if _prep_load(opts, load, event, mminion)]
+    if loads:
+        _cache_loads(opts, loads, mminion, endtime)
+
+
+def _valid_load(opts, load):
+    '''
+    Check that a return holds the data needed to store it
+    '''
+    if any(key not in load for key in ('return', 'jid', 'id')):
+        return False
+    return salt.utils.verify.valid_id(opts, load['id'])
+
+
+def _prep_load(opts, load, event, mminion):
+    '''
+    Prepare the jid of a return and fire its event on the master event bus.
+    Returns True if the return must be written to the master job cache.
+    '''
     job_cache = opts['master_job_cache']
     if load['jid'] == 'req':
         # The minion is returning a standalone job, request a jobid
@@ -88,25 +124,34 @@ def store_job(opts, load, event=None, mminion=None):
     # if you have a job_cache, or an ext_job_cache, don't write to
     # the regular master cache
     if not opts['job_cache'] or opts.get('ext_job_cache'):
-        return
+        return False
 
     # do not cache job results if explicitly requested
     if load.get('jid') == 'nocache':
         log.debug('Ignoring job return with jid for caching %s from %s',
                   load['jid'], load['id'])
-        return
+        return False
 
-    # otherwise, write to the master cache
+    return True
+
+
+def _cache_loads(opts, loads, mminion, endtime):
+    '''
+    Write prepared returns to the master job cache
+    '''
+    job_cache = opts['master_job_cache']
     savefstr = '{0}.save_load'.format(job_cache)
     getfstr = '{0}.get_load'.format(job_cache)
     fstr = '{0}.returner'.format(job_cache)
+    manyfstr = '{0}.returner_many'.format(job_cache)
     updateetfstr = '{0}.update_endtime'.format(job_cache)
-    if 'fun' not in load and load.get('return', {}):
-        ret_ = load.get('return', {})
-        if 'fun' in ret_:
-            load.update({'fun': ret_['fun']})
-        if 'user' in ret_:
-            load.update({'user': ret_['user']})
+    for load in loads:
+        if 'fun' not in load and load.get('return', {}):
+            ret_ = load.get('return', {})
+            if 'fun' in ret_:
+                load.update({'fun': ret_['fun']})
+            if 'user' in ret_:
+                load.update({'user': ret_['user']})
 
     # Try to reach returner methods
     try:
@@ -119,27 +164,39 @@ def store_job(opts, load, event=None, mminion=None):
         raise KeyError(emsg)
 
     if job_cache != 'local_cache':
+        for load in loads:
+            try:
+                mminion.returners[savefstr](load['jid'], load)
+            except KeyError as e:
+                log.error("Load does not contain 'jid': %s", e)
+            except Exception:
+                log.critical(
+                    "The specified '{0}' returner threw a stack trace:\n".format(job_cache),
+                    exc_info=True
+                )
+
+    if len(loads) > 1 and manyfstr in mminion.returners:
         try:
-            mminion.returners[savefstr](load['jid'], load)
-        except KeyError as e:
-            log.error("Load does not contain 'jid': %s", e)
+            mminion.returners[manyfstr](loads)
         except Exception:
             log.critical(
                 "The specified '{0}' returner threw a stack trace:\n".format(job_cache),
                 exc_info=True
             )
-
-    try:
-        mminion.returners[fstr](load)
-    except Exception:
-        log.critical(
-            "The specified '{0}' returner threw a stack trace:\n".format(job_cache),
-            exc_info=True
-        )
+    else:
+        for load in loads:
+            try:
+                mminion.returners[fstr](load)
+            except Exception:
+                log.critical(
+                    "The specified '{0}' returner threw a stack trace:\n".format(job_cache),
+                    exc_info=True
+                )
 
     if (opts.get('job_cache_store_endtime')
             and updateetfstr in mminion.returners):
-        mminion.returners[updateetfstr](load['jid'], endtime)
+        for jid in set(load['jid'] for load in loads):
+            mminion.returners[updateetfstr](jid, endtime)
 
 
 def store_minions(opts, jid, minions, mminion=None, syndic_id=None):
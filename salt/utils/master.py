@@ -9,9 +9,13 @@
 
 # Import python libs
 from __future__ import absolute_import, unicode_literals
+import bisect
 import os
 import logging
+import mmap
 import signal
+import struct
+import time
 from threading import Thread, Event
 
 # Import salt libs
@@ -200,10 +204,13 @@ class MasterPillarUtil(object):
             return mine_data
         if not minion_ids:
             minion_ids = self.cache.list('minions')
+        minion_ids = [minion_id for minion_id in minion_ids
+                      if salt.utils.verify.valid_id(self.opts, minion_id)]
+        cdata = self.cache.fetch_many(
+            [('minions/{0}'.format(minion_id), 'mine') for minion_id in minion_ids]
+        )
         for minion_id in minion_ids:
-            if not salt.utils.verify.valid_id(self.opts, minion_id):
-                continue
-            mdata = self.cache.fetch('minions/{0}'.format(minion_id), 'mine')
+            mdata = cdata[('minions/{0}'.format(minion_id), 'mine')]
             if isinstance(mdata, dict):
                 mine_data[minion_id] = mdata
         return mine_data
@@ -219,10 +226,13 @@ class MasterPillarUtil(object):
             return grains, pillars
         if not minion_ids:
             minion_ids = self.cache.list('minions')
+        minion_ids = [minion_id for minion_id in minion_ids
+                      if salt.utils.verify.valid_id(self.opts, minion_id)]
+        cdata = self.cache.fetch_many(
+            [('minions/{0}'.format(minion_id), 'data') for minion_id in minion_ids]
+        )
         for minion_id in minion_ids:
-            if not salt.utils.verify.valid_id(self.opts, minion_id):
-                continue
-            mdata = self.cache.fetch('minions/{0}'.format(minion_id), 'data')
+            mdata = cdata[('minions/{0}'.format(minion_id), 'data')]
             if not isinstance(mdata, dict):
                 log.warning(
                     'cache.fetch should always return a dict. ReturnedType: %s, MinionId: %s',
@@ -476,6 +486,170 @@ class MasterPillarUtil(object):
         return True
 
 
+class WorkerStats(object):
+    '''
+    Request statistics of the master worker processes, kept in a memory
+    mapped file in the master cachedir.
+
+    The file has a fixed layout: a header followed by one region per worker.
+    A region holds the worker counters and a table of command slots, each
+    with a request count, the total and maximum time spent and a latency
+    histogram. Every worker only writes its own region, so no locking is
+    needed and readers such as ``salt-run manage.worker_stats`` map the file
+    and read it without talking to the master.
+    '''
+    MAGIC = b'SALTWSTA'
+    VERSION = 1
+    SLOTS = 64
+    # Upper bounds in seconds of the latency histogram buckets, the last
+    # bucket counts the requests slower than the last bound
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+               0.25, 0.5, 1, 2.5, 5, 10)
+    HEADER = struct.Struct(str('<8sIIII'))
+    # pid, requests, queued returns, start time, busy time
+    WORKER = struct.Struct(str('<QQQdd'))
+    # command, requests, total time, maximum time, histogram
+    SLOT = struct.Struct(str('<32sQdd{0}Q'.format(len(BUCKETS) + 1)))
+
+    def __init__(self, opts, index):
+        self.opts = opts
+        self.index = index
+        self.slots = {}
+        self.counters = []
+        path = worker_stats_path(opts)
+        with salt.utils.files.fopen(path, 'r+b') as fp_:
+            self._map = mmap.mmap(fp_.fileno(), 0)
+        magic, _, workers, _, _ = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or index >= workers:
+            raise SaltException(
+                'Worker {0} has no region in the worker stats file {1}'.format(index, path)
+            )
+        self.offset = self.HEADER.size + index * self.region_size()
+        # Clear the data left by the previous process of this worker
+        self._map[self.offset:self.offset + self.region_size()] = \
+            b'\0' * self.region_size()
+        self.requests = 0
+        self.busy = 0.0
+        self.started = time.time()
+        self.update(0)
+
+    @classmethod
+    def region_size(cls):
+        return cls.WORKER.size + cls.SLOTS * cls.SLOT.size
+
+    @classmethod
+    def create(cls, opts, workers):
+        '''
+        Create the zeroed worker stats file for the given number of workers
+        '''
+        path = worker_stats_path(opts)
+        with salt.utils.files.fopen(path, 'wb') as fp_:
+            fp_.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, workers,
+                                      cls.SLOTS, len(cls.BUCKETS)))
+            fp_.write(b'\0' * (workers * cls.region_size()))
+        return path
+
+    def update(self, queued):
+        '''
+        Write the worker counters
+        '''
+        self.WORKER.pack_into(self._map, self.offset, os.getpid(), self.requests,
+                              queued, self.started, self.busy)
+
+    def record(self, cmd, duration, queued=0):
+        '''
+        Account for a request of the given command which took duration
+        seconds. queued is the number of requests the worker still holds.
+        '''
+        self.requests += 1
+        self.busy += duration
+        self.record_slot(cmd, duration)
+        self.update(queued)
+
+    def record_slot(self, cmd, duration):
+        '''
+        Account for a run of cmd which took duration seconds in its slot only,
+        for the work done within the requests such as the pillar renders
+        '''
+        if cmd not in self.slots:
+            if len(self.slots) < self.SLOTS - 1:
+                self.slots[cmd] = len(self.slots)
+                self.counters.append([0, 0.0, 0.0] + [0] * (len(self.BUCKETS) + 1))
+            elif '__other__' not in self.slots:
+                # The last slot gathers the commands which did not get one
+                self.slots['__other__'] = self.SLOTS - 1
+                self.counters.append([0, 0.0, 0.0] + [0] * (len(self.BUCKETS) + 1))
+            if cmd not in self.slots:
+                cmd = '__other__'
+        slot = self.slots[cmd]
+        counters = self.counters[slot]
+        counters[0] += 1
+        counters[1] += duration
+        counters[2] = max(counters[2], duration)
+        counters[3 + bisect.bisect_left(self.BUCKETS, duration)] += 1
+        self.SLOT.pack_into(
+            self._map,
+            self.offset + self.WORKER.size + slot * self.SLOT.size,
+            salt.utils.stringutils.to_bytes(cmd)[:32],
+            *counters
+        )
+
+    @classmethod
+    def read(cls, opts):
+        '''
+        Read the worker stats file, returns a dict holding the counters of
+        every worker which has handled requests
+        '''
+        path = worker_stats_path(opts)
+        try:
+            with salt.utils.files.fopen(path, 'rb') as fp_:
+                data = fp_.read()
+        except (IOError, OSError):
+            return {}
+        magic, _, workers, slots, buckets = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or slots != cls.SLOTS or buckets != len(cls.BUCKETS):
+            log.error('The worker stats file %s has an unknown layout', path)
+            return {}
+        bounds = ['<={0}'.format(bound) for bound in cls.BUCKETS]
+        bounds.append('>{0}'.format(cls.BUCKETS[-1]))
+        now = time.time()
+        ret = {}
+        for index in range(workers):
+            offset = cls.HEADER.size + index * cls.region_size()
+            pid, requests, queued, started, busy = cls.WORKER.unpack_from(data, offset)
+            if not pid:
+                continue
+            uptime = now - started
+            worker = {'pid': pid,
+                      'requests': requests,
+                      'queued': queued,
+                      'uptime': uptime,
+                      'busy': busy,
+                      'utilization': busy / uptime if uptime > 0 else 0.0,
+                      'commands': {}}
+            for slot in range(cls.SLOTS):
+                counters = cls.SLOT.unpack_from(
+                    data, offset + cls.WORKER.size + slot * cls.SLOT.size)
+                if not counters[1]:
+                    continue
+                name = salt.utils.stringutils.to_unicode(counters[0].rstrip(b'\0'))
+                worker['commands'][name] = {
+                    'runs': counters[1],
+                    'mean': counters[2] / counters[1],
+                    'max': counters[3],
+                    'histogram': dict(zip(bounds, counters[4:])),
+                }
+            ret['MWorker-{0}'.format(index)] = worker
+        return ret
+
+
+def worker_stats_path(opts):
+    '''
+    Return the path of the worker stats file
+    '''
+    return os.path.join(opts['cachedir'], 'worker_stats')
+
+
 class CacheTimer(Thread):
     '''
     A basic timer class the fires timer-events every second.
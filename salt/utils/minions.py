@@ -9,7 +9,9 @@ from __future__ import absolute_import, unicode_literals
 import os
 import fnmatch
 import re
+import time
 import logging
+import threading
 
 # Import salt libs
 import salt.payload
@@ -179,6 +181,215 @@ def nodegroup_comp(nodegroup, nodegroups, skip=None, first_call=True):
         return ret
 
 
+class MinionDataIndex(object):
+    '''
+    In-memory index of the grains and pillar stored in the minion data cache,
+    shared by every CkMinions instance of a process.
+
+    On refresh, only the minions whose cache bank changed since the last
+    refresh are read again, as told by ``Cache.list_with_mtime``. Besides the
+    data itself, an inverted index maps every dict key and every (lowercased)
+    value found in the grains and pillar to the minions carrying it. This
+    narrows plain targets, which contain no glob characters, down to a few
+    candidates before ``salt.utils.data.subdict_match`` is run against their
+    in-memory data.
+    '''
+    instances = {}
+    search_types = ('grains', 'pillar')
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.data = {}
+        self.mtimes = {}
+        self.values = dict((search_type, {}) for search_type in self.search_types)
+        self.keys = dict((search_type, {}) for search_type in self.search_types)
+        self.tokens = {}
+        self.lock = threading.RLock()
+
+    @classmethod
+    def instance(cls, opts, cache):
+        '''
+        Return the index of the minion data cache described by ``opts``,
+        creating it on first use
+        '''
+        key = (opts.get('cache', 'localfs'), opts.get('cachedir'))
+        if key not in cls.instances:
+            cls.instances[key] = cls(cache)
+        return cls.instances[key]
+
+    @staticmethod
+    def _text(value):
+        '''
+        Convert a value the same way subdict_match does before comparing it
+        '''
+        try:
+            return six.text_type(value).lower()
+        except UnicodeDecodeError:
+            return salt.utils.stringutils.to_unicode(value).lower()
+
+    def _walk(self, data, values, keys):
+        '''
+        Collect the dict keys and the values subdict_match may compare a
+        target against
+        '''
+        if isinstance(data, dict):
+            for key, value in six.iteritems(data):
+                keys.add(key if isinstance(key, six.string_types) else six.text_type(key))
+                if isinstance(value, (dict, list, tuple)):
+                    self._walk(value, values, keys)
+                else:
+                    values.add(self._text(value))
+        elif isinstance(data, (list, tuple)):
+            for member in data:
+                values.add(self._text(member))
+                if isinstance(member, (dict, list, tuple)):
+                    self._walk(member, values, keys)
+
+    def _remove(self, id_):
+        for search_type, kind, token in self.tokens.pop(id_, ()):
+            index = getattr(self, kind)[search_type]
+            index[token].discard(id_)
+            if not index[token]:
+                del index[token]
+        self.data.pop(id_, None)
+        self.mtimes.pop(id_, None)
+
+    def update(self, id_, mdata, mtime=None):
+        '''
+        Replace the indexed data of a minion
+        '''
+        with self.lock:
+            self._remove(id_)
+            self.data[id_] = mdata
+            self.mtimes[id_] = mtime
+            tokens = []
+            for search_type in self.search_types:
+                if not isinstance(mdata, dict):
+                    break
+                values = set()
+                keys = set()
+                self._walk(mdata.get(search_type), values, keys)
+                for kind, found in (('values', values), ('keys', keys)):
+                    index = getattr(self, kind)[search_type]
+                    for token in found:
+                        index.setdefault(token, set()).add(id_)
+                        tokens.append((search_type, kind, token))
+            self.tokens[id_] = tokens
+
+    def refresh(self):
+        '''
+        Sync the index with the minion data cache, only fetching the data of
+        the minions which changed since the last refresh
+        '''
+        mtimes = self.cache.list_with_mtime('minions')
+        now = time.time()
+        with self.lock:
+            for id_ in set(self.data).difference(mtimes):
+                self._remove(id_)
+            changed = [id_ for id_, mtime in six.iteritems(mtimes)
+                       if id_ not in self.data
+                       or mtime is None
+                       or mtime != self.mtimes[id_]]
+            if not changed:
+                return
+            fetched = self.cache.fetch_many(
+                [('minions/{0}'.format(id_), 'data') for id_ in changed]
+            )
+            for id_ in changed:
+                mtime = mtimes[id_]
+                # Filesystems with a coarse mtime resolution may not show an
+                # update made right after the previous one, so recently
+                # changed entries are read again on the next refresh
+                if mtime is not None and mtime > now - 2:
+                    mtime = -1
+                self.update(id_, fetched[('minions/{0}'.format(id_), 'data')], mtime)
+
+    def match(self, search_type, expr, delimiter, regex_match=False, exact_match=False):
+        '''
+        Return the set of cached minions whose ``search_type`` data matches
+        ``expr``, with the semantics of ``salt.utils.data.subdict_match``
+        '''
+        with self.lock:
+            candidates = self.data
+            if not regex_match \
+                    and delimiter == DEFAULT_TARGET_DELIM \
+                    and not any(char in expr for char in '*?['):
+                # A plain target can only match if one of its trailing
+                # components is a key or a value found in the data
+                splits = expr.split(delimiter)
+                candidates = set()
+                for idx in range(1, len(splits)):
+                    token = delimiter.join(splits[idx:])
+                    candidates.update(self.values[search_type].get(self._text(token), ()))
+                    candidates.update(self.keys[search_type].get(token, ()))
+            matched = set()
+            for id_ in candidates:
+                mdata = self.data[id_]
+                if mdata is None:
+                    continue
+                if salt.utils.data.subdict_match(mdata.get(search_type),
+                                                 expr,
+                                                 delimiter=delimiter,
+                                                 regex_match=regex_match,
+                                                 exact_match=exact_match):
+                    matched.add(id_)
+            return matched
+
+
+def _eval_compound(tokens):
+    '''
+    Evaluate a compound target expression made of sets of minion ids and the
+    ``|``, ``&``, ``-``, ``(`` and ``)`` operators, with the same precedence
+    as the python set operators.
+    '''
+    pos = [0]
+
+    def peek():
+        return tokens[pos[0]] if pos[0] < len(tokens) else None
+
+    def take():
+        token = peek()
+        pos[0] += 1
+        return token
+
+    def atom():
+        token = take()
+        if token == '(':
+            ret = union()
+            if take() != ')':
+                raise ValueError('Unbalanced parenthesis')
+            return ret
+        if not isinstance(token, set):
+            raise ValueError('Unexpected token {0}'.format(token))
+        return token
+
+    def difference():
+        ret = atom()
+        while peek() == '-':
+            take()
+            ret = ret - atom()
+        return ret
+
+    def intersection():
+        ret = difference()
+        while peek() == '&':
+            take()
+            ret = ret & difference()
+        return ret
+
+    def union():
+        ret = intersection()
+        while peek() == '|':
+            take()
+            ret = ret | intersection()
+        return ret
+
+    ret = union()
+    if pos[0] != len(tokens):
+        raise ValueError('Unexpected token {0}'.format(peek()))
+    return ret
+
+
 class CkMinions(object):
     '''
     Used to check what minions should respond from a target
@@ -198,6 +409,19 @@ class CkMinions(object):
         else:
             self.acc = 'accepted'
 
+    def _data_index(self):
+        '''
+        Return the refreshed minion data index, or None if it is disabled or
+        the cache driver cannot list the bank entries with their mtime
+        '''
+        if not self.opts.get('minion_data_index', False):
+            return None
+        if '{0}.list_with_mtime'.format(self.cache.driver) not in self.cache.modules:
+            return None
+        index = MinionDataIndex.instance(self.opts, self.cache)
+        index.refresh()
+        return index
+
     def _check_nodegroup_minions(self, expr, greedy):  # pylint: disable=unused-argument
         '''
         Return minions found by looking at nodegroups
@@ -292,7 +516,21 @@ class CkMinions(object):
             return {'minions': [],
                     'missing': []}
 
-        if cache_enabled:
+        index = self._data_index() if cache_enabled else None
+        if index is not None:
+            matched = index.match(search_type,
+                                  expr,
+                                  delimiter,
+                                  regex_match=regex_match,
+                                  exact_match=exact_match)
+            if greedy:
+                minions = [id_ for id_ in minions
+                           if id_ in matched
+                           or id_ not in index.data
+                           or index.data[id_] is None]
+            else:
+                minions = [id_ for id_ in minions if id_ in matched]
+        elif cache_enabled:
             if greedy:
                 cminions = list_cached_minions()
             else:
@@ -301,10 +539,13 @@ class CkMinions(object):
                 return {'minions': minions,
                         'missing': []}
             minions = set(minions)
+            if greedy:
+                cminions = [id_ for id_ in cminions if id_ in minions]
+            cdata = self.cache.fetch_many(
+                [('minions/{0}'.format(id_), 'data') for id_ in cminions]
+            )
             for id_ in cminions:
-                if greedy and id_ not in minions:
-                    continue
-                mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
+                mdata = cdata[('minions/{0}'.format(id_), 'data')]
                 if mdata is None:
                     if not greedy:
                         minions.remove(id_)
@@ -399,9 +640,13 @@ class CkMinions(object):
                             'missing': []}
             proto = 'ipv{0}'.format(tgt.version)
 
+            index = self._data_index()
             minions = set(minions)
             for id_ in cminions:
-                mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
+                if index is not None:
+                    mdata = index.data.get(id_)
+                else:
+                    mdata = self.cache.fetch('minions/{0}'.format(id_), 'data')
                 if mdata is None:
                     if not greedy:
                         minions.remove(id_)
@@ -518,7 +763,7 @@ class CkMinions(object):
                             if not results[-1] in ('&', '|', '('):
                                 results.append('&')
                             results.append('(')
-                            results.append(six.text_type(set(minions)))
+                            results.append(set(minions))
                             results.append('-')
                             unmatched.append('-')
                         elif word == 'and':
@@ -547,7 +792,7 @@ class CkMinions(object):
                         # seq start with oper, fail
                         if word == 'not':
                             results.append('(')
-                            results.append(six.text_type(set(minions)))
+                            results.append(set(minions))
                             results.append('-')
                             unmatched.append('-')
                         elif word == '(':
@@ -589,7 +834,7 @@ class CkMinions(object):
                     if 'L' == target_info['engine']:
                         engine_args.append(results and results[-1] == '-')
                     _results = engine(*engine_args)
-                    results.append(six.text_type(set(_results['minions'])))
+                    results.append(set(_results['minions']))
                     missing.extend(_results['missing'])
                     if unmatched and unmatched[-1] == '-':
                         results.append(')')
@@ -598,7 +843,7 @@ class CkMinions(object):
                 else:
                     # The match is not explicitly defined, evaluate as a glob
                     _results = self._check_glob_minions(word, True)
-                    results.append(six.text_type(set(_results['minions'])))
+                    results.append(set(_results['minions']))
                     if unmatched and unmatched[-1] == '-':
                         results.append(')')
                         unmatched.pop()
@@ -606,11 +851,10 @@ class CkMinions(object):
             # Add a closing ')' for each item left in unmatched
             results.extend([')' for item in unmatched])
 
-            results = ' '.join(results)
             log.debug('Evaluating final compound matching expr: %s',
                       results)
             try:
-                minions = list(eval(results))  # pylint: disable=W0123
+                minions = list(_eval_compound(results))
                 return {'minions': minions, 'missing': missing}
             except Exception:
                 log.error('Invalid compound target: %s', expr)
@@ -1150,8 +1394,11 @@ def mine_get(tgt, fun, tgt_type='glob', opts=None):
     else:
         return {}
 
+    mine_data = cache.fetch_many(
+        [('minions/{0}'.format(minion), 'mine') for minion in minions]
+    )
     for minion in minions:
-        mdata = cache.fetch('minions/{0}'.format(minion), 'mine')
+        mdata = mine_data[('minions/{0}'.format(minion), 'mine')]
 
         if not isinstance(mdata, dict):
             continue
@@ -456,6 +456,17 @@ class ProcessManager(object):
     def stop_restarting(self):
         self._restart_processes = False
 
+    def stop_process(self, name):
+        '''
+        Terminate the processes with the given name, they are no longer
+        managed and will not be restarted
+        '''
+        for pid, mapping in list(six.iteritems(self._process_map)):
+            if mapping['Process'].name == name:
+                del self._process_map[pid]
+                mapping['Process'].terminate()
+                mapping['Process'].join(self.wait_for_kill)
+
     def send_signal_to_processes(self, signal_):
         if (salt.utils.platform.is_windows() and
                 signal_ in (signal.SIGTERM, signal.SIGINT)):
@@ -482,9 +493,14 @@ class ProcessManager(object):
                 del self._process_map[pid]
 
     @gen.coroutine
-    def run(self, asynchronous=False):
+    def run(self, asynchronous=False, periodic=None, interval=10):
         '''
         Load and start all available api modules
+
+        :param func periodic: A function called after each check of the
+                              children
+        :param int interval: The number of seconds between the checks of the
+                             children
         '''
         log.debug('Process Manager starting!')
         appendproctitle(self.name)
@@ -502,13 +518,15 @@ class ProcessManager(object):
             try:
                 # in case someone died while we were waiting...
                 self.check_children()
+                if periodic is not None:
+                    periodic()
                 # The event-based subprocesses management code was removed from here
                 # because os.wait() conflicts with the subprocesses management logic
                 # implemented in `multiprocessing` package. See #35480 for details.
                 if asynchronous:
-                    yield gen.sleep(10)
+                    yield gen.sleep(interval)
                 else:
-                    time.sleep(10)
+                    time.sleep(interval)
                 if not self._process_map:
                     break
             # OSError is raised if a signal handler is called (SIGTERM) during os.wait
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+'''
+Simple script to time the dispatch of events to the subscriptions of a
+salt.utils.event.SaltEvent, as done by a LocalClient waiting for the returns
+of many jobs at once. The events are fed to the SaltEvent directly, without
+an event bus.
+
+    python tests/eventbench.py [-s SUBSCRIPTIONS] [-e EVENTS] [--linear]
+
+With --linear, the previous linear scan of the cached events is timed too,
+for comparison. It is slow, use it with a few hundred events.
+'''
+# Import python libs
+from __future__ import absolute_import, print_function
+import logging
+import optparse
+import time
+
+# Import Salt libs
+import salt.utils.event
+
+
+def events(subscriptions, count):
+    '''
+    Return the events of the returns of ``subscriptions`` jobs, interleaved
+    like the returns of concurrent jobs
+    '''
+    jids = ['2019{0:016d}'.format(idx) for idx in range(subscriptions)]
+    ret = []
+    for idx in range(count):
+        jid = jids[idx % subscriptions]
+        ret.append({
+            'tag': 'salt/job/{0}/ret/minion{1}'.format(jid, idx // subscriptions),
+            'data': {'jid': jid, 'return': True},
+        })
+    return jids, ret
+
+
+def run_indexed(jids, evts):
+    event = salt.utils.event.SaltEvent('master', listen=False)
+    for jid in jids:
+        event.subscribe('salt/job/{0}'.format(jid))
+    start = time.time()
+    for evt in evts:
+        event.pending_events.add(evt)
+    # Every job reads its returns
+    for evt in evts:
+        event._check_pending('salt/job/{0}'.format(evt['data']['jid']))
+    return time.time() - start
+
+
+def run_linear(jids, evts):
+    '''
+    The cached events and the subscriptions in lists, as SaltEvent used to
+    keep them
+    '''
+    match = salt.utils.event.SaltEvent._match_tag_startswith
+    pending_tags = [['salt/job/{0}'.format(jid), match] for jid in jids]
+    pending_events = []
+    start = time.time()
+    for evt in evts:
+        if any(pmatch(evt['tag'], ptag) for ptag, pmatch in pending_tags):
+            pending_events.append(evt)
+    for evt in evts:
+        tag = 'salt/job/{0}'.format(evt['data']['jid'])
+        old_events = pending_events
+        pending_events = []
+        ret = None
+        for pending in old_events:
+            if match(pending['tag'], tag):
+                if ret is None:
+                    ret = pending
+                else:
+                    pending_events.append(pending)
+            elif any(pmatch(pending['tag'], ptag)
+                     for ptag, pmatch in pending_tags):
+                pending_events.append(pending)
+    return time.time() - start
+
+
+def run(subscriptions, count, linear):
+    # Time the dispatch, not the creation of the trace log records
+    logging.getLogger('salt.utils.event').setLevel(logging.WARNING)
+    jids, evts = events(subscriptions, count)
+    print('{0} subscriptions, {1} events'.format(subscriptions, count))
+    timings = [('indexed', run_indexed(jids, evts))]
+    if linear:
+        timings.append(('linear', run_linear(jids, evts)))
+    for name, duration in timings:
+        print('{0:<10}{1:>10.3f}s{2:>14.0f} events/s'.format(
+            name, duration, count / duration))
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('-s', '--subscriptions', dest='subscriptions',
+                      type='int', default=10000,
+                      help='The number of concurrent subscriptions')
+    parser.add_option('-e', '--events', dest='events', type='int',
+                      default=20000,
+                      help='The number of events to dispatch')
+    parser.add_option('--linear', dest='linear', action='store_true',
+                      default=False,
+                      help='Also time the linear scan, it is slow')
+    options, _ = parser.parse_args()
+    run(options.subscriptions, options.events, options.linear)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+'''
+Simple script to time the serialization of representative salt payloads
+with salt.payload.Serial
+
+    python tests/payloadbench.py [-n NUMBER]
+'''
+# Import python libs
+from __future__ import absolute_import, print_function
+import datetime
+import optparse
+import timeit
+
+# Import Salt libs
+import salt.payload
+import salt.utils.odict
+
+
+def highstate_return(states=500):
+    '''
+    Return the load of a minion returning a highstate
+    '''
+    ret = {}
+    for idx in range(states):
+        tag = 'file_|-/etc/app/conf.d/{0}.conf_|-/etc/app/conf.d/{0}.conf_|-managed'.format(idx)
+        ret[tag] = {
+            'name': '/etc/app/conf.d/{0}.conf'.format(idx),
+            'changes': {'diff': '--- \n+++ \n@@ -1 +1 @@\n-old\n+new {0}\n'.format(idx)} if idx % 10 == 0 else {},
+            'result': True,
+            'comment': 'File /etc/app/conf.d/{0}.conf is in the correct state'.format(idx),
+            '__sls__': 'app.config',
+            '__run_num__': idx,
+            'start_time': '10:12:{0:02d}.{1:06d}'.format(idx % 60, idx),
+            'duration': 1.234,
+            '__id__': '/etc/app/conf.d/{0}.conf'.format(idx),
+        }
+    return {'cmd': '_return', 'id': 'minion.example.com', 'jid': '20191018101010123456',
+            'fun': 'state.highstate', 'fun_args': [], 'retcode': 0, 'success': True,
+            'return': ret}
+
+
+def grains():
+    '''
+    Return a grains dictionary
+    '''
+    return {
+        'id': 'minion.example.com', 'os': 'CentOS', 'os_family': 'RedHat',
+        'osrelease': '7.6.1810', 'osrelease_info': [7, 6, 1810], 'kernel': 'Linux',
+        'kernelrelease': '3.10.0-957.el7.x86_64', 'num_cpus': 16, 'mem_total': 64238,
+        'cpu_flags': ['fpu', 'vme', 'de', 'pse', 'tsc', 'msr', 'pae', 'mce', 'cx8', 'apic'] * 8,
+        'ip4_interfaces': {'eth{0}'.format(idx): ['10.0.{0}.12'.format(idx)] for idx in range(8)},
+        'ipv4': ['10.0.{0}.12'.format(idx) for idx in range(8)],
+        'fqdns': ['minion.example.com'], 'roles': ['web', 'app', 'db'],
+        'saltversioninfo': [2019, 2, 0, 0], 'virtual': 'kvm', 'biosreleasedate': '04/01/2014',
+        'disks': ['vda', 'vdb'], 'gpus': [], 'selinux': {'enabled': True, 'enforced': 'Enforcing'},
+        'systemd': {'version': '219', 'features': '+PAM +AUDIT +SELINUX +IMA -APPARMOR +SMACK'},
+    }
+
+
+def pillar():
+    '''
+    Return a nested pillar with ordered dicts and datetimes
+    '''
+    users = salt.utils.odict.OrderedDict()
+    for idx in range(200):
+        users['user{0}'.format(idx)] = salt.utils.odict.OrderedDict([
+            ('uid', 1000 + idx),
+            ('groups', ['users', 'wheel'] if idx % 5 == 0 else ['users']),
+            ('ssh_keys', ['ssh-rsa AAAAB3NzaC1yc2EAAAADAQABAAABAQC{0} user{0}'.format(idx)]),
+            ('expires', datetime.datetime(2020, 1, 1, 0, 0, idx % 60)),
+        ])
+    return {'users': users, 'app': {'settings': {'key{0}'.format(idx): idx for idx in range(300)}}}
+
+
+PAYLOADS = (
+    ('highstate return', highstate_return),
+    ('grains', grains),
+    ('pillar', pillar),
+)
+
+
+def _time(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def run(number):
+    serial = salt.payload.Serial({})
+    payloads = [(name, func()) for name, func in PAYLOADS]
+    payloads.append(('small event', {'cmd': '_minion_event', 'id': 'minion.example.com',
+                                     'tag': 'salt/beacon/x', 'data': {'a': 1}}))
+    print('{0:<20}{1:>8}{2:>14}{3:>14}{4:>14}'.format(
+        'payload', 'bytes', 'dumps (us)', 'loads (us)', 'wire (us)'))
+    for name, data in payloads:
+        packed = serial.dumps(data)
+        # Small payloads are timed more often to get meaningful numbers
+        count = number if len(packed) > 1024 else number * 100
+        print('{0:<20}{1:>8}{2:>14.1f}{3:>14.1f}{4:>14.1f}'.format(
+            name,
+            len(packed),
+            _time(lambda: serial.dumps(data), count),
+            _time(lambda: serial.loads(packed), count),
+            # Payloads sent between minions and masters have no bin type
+            _time(lambda: serial.loads(packed, use_bin_type=False), count),
+        ))
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--number', dest='number', type='int', default=200,
+                      help='The number of times each payload is serialized')
+    options, _ = parser.parse_args()
+    run(options.number)
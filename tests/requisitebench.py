@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+'''
+Simple script to time the resolution of the requisites of a synthetic
+highstate by salt.state.State, the states are mocked
+
+    python tests/requisitebench.py [-c CHUNKS]
+'''
+# Import python libs
+from __future__ import absolute_import, print_function
+import copy
+import optparse
+import shutil
+import tempfile
+import time
+
+# Import Salt libs
+import salt.config
+import salt.state
+from salt.utils.odict import OrderedDict
+
+
+def highstate(chunks=5000):
+    '''
+    Return the high data of a highstate with about the given number of chunks,
+    grouped in sls files of 50 ids which use the usual requisites
+    '''
+    high = OrderedDict()
+    per_sls = 50
+    for idx in range(chunks // 2):
+        sls = 'app{0}'.format(idx // per_sls)
+        conf = '/etc/{0}/conf.d/{1}.conf'.format(sls, idx)
+        pkg_id = '{0}-pkg'.format(sls)
+        args = [
+            'managed',
+            {'source': 'salt://{0}/files/{1}.conf'.format(sls, idx)},
+            {'order': 10000 + 2 * idx},
+        ]
+        if idx % per_sls == 0:
+            high[pkg_id] = OrderedDict([
+                ('pkg', ['installed', {'name': sls}, {'order': 10000 + 2 * idx - 1}]),
+                ('__sls__', sls),
+                ('__env__', 'base'),
+            ])
+        else:
+            args.append({'require': [{'pkg': pkg_id}]})
+        if idx % 10 == 0:
+            args.append({'watch_in': [{'service': '{0}-service-{1}'.format(sls, idx)}]})
+        if idx % 25 == 0 and idx >= per_sls:
+            # Require everything in the previous sls file
+            args.append({'require': [{'sls': 'app{0}'.format(idx // per_sls - 1)}]})
+        high[conf] = OrderedDict([('file', args), ('__sls__', sls), ('__env__', 'base')])
+        high['{0}-service-{1}'.format(sls, idx)] = OrderedDict([
+            ('service', [
+                'running',
+                {'name': '{0}-{1}'.format(sls, idx)},
+                {'onchanges': [{'file': '/etc/{0}/conf.d/*.conf'.format(sls)}]} if idx % 7 == 0
+                else {'require': [{'file': conf}]},
+                {'order': 10000 + 2 * idx + 1},
+            ] + (
+                # Use the arguments of a service referred to by name
+                [{'use': [{'service': '{0}-{1}'.format(sls, idx - idx % per_sls)}]}]
+                if idx % 5 == 1 else []
+            )),
+            ('__sls__', sls),
+            ('__env__', 'base'),
+        ])
+    return high
+
+
+def run(chunks):
+    cache_dir = tempfile.mkdtemp()
+    try:
+        opts = salt.config.minion_config(None)
+        opts['cachedir'] = cache_dir
+        opts['file_client'] = 'local'
+        opts['grains'] = {}
+        opts['pillar'] = {}
+        opts['state_events'] = False
+        state = salt.state.State(opts, initial_pillar={'bench': True}, mocked=True)
+        # Load the state modules before timing anything
+        for func in ('file.mod_init', 'pkg.mod_init', 'service.mod_init'):
+            func in state.states  # pylint: disable=pointless-statement
+        high = highstate(chunks)
+
+        start = time.time()
+        req_high, errors = state.requisite_in(copy.deepcopy(high))
+        req_in = time.time() - start
+        if errors:
+            raise SystemExit('\n'.join(errors))
+
+        start = time.time()
+        low = state.compile_high_data(req_high)
+        compiled = time.time() - start
+
+        start = time.time()
+        ret = state.call_chunks(low)
+        called = time.time() - start
+    finally:
+        shutil.rmtree(cache_dir)
+    print('{0} chunks, {1} returns'.format(len(low), len(ret)))
+    print('{0:<20}{1:>10.3f}s'.format('requisite_in', req_in))
+    print('{0:<20}{1:>10.3f}s'.format('compile_high_data', compiled))
+    print('{0:<20}{1:>10.3f}s'.format('call_chunks', called))
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser()
+    parser.add_option('-c', '--chunks', dest='chunks', type='int', default=5000,
+                      help='The number of chunks of the highstate')
+    options, _ = parser.parse_args()
+    run(options.chunks)
@@ -17,9 +17,12 @@ from salt.utils.process import clean_proc
 
 
 @contextmanager
-def eventpublisher_process(sock_dir):
-    proc = salt.utils.event.EventPublisher({'sock_dir': sock_dir})
-    proc.start()
+def eventpublisher_process(sock_dir, shards=1):
+    opts = {'sock_dir': sock_dir, 'event_publisher_shards': shards}
+    procs = [salt.utils.event.EventPublisher(opts, shard=shard)
+             for shard in range(shards)]
+    for proc in procs:
+        proc.start()
     try:
         if os.environ.get('TRAVIS_PYTHON_VERSION', None) is not None:
             # Travis is slow
@@ -28,7 +31,8 @@ def eventpublisher_process(sock_dir):
             time.sleep(2)
         yield
     finally:
-        clean_proc(proc)
+        for proc in procs:
+            clean_proc(proc)
 
 
 class EventSender(multiprocessing.Process):
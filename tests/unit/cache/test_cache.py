@@ -12,6 +12,7 @@ from tests.support.unit import skipIf, TestCase
 from tests.support.mock import (
     NO_MOCK,
     NO_MOCK_REASON,
+    MagicMock,
     patch,
 )
 
@@ -41,6 +42,44 @@ class CacheFunctionsTest(TestCase):
         self.assertIsInstance(ret, salt.cache.MemCache)
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class CacheTest(TestCase):
+    '''
+    Validate the bulk operations of the Cache class
+    '''
+    def setUp(self):
+        self.opts = {'cache': 'fake_driver'}
+        self.cache = salt.cache.factory(self.opts)
+
+    @patch('salt.cache.Cache.fetch', side_effect=lambda bank, key: bank + key)
+    @patch('salt.loader.cache', return_value={})
+    def test_fetch_many_fallback(self, loader_mock, cache_fetch_mock):
+        ret = self.cache.fetch_many([('bank', 'a'), ('bank', 'b')])
+        self.assertEqual(ret, {('bank', 'a'): 'banka', ('bank', 'b'): 'bankb'})
+
+    @patch('salt.loader.cache')
+    def test_fetch_many_driver(self, loader_mock):
+        fetch_many = MagicMock(return_value={('bank', 'a'): 'data'})
+        loader_mock.return_value = {'fake_driver.fetch_many': fetch_many}
+        ret = self.cache.fetch_many([('bank', 'a')])
+        self.assertEqual(ret, {('bank', 'a'): 'data'})
+        fetch_many.assert_called_once_with([('bank', 'a')])
+
+    @patch('salt.cache.Cache.store')
+    @patch('salt.loader.cache', return_value={})
+    def test_store_many_fallback(self, loader_mock, cache_store_mock):
+        self.cache.store_many({('bank', 'a'): 'data'})
+        cache_store_mock.assert_called_once_with('bank', 'a', 'data')
+
+    @patch('salt.cache.Cache.list', return_value=['a', 'b'])
+    @patch('salt.loader.cache', return_value={})
+    def test_list_with_mtime_fallback(self, loader_mock, cache_list_mock):
+        self.assertEqual(self.cache.list_with_mtime('bank'), {'a': None, 'b': None})
+        updated = MagicMock(return_value=1)
+        self.cache._modules = {'fake_driver.updated': updated}
+        self.assertEqual(self.cache.list_with_mtime('bank'), {'a': 1, 'b': 1})
+
+
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 class MemCacheTest(TestCase):
     '''
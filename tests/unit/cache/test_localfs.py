@@ -140,6 +140,45 @@ class LocalFSTest(TestCase, LoaderModuleMockMixin):
             with patch.dict(localfs.__context__, {'serial': serializer}):
                 self.assertIn('payload data', localfs.fetch(bank='bank', key='key', cachedir=tmp_dir))
 
+    # 'fetch_many' function tests: 1
+
+    def test_fetch_many(self):
+        '''
+        Tests that fetch_many returns the data of every requested key and an
+        empty dict for the missing ones.
+        '''
+        # Create a temporary cache dir
+        tmp_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        serializer = salt.payload.Serial(self)
+        self._create_tmp_cache_file(tmp_dir, serializer)
+
+        with patch.dict(localfs.__context__, {'serial': serializer}):
+            ret = localfs.fetch_many([('bank', 'key'), ('bank', 'missing'),
+                                      ('other', 'key')],
+                                     cachedir=tmp_dir)
+        self.assertEqual(ret, {('bank', 'key'): 'payload data',
+                               ('bank', 'missing'): {},
+                               ('other', 'key'): {}})
+
+    # 'store_many' function tests: 1
+
+    def test_store_many(self):
+        '''
+        Tests that store_many writes every key, creating the banks as needed.
+        '''
+        # Create a temporary cache dir
+        tmp_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        serializer = salt.payload.Serial(self)
+
+        items = {('minions/alpha', 'data'): {'grains': {'id': 'alpha'}},
+                 ('minions/alpha', 'mine'): {'test.ping': True},
+                 ('minions/beta', 'data'): {'grains': {'id': 'beta'}}}
+        with patch.dict(localfs.__context__, {'serial': serializer}):
+            localfs.store_many(items, cachedir=tmp_dir)
+            for (bank, key), data in items.items():
+                self.assertEqual(localfs.fetch(bank, key, cachedir=tmp_dir), data)
+
     # 'updated' function tests: 3
 
     def test_updated_return_when_cache_file_does_not_exist(self):
@@ -248,6 +287,29 @@ class LocalFSTest(TestCase, LoaderModuleMockMixin):
         with patch.dict(localfs.__opts__, {'cachedir': tmp_dir}):
             self.assertEqual(localfs.list_(bank='bank', cachedir=tmp_dir), ['key'])
 
+    # 'list_with_mtime' function tests: 2
+
+    def test_list_with_mtime_no_base_dir(self):
+        '''
+        Tests that an empty dict is returned when the bank directory doesn't exist.
+        '''
+        with patch('os.path.isdir', MagicMock(return_value=False)):
+            self.assertEqual(localfs.list_with_mtime(bank='', cachedir=''), {})
+
+    def test_list_with_mtime_success(self):
+        '''
+        Tests that list_with_mtime returns the bank entries with their mtime.
+        '''
+        # Create a temporary cache dir
+        tmp_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+
+        # Use the helper function to create the cache file using localfs.store()
+        self._create_tmp_cache_file(tmp_dir, salt.payload.Serial(self))
+
+        ret = localfs.list_with_mtime(bank='bank', cachedir=tmp_dir)
+        self.assertEqual(list(ret), ['key'])
+        self.assertIsInstance(ret['key'], float)
+
     # 'contains' function tests: 1
 
     def test_contains(self):
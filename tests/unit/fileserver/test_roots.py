@@ -13,7 +13,7 @@ import tempfile
 from tests.integration import AdaptedConfigurationTestCaseMixin
 from tests.support.mixins import LoaderModuleMockMixin
 from tests.support.unit import TestCase, skipIf
-from tests.support.mock import patch, NO_MOCK, NO_MOCK_REASON
+from tests.support.mock import patch, MagicMock, NO_MOCK, NO_MOCK_REASON
 from tests.support.runtests import RUNTIME_VARS
 from tests.support.paths import TMP
 
@@ -23,6 +23,7 @@ import salt.fileclient
 import salt.utils.files
 import salt.utils.hashutils
 import salt.utils.platform
+from salt.ext import six
 
 try:
     import win32file
@@ -195,3 +196,118 @@ class RootsTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderModuleMockMix
         self.assertEqual('dynamo.sls', ret1['rel'])
         self.assertIn('top.sls', ret2)
         self.assertIn('dynamo.sls', ret2)
+
+    def test_roots_index(self):
+        '''
+        Ensure the index kept by the watcher lists the same files as the walk
+        of the roots and follows the changes of the roots
+        '''
+        index_root = tempfile.mkdtemp(dir=TMP)
+        self.addCleanup(salt.utils.files.rm_rf, index_root)
+        os.makedirs(os.path.join(index_root, 'sub', 'empty'))
+        with salt.utils.files.fopen(os.path.join(index_root, 'sub', 'a.sls'), 'w') as fp_:
+            fp_.write('a')
+        opts = {'file_roots': copy.copy(self.opts['file_roots']),
+                'fileserver_list_cache_time': 0}
+        opts['file_roots']['indexed'] = opts['file_roots']['base'] + [index_root]
+
+        with patch.dict(roots.__opts__, opts):
+            walked = dict((form, roots._file_lists({'saltenv': 'indexed'}, form))
+                          for form in ('files', 'dirs', 'empty_dirs', 'links'))
+            indexes = {}
+            changes = {'added': set(), 'removed': set()}
+            for root in roots._saltenv_roots('indexed'):
+                indexes[root] = roots._RootIndex(root)
+                indexes[root].scan(root, changes)
+            roots._write_index('indexed', indexes)
+            self.addCleanup(roots._remove_indexes)
+
+            with patch.dict(roots.__opts__, {'fileserver_roots_inotify': True}):
+                for form, expected in six.iteritems(walked):
+                    self.assertEqual(
+                        roots._file_lists({'saltenv': 'indexed'}, form), expected)
+                ret = roots.find_file('testfile', 'indexed')
+                self.assertEqual(
+                    ret['path'], os.path.join(RUNTIME_VARS.BASE_FILES, 'testfile'))
+                self.assertIn('stat', ret)
+                self.assertEqual(roots.find_file('missing', 'indexed')['path'], '')
+
+                # A file is added to the empty dir and the file is removed
+                new = os.path.join(index_root, 'sub', 'empty', 'b.sls')
+                with salt.utils.files.fopen(new, 'w') as fp_:
+                    fp_.write('b')
+                os.remove(os.path.join(index_root, 'sub', 'a.sls'))
+                changes = {'added': set(), 'removed': set()}
+                for path in sorted((new, os.path.join(index_root, 'sub', 'a.sls'))):
+                    indexes[index_root].refresh(path, changes)
+                roots._write_index('indexed', indexes)
+                self.assertEqual(changes['added'], set([new]))
+                self.assertEqual(changes['removed'],
+                                 set([os.path.join(index_root, 'sub', 'a.sls')]))
+                files = roots.file_list({'saltenv': 'indexed'})
+                self.assertIn('sub/empty/b.sls', files)
+                self.assertNotIn('sub/a.sls', files)
+                self.assertNotIn('sub/empty', roots.file_list_emptydirs({'saltenv': 'indexed'}))
+                self.assertEqual(
+                    roots.find_file('sub/empty/b.sls', 'indexed')['path'], new)
+
+                # Removing a dir forgets everything beneath it
+                salt.utils.files.rm_rf(os.path.join(index_root, 'sub'))
+                indexes[index_root].refresh(os.path.join(index_root, 'sub'), changes)
+                roots._write_index('indexed', indexes)
+                self.assertNotIn('sub/empty/b.sls', roots.file_list({'saltenv': 'indexed'}))
+                self.assertNotIn('sub', roots.dir_list({'saltenv': 'indexed'}))
+
+    def test_watch_failed(self):
+        '''
+        Ensure the watcher stops, and the roots are walked, when a directory
+        of the roots cannot be watched
+        '''
+        root = self.opts['file_roots']['base'][0]
+        pyinotify = MagicMock()
+        pyinotify.ProcessEvent = object
+        pyinotify.WatchManager.return_value.add_watch.return_value = {root: -1}
+        with patch.object(roots, 'HAS_PYINOTIFY', True), \
+                patch.object(roots, 'pyinotify', pyinotify, create=True), \
+                patch.object(roots, '_WATCH_MASK', 0, create=True), \
+                patch.object(roots, '_write_index') as write_index, \
+                patch.object(roots, 'log') as log, \
+                patch.dict(roots.__opts__, {'fileserver_roots_inotify': True}):
+            roots.watch()
+        self.assertFalse(write_index.called)
+        self.assertFalse(roots._WATCHING.is_set())
+        self.assertIn(root, log.error.call_args[0][1])
+        self.assertFalse(pyinotify.Notifier.return_value.check_events.called)
+
+    def test_file_hash_index(self):
+        '''
+        Ensure the hashes are served from the shared index once the roots
+        were hashed, and hashed again once the file changed
+        '''
+        hash_root = tempfile.mkdtemp(dir=TMP)
+        self.addCleanup(salt.utils.files.rm_rf, hash_root)
+        path = os.path.join(hash_root, 'hashed')
+        with salt.utils.files.fopen(path, 'w') as fp_:
+            fp_.write('hashed')
+        load = {'saltenv': 'base', 'path': 'hashed'}
+        fnd = {'path': path, 'rel': 'hashed'}
+        self.addCleanup(roots._HashIndex.invalidate, self.opts)
+        with patch.dict(roots.__opts__, {'fileserver_roots_hash_index': True}):
+            roots._HashIndex.instance(roots.__opts__).update('sha256', [path])
+            # A new worker loads the index written by the update process
+            roots._HashIndex._instances.pop(roots._HashIndex.cache_path(roots.__opts__))
+            with patch('salt.utils.hashutils.get_hash') as get_hash:
+                ret = roots.file_hash(load, fnd)
+            self.assertFalse(get_hash.called)
+            with salt.utils.files.fopen(path, 'rb') as fp_:
+                self.assertEqual(ret, {'hsum': salt.utils.hashutils.sha256_digest(fp_.read()),
+                                       'hash_type': 'sha256'})
+
+            with salt.utils.files.fopen(path, 'ab') as fp_:
+                fp_.write(b'more')
+            with salt.utils.files.fopen(path, 'rb') as fp_:
+                hsum = salt.utils.hashutils.sha256_digest(fp_.read())
+            self.assertEqual(roots.file_hash(load, fnd)['hsum'], hsum)
+            with patch('salt.utils.hashutils.get_hash') as get_hash:
+                self.assertEqual(roots.file_hash(load, fnd)['hsum'], hsum)
+            self.assertFalse(get_hash.called)
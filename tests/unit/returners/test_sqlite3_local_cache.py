@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+'''
+Unit tests for the sqlite3 backed job cache (sqlite3_local_cache).
+'''
+
+# Import Python libs
+from __future__ import absolute_import, print_function, unicode_literals
+import os
+import shutil
+import tempfile
+import time
+
+# Import Salt Testing libs
+from tests.support.mixins import LoaderModuleMockMixin
+from tests.support.runtests import RUNTIME_VARS
+from tests.support.unit import TestCase, skipIf
+from tests.support.mock import (
+    MagicMock,
+    NO_MOCK,
+    NO_MOCK_REASON,
+    patch
+)
+
+# Import Salt libs
+import salt.returners.sqlite3_local_cache as sqlite3_local_cache
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+@skipIf(not sqlite3_local_cache.HAS_SQLITE3, 'sqlite3 is not available')
+class Sqlite3LocalCacheTestCase(TestCase, LoaderModuleMockMixin):
+    '''
+    Tests for the sqlite3_local_cache returner
+    '''
+    def setup_loader_modules(self):
+        self.cachedir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.addCleanup(shutil.rmtree, self.cachedir, ignore_errors=True)
+        self.addCleanup(sqlite3_local_cache._CONNECTIONS.clear)
+        return {sqlite3_local_cache: {'__opts__': {'cachedir': self.cachedir,
+                                                   'keep_jobs': 1,
+                                                   'hash_type': 'sha256',
+                                                   'job_cache_store_endtime': True}}}
+
+    def _new_job(self, fun='test.ping', minions=('alpha', 'beta')):
+        jid = sqlite3_local_cache.prep_jid()
+        load = {'jid': jid, 'fun': fun, 'arg': [], 'tgt': 'a*',
+                'tgt_type': 'glob', 'user': 'root'}
+        sqlite3_local_cache.save_load(jid, load, minions=list(minions))
+        return jid
+
+    def test_database_created_in_cachedir(self):
+        self._new_job()
+        self.assertTrue(os.path.isfile(os.path.join(self.cachedir, 'jobs.sqlite3')))
+
+    def test_prep_jid_passed_jid(self):
+        self.assertEqual(sqlite3_local_cache.prep_jid(passed_jid='20190101000000000000'),
+                         '20190101000000000000')
+        # Storing the same jid again must not fail
+        self.assertEqual(sqlite3_local_cache.prep_jid(passed_jid='20190101000000000000'),
+                         '20190101000000000000')
+
+    def test_returner_and_get_jid(self):
+        jid = self._new_job()
+        sqlite3_local_cache.returner({'jid': jid, 'id': 'alpha', 'fun': 'test.ping',
+                                      'return': True, 'retcode': 0, 'out': 'nested'})
+        self.assertEqual(sqlite3_local_cache.get_jid(jid),
+                         {'alpha': {'return': True, 'retcode': 0, 'out': 'nested'}})
+        # A second return from the same minion is dropped
+        self.assertFalse(sqlite3_local_cache.returner(
+            {'jid': jid, 'id': 'alpha', 'fun': 'test.ping', 'return': False}))
+        self.assertTrue(sqlite3_local_cache.get_jid(jid)['alpha']['return'])
+
+    def test_returner_unknown_jid(self):
+        self.assertFalse(sqlite3_local_cache.returner(
+            {'jid': '20190101000000000000', 'id': 'alpha', 'return': True}))
+
+    def test_returner_nocache(self):
+        jid = sqlite3_local_cache.prep_jid(nocache=True)
+        sqlite3_local_cache.returner({'jid': jid, 'id': 'alpha', 'return': True})
+        self.assertEqual(sqlite3_local_cache.get_jid(jid), {})
+
+    def test_get_load(self):
+        jid = self._new_job()
+        sqlite3_local_cache.save_minions(jid, ['gamma'], syndic_id='syndic')
+        load = sqlite3_local_cache.get_load(jid)
+        self.assertEqual(load['fun'], 'test.ping')
+        self.assertEqual(load['Minions'], ['alpha', 'beta', 'gamma'])
+        # The load stored for the published job is not overwritten
+        sqlite3_local_cache.save_load(jid, {'jid': jid, 'fun': 'test.echo'}, minions=[])
+        self.assertEqual(sqlite3_local_cache.get_load(jid)['fun'], 'test.ping')
+        self.assertEqual(sqlite3_local_cache.get_load('20190101000000000000'), {})
+
+    def test_save_load_computes_minions(self):
+        jid = sqlite3_local_cache.prep_jid()
+        ckminions = MagicMock()
+        ckminions.return_value.check_minions.return_value = {'minions': ['alpha']}
+        with patch('salt.utils.minions.CkMinions', ckminions):
+            sqlite3_local_cache.save_load(jid, {'jid': jid, 'fun': 'test.ping',
+                                                'tgt': 'alpha', 'tgt_type': 'glob'})
+        ckminions.return_value.check_minions.assert_called_once_with('alpha', 'glob')
+        self.assertEqual(sqlite3_local_cache.get_load(jid)['Minions'], ['alpha'])
+
+    def test_get_jids(self):
+        jid1 = self._new_job()
+        jid2 = self._new_job(fun='saltutil.find_job')
+        sqlite3_local_cache.update_endtime(jid1, 'sometime')
+        jids = sqlite3_local_cache.get_jids()
+        self.assertEqual(sorted(jids), sorted([jid1, jid2]))
+        self.assertEqual(jids[jid1]['Function'], 'test.ping')
+        self.assertEqual(jids[jid1]['EndTime'], 'sometime')
+        self.assertNotIn('EndTime', jids[jid2])
+
+    def test_get_jids_filter(self):
+        jids = [self._new_job() for _ in range(3)]
+        self._new_job(fun='saltutil.find_job')
+        ret = sqlite3_local_cache.get_jids_filter(2)
+        self.assertEqual([job['JID'] for job in ret], jids[1:])
+        ret = sqlite3_local_cache.get_jids_filter(10, filter_find_job=False)
+        self.assertEqual(len(ret), 4)
+        self.assertEqual(ret[-1]['Function'], 'saltutil.find_job')
+
+    def test_endtime(self):
+        jid = self._new_job()
+        self.assertFalse(sqlite3_local_cache.get_endtime(jid))
+        sqlite3_local_cache.update_endtime(jid, 'sometime')
+        self.assertEqual(sqlite3_local_cache.get_endtime(jid), 'sometime')
+
+    def test_clean_old_jobs(self):
+        old_jid = self._new_job()
+        sqlite3_local_cache.returner({'jid': old_jid, 'id': 'alpha', 'return': True})
+        new_jid = self._new_job()
+        with patch('time.time', MagicMock(return_value=time.time() + 1800)):
+            sqlite3_local_cache.clean_old_jobs()
+        self.assertEqual(sorted(sqlite3_local_cache.get_jids()), sorted([old_jid, new_jid]))
+        with patch('time.time', MagicMock(return_value=time.time() + 7200)):
+            sqlite3_local_cache.clean_old_jobs()
+        self.assertEqual(sqlite3_local_cache.get_jids(), {})
+        self.assertEqual(sqlite3_local_cache.get_jid(old_jid), {})
+        self.assertEqual(sqlite3_local_cache.get_load(old_jid), {})
+
+    def test_returner_many(self):
+        jid = self._new_job()
+        sqlite3_local_cache.returner_many([
+            {'jid': jid, 'id': 'alpha', 'return': True},
+            {'jid': jid, 'id': 'beta', 'return': False},
+            {'jid': jid, 'id': 'alpha', 'return': False},
+        ])
+        self.assertEqual(sqlite3_local_cache.get_jid(jid),
+                         {'alpha': {'return': True}, 'beta': {'return': False}})
@@ -5,19 +5,25 @@
 
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
+import functools
+import time
 
 # Import Salt Testing libs
 import tests.integration as integration
 from tests.support.unit import TestCase, skipIf
+from tests.support.events import eventpublisher_process
 from tests.support.mock import patch, NO_MOCK, NO_MOCK_REASON
 from tornado.concurrent import Future
 
 
 # Import Salt libs
 from salt import client
+import salt.utils.event
 import salt.utils.platform
+import salt.utils.minions
 from salt.exceptions import (
-    EauthAuthenticationError, SaltInvocationError, SaltClientError, SaltReqTimeoutError
+    AuthorizationError, EauthAuthenticationError, SaltInvocationError, SaltClientError,
+    SaltReqTimeoutError
 )
 
 
@@ -170,3 +176,207 @@ class LocalClientTestCase(TestCase,
         self._test_parse_input('cmd_iter_no_block')
         self._test_parse_input('cmd_async')
         self._test_parse_input('run_job_async', asynchronous=True)
+
+    def _test_iter_returns(self, running):
+        '''
+        Wait for the returns of two jobs sent to two minions which do not
+        return, they answer the first saltutil.running ping with ``running``
+        '''
+        pings = []
+
+        def run_job(tgt, fun, **kwargs):
+            ping_jid = 'ping{0}'.format(len(pings))
+            pings.append((fun, tgt))
+            self.client.event.subscribe('salt/job/{0}'.format(ping_jid))
+            return {'jid': ping_jid, 'minions': tgt}
+
+        def get_returns_no_block(tag, match_type=None):
+            if tag.startswith('salt/job/ping'):
+                jids = running if tag == 'salt/job/ping0' else []
+                for id_ in ('m1', 'm2'):
+                    yield {'tag': '{0}/ret/{1}'.format(tag, id_),
+                           'data': {'id': id_, 'retcode': 0,
+                                    'return': [{'jid': jid} for jid in jids]}}
+            while True:
+                yield None
+
+        with patch.object(self.client, 'run_job', side_effect=run_job), \
+                patch.object(self.client, 'get_returns_no_block', side_effect=get_returns_no_block), \
+                patch.object(self.client, 'returners', {}), \
+                patch.dict(self.client.opts, {'gather_job_coalesce': True}), \
+                patch.dict(client._JOB_LIVENESS, {}, clear=True):
+            jobs = [
+                self.client.get_iter_returns(jid, ['m1', 'm2'], timeout=1,
+                                             gather_job_timeout=1,
+                                             expect_minions=True, block=False)
+                for jid in ('1', '2')
+            ]
+            rets = [[], []]
+            done = set()
+            # Interleave the jobs like concurrent callers
+            while len(done) < len(jobs):
+                for idx, job in enumerate(jobs):
+                    if idx in done:
+                        continue
+                    try:
+                        ret = next(job)
+                    except StopIteration:
+                        done.add(idx)
+                        continue
+                    if ret:
+                        rets[idx].append(ret)
+        self.assertFalse(self.client.event.pending_events.subscribed('salt/job/ping0/ret/m1'))
+        return pings, rets
+
+    def test_get_iter_returns_coalesces_pings(self):
+        pings, rets = self._test_iter_returns(running=[])
+        # A single ping for both jobs, which tells that they are not running
+        self.assertEqual(pings, [('saltutil.running', ['m1', 'm2'])])
+        for ret in rets:
+            self.assertEqual(sorted(ret, key=lambda x: list(x)),
+                             [{'m1': {'failed': True}}, {'m2': {'failed': True}}])
+
+    def test_get_iter_returns_running_job(self):
+        pings, rets = self._test_iter_returns(running=['1'])
+        # The first job was still running, it pings again after the interval
+        self.assertEqual(pings, [('saltutil.running', ['m1', 'm2'])] * 2)
+        for ret in rets:
+            self.assertEqual(sorted(ret, key=lambda x: list(x)),
+                             [{'m1': {'failed': True}}, {'m2': {'failed': True}}])
+
+    def test_get_iter_returns_late_ping(self):
+        '''
+        Test that a job does not wait for the saltutil.running ping another
+        client sent after the job started waiting, whose returns the event
+        listener of its client dropped before it subscribed to them
+        '''
+        opts = self.get_temp_config('master', gather_job_coalesce=True)
+        clients = [client.LocalClient(mopts=opts) for _ in range(2)]
+        pings = []
+        with eventpublisher_process(opts['sock_dir']):
+            minion = salt.utils.event.MasterEvent(opts['sock_dir'], listen=False)
+
+            def run_job(local, tgt, fun, **kwargs):
+                ping_jid = 'ping{0}'.format(len(pings))
+                pings.append(ping_jid)
+                local.event.subscribe('salt/job/{0}'.format(ping_jid))
+                # The minion is still running both jobs
+                minion.fire_event({'id': 'm1', 'retcode': 0, 'return': [{'jid': '1'}, {'jid': '2'}]},
+                                  'salt/job/{0}/ret/m1'.format(ping_jid))
+                if local is clients[1]:
+                    minion.fire_event({'id': 'm1', 'return': True}, 'salt/job/2/ret/m1')
+                return {'jid': ping_jid, 'minions': tgt}
+
+            for local in clients:
+                local.event.connect_pub()
+            clients[1].event.subscribe('salt/job/2')
+            time.sleep(1)
+            with patch.object(clients[0], 'run_job', side_effect=functools.partial(run_job, clients[0])), \
+                    patch.object(clients[1], 'run_job', side_effect=functools.partial(run_job, clients[1])), \
+                    patch.object(clients[1], 'returners', {}), \
+                    patch.dict(client._JOB_LIVENESS, {}, clear=True):
+                job = clients[1].get_iter_returns('2', ['m1'], timeout=1, gather_job_timeout=2,
+                                                  expect_minions=True, block=False)
+                next(job)
+                # The first client checks its own job while the second one
+                # waits, and stops before reading the returns of its ping
+                clients[0]._check_running(set(['m1']), time.time() - 1, set(), gather_job_timeout=2)
+                rets = []
+                deadline = time.time() + 30
+                for ret in job:
+                    if ret:
+                        rets.append(ret)
+                    self.assertLess(time.time(), deadline)
+        self.assertEqual(rets, [{'m1': {'ret': True}}])
+        self.assertEqual(pings, ['ping0', 'ping1'])
+
+    def test_get_iter_returns_restricted_user(self):
+        '''
+        Test that a user whose auth_list does not allow saltutil.running
+        checks its job with saltutil.find_job, which the master always accepts
+        '''
+        ckminions = salt.utils.minions.CkMinions(self.client.opts)
+        funs = []
+
+        def run_job(tgt, fun, **kwargs):
+            funs.append(fun)
+            if not ckminions.auth_check(['test.*'], fun, [], tgt, kwargs.get('tgt_type', 'glob'),
+                                        minions=tgt, whitelist=['saltutil.find_job']):
+                raise AuthorizationError('Authorization error occurred.')
+            return {'jid': 'ping', 'minions': tgt}
+
+        def get_returns_no_block(tag, match_type=None):
+            while True:
+                yield None
+
+        with patch.object(self.client, 'run_job', side_effect=run_job), \
+                patch.object(self.client, 'get_returns_no_block', side_effect=get_returns_no_block), \
+                patch.object(self.client, 'returners', {}), \
+                patch.dict(self.client.opts, {'gather_job_coalesce': True}), \
+                patch.dict(client._JOB_LIVENESS, {}, clear=True):
+            rets = [ret for ret in self.client.get_iter_returns(
+                '1', ['m1'], timeout=0, gather_job_timeout=1, expect_minions=True, block=False) if ret]
+        self.assertEqual(funs, ['saltutil.running', 'saltutil.find_job'])
+        self.assertEqual(rets, [{'m1': {'failed': True}}])
+
+
+class JobLivenessTestCase(TestCase):
+    '''
+    Test the sharing of the saltutil.running pings
+    '''
+    def setUp(self):
+        self.liveness = client.JobLiveness()
+        self.pings = []
+
+    def ping(self, tgt):
+        self.pings.append(tgt)
+        return 'ping{0}'.format(len(self.pings))
+
+    def test_check_pings_once(self):
+        since = time.time()
+        self.assertEqual(self.liveness.check(['m1', 'm2'], since, 10, self.ping),
+                         ({}, {'ping1': set(['m1', 'm2'])}))
+        # The job which sent the ping waits for it, and pings the other minion
+        self.assertEqual(self.liveness.check(['m2', 'm3'], since, 10, self.ping, ['ping1']),
+                         ({}, {'ping1': set(['m2']), 'ping2': set(['m3'])}))
+        self.assertEqual(self.pings, [['m1', 'm2'], ['m3']])
+
+    def test_check_not_subscribed(self):
+        since = time.time()
+        self.liveness.check(['m1', 'm2'], since, 10, self.ping)
+        # Another job did not listen to the returns of the ping since it was
+        # sent, it pings the minions which did not answer yet again
+        self.liveness.record('ping1', 'm1', ['1'])
+        self.assertEqual(self.liveness.check(['m1', 'm2'], since - 1, 10, self.ping),
+                         ({'m1': frozenset(['1'])}, {'ping2': set(['m2'])}))
+        # The returns of the first ping no longer replace the newer ones
+        self.liveness.record('ping2', 'm2', ['2'])
+        self.liveness.record('ping1', 'm2', ['1'])
+        self.assertEqual(self.liveness.check(['m2'], since, 10, self.ping),
+                         ({'m2': frozenset(['2'])}, {}))
+        self.assertEqual(self.pings, [['m1', 'm2'], ['m2']])
+
+    def test_check_returns(self):
+        since = time.time()
+        self.liveness.check(['m1', 'm2'], since, 10, self.ping)
+        self.liveness.record('ping1', 'm1', ['1', '2'])
+        # The returns of older pings are ignored
+        self.liveness.record('ping0', 'm2', ['1'])
+        self.assertEqual(self.liveness.check(['m1', 'm2'], since, 10, self.ping, ['ping1']),
+                         ({'m1': frozenset(['1', '2'])}, {'ping1': set(['m2'])}))
+        self.assertEqual(len(self.pings), 1)
+
+    def test_check_stale(self):
+        self.liveness.check(['m1'], time.time(), 10, self.ping)
+        self.liveness.record('ping1', 'm1', ['1'])
+        # A job published after the ping
+        self.assertEqual(self.liveness.check(['m1'], time.time() + 1, 10, self.ping),
+                         ({}, {'ping2': set(['m1'])}))
+        # A ping older than the interval
+        self.assertEqual(self.liveness.check(['m1'], 0, -1, self.ping),
+                         ({}, {'ping3': set(['m1'])}))
+
+    def test_check_no_ping(self):
+        self.assertEqual(self.liveness.check(['m1'], time.time(), 10, lambda tgt: None),
+                         ({}, {}))
+        self.assertEqual(self.liveness.pings, {})
@@ -19,6 +19,7 @@ from tests.support.unit import TestCase, skipIf
 
 # Import Salt libs
 import salt.utils.files
+import salt.utils.platform
 from salt.ext.six.moves import range
 from salt import fileclient
 from salt.ext import six
@@ -459,3 +460,132 @@ class FileclientCacheTest(TestCase, AdaptedConfigurationTestCaseMixin, LoaderMod
                    _salt('dev'))
 
             _check('/foo/bar', '/foo/bar')
+
+    def test_cache_dir_batched(self):
+        '''
+        Ensure the files of a directory are fetched with a manifest and
+        batches of files, and only fetched again once changed
+        '''
+        patched_opts = dict((x, y) for x, y in six.iteritems(self.minion_opts))
+        patched_opts.update(self.MOCKED_OPTS)
+        patched_opts['file_fetch_workers'] = 2
+
+        with patch.dict(fileclient.__opts__, patched_opts):
+            client = fileclient.get_file_client(fileclient.__opts__, pillar=False)
+            # Act like a remote channel, so that the batches are fetched by
+            # several workers
+            channel = client.channel
+            sent = []
+
+            def _send(load, **kwargs):
+                sent.append(load['cmd'])
+                return channel.send(load, **kwargs)
+            remote = MagicMock(send=MagicMock(side_effect=_send))
+            client.channel = remote
+            with patch('salt.transport.client.ReqChannel.factory',
+                       MagicMock(return_value=remote)):
+                ret = client.cache_dir('salt://{0}'.format(SUBDIR), 'base')
+                self.assertEqual(len(ret), len(SUBDIR_FILES))
+                self.assertEqual(sent, ['_file_list', '_file_manifest', '_serve_files'])
+                for path in ret:
+                    with salt.utils.files.fopen(path) as fp_:
+                        self.assertIn(os.path.basename(path), fp_.read())
+
+                del sent[:]
+                changed = os.path.join(self.FS_ROOT, 'base', SUBDIR, 'bar.txt')
+                with salt.utils.files.fopen(changed, 'w') as fp_:
+                    fp_.write('changed')
+                self.assertEqual(
+                    client.cache_dir('salt://{0}'.format(SUBDIR), 'base'), ret)
+                self.assertEqual(sent, ['_file_list', '_file_manifest', '_serve_files'])
+                cached = os.path.join(self.CACHE_ROOT, 'files', 'base', SUBDIR, 'bar.txt')
+                with salt.utils.files.fopen(cached) as fp_:
+                    self.assertEqual(fp_.read(), 'changed')
+
+                del sent[:]
+                client.cache_dir('salt://{0}'.format(SUBDIR), 'base')
+                self.assertEqual(sent, ['_file_list', '_file_manifest'])
+
+    def test_cache_files_chunked(self):
+        '''
+        Ensure the files bigger than file_buffer_size are fetched in chunks
+        '''
+        patched_opts = dict((x, y) for x, y in six.iteritems(self.minion_opts))
+        patched_opts.update(self.MOCKED_OPTS)
+        patched_opts['file_buffer_size'] = 16
+
+        with patch.dict(fileclient.__opts__, patched_opts):
+            client = fileclient.get_file_client(fileclient.__opts__, pillar=False)
+            urls = ['salt://{0}/{1}'.format(SUBDIR, name) for name in SUBDIR_FILES]
+            urls.append('salt://missing.txt')
+            with patch.object(client, 'get_file', MagicMock()) as get_file:
+                ret = client.cache_files(urls, 'dev')
+            self.assertFalse(get_file.called)
+            self.assertFalse(ret[-1])
+            for path, name in zip(ret, SUBDIR_FILES):
+                with salt.utils.files.fopen(path) as fp_:
+                    self.assertEqual(
+                        fp_.read(),
+                        'This is file \'{0}\' in subdir \'{1} from saltenv '
+                        '\'dev\''.format(name, SUBDIR))
+
+    @skipIf(salt.utils.platform.is_windows(), 'Hard links are not used on Windows')
+    def test_cache_file_objects(self):
+        '''
+        Ensure the files with the same contents are stored and downloaded
+        once with file_cache_objects, and replaced objects are removed
+        '''
+        patched_opts = dict((x, y) for x, y in six.iteritems(self.minion_opts))
+        patched_opts.update(self.MOCKED_OPTS)
+        patched_opts['file_cache_objects'] = True
+        patched_opts['file_fetch_workers'] = 1
+        for saltenv in SALTENVS:
+            path = os.path.join(self.FS_ROOT, saltenv, 'foo.txt')
+            with salt.utils.files.fopen(path, 'w') as fp_:
+                fp_.write('The same in all saltenvs')
+
+        with patch.dict(fileclient.__opts__, patched_opts):
+            client = fileclient.get_file_client(fileclient.__opts__, pillar=False)
+            channel = client.channel
+            sent = []
+
+            def _send(load, **kwargs):
+                sent.append(load['cmd'])
+                return channel.send(load, **kwargs)
+            client.channel = MagicMock(send=MagicMock(side_effect=_send))
+
+            base = client.cache_file('salt://foo.txt', 'base')
+            self.assertIn('_serve_file', sent)
+            objects = os.path.join(self.CACHE_ROOT, 'objects')
+            hash_server = client.hash_file('salt://foo.txt', 'base')
+            obj = fileclient.object_path(
+                fileclient.__opts__, hash_server['hash_type'], hash_server['hsum'])
+            self.assertTrue(obj.startswith(objects))
+            self.assertTrue(os.path.samefile(base, obj))
+
+            del sent[:]
+            dev = client.cache_file('salt://foo.txt', 'dev')
+            self.assertNotIn('_serve_file', sent)
+            self.assertTrue(os.path.samefile(base, dev))
+            self.assertEqual(os.stat(obj).st_nlink, 3)
+            self.assertTrue(fileclient.is_cached_object(
+                fileclient.__opts__, dev, hash_server['hash_type'], hash_server['hsum']))
+
+            # The same contents in a directory are linked as well
+            ret = client.cache_dir('salt://{0}'.format(SUBDIR), 'base')
+            self.assertEqual(len(ret), len(SUBDIR_FILES))
+            for path in ret:
+                self.assertEqual(os.stat(path).st_nlink, 2)
+
+            for saltenv in SALTENVS:
+                path = os.path.join(self.FS_ROOT, saltenv, 'foo.txt')
+                with salt.utils.files.fopen(path, 'w') as fp_:
+                    fp_.write('changed in {0}'.format(saltenv))
+            client.cache_file('salt://foo.txt', 'base')
+            self.assertEqual(os.stat(obj).st_nlink, 2)
+            client.cache_file('salt://foo.txt', 'dev')
+            self.assertFalse(os.path.exists(obj))
+            with salt.utils.files.fopen(dev) as fp_:
+                self.assertEqual(fp_.read(), 'changed in dev')
+            with salt.utils.files.fopen(base) as fp_:
+                self.assertEqual(fp_.read(), 'changed in base')
@@ -1267,3 +1267,181 @@ class LazyLoaderOptimizationOrderTest(TestCase):
         basename = os.path.basename(filename)
         expected = 'lazyloadertest.py' if six.PY3 else 'lazyloadertest.pyc'
         assert basename == expected, basename
+
+
+class LoaderIndexTest(TestCase):
+    '''
+    Test the on disk index of the loader file mappings
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cls.opts = salt.config.minion_config(None)
+        cls.opts['grains'] = {}
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.module_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.addCleanup(shutil.rmtree, self.module_dir)
+        self.addCleanup(salt.loader.LoaderIndex._instances.clear)
+        self._write_module('first', '')
+        self._write_module(
+            'thirdpkg',
+            "__virtualname__ = 'vpkg'\n\n\ndef __virtual__():\n    return __virtualname__\n\n\n"
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.opts
+
+    def _write_module(self, name, header):
+        with salt.utils.files.fopen(os.path.join(self.module_dir, name + '.py'), 'w') as fh:
+            fh.write(header + 'def test():\n    return True\n')
+        # Make sure the directory mtime changes even on filesystems with a
+        # coarse timestamp granularity
+        mtime = os.stat(self.module_dir).st_mtime
+        os.utime(self.module_dir, (mtime + 2, mtime + 2))
+
+    def _get_loader(self):
+        opts = copy.deepcopy(self.opts)
+        opts['cachedir'] = self.cache_dir
+        opts['loader_index'] = True
+        return salt.loader.LazyLoader([self.module_dir], opts, tag='module')
+
+    def test_index_reused(self):
+        '''
+        Test that a second loader reuses the mapping without listing the
+        module directory
+        '''
+        loader = self._get_loader()
+        self.assertTrue(os.path.isfile(os.path.join(self.cache_dir, 'loader_index.p')))
+        salt.loader.LoaderIndex._instances.clear()
+        with patch('os.listdir', side_effect=AssertionError('listed')):
+            indexed = self._get_loader()
+        self.assertEqual(indexed.file_mapping, loader.file_mapping)
+        self.assertIn('first', indexed.file_mapping)
+        self.assertTrue(indexed['first.test']())
+
+    def test_index_invalidated(self):
+        '''
+        Test that adding a module invalidates the index
+        '''
+        self._get_loader()
+        self._write_module('second', '')
+        loader = self._get_loader()
+        self.assertIn('second', loader.file_mapping)
+        salt.loader.LoaderIndex.invalidate(loader.opts)
+        self.assertFalse(os.path.isfile(os.path.join(self.cache_dir, 'loader_index.p')))
+
+    def test_virtualname(self):
+        '''
+        Test that the modules providing a virtual name are tried first
+        '''
+        for loader in (self._get_loader(), self._get_loader()):
+            self.assertEqual(loader.virtualname_mapping, {'vpkg': ['thirdpkg']})
+            self.assertEqual(list(loader._iter_files('vpkg')), ['thirdpkg', 'first'])
+            self.assertTrue(loader['vpkg.test']())
+
+
+class VirtualCacheTest(TestCase):
+    '''
+    Test the on disk cache of the modules refused by __virtual__
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cls.opts = salt.config.minion_config(None)
+        cls.opts['grains'] = {}
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.module_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+        self.addCleanup(shutil.rmtree, self.module_dir)
+        self.addCleanup(salt.loader.VirtualCache._instances.clear)
+        self.calls = os.path.join(self.cache_dir, 'calls')
+        self._write_module('refused', "(False, 'nope')")
+        self._write_module('accepted', 'True')
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.opts
+
+    def _write_module(self, name, ret):
+        with salt.utils.files.fopen(os.path.join(self.module_dir, name + '.py'), 'w') as fh:
+            fh.write(
+                'def __virtual__():\n'
+                '    with open({0!r}, \'a\') as fh:\n'
+                '        fh.write({1!r})\n'
+                '    return {2}\n\n\n'
+                'def test():\n'
+                '    return True\n'.format(self.calls, name + '\n', ret)
+            )
+
+    def _get_calls(self):
+        if not os.path.isfile(self.calls):
+            return []
+        with salt.utils.files.fopen(self.calls) as fh:
+            return sorted(fh.read().splitlines())
+
+    def _get_loader(self, **kwargs):
+        opts = copy.deepcopy(self.opts)
+        opts['cachedir'] = self.cache_dir
+        opts['virtual_cache'] = True
+        opts.update(kwargs)
+        loader = salt.loader.LazyLoader([self.module_dir], opts, tag='module')
+        loader._load_all()
+        return loader
+
+    def test_refusal_cached(self):
+        '''
+        Test that a second loader skips the refused module without running
+        its __virtual__ function
+        '''
+        loader = self._get_loader()
+        self.assertEqual(self._get_calls(), ['accepted', 'refused'])
+        self.assertIn('accepted.test', loader)
+        self.assertTrue(os.path.isfile(os.path.join(self.cache_dir, 'virtual_cache.p')))
+
+        salt.loader.VirtualCache._instances.clear()
+        os.remove(self.calls)
+        loader = self._get_loader()
+        self.assertEqual(self._get_calls(), ['accepted'])
+        self.assertIn('accepted.test', loader)
+        self.assertNotIn('refused.test', loader)
+        self.assertEqual(loader.missing_modules['refused'], 'nope')
+
+    def test_refusal_invalidated(self):
+        '''
+        Test that changed options, a changed module and the invalidation of
+        the cache run __virtual__ again
+        '''
+        self._get_loader()
+        os.remove(self.calls)
+        self._get_loader(foo='bar')
+        self.assertEqual(self._get_calls(), ['accepted', 'refused'])
+
+        os.remove(self.calls)
+        self._write_module('refused', 'True  ')
+        loader = self._get_loader()
+        self.assertEqual(self._get_calls(), ['accepted', 'refused'])
+        self.assertIn('refused.test', loader)
+
+        self._write_module('refused', "(False, 'nope')  ")
+        self._get_loader()
+        salt.loader.VirtualCache.invalidate(loader.opts)
+        self.assertFalse(os.path.isfile(os.path.join(self.cache_dir, 'virtual_cache.p')))
+        os.remove(self.calls)
+        self._get_loader()
+        self.assertEqual(self._get_calls(), ['accepted', 'refused'])
+
+    def test_fingerprints_pruned(self):
+        '''
+        Test that only the most recently stored fingerprints are kept
+        '''
+        cache = salt.loader.VirtualCache(os.path.join(self.cache_dir, 'virtual_cache.p'))
+        for max_fingerprints, kept in ((2, ['b', 'c']), (0, [])):
+            with patch.object(salt.loader.VirtualCache, 'max_fingerprints', max_fingerprints):
+                for fingerprint in ('a', 'b', 'c'):
+                    cache.set(fingerprint, 'refused', [0, 0], 'nope')
+                    cache.flush()
+            self.assertEqual(sorted(cache._read()), kept)
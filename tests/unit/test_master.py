@@ -331,3 +331,117 @@ class ClearFuncsTestCase(TestCase):
                 patch('salt.utils.master.get_values_of_matching_keys', MagicMock(return_value=['test'])), \
                 patch('salt.utils.minions.CkMinions.auth_check', MagicMock(return_value=False)):
             self.assertEqual(mock_ret, self.clear_funcs.publish(load))
+
+
+class AESFuncsTestCase(TestCase):
+    '''
+    TestCase for salt.master.AESFuncs class
+    '''
+
+    def setUp(self):
+        opts = salt.config.master_config(None)
+        opts['return_batch_size'] = 3
+        opts['return_batch_interval'] = 60
+        with patch('salt.utils.event.get_master_event', MagicMock()), \
+                patch('salt.client.get_local_client', MagicMock()), \
+                patch('salt.minion.MasterMinion', MagicMock()), \
+                patch('salt.fileserver.Fileserver', MagicMock()), \
+                patch('salt.daemons.masterapi.RemoteFuncs', MagicMock()):
+            self.aes_funcs = salt.master.AESFuncs(opts)
+
+    def test_return_batch(self):
+        '''
+        Asserts that returns are written to the job cache once the batch is full
+        '''
+        loads = [{'jid': '20190618090114890985', 'id': 'minion{0}'.format(idx), 'return': True}
+                 for idx in range(4)]
+        with patch('salt.utils.job.store_jobs', MagicMock()) as store_jobs:
+            for load in loads[:2]:
+                self.aes_funcs._return(load)
+            store_jobs.assert_not_called()
+            self.assertEqual(self.aes_funcs.queued_returns(), 2)
+            self.aes_funcs._return(loads[2])
+            store_jobs.assert_called_once_with(
+                self.aes_funcs.opts, loads[:3],
+                event=self.aes_funcs.event, mminion=self.aes_funcs.mminion)
+            self.aes_funcs._return(loads[3])
+            self.aes_funcs.flush_returns()
+            self.assertEqual(store_jobs.call_args[0][1], loads[3:])
+            self.aes_funcs.flush_returns()
+            self.assertEqual(store_jobs.call_count, 2)
+        stats = self.aes_funcs.return_batch_stats()
+        self.assertEqual(stats['flushes'], 2)
+        self.assertEqual(stats['returns'], 4)
+        self.assertEqual(stats['max_queue'], 3)
+        self.assertEqual(stats['forced'], 1)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['mean_batch'], 2.0)
+        self.assertEqual(self.aes_funcs.return_batch_stats()['flushes'], 0)
+
+    def test_return_batch_interval(self):
+        '''
+        Asserts that queued returns are written once the interval has passed
+        '''
+        self.aes_funcs.opts['return_batch_interval'] = 0
+        load = {'jid': '20190618090114890985', 'id': 'minion', 'return': True}
+        with patch('salt.utils.job.store_jobs', MagicMock()) as store_jobs:
+            self.aes_funcs._return(load)
+            store_jobs.assert_called_once()
+
+    def test_flush_returns_reentry(self):
+        '''
+        Asserts that a flush started while another one runs does not write the
+        returns again
+        '''
+        loads = [{'jid': '20190618090114890985', 'id': 'minion{0}'.format(idx), 'return': True}
+                 for idx in range(2)]
+
+        def store_jobs(opts, batch, **kwargs):
+            self.aes_funcs._return_queue.append(loads[1])
+            self.aes_funcs.flush_returns()
+
+        with patch('salt.utils.job.store_jobs', MagicMock(side_effect=store_jobs)) as store_mock:
+            self.aes_funcs._return_queue.append(loads[0])
+            self.aes_funcs.flush_returns()
+            self.assertEqual(store_mock.call_count, 1)
+            self.assertEqual(self.aes_funcs.queued_returns(), 1)
+            store_mock.side_effect = None
+            self.aes_funcs.flush_returns()
+            self.assertEqual(store_mock.call_args[0][1], loads[1:])
+        self.assertEqual(self.aes_funcs.queued_returns(), 0)
+
+
+class MWorkerTestCase(TestCase):
+    '''
+    TestCase for salt.master.MWorker class
+    '''
+    def test_handle_signals(self):
+        '''
+        Asserts that the signal handler leaves the queued returns to the
+        worker loop
+        '''
+        opts = salt.config.master_config(None)
+        worker = salt.master.MWorker(opts, {}, {}, [], 'MWorker-0')
+        worker.aes_funcs = MagicMock()
+        with patch('salt.utils.process.SignalHandlingMultiprocessingProcess._handle_signals',
+                   MagicMock()) as handle_mock:
+            worker._handle_signals(15, None)
+        handle_mock.assert_called_once_with(15, None)
+        worker.aes_funcs.flush_returns.assert_not_called()
+
+    def test_post_stats_publish(self):
+        '''
+        Asserts that the master stats events include the publish timings of
+        the worker
+        '''
+        opts = salt.config.master_config(None)
+        opts['master_stats_event_iter'] = 0
+        worker = salt.master.MWorker(opts, {}, {}, [], 'MWorker-0')
+        worker.aes_funcs = MagicMock()
+        pub_stats = {'send': {'mean': 0.001, 'runs': 2}}
+        with patch('salt.transport.zeromq.ZeroMQPubServerChannel.publish_stats',
+                   MagicMock(return_value=pub_stats)):
+            worker._post_stats({'publish': {'mean': 0.01, 'latency': 0, 'runs': 2}})
+        data = worker.aes_funcs.event.fire_event.call_args[0][0]
+        self.assertEqual(data['publish'], pub_stats)
+        self.assertEqual(data['stats']['publish']['runs'], 2)
@@ -16,13 +16,15 @@ import datetime
 
 # Import Salt Testing libs
 from tests.support.unit import skipIf, TestCase
-from tests.support.mock import NO_MOCK, NO_MOCK_REASON
+from tests.support.mock import NO_MOCK, NO_MOCK_REASON, patch
 
 # Import Salt libs
 from salt.utils import immutabletypes
 from salt.utils.odict import OrderedDict
 import salt.exceptions
 import salt.payload
+import salt.transport.frame
+import salt.utils.msgpack
 
 # Import 3rd-party libs
 import zmq
@@ -164,6 +166,67 @@ class PayloadTestCase(TestCase):
         odata = payload.loads(sdata)
         self.assertTrue('recursion' in odata['data'].lower())
 
+    def test_loads_decoded_strings(self):
+        '''
+        Test that the strings decoded while unpacking are the same as the
+        ones decoded by walking the unpacked data
+        '''
+        payload = salt.payload.Serial('msgpack')
+        idata = {'jid': '20191018101010123456', 'duration': 1.2345, 'num': 50000,
+                 'ret': {'comment': 'Ąţ unicode', 'out': [b'\xff\xfe', 'text']},
+                 'stamp': datetime.datetime(2019, 10, 18, 10, 10, 10, 123456)}
+        sdata = payload.dumps(idata)
+        odata = payload.loads(sdata)
+        self.assertEqual(odata, payload.loads(sdata, use_bin_type=False))
+        self.assertEqual(odata, salt.transport.frame.decode_embedded_strs(
+            payload.loads(sdata, raw=True)))
+        if six.PY3:
+            self.assertEqual(odata['ret']['out'], [b'\xff\xfe', 'text'])
+            self.assertEqual(odata['ret']['comment'], 'Ąţ unicode')
+
+    @skipIf(six.PY2, 'Python 2 has no distinct bytes type')
+    def test_loads_bin_type(self):
+        '''
+        Test that bytes packed with the bin type are still decoded when no
+        encoding is given
+        '''
+        payload = salt.payload.Serial('msgpack')
+        sdata = payload.dumps({'data': b'text', 'bin': b'\xff'}, use_bin_type=True)
+        self.assertEqual(payload.loads(sdata), {'data': 'text', 'bin': b'\xff'})
+        self.assertEqual(payload.loads(sdata, encoding='utf-8'), {'data': b'text', 'bin': b'\xff'})
+
+    def test_loads_envelope(self):
+        '''
+        Test that a transport envelope holding ciphertext is unpacked once,
+        without trying to decode the ciphertext as a string first
+        '''
+        payload = salt.payload.Serial('msgpack')
+        ciphertext = bytes(bytearray(range(256))) * 8
+        sdata = payload.dumps({'enc': 'aes', 'load': ciphertext})
+        with patch('salt.utils.msgpack.loads', side_effect=salt.utils.msgpack.loads) as loads:
+            odata = payload.loads(sdata)
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(odata['enc'], 'aes')
+        self.assertEqual(odata['load'], ciphertext)
+
+    def test_dumps_threads(self):
+        '''
+        Test that threads serializing at the same time do not share a packer
+        '''
+        payload = salt.payload.Serial('msgpack')
+        results = {}
+
+        def dump(idx):
+            data = {'thread': idx, 'data': list(range(idx * 100))}
+            results[idx] = all(payload.loads(payload.dumps(data)) == data for _ in range(50))
+
+        threads = [threading.Thread(target=dump, args=(idx,)) for idx in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, dict((idx, True) for idx in range(8)))
+
 
 class SREQTestCase(TestCase):
     port = 8845  # TODO: dynamically assign a port?
@@ -13,6 +13,7 @@ import os
 import shutil
 import tempfile
 import textwrap
+import threading
 
 # Import Salt Testing libs
 from tests.support.runtests import RUNTIME_VARS
@@ -1130,3 +1131,145 @@ class AsyncRemotePillarTestCase(TestCase):
              'pillar_override': {},
              'extra_minion_data': {'path_to_add': 'fake_data'}},
             dictkey='pillar')
+
+
+class PillarFlightTestCase(TestCase):
+    '''
+    Tests for the coalescing of the pillar renders in flight
+    '''
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.addCleanup(shutil.rmtree, self.cachedir, ignore_errors=True)
+        self.flight = salt.pillar.PillarFlight({'cachedir': self.cachedir,
+                                                'pillar_coalesce_timeout': 5})
+        self.key = salt.pillar.PillarFlight.key('minion', {'os': 'Linux'})
+        self.lock = os.path.join(self.flight.flight_dir, 'top-{0}.lock'.format(self.key))
+        self.result = os.path.join(self.flight.flight_dir, 'top-{0}.p'.format(self.key))
+        os.makedirs(self.flight.flight_dir)
+        stats = salt.pillar.PillarFlight.stats['top']
+        self.before = dict(stats)
+
+    def _counted(self, how):
+        return salt.pillar.PillarFlight.stats['top'][how] - self.before[how]
+
+    def test_render_computed(self):
+        '''
+        Ensure a render without another one in flight is computed and its
+        result left for the renders which waited for it
+        '''
+        func = MagicMock(return_value={'base': {'*': ['common']}})
+        self.assertEqual(self.flight.run('top', self.key, func, 'top.sls'),
+                         {'base': {'*': ['common']}})
+        func.assert_called_once_with('top.sls')
+        self.assertFalse(os.path.exists(self.lock))
+        # No one waited for it
+        self.assertFalse(os.path.exists(self.result))
+        self.assertEqual(self._counted('computed'), 1)
+        self.assertNotEqual(self.key, salt.pillar.PillarFlight.key('minion', {'os': 'BSD'}))
+
+    def test_result_removed_once_read(self):
+        '''
+        Ensure a result is kept until the last render waiting for it read it
+        '''
+        waiting = [self.flight._register('top', self.key) for _ in range(2)]
+        self.flight.run('top', self.key, MagicMock(return_value={'base': {}}))
+        self.assertTrue(os.path.exists(self.result))
+        self.flight._unregister('top', self.key, waiting[0], self.result)
+        self.assertTrue(os.path.exists(self.result))
+        self.flight._unregister('top', self.key, waiting[1], self.result)
+        self.assertEqual(os.listdir(self.flight.flight_dir), [])
+
+    def test_render_coalesced(self):
+        '''
+        Ensure a render waits for the identical render in flight and uses its
+        result
+        '''
+        with fopen(self.lock, 'wb') as fp_:
+            fp_.write(b'token')
+
+        def _finish():
+            with fopen(self.result, 'wb') as fp_:
+                self.flight.serial.dump({'token': 'token', 'ret': {'shared': True}}, fp_)
+            os.remove(self.lock)
+        timer = threading.Timer(0.2, _finish)
+        timer.start()
+        func = MagicMock()
+        try:
+            self.assertEqual(self.flight.run('top', self.key, func), {'shared': True})
+        finally:
+            timer.join()
+        self.assertFalse(func.called)
+        self.assertEqual(self._counted('coalesced'), 1)
+        # The result and the wait file are gone once read
+        self.assertEqual(os.listdir(self.flight.flight_dir), [])
+
+    def test_render_failed_or_stale(self):
+        '''
+        Ensure a render is computed when the render it waited for did not
+        share a result, or left a stale lock behind
+        '''
+        with fopen(self.lock, 'wb') as fp_:
+            fp_.write(b'token')
+        os.utime(self.lock, (0, 0))
+        func = MagicMock(return_value={'computed': True})
+        self.assertEqual(self.flight.run('top', self.key, func), {'computed': True})
+        func.assert_called_once_with()
+        self.assertEqual(self._counted('computed'), 1)
+
+    def test_top_key(self):
+        '''
+        Ensure the renders of a plain top file are shared between minions, and
+        those of a template only between the renders with the same inputs
+        '''
+        opts = {
+            'optimization_order': [0, 1, 2],
+            'renderer': 'jinja|yaml',
+            'renderer_blacklist': [],
+            'renderer_whitelist': [],
+            'state_top': '',
+            'pillar_roots': {'base': ['/srv/pillar/base']},
+            'file_roots': {'base': ['/srv/salt/base']},
+            'extension_modules': '',
+            'cachedir': self.cachedir,
+            'pillar_coalesce': True,
+        }
+        pillars = [salt.pillar.Pillar(dict(opts), {'os': os_}, minion, 'base')
+                   for os_, minion in (('Linux', 'minion1'), ('BSD', 'minion2'))]
+        top = os.path.join(self.cachedir, 'top.sls')
+        with fopen(top, 'w') as fp_:
+            fp_.write('base:\n  \'*\':\n    - common\n')
+        keys = [pillar._top_key(top, 'base', ()) for pillar in pillars]
+        self.assertEqual(keys[0], keys[1])
+        with fopen(top, 'w') as fp_:
+            fp_.write('base:\n  \'*\':\n    - {{ grains[\'os\'] }}\n')
+        keys = [pillar._top_key(top, 'base', ()) for pillar in pillars]
+        self.assertNotEqual(keys[0], keys[1])
+        with fopen(top, 'w') as fp_:
+            fp_.write('#!py\ndef run():\n    return {}\n')
+        keys = [pillar._top_key(top, 'base', ()) for pillar in pillars]
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_ext_pillar_key(self):
+        '''
+        Ensure the ext_pillar calls are only shared between the renders of the
+        same pillarenv
+        '''
+        opts = {
+            'optimization_order': [0, 1, 2],
+            'renderer': 'yaml',
+            'renderer_blacklist': [],
+            'renderer_whitelist': [],
+            'state_top': '',
+            'pillar_roots': {'dev': ['/srv/pillar/dev'], 'prod': ['/srv/pillar/prod']},
+            'file_roots': {'base': ['/srv/salt/base']},
+            'extension_modules': '',
+            'cachedir': self.cachedir,
+            'pillar_coalesce': True,
+        }
+        pillars = [salt.pillar.Pillar(dict(opts), {'os': 'Linux'}, 'minion', 'base',
+                                      pillarenv=pillarenv)
+                   for pillarenv in ('dev', 'prod', 'dev')]
+        keys = [pillar._ext_pillar_key('git', ['master file:///srv/git'], {})
+                for pillar in pillars]
+        self.assertNotEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], keys[2])
@@ -23,6 +23,7 @@ from tests.support.runtests import RUNTIME_VARS
 # Import Salt libs
 import salt.exceptions
 import salt.state
+import salt.utils.files
 from salt.utils.odict import OrderedDict
 from salt.utils.decorators import state as statedecorators
 
@@ -294,6 +295,90 @@ class HighStateTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
         self.assertEqual(ret, [('somestuff', 'cmd')])
 
 
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class CompileCacheTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
+    '''
+    TestCase for the cache of the compiled highstates
+    '''
+    def setUp(self):
+        root_dir = tempfile.mkdtemp(dir=integration.TMP)
+        self.addCleanup(shutil.rmtree, root_dir, ignore_errors=True)
+        self.state_tree_dir = os.path.join(root_dir, 'state_tree')
+        cache_dir = os.path.join(root_dir, 'cachedir')
+        os.makedirs(os.path.join(self.state_tree_dir, 'app'))
+        os.makedirs(cache_dir)
+        self._write('top.sls', "base:\n  '*':\n    - app\n")
+        self._write('app/init.sls',
+                    "{% from 'app/map.jinja' import name %}\n"
+                    "app:\n  test.succeed_without_changes:\n    - name: {{ name }}\n")
+        self._write('app/map.jinja', "{% set name = 'one' %}\n")
+
+        overrides = {}
+        overrides['root_dir'] = root_dir
+        overrides['state_events'] = False
+        overrides['id'] = 'match'
+        overrides['file_client'] = 'local'
+        overrides['file_roots'] = dict(base=[self.state_tree_dir])
+        overrides['cachedir'] = cache_dir
+        overrides['test'] = False
+        overrides['state_compile_cache'] = True
+        self.config = self.get_temp_config('minion', **overrides)
+        self.addCleanup(delattr, self, 'config')
+
+    def _write(self, path, contents):
+        with salt.utils.files.fopen(os.path.join(self.state_tree_dir, path), 'w') as fp_:
+            fp_.write(contents)
+
+    def _highstate(self):
+        highstate = salt.state.HighState(self.config)
+        highstate.push_active()
+        self.addCleanup(highstate.pop_active)
+        return highstate
+
+    def test_compile_highstate_cached(self):
+        '''
+        Test that the high data is not rendered again while its files are the
+        same
+        '''
+        highstate = self._highstate()
+        high = highstate.compile_highstate()
+        self.assertEqual(high['app']['__sls__'], 'app')
+        self.assertEqual(highstate.compile_cache_stats, {'hits': 0, 'misses': 1})
+
+        highstate = self._highstate()
+        with patch.object(highstate, 'render_highstate') as render_mock:
+            self.assertEqual(dict(highstate.compile_highstate()), dict(high))
+        self.assertFalse(render_mock.called)
+        self.assertEqual(highstate.compile_cache_stats, {'hits': 1, 'misses': 0})
+
+    def test_compile_highstate_changed_import(self):
+        '''
+        Test that changing a file imported by an SLS file renders the high
+        data again
+        '''
+        self._highstate().compile_highstate()
+        self._write('app/map.jinja', "{% set name = 'another' %}\n")
+        highstate = self._highstate()
+        high = highstate.compile_highstate()
+        self.assertEqual(highstate.compile_cache_stats, {'hits': 0, 'misses': 1})
+        self.assertIn({'name': 'another'}, high['app']['test'])
+
+    def test_compile_low_chunks_cached(self):
+        '''
+        Test that the low chunks are cached apart from the high data
+        '''
+        chunks = self._highstate().compile_low_chunks()
+        self.assertEqual([chunk['name'] for chunk in chunks], ['one'])
+        highstate = self._highstate()
+        self.assertEqual(highstate.compile_low_chunks(), chunks)
+        self.assertEqual(highstate.compile_cache_stats, {'hits': 1, 'misses': 0})
+        # The pillar is part of the fingerprint
+        highstate = self._highstate()
+        highstate.state.opts['pillar'] = {'changed': True}
+        highstate.compile_low_chunks()
+        self.assertEqual(highstate.compile_cache_stats, {'hits': 0, 'misses': 1})
+
+
 @skipIf(NO_MOCK, NO_MOCK_REASON)
 @skipIf(pytest is None, 'PyTest is missing')
 class StateReturnsTestCase(TestCase):
@@ -574,3 +659,153 @@ class StateFormatSlotsTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
             self.state_obj.format_slots(cdata)
         mock.assert_called_once_with('fun_arg', fun_key='fun_val')
         self.assertEqual(cdata, {'args': ['arg'], 'kwargs': {'key': 'value1thing~'}})
+
+
+class StateGraphTestCase(TestCase, AdaptedConfigurationTestCaseMixin):
+    '''
+    TestCase for running the chunks following the graph of their requisites
+    '''
+    def setUp(self):
+        with patch('salt.state.State._gather_pillar'):
+            minion_opts = self.get_temp_config('minion')
+            minion_opts['state_workers'] = 2
+            self.state_obj = salt.state.State(minion_opts, jid='20190101000000000000')
+
+    def _high(self, *states):
+        high = OrderedDict()
+        for name, fun, args in states:
+            high[name] = {'test': [fun] + args, '__sls__': 'graph', '__env__': 'base'}
+        return high
+
+    def test_chunk_graph(self):
+        '''
+        Test the graph of the chunks, from their requisites and order options
+        '''
+        high = self._high(
+            ('one', 'succeed_with_changes', [{'order': 10000}]),
+            ('two', 'succeed_with_changes', [{'order': 10001}, {'require': [{'test': 'one'}]}]),
+            ('three', 'succeed_with_changes', [{'order': 10002}, {'onchanges': [{'id': 'o*'}]}]),
+            ('four', 'succeed_with_changes', [{'order': 10003}]),
+            ('last', 'succeed_with_changes', [{'order': 'last'}]),
+        )
+        # In different SLS files the definition order is not followed
+        for name in high:
+            high[name]['__sls__'] = name
+        chunks = self.state_obj.compile_high_data(high)
+        self.assertEqual([chunk['__id__'] for chunk in chunks],
+                         ['one', 'two', 'three', 'four', 'last'])
+        self.assertEqual(self.state_obj._chunk_graph(chunks),
+                         [set(), {0}, {0}, set(), {0, 1, 2, 3}])
+
+    def test_chunk_graph_auto_order(self):
+        '''
+        Test that the chunks of an SLS file keep their definition order
+        '''
+        high = self._high(
+            ('one', 'succeed_with_changes', [{'order': 10000}]),
+            ('two', 'succeed_with_changes', [{'order': 10001}, {'parallel': True}]),
+            ('three', 'succeed_with_changes', [{'order': 10002}]),
+            ('four', 'succeed_with_changes', [{'order': 10003}]),
+            ('last', 'succeed_with_changes', [{'order': 'last'}]),
+        )
+        chunks = self.state_obj.compile_high_data(high)
+        self.assertEqual(self.state_obj._chunk_graph(chunks),
+                         [set(), {0}, {0}, {2}, {0, 1, 2, 3}])
+
+        # A chunk required by the chunks before it does not wait for them
+        high = self._high(
+            ('one', 'succeed_with_changes', [{'order': 10000}, {'require': [{'test': 'two'}]}]),
+            ('two', 'succeed_with_changes', [{'order': 10001}]),
+        )
+        chunks = self.state_obj.compile_high_data(high)
+        self.assertEqual(self.state_obj._chunk_graph(chunks), [{1}, set()])
+
+        self.state_obj.opts['state_auto_order'] = False
+        high = self._high(
+            ('one', 'succeed_with_changes', []),
+            ('two', 'succeed_with_changes', []),
+        )
+        chunks = self.state_obj.compile_high_data(high)
+        self.assertEqual(self.state_obj._chunk_graph(chunks), [set(), set()])
+
+    def test_call_chunks_graph(self):
+        '''
+        Test that the chunks run with their requisites honored
+        '''
+        high = self._high(
+            ('fails', 'fail_without_changes', [{'order': 10000}]),
+            ('needs_fails', 'succeed_with_changes', [{'order': 10001}, {'require': [{'test': 'fails'}]}]),
+            ('changes', 'succeed_with_changes', [{'order': 10002}]),
+            ('needs_changes', 'succeed_without_changes', [{'order': 10003}, {'onchanges': [{'test': 'changes'}]}]),
+            ('inline', 'succeed_with_changes', [{'order': 10004}, {'parallel': False}]),
+        )
+        with patch.object(self.state_obj, 'call_chunks_graph',
+                          wraps=self.state_obj.call_chunks_graph) as graph_mock:
+            ret = self.state_obj.call_high(high)
+        self.assertTrue(graph_mock.called)
+        ret = dict((key.split('_|-')[1], val) for key, val in ret.items())
+        self.assertEqual(len(ret), 5)
+        self.assertFalse(ret['fails']['result'])
+        self.assertFalse(ret['needs_fails']['result'])
+        self.assertIn('One or more requisite failed', ret['needs_fails']['comment'])
+        self.assertTrue(ret['changes']['changes'])
+        self.assertTrue(ret['needs_changes']['result'])
+        self.assertTrue(ret['inline']['result'])
+        self.assertNotIn('proc', ret['changes'])
+
+
+class StateIndexTestCase(TestCase):
+    '''
+    TestCase for the indexes used to resolve requisites
+    '''
+    def test_chunk_index(self):
+        '''
+        Test that the chunk index matches like the requisites do
+        '''
+        chunks = [
+            {'state': 'pkg', '__id__': 'nginx', 'name': 'nginx', '__sls__': 'web', 'fun': 'installed'},
+            {'state': 'file', '__id__': 'nginx-conf', 'name': '/etc/nginx/nginx.conf',
+             '__sls__': 'web.conf', 'fun': 'managed'},
+            {'state': 'file', '__id__': 'site-conf', 'name': '/etc/nginx/sites/default',
+             '__sls__': 'web.conf', 'fun': 'managed'},
+            {'state': 'service', '__id__': 'nginx-service', 'name': 'nginx', '__sls__': 'web', 'fun': 'running'},
+        ]
+        index = salt.state.ChunkIndex(chunks)
+        self.assertTrue(index.current(chunks))
+        self.assertFalse(index.current(list(chunks)))
+        self.assertEqual(index.positions('id', 'nginx'), [0, 3])
+        self.assertEqual(index.positions('service', 'nginx'), [3])
+        self.assertEqual(index.positions('file', '/etc/nginx/*'), [1, 2])
+        self.assertEqual(index.positions('file', 'nginx-conf'), [1])
+        self.assertEqual(index.positions('pkg', 'nginx-conf'), [])
+        self.assertEqual(index.positions('sls', 'web'), [0, 3])
+        self.assertEqual(index.positions('sls', 'web*'), [0, 1, 2, 3])
+        self.assertEqual(index.match('id', '*-conf'), chunks[1:3])
+
+    def test_find_name_index(self):
+        '''
+        Test that find_name and find_sls_ids return the same with the index
+        '''
+        high = OrderedDict([
+            ('nginx', {'pkg': ['installed'], '__sls__': 'web', '__env__': 'base'}),
+            ('nginx-conf', {'file': ['managed', {'name': '/etc/nginx/nginx.conf'}],
+                            '__sls__': 'web.conf', '__env__': 'base'}),
+            ('nginx-service', {'service': ['running', {'name': 'nginx'}, {'enable': True}],
+                               '__sls__': 'web', '__env__': 'base'}),
+        ])
+        index = salt.state.HighIndex(high)
+        for name, state in (('/etc/nginx/nginx.conf', 'file'), ('nginx', 'service'),
+                            ('nginx-service', 'service'), ('missing', 'file')):
+            self.assertEqual(salt.state.find_name(name, state, high, index),
+                             salt.state.find_name(name, state, high))
+        self.assertEqual(salt.state.find_name('/etc/nginx/nginx.conf', 'file', high, index),
+                         [('nginx-conf', 'file')])
+        self.assertEqual(salt.state.find_sls_ids('web', high, index),
+                         salt.state.find_sls_ids('web', high))
+
+        # Changed states are added again
+        high['nginx-conf']['file'][1] = {'name': '/etc/nginx/other.conf'}
+        index.add('nginx-conf', 'file')
+        self.assertEqual(salt.state.find_name('/etc/nginx/nginx.conf', 'file', high, index), [])
+        self.assertEqual(salt.state.find_name('/etc/nginx/other.conf', 'file', high, index),
+                         [('nginx-conf', 'file')])
@@ -6,6 +6,8 @@
 # Import python libs
 from __future__ import absolute_import, print_function, unicode_literals
 import os
+import shutil
+import tempfile
 import time
 import threading
 import multiprocessing
@@ -25,15 +27,19 @@ if not hasattr(zmq.eventloop.ioloop, 'ZMQIOLoop'):
     zmq.eventloop.ioloop.ZMQIOLoop = zmq.eventloop.ioloop.IOLoop
 from tornado.testing import AsyncTestCase
 import tornado.gen
+import tornado.testing
 
 # Import Salt libs
 import salt.config
 import salt.log.setup
+import salt.payload
 from salt.ext import six
 import salt.utils.process
 import salt.utils.platform
+import salt.utils.stringutils
 import salt.transport.server
 import salt.transport.client
+import salt.transport.zeromq
 import salt.exceptions
 from salt.ext.six.moves import range
 from salt.transport.zeromq import AsyncReqMessageClientPool
@@ -323,6 +329,144 @@ class AsyncReqMessageClientPoolTest(TestCase):
         self.assertEqual([], self.message_client_pool.message_clients)
 
 
+class AsyncReqMessageClientTest(AsyncTestCase):
+    '''
+    Test the multiplexing of requests over the message client socket
+    '''
+    def get_new_ioloop(self):
+        return zmq.eventloop.ioloop.ZMQIOLoop()
+
+    def setUp(self):
+        super(AsyncReqMessageClientTest, self).setUp()
+        self.serial = salt.payload.Serial('msgpack')
+        self.context = zmq.Context()
+        self.server = self.context.socket(zmq.ROUTER)
+        self.port = self.server.bind_to_random_port('tcp://127.0.0.1')
+        self.message_client = self._message_client({})
+
+    def _message_client(self, opts):
+        return salt.transport.zeromq.AsyncReqMessageClient(
+            opts, 'tcp://127.0.0.1:{0}'.format(self.port), io_loop=self.io_loop)
+
+    def tearDown(self):
+        self.message_client.close()
+        self.server.close(0)
+        self.context.term()
+        del self.message_client
+        super(AsyncReqMessageClientTest, self).tearDown()
+
+    def _reply(self, frames, data):
+        self.server.send_multipart(frames[:-1] + [self.serial.dumps(data)])
+
+    @tornado.gen.coroutine
+    def _recv(self):
+        while not self.server.poll(0):
+            yield tornado.gen.sleep(0.01)
+        raise tornado.gen.Return(self.server.recv_multipart())
+
+    @tornado.testing.gen_test
+    def test_send_concurrent(self):
+        '''
+        Test that several requests are in flight at once with
+        shared_req_channel and that the replies find their request whatever
+        order they come back in
+        '''
+        self.message_client.close()
+        self.message_client = self._message_client({'shared_req_channel': True})
+        futures = [self.message_client.send({'idx': idx}, timeout=10) for idx in range(3)]
+        self.assertEqual(len(self.message_client.send_queue), 3)
+        requests = []
+        for _ in range(3):
+            frames = yield self._recv()
+            requests.append(frames)
+        for frames in reversed(requests):
+            self._reply(frames, {'ret': self.serial.loads(frames[-1])['idx']})
+        rets = yield futures
+        self.assertEqual(rets, [{'ret': 0}, {'ret': 1}, {'ret': 2}])
+        self.assertEqual(self.message_client.send_queue, [])
+        self.assertEqual(self.message_client.send_timeout_map, {})
+
+    @tornado.testing.gen_test
+    def test_send_timeout(self):
+        '''
+        Test that a request is sent again when it times out and that the late
+        reply to the first attempt is dropped
+        '''
+        future = self.message_client.send({'idx': 0}, timeout=0.5, tries=1)
+        first = yield self._recv()
+        second = yield self._recv()
+        self.assertNotEqual(first[1], second[1])
+        self._reply(first, 'late')
+        self._reply(second, 'retried')
+        ret = yield future
+        self.assertEqual(ret, 'retried')
+
+        with self.assertRaises(salt.exceptions.SaltReqTimeoutError):
+            yield self.message_client.send({'idx': 1}, timeout=0.1, tries=0)
+        self.assertEqual(self.message_client.send_future_map, {})
+
+    @tornado.testing.gen_test
+    def test_send_one_at_a_time(self):
+        '''
+        Test that without shared_req_channel a request is only sent once the
+        previous one got its reply or timed out, and that the socket holding
+        a timed out request is replaced
+        '''
+        futures = [self.message_client.send({'idx': idx}, timeout=timeout, tries=0)
+                   for idx, timeout in enumerate((10, 0.5, 10))]
+        first = yield self._recv()
+        self.assertEqual(self.serial.loads(first[-1]), {'idx': 0})
+        yield tornado.gen.sleep(0.1)
+        self.assertFalse(self.server.poll(0))
+        self._reply(first, 'first')
+        second = yield self._recv()
+        self.assertEqual(self.serial.loads(second[-1]), {'idx': 1})
+        socket = self.message_client.socket
+        # The second request times out
+        with self.assertRaises(salt.exceptions.SaltReqTimeoutError):
+            yield futures[1]
+        self.assertIsNot(self.message_client.socket, socket)
+        third = yield self._recv()
+        self.assertEqual(self.serial.loads(third[-1]), {'idx': 2})
+        self._reply(third, 'third')
+        rets = yield [futures[0], futures[2]]
+        self.assertEqual(rets, ['first', 'third'])
+        self.assertEqual(self.message_client.send_message_map, {})
+
+
+class SharedReqChannelTestCases(BaseZMQReqCase):
+    '''
+    Test the request channel shared by the threads of a process
+    '''
+    @classmethod
+    @tornado.gen.coroutine
+    def _handle_payload(cls, payload):
+        raise tornado.gen.Return((payload, {'fun': 'send_clear'}))
+
+    def test_threads(self):
+        '''
+        Test that the threads share one channel and get their own replies
+        '''
+        opts = dict(self.minion_config, shared_req_channel=True)
+        channels = []
+        rets = {}
+
+        def send(idx):
+            channel = salt.transport.client.ReqChannel.factory(opts, crypt='clear')
+            channels.append(channel)
+            rets[idx] = channel.send({'thread': idx}, timeout=10)['load']
+            channel.close()
+
+        threads = [threading.Thread(target=send, args=(idx,)) for idx in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(rets, dict((idx, {'thread': idx}) for idx in range(5)))
+        self.assertEqual(len(set(id(channel) for channel in channels)), 1)
+        self.assertIsInstance(channels[0], salt.transport.client.SharedReqChannel)
+
+
 class ZMQConfigTest(TestCase):
     def test_master_uri(self):
         '''
@@ -372,6 +516,179 @@ class ZMQConfigTest(TestCase):
                                                          source_port=s_port) == 'tcp://0.0.0.0:{0};{1}:{2}'.format(s_port, m_ip, m_port)
 
 
+class PubTargetTest(TestCase):
+    '''
+    Test the topics the publications are sent to
+    '''
+    def setUp(self):
+        self.opts = {'zmq_filtering': True,
+                     'master_stats': False,
+                     'sign_pub_messages': False,
+                     'serial': 'msgpack'}
+        self.serial = salt.payload.Serial(self.opts)
+        self.load = {'tgt': 'os:Linux', 'tgt_type': 'grain', 'jid': '1',
+                     'fun': 'test.ping', 'arg': []}
+        self.ckminions = MagicMock()
+        self.ckminions.check_minions.return_value = {'minions': ['minion1'], 'missing': []}
+        self.pub_sock = MagicMock()
+        crypticle = MagicMock()
+        crypticle.dumps.return_value = b'load'
+        patches = (
+            patch('salt.utils.minions.CkMinions', MagicMock(return_value=self.ckminions)),
+            patch('salt.transport.zeromq.ZeroMQPubServerChannel._get_crypt',
+                  MagicMock(return_value=(crypticle, None))),
+            patch('salt.transport.zeromq.ZeroMQPubServerChannel.pub_sock', self.pub_sock),
+        )
+        for item in patches:
+            item.start()
+            self.addCleanup(item.stop)
+
+    def _publish(self, minions=None):
+        channel = salt.transport.zeromq.ZeroMQPubServerChannel(self.opts)
+        channel.publish(self.load, minions=minions)
+        header = self.pub_sock.send_multipart.call_args[0][0][0]
+        return self.serial.loads(header)
+
+    def test_minions_passed(self):
+        '''
+        Test that the minions resolved by the master are used as topics
+        '''
+        header = self._publish(minions=['minion1', 'minion2'])
+        self.assertEqual(header['topic_lst'], ['minion1', 'minion2'])
+        self.assertFalse(self.ckminions.check_minions.called)
+
+    def test_minions_resolved(self):
+        '''
+        Test that any target type is resolved when no minions are passed
+        '''
+        header = self._publish()
+        self.assertEqual(header['topic_lst'], ['minion1'])
+        self.ckminions.check_minions.assert_called_once_with(
+            'os:Linux', tgt_type='grain', delimiter=':')
+
+    def test_no_filtering(self):
+        '''
+        Test that the publications are broadcast without zmq_filtering
+        '''
+        self.opts['zmq_filtering'] = False
+        header = self._publish(minions=['minion1'])
+        self.assertNotIn('topic_lst', header)
+        self.assertFalse(self.ckminions.check_minions.called)
+
+
+class WorkerPoolTest(TestCase):
+    '''
+    Test the routing of the requests to the worker pools
+    '''
+    def setUp(self):
+        self.sock_dir = tempfile.mkdtemp(dir=RUNTIME_VARS.TMP)
+        self.addCleanup(shutil.rmtree, self.sock_dir, ignore_errors=True)
+        self.opts = {'sock_dir': self.sock_dir,
+                     'worker_pools': {'pillar': {'commands': ['_pillar'],
+                                                 'max_worker_threads': 3},
+                                      'files': {'commands': ['_serve_file', '_file_hash'],
+                                                'worker_threads': 2}}}
+        self.serial = salt.payload.Serial(self.opts)
+
+    def test_worker_pools(self):
+        pools = salt.transport.zeromq.worker_pools(self.opts)
+        self.assertEqual(list(pools), ['files', 'pillar'])
+        self.assertEqual(pools['files'], {'commands': set(['_serve_file', '_file_hash']),
+                                          'min': 2, 'max': 2})
+        self.assertEqual(pools['pillar'], {'commands': set(['_pillar']), 'min': 1, 'max': 3})
+        self.assertEqual(salt.transport.zeromq.worker_pools({}), {})
+
+    def test_payload_cmd(self):
+        channel = MagicMock(crypt='aes')
+        channel.auth.creds = {'pool_commands': ['_pillar']}
+        payload = self.serial.dumps(salt.transport.zeromq.AsyncZeroMQReqChannel._package_load(
+            channel, b'encrypted', {'cmd': '_pillar'}))
+        self.assertEqual(salt.transport.zeromq._payload_cmd(payload), '_pillar')
+        # Only the commands of the pools the master advertised go in clear
+        for creds in ({'pool_commands': ['_pillar']}, {'pool_commands': []}, {}):
+            channel.auth.creds = creds
+            self.assertNotIn('cmd', salt.transport.zeromq.AsyncZeroMQReqChannel._package_load(
+                channel, b'encrypted', {'cmd': '_return'}))
+        payload = self.serial.dumps({'enc': 'clear', 'load': {'cmd': 'publish', 'tgt': '*'}})
+        self.assertEqual(salt.transport.zeromq._payload_cmd(payload), 'publish')
+        payload = self.serial.dumps({'enc': 'aes', 'load': b'encrypted'})
+        self.assertIsNone(salt.transport.zeromq._payload_cmd(payload))
+        self.assertIsNone(salt.transport.zeromq._payload_cmd(b'garbage'))
+
+    def test_pool_device(self):
+        channel = salt.transport.zeromq.ZeroMQReqServerChannel(self.opts)
+        channel._pool_state = multiprocessing.Array(ctypes.c_int, 8)
+        channel.set_pool_workers('pillar', 1)
+        channel.context = zmq.Context()
+        channel.clients = channel.context.socket(zmq.ROUTER)
+        port = channel.clients.bind_to_random_port('tcp://127.0.0.1')
+        channel.workers = channel.context.socket(zmq.DEALER)
+        channel.workers.bind(channel._worker_uri())
+        device = threading.Thread(target=channel._pool_device)
+        device.start()
+
+        sockets = []
+
+        def socket(kind, uri):
+            sock = channel.context.socket(kind)
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.RCVTIMEO = 5000
+            sock.connect(uri)
+            sockets.append(sock)
+            return sock
+
+        try:
+            default_worker = socket(zmq.REP, channel._worker_uri())
+            pillar_worker = socket(zmq.REP, channel._worker_uri('pillar'))
+            clients = [socket(zmq.REQ, 'tcp://127.0.0.1:{0}'.format(port)) for _ in range(3)]
+
+            clients[0].send(self.serial.dumps({'enc': 'clear', 'load': {'cmd': 'publish'}}))
+            clients[1].send(self.serial.dumps({'cmd': '_pillar', 'enc': 'aes', 'load': b'1'}))
+            clients[2].send(self.serial.dumps({'cmd': '_pillar', 'enc': 'aes', 'load': b'2'}))
+
+            self.assertEqual(self.serial.loads(default_worker.recv())['load']['cmd'], 'publish')
+            default_worker.send(b'published')
+            self.assertEqual(clients[0].recv(), b'published')
+
+            # The pool has a single worker, the second request waits for it
+            first = self.serial.loads(pillar_worker.recv())['load']
+            time.sleep(0.1)
+            self.assertEqual(channel.pool_state('pillar'), (1, 1))
+            pillar_worker.send(salt.utils.stringutils.to_bytes(first))
+            second = self.serial.loads(pillar_worker.recv())['load']
+            pillar_worker.send(salt.utils.stringutils.to_bytes(second))
+            self.assertEqual(sorted([first, second]), ['1', '2'])
+            self.assertEqual(clients[1].recv(), b'1')
+            self.assertEqual(clients[2].recv(), b'2')
+
+            # Retiring a worker pauses the pool once its requests are handled
+            clients[1].send(self.serial.dumps({'cmd': '_pillar', 'enc': 'aes', 'load': b'3'}))
+            third = pillar_worker.recv()
+            self.assertFalse(channel.retire_pool_worker('pillar'))
+            time.sleep(1.5)
+            self.assertFalse(channel.retire_pool_worker('pillar'))
+            pillar_worker.send(third)
+            self.assertEqual(clients[1].recv(), third)
+            time.sleep(1.5)
+            self.assertTrue(channel.retire_pool_worker('pillar'))
+            clients[2].send(self.serial.dumps({'cmd': '_pillar', 'enc': 'aes', 'load': b'4'}))
+            time.sleep(0.5)
+            self.assertEqual(channel.pool_state('pillar'), (1, 0))
+            channel.resume_pool('pillar')
+            fourth = pillar_worker.recv()
+            self.assertEqual(self.serial.loads(fourth)['load'], '4')
+            pillar_worker.send(fourth)
+            self.assertEqual(clients[2].recv(), fourth)
+        finally:
+            channel._closing = True
+            device.join()
+            for sock in sockets:
+                sock.close()
+            channel.clients.close()
+            channel.workers.close()
+            channel.context.term()
+
+
 class PubServerChannel(TestCase, AdaptedConfigurationTestCaseMixin):
 
     @classmethod
@@ -550,6 +867,48 @@ class PubServerChannel(TestCase, AdaptedConfigurationTestCaseMixin):
 
         assert res.result()['enc'] == 'aes'
 
+    def test_publish_crypticle_cached_per_aes_key(self):
+        '''
+        test ZeroMQPubServerChannel reuses its crypticle until the AES key
+        is rotated
+        '''
+        opts = dict(self.master_config)
+        channel = salt.transport.zeromq.ZeroMQPubServerChannel(opts)
+        crypticle, sign_key = channel._get_crypt()
+        assert sign_key is None
+        other = salt.transport.zeromq.ZeroMQPubServerChannel(opts)
+        assert other._get_crypt()[0] is crypticle
+
+        old_secret = salt.master.SMaster.secrets['aes']['secret']
+        salt.master.SMaster.secrets['aes']['secret'] = multiprocessing.Array(
+            ctypes.c_char,
+            six.b(salt.crypt.Crypticle.generate_key_string()),
+        )
+        try:
+            assert other._get_crypt()[0] is not crypticle
+        finally:
+            salt.master.SMaster.secrets['aes']['secret'] = old_secret
+
+    def test_publish_stats(self):
+        '''
+        test ZeroMQPubServerChannel records per stage publish timings and
+        sends the serialized payload as its own frame
+        '''
+        opts = dict(self.master_config, master_stats=True)
+        channel = salt.transport.zeromq.ZeroMQPubServerChannel(opts)
+        sock = MagicMock()
+        with patch.object(salt.transport.zeromq.ZeroMQPubServerChannel,
+                          'pub_sock', sock):
+            channel.publish({'tgt_type': 'list', 'tgt': ['minion'], 'jid': 1})
+        header, payload = sock.send_multipart.call_args[0][0]
+        assert channel.serial.loads(header)['topic_lst'] == ['minion']
+        assert channel.serial.loads(payload)['enc'] == 'aes'
+        stats = channel.publish_stats()
+        for stage in ('encrypt', 'target', 'serialize', 'send'):
+            assert stats[stage]['runs'] >= 1
+        # The timings are reset once they were fired with the master stats
+        assert channel.publish_stats() == {}
+
     @skipIf(salt.utils.platform.is_windows(), 'Skip on Windows OS')
     def test_zeromq_filtering(self):
         '''
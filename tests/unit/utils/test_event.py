@@ -10,6 +10,7 @@
 # Import python libs
 from __future__ import absolute_import, unicode_literals, print_function
 import os
+import datetime
 import hashlib
 import time
 import shutil
@@ -18,8 +19,10 @@ import shutil
 from tests.support.unit import expectedFailure, skipIf, TestCase
 from tests.support.runtests import RUNTIME_VARS
 from tests.support.events import eventpublisher_process, eventsender_process
+from tests.support.mock import MagicMock
 
 # Import salt libs
+import salt.payload
 import salt.utils.event
 import salt.utils.stringutils
 
@@ -280,6 +283,29 @@ class TestSaltEvent(TestCase):
                 evt = me.get_event(tag='testevents')
                 self.assertGotEvent(evt, {'data': '{0}'.format(i)}, 'Event {0}'.format(i))
 
+    def test_event_shards(self):
+        '''Test events are published by the shard of their tag and received from all shards'''
+        opts = {'event_publisher_shards': 2}
+        tags = ['salt/job/{0}/ret/minion'.format(idx) for idx in range(10)]
+        shards = [salt.utils.event.tag_shard(tag, 2) for tag in tags]
+        self.assertEqual(set(shards), set([0, 1]))
+        self.assertEqual(
+            salt.utils.event.tag_shard('salt/job/1/new', 2),
+            salt.utils.event.tag_shard('salt/job/1/ret/minion', 2))
+        with eventpublisher_process(self.sock_dir, shards=2):
+            self.assertTrue(os.path.exists(
+                os.path.join(self.sock_dir, 'master_event_pub_1.ipc')))
+            me = salt.utils.event.MasterEvent(self.sock_dir, opts=opts, listen=True)
+            for idx, tag in enumerate(tags):
+                me.fire_event({'data': idx}, tag)
+            received = {}
+            for _ in tags:
+                evt = me.get_event(tag='salt/job/', full=True)
+                self.assertIsNotNone(evt)
+                received[evt['tag']] = evt['data']['data']
+            self.assertEqual(received, dict((tag, idx) for idx, tag in enumerate(tags)))
+            self.assertIsNone(me.get_event(wait=0.1, tag='salt/job/'))
+
     # Test the fire_master function. As it wraps the underlying fire_event,
     # we don't need to perform extensive testing.
     def test_send_master_event(self):
@@ -293,6 +319,117 @@ class TestSaltEvent(TestCase):
             self.assertGotEvent(evt, {'data': data, 'tag': 'test_master', 'events': None, 'pretag': None})
 
 
+class TestPendingEvents(TestCase):
+    def setUp(self):
+        self.event = salt.utils.event.SaltEvent('master', listen=False)
+        self.pending = self.event.pending_events
+
+    def _evt(self, tag):
+        return {'tag': tag, 'data': {}}
+
+    def test_pending_events_index(self):
+        '''
+        Events are cached for the subscriptions they match and are returned in
+        order, with any match type
+        '''
+        self.event.subscribe('salt/job/1')
+        self.event.subscribe('/ret/m1', 'endswith')
+        self.event.subscribe('salt/job/[12]/ret/*', 'fnmatch')
+        for tag in ('salt/job/1/new', 'salt/job/2/ret/m1', 'salt/job/3/ret/m1',
+                    'salt/job/1/ret/m2', 'salt/job/3/ret/m2'):
+            self.pending.add(self._evt(tag))
+        self.assertEqual(len(self.pending), 4)
+
+        self.assertEqual(self.event._check_pending('salt/job/1')['tag'],
+                         'salt/job/1/new')
+        self.assertEqual(
+            self.event._check_pending('/ret/m1', 'endswith')['tag'],
+            'salt/job/2/ret/m1')
+        # Not subscribed to, found in the cached events
+        self.assertEqual(self.event._check_pending('salt/job/3')['tag'],
+                         'salt/job/3/ret/m1')
+        self.assertEqual(
+            self.event._check_pending('salt/job/[12]/ret/*', 'fnmatch')['tag'],
+            'salt/job/1/ret/m2')
+        self.assertIsNone(self.event._check_pending('salt/job/1'))
+        self.assertEqual(len(self.pending), 0)
+
+    def test_pending_events_subscriptions(self):
+        '''
+        New subscriptions get the cached events they match, and the events of
+        a removed subscription are dropped unless subscribed to elsewhere
+        '''
+        self.event.subscribe('salt/job/')
+        self.pending.add(self._evt('salt/job/1/ret/m1'))
+        self.pending.add(self._evt('salt/job/2/ret/m1'))
+        self.event.subscribe('salt/job/2')
+        self.event.subscribe('salt/job/2')
+        self.event.unsubscribe('salt/job/')
+        self.assertEqual([x['tag'] for x in self.pending],
+                         ['salt/job/2/ret/m1'])
+        self.event.unsubscribe('salt/job/2')
+        self.assertTrue(self.pending.subscribed('salt/job/2/ret/m2'))
+        self.event.unsubscribe('salt/job/2')
+        self.assertFalse(self.pending.subscribed('salt/job/2/ret/m2'))
+        self.assertEqual(len(self.pending), 0)
+        self.assertRaises(ValueError, self.event.unsubscribe, 'salt/job/2')
+        self.assertFalse(self.pending.add(self._evt('salt/job/2/ret/m2')))
+
+    def test_pending_events_queue_size(self):
+        '''
+        The oldest events of a full subscription queue are dropped and counted
+        '''
+        self.pending.queue_size = 2
+        self.event.subscribe('salt/job/1')
+        self.event.subscribe('salt/job/')
+        for idx in range(3):
+            self.pending.add(self._evt('salt/job/1/ret/m{0}'.format(idx)))
+        self.assertEqual(self.pending.dropped, 1)
+        self.assertEqual(self.event._check_pending('salt/job/1')['tag'],
+                         'salt/job/1/ret/m1')
+        # Events already returned do not count against the queue size
+        self.pending.add(self._evt('salt/job/2/ret/m0'))
+        self.assertEqual(self.pending.dropped, 1)
+        self.assertEqual(self.event._check_pending('salt/job/')['tag'],
+                         'salt/job/1/ret/m2')
+        self.assertEqual(self.event._check_pending('salt/job/')['tag'],
+                         'salt/job/2/ret/m0')
+
+
+class TestEventPublisherStats(TestCase):
+    def test_post_stats(self):
+        '''
+        A shard of the event bus publishes its throughput and lag with the
+        master stats
+        '''
+        publisher = salt.utils.event.EventPublisher(
+            {'master_stats': True, 'master_stats_event_iter': 60,
+             'event_publisher_shards': 2},
+            shard=1)
+        publisher.publisher = MagicMock()
+        stamp = (datetime.datetime.utcnow() -
+                 datetime.timedelta(seconds=3)).isoformat()
+        package = b''.join([
+            b'salt/job/1/new',
+            salt.utils.stringutils.to_bytes(salt.utils.event.TAGEND),
+            salt.payload.Serial({'serial': 'msgpack'}).dumps(
+                {'_stamp': stamp}, use_bin_type=True)])
+        publisher.handle_publish(package, None)
+        self.assertEqual(publisher.publisher.publish.call_count, 1)
+
+        publisher.stat_clock -= 61
+        publisher.handle_publish(package, None)
+        self.assertEqual(publisher.publisher.publish.call_count, 3)
+        tag, data = salt.utils.event.SaltEvent.unpack(
+            publisher.publisher.publish.call_args[0][0])
+        self.assertEqual(tag, 'salt/stats/event_publisher/1')
+        self.assertEqual(data['shard'], 1)
+        self.assertEqual(data['shards'], 2)
+        self.assertEqual(data['events'], 2)
+        self.assertGreaterEqual(data['lag'], 3)
+        self.assertEqual(publisher.stat_events, 0)
+
+
 class TestAsyncEventPublisher(AsyncTestCase):
     def get_new_ioloop(self):
         return zmq.eventloop.ioloop.ZMQIOLoop()
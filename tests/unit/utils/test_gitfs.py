@@ -6,13 +6,20 @@ any remotes.
 
 # Import python libs
 from __future__ import absolute_import, unicode_literals, print_function
+import os
+import shutil
+import tempfile
+import threading
+import time
 
 # Import Salt Testing libs
 from tests.support.unit import skipIf, TestCase
 from tests.support.mock import MagicMock, patch, NO_MOCK, NO_MOCK_REASON
 
 # Import salt libs
+import salt.utils.files
 import salt.utils.gitfs
+import salt.utils.hashutils
 from salt.exceptions import FileserverConfigError
 
 # GLOBALS
@@ -90,3 +97,218 @@ class TestGitFSProvider(TestCase):
                                 role_class,
                                 *args,
                                 **kwargs)
+
+
+class FakeRemote(object):
+    '''
+    A remote whose fetch takes ``delay`` seconds, or waits for ``release`` to
+    be set
+    '''
+    def __init__(self, id_, changed=False, delay=0, release=None):
+        self.id = id_
+        self.changed = changed
+        self.delay = delay
+        self.release = release
+        self.done = threading.Event()
+
+    def fetch(self):
+        if self.release is not None:
+            self.release.wait()
+        time.sleep(self.delay)
+        self.done.set()
+        return self.changed
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class TestGitBaseFetch(TestCase):
+
+    def _gitfs(self, remotes, **opts):
+        opts = dict(OPTS, **opts)
+        with patch.object(salt.utils.gitfs.GitFS, 'verify_gitpython',
+                          MagicMock(return_value=True)), \
+                patch.object(salt.utils.gitfs.GitFS, 'verify_pygit2',
+                             MagicMock(return_value=False)):
+            gitfs = salt.utils.gitfs.GitFS(opts, {}, init_remotes=False)
+        gitfs.remotes = remotes
+        return gitfs
+
+    def test_fetch_remotes_concurrent(self):
+        '''
+        The remotes are fetched by up to gitfs_fetch_workers threads, and the
+        duration of each fetch is recorded
+        '''
+        remotes = [FakeRemote('remote{0}'.format(idx), delay=0.3)
+                   for idx in range(4)]
+        gitfs = self._gitfs(remotes, gitfs_fetch_workers=4)
+        start = time.time()
+        self.assertFalse(gitfs.fetch_remotes())
+        self.assertLess(time.time() - start, 1.0)
+        for remote in remotes:
+            stats = gitfs.fetch_stats[remote.id]
+            self.assertGreaterEqual(stats['duration'], 0.3)
+            self.assertFalse(stats['timed_out'])
+
+        remotes[2].changed = True
+        self.assertTrue(gitfs.fetch_remotes())
+        self.assertTrue(gitfs.fetch_remotes(remotes=[('remote2', None)]))
+        self.assertEqual(list(gitfs.fetch_stats), ['remote2'])
+
+    def test_fetch_remotes_timeout(self):
+        '''
+        A hanging remote does not hold up the others past gitfs_fetch_timeout,
+        and its changes are reported by the next update
+        '''
+        release = threading.Event()
+        hanging = FakeRemote('hanging', changed=True, release=release)
+        remotes = [hanging] + [FakeRemote('remote{0}'.format(idx), delay=0.1)
+                               for idx in range(3)]
+        gitfs = self._gitfs(remotes, gitfs_fetch_workers=2,
+                            gitfs_fetch_timeout=1)
+        try:
+            start = time.time()
+            self.assertFalse(gitfs.fetch_remotes())
+            self.assertLess(time.time() - start, 3)
+            self.assertTrue(gitfs.fetch_stats['hanging']['timed_out'])
+            for remote in remotes[1:]:
+                self.assertTrue(remote.done.is_set())
+                self.assertFalse(gitfs.fetch_stats[remote.id]['timed_out'])
+        finally:
+            release.set()
+        self.assertTrue(hanging.done.wait(5))
+        # Give the worker the time to record the late change
+        time.sleep(0.1)
+
+        gitfs = self._gitfs(remotes[1:], gitfs_fetch_workers=2,
+                            gitfs_fetch_timeout=1)
+        self.assertTrue(gitfs.fetch_remotes())
+        self.assertFalse(gitfs.fetch_remotes())
+
+
+class FakeProvider(salt.utils.gitfs.GitProvider):
+    '''
+    A remote serving the trees in ``trees``, a dict mapping environments to a
+    (tree SHA, {path: contents}) tuple
+    '''
+    def __init__(self, trees):  # pylint: disable=super-init-not-called
+        self.trees = trees
+        self.listed = []
+        self.written = []
+        self._listings = {}
+        self._env_listings = {}
+
+    def mountpoint(self, tgt_env):
+        return ''
+
+    def root(self, tgt_env):
+        return ''
+
+    def get_tree(self, tgt_env):
+        return self.trees.get(tgt_env)
+
+    def tree_sha(self, tree):
+        return tree[0]
+
+    def file_list(self, tgt_env, tree=None):
+        self.listed.append(tgt_env)
+        return set(tree[1]), {}
+
+    def dir_list(self, tgt_env, tree=None):
+        return set(os.path.dirname(x) for x in tree[1]) - set([''])
+
+    def find_file(self, path, tgt_env):
+        try:
+            contents = self.trees[tgt_env][1][path]
+        except KeyError:
+            return None, None, None
+        return contents, '{0:040x}'.format(abs(hash(contents))), 0o100644
+
+    def write_file(self, blob, dest):
+        self.written.append(blob)
+        with salt.utils.files.fopen(dest, 'w') as fp_:
+            fp_.write(blob)
+
+
+@skipIf(NO_MOCK, NO_MOCK_REASON)
+class TestGitFSCache(TestCase):
+
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cachedir)
+
+    def _gitfs(self, remote):
+        opts = dict(OPTS, cachedir=self.cachedir, hash_type='sha256')
+        with patch.object(salt.utils.gitfs.GitFS, 'verify_gitpython',
+                          MagicMock(return_value=True)), \
+                patch.object(salt.utils.gitfs.GitFS, 'verify_pygit2',
+                             MagicMock(return_value=False)):
+            gitfs = salt.utils.gitfs.GitFS(opts, {}, init_remotes=False)
+        gitfs.remotes = [remote]
+        return gitfs
+
+    def test_list_env(self):
+        '''
+        The listing of a tree is computed once, for all the environments
+        pointing to it
+        '''
+        tree = ('a' * 40, {'top.sls': 'base', 'web/init.sls': 'web'})
+        remote = FakeProvider({'base': tree, 'dev': tree})
+        files, symlinks, dirs = remote.list_env('base')
+        self.assertEqual(files, set(['top.sls', 'web/init.sls']))
+        self.assertEqual(dirs, set(['web']))
+        remote.list_env('dev')
+        remote.list_env('base')
+        self.assertEqual(remote.listed, ['base'])
+
+        # A new commit in an environment is listed, the old tree is dropped
+        # once no environment points to it anymore
+        remote.trees['dev'] = ('b' * 40, {'top.sls': 'dev'})
+        self.assertEqual(remote.list_env('dev')[0], set(['top.sls']))
+        self.assertEqual(remote.listed, ['base', 'dev'])
+        self.assertEqual(len(remote._listings), 2)
+        remote.trees['base'] = remote.trees['dev']
+        remote.list_env('base')
+        self.assertEqual(remote.listed, ['base', 'dev'])
+        self.assertEqual(list(remote._listings), [('b' * 40, '', '')])
+
+    def test_find_file_blobs(self):
+        '''
+        The blobs are cached once per SHA for all of the environments, and
+        the blobs no longer in use are reaped
+        '''
+        tree = ('a' * 40, {'top.sls': 'base: {}'})
+        remote = FakeProvider({'base': tree, 'dev': tree})
+        gitfs = self._gitfs(remote)
+        with patch.object(gitfs, 'envs', MagicMock(return_value=['base', 'dev'])):
+            base = gitfs.find_file('top.sls', 'base')
+            dev = gitfs.find_file('top.sls', 'dev')
+            self.assertEqual(base['path'], dev['path'])
+            self.assertEqual(base['stat'], [0o100644])
+            self.assertEqual(remote.written, ['base: {}'])
+            self.assertEqual(gitfs.find_file('missing.sls', 'base'),
+                             {'path': '', 'rel': ''})
+
+            load = {'path': 'top.sls', 'saltenv': 'base'}
+            hsum = gitfs.file_hash(load, base)
+            self.assertEqual(
+                hsum['hsum'],
+                salt.utils.hashutils.sha256_digest('base: {}'))
+            self.assertEqual(gitfs.file_hash(load, dev), hsum)
+
+            remote.trees['dev'] = ('b' * 40, {'top.sls': 'dev: {}'})
+            new_dev = gitfs.find_file('top.sls', 'dev')
+            self.assertNotEqual(new_dev['path'], base['path'])
+
+            old = time.time() - salt.utils.gitfs.BLOB_REAP_AGE - 1
+            for path in (base['path'], '{0}.sha256'.format(base['path']),
+                         new_dev['path']):
+                os.utime(path, (old, old))
+            gitfs._reap_blobs()
+            self.assertTrue(os.path.isfile(base['path']))
+
+            remote.trees['base'] = remote.trees['dev']
+            gitfs.find_file('top.sls', 'base')
+            gitfs._reap_blobs()
+            self.assertFalse(os.path.isfile(base['path']))
+            self.assertFalse(os.path.isfile(
+                '{0}.sha256'.format(base['path'])))
+            self.assertTrue(os.path.isfile(new_dev['path']))
@@ -9,6 +9,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 # Import Salt Testing Libs
 from tests.support.unit import skipIf, TestCase
 from tests.support.mock import (
+    MagicMock,
     NO_MOCK,
     NO_MOCK_REASON,
     patch
@@ -59,3 +60,22 @@ class JobTest(TestCase):
                 with self.assertLogs('salt.utils.job', level='CRITICAL') as logged:
                     job.store_job(MockMasterMinion.opts, {'jid': '20190618090114890985', 'return': {'success': True}, 'id': 'a'})
                     self.assertIn("The specified 'foo' returner threw a stack trace", logged.output[0])
+
+    def test_store_jobs_returner_many(self):
+        '''
+        test store_jobs writing all the returns with returner_many
+        '''
+        loads = [{'jid': '20190618090114890985', 'return': {'success': True}, 'id': 'a'},
+                 {'jid': '20190618090114890985', 'return': {'success': True}, 'id': 'b'},
+                 {'jid': '20190618090114890985', 'id': 'c'}]
+        returner_many = MagicMock()
+        returner = MagicMock()
+        event = MagicMock()
+        with patch.object(salt.minion, 'MasterMinion', MockMasterMinion), \
+                patch.dict(MockMasterMinion.returners, {'foo.returner_many': returner_many,
+                                                        'foo.returner': returner}), \
+                patch('salt.utils.verify.valid_id', return_value=True):
+            job.store_jobs(MockMasterMinion.opts, loads, event=event)
+        returner_many.assert_called_once_with(loads[:2])
+        returner.assert_not_called()
+        self.assertEqual(event.fire_event.call_count, 2)
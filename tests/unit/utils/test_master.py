@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 # Import Python Libs
 from __future__ import absolute_import
+import os
+import shutil
+import tempfile
 
 # Import Salt Testing Libs
 from tests.support.unit import TestCase, skipIf
@@ -104,3 +107,51 @@ class MasterUtilsIsPidHealthy(TestCase):
         m_fopen = mock_open(side_effect=OSError)
         with patch('salt.utils.files.fopen', m_fopen):
             assert master.is_pid_healthy(12345) is False
+
+
+class WorkerStatsTestCase(TestCase):
+    '''
+    Tests for the worker stats file
+    '''
+    def setUp(self):
+        self.cachedir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cachedir, ignore_errors=True)
+        self.opts = {'cachedir': self.cachedir}
+        master.WorkerStats.create(self.opts, 2)
+
+    def test_record_and_read(self):
+        stats = master.WorkerStats(self.opts, 1)
+        stats.record('_return', 0.002, queued=3)
+        stats.record('_return', 0.004)
+        stats.record('_pillar', 20)
+        ret = master.WorkerStats.read(self.opts)
+        # The first worker has not started yet
+        self.assertEqual(list(ret), ['MWorker-1'])
+        worker = ret['MWorker-1']
+        self.assertEqual(worker['pid'], os.getpid())
+        self.assertEqual(worker['requests'], 3)
+        self.assertEqual(worker['queued'], 0)
+        self.assertAlmostEqual(worker['busy'], 20.006)
+        self.assertEqual(worker['commands']['_return']['runs'], 2)
+        self.assertAlmostEqual(worker['commands']['_return']['mean'], 0.003)
+        self.assertEqual(worker['commands']['_return']['max'], 0.004)
+        self.assertEqual(worker['commands']['_return']['histogram']['<=0.0025'], 1)
+        self.assertEqual(worker['commands']['_return']['histogram']['<=0.005'], 1)
+        self.assertEqual(worker['commands']['_pillar']['histogram']['>10'], 1)
+        self.assertEqual(sum(worker['commands']['_pillar']['histogram'].values()), 1)
+
+    def test_restarted_worker_clears_region(self):
+        master.WorkerStats(self.opts, 0).record('_return', 0.1)
+        master.WorkerStats(self.opts, 0)
+        self.assertEqual(master.WorkerStats.read(self.opts)['MWorker-0']['commands'], {})
+
+    def test_commands_overflow(self):
+        stats = master.WorkerStats(self.opts, 0)
+        for idx in range(master.WorkerStats.SLOTS + 5):
+            stats.record('cmd{0}'.format(idx), 0.1)
+        commands = master.WorkerStats.read(self.opts)['MWorker-0']['commands']
+        self.assertEqual(len(commands), master.WorkerStats.SLOTS)
+        self.assertEqual(commands['__other__']['runs'], 6)
+
+    def test_read_missing_file(self):
+        self.assertEqual(master.WorkerStats.read({'cachedir': os.path.join(self.cachedir, 'nope')}), {})
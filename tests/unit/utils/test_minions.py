@@ -5,6 +5,7 @@ from __future__ import absolute_import, unicode_literals
 import sys
 
 # Import Salt Libs
+import salt.utils.data
 import salt.utils.minions
 
 # Import Salt Testing Libs
@@ -509,3 +510,108 @@ class NodegroupCompTest(TestCase):
         # If this works, it should also print an error to the console
         ret = salt.utils.minions.nodegroup_comp('group1', referenced_nodegroups)
         self.assertEqual(ret, [])
+
+
+MINION_DATA = {
+    'web1': {'grains': {'os': 'Ubuntu', 'roles': ['web', 'db'],
+                        'ipv4': ['10.0.0.1'], 'deep': {'a': {'b': 'c'}}},
+             'pillar': {'env': 'prod', 'ports': [80, 443]}},
+    'web2': {'grains': {'os': 'CentOS', 'roles': ['web'],
+                        'ipv4': ['10.0.1.2'], 'colon': 'x:y'},
+             'pillar': {'env': 'dev', 'nested': [{'key': 'val'}]}},
+    'db1': {'grains': {'os': 'ubuntu', 'roles': 'db',
+                       'ipv4': ['10.0.0.3']},
+            'pillar': {}},
+    'nodata': {},
+}
+
+
+class MinionDataIndexTestCase(TestCase):
+    '''
+    TestCase for salt.utils.minions.MinionDataIndex
+    '''
+    def setUp(self):
+        self.cache = MagicMock()
+        self.cache.list.return_value = list(MINION_DATA)
+        self.cache.list_with_mtime.return_value = dict((id_, 1) for id_ in MINION_DATA)
+        self.cache.fetch_many.side_effect = lambda items: dict(
+            (item, MINION_DATA[item[0].split('/')[1]]) for item in items
+        )
+        self.index = salt.utils.minions.MinionDataIndex(self.cache)
+        self.index.refresh()
+
+    def test_match_same_as_subdict_match(self):
+        '''
+        The index must return exactly the minions subdict_match would match
+        '''
+        targets = [
+            ('grains', 'os:Ubuntu', {}),
+            ('grains', 'os:ubuntu', {}),
+            ('grains', 'os:Ubu*', {}),
+            ('grains', 'roles:db', {}),
+            ('grains', 'roles:web', {}),
+            ('grains', 'deep:a:b:c', {}),
+            ('grains', 'deep:a:b', {}),
+            ('grains', 'colon:x:y', {}),
+            ('grains', 'os', {}),
+            ('grains', 'ipv4:10.0.0.*', {}),
+            ('grains', 'os:^cent', {'regex_match': True}),
+            ('pillar', 'env:prod', {}),
+            ('pillar', 'ports:443', {}),
+            ('pillar', 'nested:key:val', {}),
+            ('pillar', 'env:Prod', {'exact_match': True}),
+        ]
+        for search_type, expr, kwargs in targets:
+            expected = set(
+                id_ for id_, mdata in MINION_DATA.items()
+                if salt.utils.data.subdict_match(mdata.get(search_type), expr, **kwargs)
+            )
+            ret = self.index.match(search_type, expr, ':', **kwargs)
+            self.assertEqual(ret, expected, (search_type, expr))
+
+    def test_refresh_only_fetches_updated_minions(self):
+        '''
+        Entries whose mtime did not change are not fetched again
+        '''
+        self.cache.fetch_many.reset_mock()
+        self.index.refresh()
+        self.cache.fetch_many.assert_not_called()
+
+        self.cache.list_with_mtime.return_value = {'web1': 1, 'db1': 2}
+        self.index.refresh()
+        self.cache.fetch_many.assert_called_once_with([('minions/db1', 'data')])
+        self.assertEqual(set(self.index.data), set(['web1', 'db1']))
+        self.assertEqual(self.index.match('grains', 'roles:web', ':'), set(['web1']))
+
+    def test_eval_compound(self):
+        '''
+        Compound expressions follow the python set operator precedence
+        '''
+        a, b, c = set(['a', 'x']), set(['b', 'x']), set(['c', 'x'])
+        tokens = [a, '|', b, '&', c]
+        self.assertEqual(salt.utils.minions._eval_compound(tokens), a | b & c)
+        tokens = ['(', a, '|', b, ')', '&', c]
+        self.assertEqual(salt.utils.minions._eval_compound(tokens), (a | b) & c)
+        tokens = ['(', a | b | c, '-', a, ')', '&', b]
+        self.assertEqual(salt.utils.minions._eval_compound(tokens), set(['b']))
+        with self.assertRaises(ValueError):
+            salt.utils.minions._eval_compound(['(', a, '|', b])
+
+    def test_check_grain_minions_with_index(self):
+        '''
+        CkMinions resolves grain targets through the index when enabled
+        '''
+        ckminions = salt.utils.minions.CkMinions({'minion_data_cache': True,
+                                                  'minion_data_index': True})
+        ckminions.cache = self.cache
+        self.cache.driver = 'localfs'
+        self.cache.modules = {'localfs.list_with_mtime': None}
+        with patch('salt.utils.minions.MinionDataIndex.instance',
+                   MagicMock(return_value=self.index)):
+            ret = ckminions._check_grain_minions('os:ubuntu', ':', False)
+            self.assertEqual(sorted(ret['minions']), ['db1', 'web1'])
+            with patch.object(ckminions, '_pki_minions',
+                              MagicMock(return_value=list(MINION_DATA) + ['new'])):
+                ret = ckminions._check_compound_minions('G@roles:web and not web2',
+                                                        ':', False)
+            self.assertEqual(ret['minions'], ['web1'])
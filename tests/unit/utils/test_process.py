@@ -78,6 +78,11 @@ def spin(func):
     return wrapper
 
 
+def _spin_forever():
+    while True:
+        time.sleep(1)
+
+
 class TestProcessManager(TestCase):
 
     @spin
@@ -171,6 +176,47 @@ class TestProcessManager(TestCase):
                 process_manager.stop_restarting()
                 process_manager.kill_children()
 
+    def test_stop_process(self):
+        process_manager = salt.utils.process.ProcessManager()
+        stopped = process_manager.add_process(_spin_forever, name='stopped')
+        process_manager.add_process(_spin_forever, name='kept')
+        process_manager.stop_process('stopped')
+        try:
+            assert not stopped.is_alive()
+            process_manager.check_children()
+            assert [mapping['Process'].name for mapping in process_manager._process_map.values()] == ['kept']
+        finally:
+            process_manager.stop_restarting()
+            process_manager.kill_children()
+            time.sleep(0.5)
+            # Are there child processes still running?
+            if process_manager._process_map.keys():
+                process_manager.send_signal_to_processes(signal.SIGKILL)
+                process_manager.stop_restarting()
+                process_manager.kill_children()
+
+    def test_run_periodic(self):
+        process_manager = salt.utils.process.ProcessManager()
+        process_manager.add_process(_spin_forever, name='stopped')
+        calls = []
+
+        def periodic():
+            calls.append(len(process_manager._process_map))
+            if len(calls) == 3:
+                process_manager.stop_process('stopped')
+
+        handlers = [(signum, signal.getsignal(signum)) for signum in (signal.SIGTERM, signal.SIGINT)]
+        try:
+            process_manager.run(periodic=periodic, interval=0.1)
+            # run returns once it has no children left
+            assert calls == [1, 1, 1]
+        finally:
+            process_manager.stop_restarting()
+            process_manager.kill_children()
+            # run and kill_children install their own handlers
+            for signum, handler in handlers:
+                signal.signal(signum, handler)
+
 
 class TestThreadPool(TestCase):
 